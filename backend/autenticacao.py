@@ -0,0 +1,164 @@
+"""
+Verificação dos tokens de acesso com cache em memória.
+
+Autenticar um pedido exige jwt.decode e duas consultas ao banco (usuarios e
+instituicoes). Para que isso não pese em cada pedido:
+
+- os tokens já verificados ficam numa LRU até expirarem, pelo que um token
+  repetido custa uma consulta a um dicionário
+- utilizadores e instituições ficam em cache durante `ttl_segundos`
+- os inexistentes e os inativos também ficam em cache (cache negativa,
+  `ttl_negativo_segundos`, mais curto), para que um token de um utilizador
+  removido não vá ao banco a cada pedido
+- consultas simultâneas ao mesmo utilizador partilham uma só ida ao banco
+
+Quando um utilizador é desativado, `invalidar_utilizador()` descarta a
+entrada e o pedido seguinte já é recusado. Noutros workers a alteração
+vale no máximo ao fim de `ttl_segundos`.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from jose import JWTError, jwt
+
+from coalescencia import Coalescedor
+
+PROJECAO_USUARIO = {"nome": 1, "email": 1, "perfil": 1, "instituicaoId": 1, "ativo": 1}
+PROJECAO_INSTITUICAO = {"nome": 1, "ativo": 1}
+
+
+class ErroAutenticacao(Exception):
+    """Token inválido ou expirado, ou utilizador/instituição inexistente ou inativo"""
+
+
+def _object_id(valor: Any) -> Optional[ObjectId]:
+    try:
+        return valor if isinstance(valor, ObjectId) else ObjectId(valor)
+    except (InvalidId, TypeError):
+        return None
+
+
+class CacheAutenticacao:
+    """Tokens verificados e utilizadores/instituições em memória, com TTL e cache negativa"""
+
+    def __init__(self, usuarios_collection, instituicoes_collection, chave_secreta: str, algoritmo: str = "HS256",
+                 ttl_segundos: float = 60, ttl_negativo_segundos: float = 10, max_tokens: int = 10000):
+        self.usuarios_collection = usuarios_collection
+        self.instituicoes_collection = instituicoes_collection
+        self.chave_secreta = chave_secreta
+        self.algoritmo = algoritmo
+        self.ttl_segundos = ttl_segundos
+        self.ttl_negativo_segundos = ttl_negativo_segundos
+        self.max_tokens = max_tokens
+        # token -> (sub, exp)
+        self._tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # id -> (documento ou None, expira)
+        self._usuarios: Dict[str, Tuple[Optional[Dict[str, Any]], float]] = {}
+        self._instituicoes: Dict[str, Tuple[Optional[Dict[str, Any]], float]] = {}
+        self._coalescedor = Coalescedor()
+        # Incrementada a cada invalidação: uma consulta iniciada antes não é guardada
+        self._geracao = 0
+        self.tokens_acertos = 0
+        self.tokens_verificados = 0
+        self.acertos = 0
+        self.consultas = 0
+        self.recusados = 0
+        self.invalidacoes = 0
+
+    def _verificar_token(self, token: str) -> str:
+        """Retorna o id do utilizador (sub) de um token válido"""
+        entrada = self._tokens.get(token)
+        if entrada:
+            sub, exp = entrada
+            if exp > time.time():
+                self._tokens.move_to_end(token)
+                self.tokens_acertos += 1
+                return sub
+            del self._tokens[token]
+            raise ErroAutenticacao("Token expirado")
+
+        self.tokens_verificados += 1
+        try:
+            claims = jwt.decode(token, self.chave_secreta, algorithms=[self.algoritmo])
+        except JWTError as e:
+            raise ErroAutenticacao(f"Token inválido: {e}")
+        sub, exp = claims.get("sub"), claims.get("exp")
+        if not sub or not isinstance(exp, (int, float)):
+            raise ErroAutenticacao("Token inválido: sem utilizador ou sem validade")
+        self._tokens[token] = (sub, exp)
+        if len(self._tokens) > self.max_tokens:
+            self._tokens.popitem(last=False)
+        return sub
+
+    async def _obter(self, cache: Dict[str, Tuple[Optional[Dict[str, Any]], float]], tipo: str, chave: str,
+                     collection, projecao: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        entrada = cache.get(chave)
+        if entrada and entrada[1] > time.monotonic():
+            self.acertos += 1
+            return entrada[0]
+
+        async def consultar() -> Optional[Dict[str, Any]]:
+            geracao = self._geracao
+            self.consultas += 1
+            object_id = _object_id(chave)
+            documento = await collection.find_one({"_id": object_id}, projecao) if object_id else None
+            # Inexistentes e inativos expiram mais cedo: uma reativação vale depressa
+            ativo = documento is not None and documento.get("ativo", True) is not False
+            ttl = self.ttl_segundos if ativo else self.ttl_negativo_segundos
+            if geracao == self._geracao:
+                cache[chave] = (documento, time.monotonic() + ttl)
+            return documento
+        documento, _ = await self._coalescedor.executar(f"{self._geracao}:{tipo}:{chave}", consultar)
+        return documento
+
+    async def autenticar(self, token: str) -> Dict[str, Any]:
+        """Utilizador autenticado pelo token; ErroAutenticacao se o pedido deve ser recusado"""
+        try:
+            usuario_id = self._verificar_token(token)
+            usuario = await self._obter(self._usuarios, "usuario", usuario_id, self.usuarios_collection,
+                                        PROJECAO_USUARIO)
+            if not usuario or not usuario.get("ativo", False):
+                raise ErroAutenticacao("Utilizador inexistente ou inativo")
+            instituicao_id = str(usuario.get("instituicaoId"))
+            instituicao = await self._obter(self._instituicoes, "instituicao", instituicao_id,
+                                            self.instituicoes_collection, PROJECAO_INSTITUICAO)
+            if not instituicao or instituicao.get("ativo", True) is False:
+                raise ErroAutenticacao("Instituição inexistente ou inativa")
+        except ErroAutenticacao:
+            self.recusados += 1
+            raise
+        return {
+            "id": usuario_id,
+            "nome": usuario.get("nome"),
+            "email": usuario.get("email"),
+            "perfil": usuario.get("perfil", "USUARIO"),
+            "instituicaoId": instituicao_id,
+            "instituicaoNome": instituicao.get("nome", "Instituição"),
+        }
+
+    def invalidar_utilizador(self, usuario_id: str) -> None:
+        """Descarta o utilizador em cache (desativado, removido ou alterado)"""
+        self._usuarios.pop(str(usuario_id), None)
+        self._geracao += 1
+        self.invalidacoes += 1
+
+    def invalidar_instituicao(self, instituicao_id: str) -> None:
+        self._instituicoes.pop(str(instituicao_id), None)
+        self._geracao += 1
+        self.invalidacoes += 1
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "tokens": len(self._tokens),
+            "tokens_acertos": self.tokens_acertos,
+            "tokens_verificados": self.tokens_verificados,
+            "usuarios": len(self._usuarios),
+            "instituicoes": len(self._instituicoes),
+            "acertos": self.acertos,
+            "consultas": self.consultas,
+            "recusados": self.recusados,
+            "invalidacoes": self.invalidacoes,
+        }
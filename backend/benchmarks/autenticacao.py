@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Custo da autenticação por pedido: verificação direta (jwt.decode e duas
+consultas ao banco) vs. CacheAutenticacao.
+
+As coleções usuarios e instituicoes são substituídas por dicionários com
+LATENCIA_BANCO segundos por consulta (uma ida a um MongoDB local), para
+que o script corra sem banco. Além dos tempos por pedido, verifica:
+
+- uma rajada de pedidos simultâneos com a cache vazia faz uma só consulta
+  por utilizador
+- um token de um utilizador inexistente só vai ao banco uma vez (cache
+  negativa)
+- depois de desativar um utilizador e chamar invalidar_utilizador(), o
+  pedido seguinte é recusado
+
+Uso:
+    python benchmarks/autenticacao.py [PEDIDOS]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from jose import jwt
+
+from autenticacao import CacheAutenticacao, ErroAutenticacao
+
+LATENCIA_BANCO = 0.0005
+CHAVE = "chave-do-benchmark"
+NUM_UTILIZADORES = 50
+
+
+class ColecaoMemoria:
+    """find_one por _id sobre um dicionário, com latência de rede simulada"""
+
+    def __init__(self, documentos):
+        self.documentos = {doc["_id"]: doc for doc in documentos}
+        self.consultas = 0
+
+    async def find_one(self, filtro, projecao=None):
+        self.consultas += 1
+        await asyncio.sleep(LATENCIA_BANCO)
+        documento = self.documentos.get(filtro["_id"])
+        # Uma cópia, como o driver: alterar a coleção não altera o que já está em cache
+        return dict(documento) if documento else None
+
+
+def criar_token(usuario_id) -> str:
+    return jwt.encode({"sub": str(usuario_id), "exp": datetime.utcnow() + timedelta(hours=1)}, CHAVE, algorithm="HS256")
+
+
+async def autenticar_sem_cache(usuarios, instituicoes, token: str) -> dict:
+    """O que cada pedido faria sem cache"""
+    claims = jwt.decode(token, CHAVE, algorithms=["HS256"])
+    usuario = await usuarios.find_one({"_id": ObjectId(claims["sub"])})
+    if not usuario or not usuario.get("ativo"):
+        raise ErroAutenticacao("Utilizador inexistente ou inativo")
+    instituicao = await instituicoes.find_one({"_id": usuario["instituicaoId"]})
+    return {"id": claims["sub"], "nome": usuario["nome"], "instituicaoNome": instituicao["nome"]}
+
+
+async def medir(funcao, tokens, pedidos: int) -> float:
+    inicio = time.perf_counter()
+    for i in range(pedidos):
+        await funcao(tokens[i % len(tokens)])
+    return (time.perf_counter() - inicio) / pedidos * 1e6
+
+
+async def executar(pedidos: int) -> None:
+    instituicao_id = ObjectId()
+    instituicoes = ColecaoMemoria([{"_id": instituicao_id, "nome": "Instituição de teste", "ativo": True}])
+    ids = [ObjectId() for _ in range(NUM_UTILIZADORES)]
+    usuarios = ColecaoMemoria([{"_id": i, "nome": f"Utilizador {n}", "email": f"u{n}@teste.mz", "perfil": "AUTORIDADE",
+                                "instituicaoId": instituicao_id, "ativo": True} for n, i in enumerate(ids)])
+    tokens = [criar_token(i) for i in ids]
+    cache = CacheAutenticacao(usuarios, instituicoes, CHAVE)
+
+    decode = await medir(lambda t: asyncio.sleep(0, jwt.decode(t, CHAVE, algorithms=["HS256"])), tokens, pedidos)
+    sem_cache = await medir(lambda t: autenticar_sem_cache(usuarios, instituicoes, t), tokens, min(pedidos, 2000))
+    await medir(cache.autenticar, tokens, len(tokens))  # aquecer: uma falha por utilizador
+    com_cache = await medir(cache.autenticar, tokens, pedidos)
+    print(f"{pedidos} pedidos, {NUM_UTILIZADORES} utilizadores, latência do banco {LATENCIA_BANCO * 1000:.1f} ms")
+    print(f"jwt.decode sozinho:           {decode:9.1f} µs/pedido")
+    print(f"sem cache (decode + 2 idas):  {sem_cache:9.1f} µs/pedido")
+    print(f"CacheAutenticacao (acertos):  {com_cache:9.1f} µs/pedido")
+    print(f"cache: {cache.estatisticas()}")
+
+    # Rajada com a cache vazia: consultas coalescidas por utilizador
+    cache = CacheAutenticacao(usuarios, instituicoes, CHAVE)
+    usuarios.consultas = instituicoes.consultas = 0
+    await asyncio.gather(*[cache.autenticar(tokens[i % 5]) for i in range(500)])
+    print(f"\nRajada de 500 pedidos de 5 utilizadores com a cache vazia: {usuarios.consultas} consultas a usuarios, "
+          f"{instituicoes.consultas} a instituicoes")
+    assert usuarios.consultas == 5 and instituicoes.consultas == 1
+
+    # Cache negativa: utilizador removido
+    token_removido = criar_token(ObjectId())
+    usuarios.consultas = 0
+    for _ in range(100):
+        try:
+            await cache.autenticar(token_removido)
+        except ErroAutenticacao:
+            pass
+    print(f"100 pedidos de um utilizador inexistente: {usuarios.consultas} consulta(s) a usuarios")
+    assert usuarios.consultas == 1
+
+    # Desativação com invalidação explícita
+    usuarios.documentos[ids[0]]["ativo"] = False
+    await cache.autenticar(tokens[0])
+    print("Utilizador desativado no banco: ainda aceite pela cache até invalidar ou expirar o TTL")
+    cache.invalidar_utilizador(str(ids[0]))
+    try:
+        await cache.autenticar(tokens[0])
+        raise AssertionError("utilizador desativado continua a ser aceite")
+    except ErroAutenticacao as e:
+        print(f"Depois de desativar e invalidar: recusado ({e})")
+
+
+if __name__ == "__main__":
+    asyncio.run(executar(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API com substitutos locais do Gemini, dos sites de vagas
+e do MongoDB: débito e latências (p50/p95/p99) por cenário sem gastar quota
+do Gemini nem pedir páginas a sites reais.
+
+Substitutos:
+- Gemini falso (API REST, o SDK é apontado para ele com GEMINI_API_ENDPOINT)
+  que devolve as respostas guardadas em respostas_gemini.json, com latência
+  e variação configuráveis
+- servidor de páginas de vagas com o corpus de benchmarks/paginas/; cada URL
+  /vaga/<n>/<pagina> acrescenta um parágrafo próprio, para que os links não
+  sejam todos a mesma vaga para as caches
+- MongoDB em memória (mongomock atrás de uma interface igual à do motor) ou,
+  com --mongodb, um servidor real descartável, numa base humai_verify_carga
+  apagada no fim
+
+Os dois servidores correm noutro processo, para não disputarem o GIL com a
+API. A API corre no mesmo processo do script (httpx.ASGITransport), como nos
+outros benchmarks.
+
+Cenários:
+- analyze_texto: textos diferentes em TEXTO (triagem, LLM, gravação)
+- analyze_texto_cache: os mesmos textos outra vez (cache de análises)
+- analyze_link: links diferentes para o servidor de páginas
+- vagas_paginacao: percorrer /vagas página a página pelo cursor
+- dashboard: /dashboard, /vagas/stats e os dois rankings
+- login_rajada: logins simultâneos
+
+O resultado é gravado em benchmarks/resultados/carga-<commit>-<data>.json.
+Com --comparar, os p95 e o débito são comparados com um resultado anterior
+e o script termina com código 1 se algum cenário piorou mais do que a
+tolerância.
+
+A quota de pedidos ao Gemini não entra na medição (LLM_PEDIDOS_POR_MINUTO
+alto); LLM_PEDIDOS_POR_MINUTO=15 inclui-a. Sem --mongodb é preciso o
+mongomock (pip install mongomock); os tempos do /vagas e do painel sobre o
+mongomock servem para comparar commits, não o MongoDB real.
+
+Uso:
+    python benchmarks/carga.py [--pedidos N] [--concorrencia C] [--latencia-llm S] [--jitter-llm S]
+                               [--vagas N] [--mongodb URL] [--cenarios a,b] [--comparar FICHEIRO]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+PASTA_PAGINAS = os.path.join(PASTA, "paginas")
+PASTA_RESULTADOS = os.path.join(PASTA, "resultados")
+SENHA = "senha-do-teste-de-carga"
+CODIGO_INSTITUICAO = "CARGA01"
+ORIGENS = ("cache", "semelhante", "triagem", "reputacao", "llm", "recurso")
+ETAPAS = ("obtencao", "extracao", "reducao", "triagem", "cache", "llm", "interpretacao", "gravacao")
+CENARIOS = ("analyze_texto", "analyze_texto_cache", "analyze_link", "vagas_paginacao", "dashboard", "login_rajada")
+
+
+def ler_pagina(nome: str) -> bytes:
+    with open(os.path.join(PASTA_PAGINAS, nome), "rb") as f:
+        return f.read()
+
+
+def vocabulario() -> list:
+    """Palavras do corpus de páginas, para gerar textos e parágrafos diferentes entre si"""
+    palavras = []
+    for nome in sorted(os.listdir(PASTA_PAGINAS)):
+        # Há páginas do corpus em latin-1, como vieram dos sites
+        corpo = ler_pagina(nome)
+        try:
+            html = corpo.decode("utf-8")
+        except UnicodeDecodeError:
+            html = corpo.decode("latin-1")
+        html = re.sub(r"<(script|style)\b.*?</\1>", " ", html, flags=re.S | re.I)
+        palavras += re.findall(r"[^\W\d_]{3,}", re.sub(r"<[^>]+>", " ", html))
+    return palavras
+
+
+def paragrafo(palavras: list, semente: int, n: int = 80) -> str:
+    return " ".join(random.Random(semente).choices(palavras, k=n))
+
+
+# --- Substitutos (processo separado) ---
+
+class GeminiFalso(BaseHTTPRequestHandler):
+    """generateContent e streamGenerateContent com respostas guardadas"""
+
+    protocol_version = "HTTP/1.1"
+    respostas: list = []
+    latencia = 0.0
+    jitter = 0.0
+
+    def _json(self, estado: int, corpo) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False).encode()
+        self.send_response(estado)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        pedido = self.rfile.read(int(self.headers.get("content-length", 0)))
+        time.sleep(max(0.0, self.latencia + random.uniform(-self.jitter, self.jitter)))
+        # O mesmo prompt recebe sempre a mesma resposta
+        texto = self.respostas[int(hashlib.sha1(pedido).hexdigest(), 16) % len(self.respostas)]
+
+        def pedaco(parte):
+            return {"candidates": [{"content": {"parts": [{"text": parte}], "role": "model"},
+                                    "finishReason": "STOP", "index": 0}]}
+        if ":streamGenerateContent" in self.path:
+            meio = len(texto) // 2
+            return self._json(200, [pedaco(texto[:meio]), pedaco(texto[meio:])])
+        self._json(200, pedaco(texto))
+
+    def log_message(self, *args):
+        pass
+
+
+class SitePaginas(BaseHTTPRequestHandler):
+    """GET /vaga/<n>/<pagina>: página do corpus com um parágrafo próprio de cada n"""
+
+    protocol_version = "HTTP/1.1"
+    paginas: dict = {}
+    palavras: list = []
+    latencia = 0.0
+
+    def do_GET(self):
+        partes = self.path.strip("/").split("/")
+        if len(partes) != 3 or partes[0] != "vaga" or partes[2] not in self.paginas or not partes[1].isdigit():
+            self.send_response(404)
+            self.send_header("content-length", "0")
+            self.end_headers()
+            return
+        time.sleep(self.latencia)
+        # Em entidades HTML, para servir no encoding original da página
+        extra = f"<p>Referência da vaga {partes[1]}: {paragrafo(self.palavras, int(partes[1]))}</p></body>"
+        corpo = self.paginas[partes[2]].replace(b"</body>", extra.encode("ascii", "xmlcharrefreplace"), 1)
+        self.send_response(200)
+        self.send_header("content-type", "text/html")
+        self.send_header("content-length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def _servir(portas, latencia_llm: float, jitter_llm: float, latencia_pagina: float) -> None:
+    with open(os.path.join(PASTA, "respostas_gemini.json"), encoding="utf-8") as f:
+        GeminiFalso.respostas = [json.dumps(r, ensure_ascii=False) for r in json.load(f)]
+    GeminiFalso.latencia, GeminiFalso.jitter = latencia_llm, jitter_llm
+    SitePaginas.paginas = {nome: ler_pagina(nome) for nome in os.listdir(PASTA_PAGINAS)}
+    SitePaginas.palavras = vocabulario()
+    SitePaginas.latencia = latencia_pagina
+
+    servidores = [ThreadingHTTPServer(("127.0.0.1", 0), GeminiFalso), ThreadingHTTPServer(("127.0.0.1", 0), SitePaginas)]
+    for servidor in servidores:
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    portas.put([servidor.server_address[1] for servidor in servidores])
+    threading.Event().wait()
+
+
+def iniciar_substitutos(args) -> tuple:
+    contexto = multiprocessing.get_context("spawn")
+    portas = contexto.Queue()
+    processo = contexto.Process(target=_servir, args=(portas, args.latencia_llm, args.jitter_llm, args.latencia_pagina),
+                                daemon=True)
+    processo.start()
+    porta_gemini, porta_paginas = portas.get(timeout=30)
+    return processo, f"http://127.0.0.1:{porta_gemini}", f"http://127.0.0.1:{porta_paginas}"
+
+
+# --- MongoDB em memória com a interface do motor ---
+
+class _CursorMemoria:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, nome):
+        # sort, skip, limit, hint, batch_size...: encadeáveis como no motor
+        metodo = getattr(self._cursor, nome)
+
+        def encadear(*args, **kwargs):
+            resultado = metodo(*args, **kwargs)
+            return self if resultado is self._cursor else resultado
+        return encadear
+
+    async def to_list(self, length=None):
+        documentos = list(self._cursor)
+        return documentos[:length] if length else documentos
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def _converter(documento: dict, estagio: dict) -> dict:
+    """$addFields com {"$convert": {"input": "$campo", "to": "objectId", "onError": ...}}"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+
+    for campo, expressao in estagio["$addFields"].items():
+        conversao = expressao["$convert"]
+        valor = documento.get(conversao["input"].lstrip("$"))
+        try:
+            documento[campo] = valor if isinstance(valor, ObjectId) else ObjectId(valor)
+        except (InvalidId, TypeError):
+            documento[campo] = conversao.get("onError")
+    return documento
+
+
+class _ColecaoMemoria:
+    def __init__(self, colecao, base):
+        self._colecao = colecao
+        self.database = base
+        self.name = colecao.name
+
+    def find(self, *args, **kwargs):
+        kwargs.pop("batch_size", None)
+        return _CursorMemoria(self._colecao.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        # O mongomock não implementa $convert (usado no login): essas etapas são feitas em Python
+        # e o resto do pipeline corre sobre uma coleção temporária da mesma base
+        for i, estagio in enumerate(pipeline):
+            if "$convert" in json.dumps(estagio, default=str):
+                documentos = [_converter(doc, estagio) for doc in self._colecao.aggregate(pipeline[:i])]
+                temporaria = self._colecao.database[f"_carga_{id(documentos)}"]
+                if documentos:
+                    temporaria.insert_many(documentos)
+                resultado = list(_ColecaoMemoria(temporaria, self.database).aggregate(pipeline[i + 1:])._cursor)
+                temporaria.drop()
+                return _CursorMemoria(iter(resultado))
+        return _CursorMemoria(self._colecao.aggregate(pipeline))
+
+    def list_indexes(self):
+        return _CursorMemoria(iter(self._colecao.list_indexes()))
+
+    def __getattr__(self, nome):
+        metodo = getattr(self._colecao, nome)
+
+        async def assincrono(*args, **kwargs):
+            return metodo(*args, **kwargs)
+        return assincrono
+
+
+class _BaseMemoria:
+    def __init__(self, base):
+        self._base = base
+        self.name = base.name
+        self._colecoes = {}
+
+    def __getitem__(self, nome):
+        if nome not in self._colecoes:
+            self._colecoes[nome] = _ColecaoMemoria(self._base[nome], self)
+        return self._colecoes[nome]
+
+    __getattr__ = __getitem__
+
+    async def command(self, *args, **kwargs):
+        return self._base.command(*args, **kwargs)
+
+
+class ClienteMongoMemoria:
+    """Substitui AsyncIOMotorClient: as bases são do mongomock, os métodos são corrotinas"""
+
+    def __init__(self, *args, **kwargs):
+        import mongomock
+        self._cliente = mongomock.MongoClient()
+        self._bases = {}
+
+    def __getitem__(self, nome):
+        if nome not in self._bases:
+            self._bases[nome] = _BaseMemoria(self._cliente[nome])
+        return self._bases[nome]
+
+    __getattr__ = __getitem__
+
+    async def apagar(self) -> None:
+        pass
+
+
+def cliente_mongo_descartavel(url: str):
+    """AsyncIOMotorClient em que client.<base> é <base>_carga, apagada no fim"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    class ClienteMongoCarga:
+        def __init__(self, *args, **kwargs):
+            self._cliente = AsyncIOMotorClient(url)
+            self._usadas = set()
+
+        def __getitem__(self, nome):
+            self._usadas.add(f"{nome}_carga")
+            return self._cliente[f"{nome}_carga"]
+
+        __getattr__ = __getitem__
+
+        async def apagar(self) -> None:
+            for nome in self._usadas:
+                await self._cliente.drop_database(nome)
+    return ClienteMongoCarga
+
+
+# --- Medição ---
+
+def percentil(valores: list, p: float) -> float:
+    return valores[min(int(len(valores) * p), len(valores) - 1)] if valores else 0.0
+
+
+class Amostras:
+    """Latência e código de estado de cada pedido de um cenário"""
+
+    def __init__(self):
+        self.latencias = []
+        self.estados = Counter()
+        self.inicio = time.perf_counter()
+        self.fim = None
+
+    async def pedido(self, chamada):
+        inicio = time.perf_counter()
+        try:
+            resposta = await chamada
+            estado = str(resposta.status_code)
+        except Exception as e:
+            resposta, estado = None, type(e).__name__
+        self.latencias.append(time.perf_counter() - inicio)
+        self.estados[estado] += 1
+        return resposta
+
+    def resumo(self) -> dict:
+        duracao = (self.fim or time.perf_counter()) - self.inicio
+        tempos = sorted(self.latencias)
+        return {
+            "pedidos": len(tempos),
+            "erros": sum(n for estado, n in self.estados.items() if not estado.startswith(("2", "3"))),
+            "estados": dict(self.estados),
+            "duracao_s": round(duracao, 3),
+            "pedidos_por_segundo": round(len(tempos) / duracao, 2) if duracao else None,
+            "latencia_ms": {
+                "media": round(sum(tempos) / len(tempos) * 1000, 2) if tempos else None,
+                "p50": round(percentil(tempos, 0.50) * 1000, 2),
+                "p90": round(percentil(tempos, 0.90) * 1000, 2),
+                "p95": round(percentil(tempos, 0.95) * 1000, 2),
+                "p99": round(percentil(tempos, 0.99) * 1000, 2),
+                "max": round(tempos[-1] * 1000, 2) if tempos else None,
+            },
+        }
+
+
+async def em_paralelo(funcoes: list, concorrencia: int) -> None:
+    limite = asyncio.Semaphore(concorrencia)
+
+    async def uma(funcao):
+        async with limite:
+            await funcao()
+    await asyncio.gather(*[uma(funcao) for funcao in funcoes])
+
+
+def contadores_api(main) -> dict:
+    """Origens das análises e etapas, para calcular a diferença de cada cenário"""
+    from metricas import duracao_etapas
+    return {
+        "origens": {origem: main.analises_por_origem.valor(origem=origem) for origem in ORIGENS},
+        "etapas": {nome: (duracao_etapas.total(etapa=nome), duracao_etapas.soma(etapa=nome)) for nome in ETAPAS},
+    }
+
+
+def diferenca(antes: dict, depois: dict) -> dict:
+    origens = {o: int(depois["origens"][o] - antes["origens"][o]) for o in ORIGENS}
+    etapas = {}
+    for nome in ETAPAS:
+        (n0, s0), (n1, s1) = antes["etapas"][nome], depois["etapas"][nome]
+        if n1 > n0:
+            etapas[nome] = {"n": n1 - n0, "media_ms": round((s1 - s0) / (n1 - n0) * 1000, 2)}
+    return {"origens": {o: n for o, n in origens.items() if n}, "etapas": etapas}
+
+
+# --- Dados iniciais ---
+
+def vaga_sintetica(i: int, inicio: datetime) -> dict:
+    aleatorio = random.Random(i)
+    dominio = aleatorio.choice([None, "www.emprego.co.mz", "vagas-rapidas.net", "www.linkedin.com", "portal.gov.mz"])
+    nivel = aleatorio.choice(["BAIXO", "BAIXO", "MEDIO", "ALTO", "CRITICO"])
+    return {
+        "url_vaga": f"https://{dominio}/vaga/{i}" if dominio else None,
+        "texto_original": None if dominio else f"Texto da vaga {i}",
+        "tipo_entrada": "LINK" if dominio else "TEXTO",
+        "titulo": f"Vaga {i}",
+        "empresa": aleatorio.choice(["Vodacom", "Vodacom Moçambique, S.A.", "Millennium BIM", "TechnoServe",
+                                     "Agência de Recrutamento", "Não especificada"]),
+        "descricao": "Descrição da vaga " * 30,
+        "nivel_risco": nivel,
+        "pontuacao_risco": {"BAIXO": 10, "MEDIO": 45, "ALTO": 75, "CRITICO": 95}[nivel],
+        "alertas": [],
+        "recomendacoes": [],
+        "detalhes_risco": {},
+        "data_analise": inicio + timedelta(minutes=i),
+    }
+
+
+async def preparar_dados(main, num_vagas: int, num_usuarios: int) -> None:
+    """Vagas já analisadas (com campos derivados e estatísticas), uma instituição e os utilizadores"""
+    from estatisticas_vagas import registrar
+    from indices_vagas import campos_derivados
+
+    inicio = datetime.now() - timedelta(minutes=num_vagas)
+    for lote in range(0, num_vagas, 500):
+        vagas = [vaga_sintetica(i, inicio) for i in range(lote, min(lote + 500, num_vagas))]
+        vagas = [{**vaga, **campos_derivados(vaga)} for vaga in vagas]
+        await main.vagas_collection.insert_many(vagas)
+        await registrar(main.vagas_estatisticas_collection, vagas)
+
+    instituicao = await main.instituicoes_collection.insert_one(
+        {"nome": "Instituição do teste de carga", "codigoAcesso": CODIGO_INSTITUICAO, "ativo": True})
+    hash_senha = await main.verificador_senhas.gerar_hash(SENHA)
+    await main.usuarios_collection.insert_many([
+        {"nome": f"Utilizador {i}", "email": f"carga{i}@teste.mz", "senha": hash_senha,
+         "instituicaoId": instituicao.inserted_id, "perfil": "AUTORIDADE", "ativo": True}
+        for i in range(num_usuarios)
+    ])
+
+
+# --- Cenários ---
+
+async def cenario_analyze(http, corpos: list, concorrencia: int, cabecalhos: dict) -> Amostras:
+    amostras = Amostras()
+
+    def analisar(corpo):
+        return lambda: amostras.pedido(http.post("/analyze", json=corpo, headers=cabecalhos))
+    await em_paralelo([analisar(corpo) for corpo in corpos], concorrencia)
+    return amostras
+
+
+async def cenario_paginacao(http, paginas: int, concorrencia: int, cabecalhos: dict) -> Amostras:
+    """Cada cliente percorre a listagem (com e sem filtro) até somar `paginas` páginas"""
+    amostras = Amostras()
+    restantes = [paginas]
+
+    async def percorrer(nivel_risco):
+        cursor = None
+        while restantes[0] > 0:
+            restantes[0] -= 1
+            params = {"limit": 20, **({"cursor": cursor} if cursor else {}),
+                      **({"nivel_risco": nivel_risco} if nivel_risco else {})}
+            resposta = await amostras.pedido(http.get("/vagas", params=params, headers=cabecalhos))
+            cursor = resposta.json().get("proximo_cursor") if resposta is not None and resposta.status_code == 200 else None
+            if cursor is None:
+                break
+
+    niveis = [None, "ALTO", "CRITICO", None]
+    while restantes[0] > 0:
+        await asyncio.gather(*[percorrer(niveis[i % len(niveis)]) for i in range(concorrencia)])
+    return amostras
+
+
+async def cenario_dashboard(http, pedidos: int, concorrencia: int, cabecalhos: dict) -> Amostras:
+    amostras = Amostras()
+    rotas = ["/dashboard", "/vagas/stats", "/vagas/top-empresas-risco", "/vagas/top-dominios-risco"]
+
+    def pedir(rota):
+        return lambda: amostras.pedido(http.get(rota, headers=cabecalhos))
+    await em_paralelo([pedir(rotas[i % len(rotas)]) for i in range(pedidos)], concorrencia)
+    return amostras
+
+
+async def cenario_login(http, usuarios: int) -> Amostras:
+    amostras = Amostras()
+    await asyncio.gather(*[
+        amostras.pedido(http.post("/auth/login", json={"email": f"carga{i}@teste.mz", "senha": SENHA,
+                                                       "instituicaoId": CODIGO_INSTITUICAO.lower()}))
+        for i in range(usuarios)
+    ])
+    return amostras
+
+
+# --- Execução ---
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PASTA, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "desconhecido"
+
+
+async def executar(args) -> dict:
+    processo, url_gemini, url_paginas = iniciar_substitutos(args)
+
+    os.environ.setdefault("GOOGLE_API_KEY", "chave-do-teste-de-carga")
+    os.environ.setdefault("LLM_PEDIDOS_POR_MINUTO", "60000")
+    os.environ.setdefault("LOG_NIVEL", "WARNING")
+    os.environ["GEMINI_API_ENDPOINT"] = url_gemini
+    # O MongoDB é substituído antes de main criar o cliente
+    import motor.motor_asyncio
+    motor.motor_asyncio.AsyncIOMotorClient = (
+        cliente_mongo_descartavel(args.mongodb) if args.mongodb else ClienteMongoMemoria)
+    import httpx
+    import main
+
+    cenarios = [c for c in args.cenarios.split(",") if c] if args.cenarios else list(CENARIOS)
+    desconhecidos = set(cenarios) - set(CENARIOS)
+    if desconhecidos:
+        raise SystemExit(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    print(f"Gemini falso em {url_gemini} ({args.latencia_llm}s ± {args.jitter_llm}s), páginas em {url_paginas}, "
+          f"MongoDB {'em ' + args.mongodb if args.mongodb else 'em memória'}")
+    await preparar_dados(main, args.vagas, max(args.usuarios, 1))
+    print(f"{args.vagas} vagas e {args.usuarios} utilizadores criados; {args.pedidos} pedidos por cenário, "
+          f"{args.concorrencia} em simultâneo\n")
+
+    palavras = vocabulario()
+    # Textos com palavras sorteadas do corpus: diferentes entre si para o índice de quase-duplicados
+    textos = [{"tipoEntrada": "TEXTO", "textoPublicacao": f"Vaga {i}. {paragrafo(palavras, 10_000 + i)}"}
+              for i in range(args.pedidos)]
+    nomes_paginas = sorted(os.listdir(PASTA_PAGINAS))
+    links = [{"tipoEntrada": "LINK", "linkOportunidade": f"{url_paginas}/vaga/{i}/{nomes_paginas[i % len(nomes_paginas)]}"}
+             for i in range(args.pedidos)]
+
+    resultados = {}
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://carga",
+                                     timeout=300) as http:
+            resposta = await http.post("/auth/login", json={"email": "carga0@teste.mz", "senha": SENHA,
+                                                            "instituicaoId": CODIGO_INSTITUICAO})
+            cabecalhos = {"Authorization": f"Bearer {resposta.json()['token']}"}
+
+            for nome in cenarios:
+                antes = contadores_api(main)
+                if nome in ("analyze_texto", "analyze_texto_cache"):
+                    amostras = await cenario_analyze(http, textos, args.concorrencia, cabecalhos)
+                elif nome == "analyze_link":
+                    amostras = await cenario_analyze(http, links, args.concorrencia, cabecalhos)
+                elif nome == "vagas_paginacao":
+                    amostras = await cenario_paginacao(http, args.pedidos, args.concorrencia, cabecalhos)
+                elif nome == "dashboard":
+                    amostras = await cenario_dashboard(http, args.pedidos, args.concorrencia, cabecalhos)
+                else:
+                    amostras = await cenario_login(http, args.usuarios)
+                amostras.fim = time.perf_counter()
+                # Gravações e atualizações em segundo plano não contam para o cenário seguinte
+                await asyncio.gather(*main.tarefas_login)
+                resultados[nome] = {**amostras.resumo(), **diferenca(antes, contadores_api(main))}
+                mostrar(nome, resultados[nome])
+    await main.client.apagar()
+    processo.terminate()
+
+    return {
+        "commit": commit_atual(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {"python": platform.python_version(), "cpus": os.cpu_count(), "sistema": platform.system()},
+        "configuracao": {
+            "pedidos": args.pedidos, "concorrencia": args.concorrencia, "usuarios": args.usuarios,
+            "vagas": args.vagas, "latencia_llm": args.latencia_llm, "jitter_llm": args.jitter_llm,
+            "latencia_pagina": args.latencia_pagina, "mongodb": "real" if args.mongodb else "memoria",
+            "llm_pedidos_por_minuto": float(os.environ["LLM_PEDIDOS_POR_MINUTO"]),
+            "bcrypt_rounds": main.verificador_senhas.rounds,
+        },
+        "cenarios": resultados,
+    }
+
+
+def mostrar(nome: str, r: dict) -> None:
+    latencia = r["latencia_ms"]
+    origens = " ".join(f"{o}={n}" for o, n in r["origens"].items())
+    print(f"{nome:<20} {r['pedidos']:5d} pedidos {r['erros']:4d} erros {r['pedidos_por_segundo'] or 0:8.1f} pedidos/s"
+          f" | p50 {latencia['p50']:8.1f}ms p95 {latencia['p95']:8.1f}ms p99 {latencia['p99']:8.1f}ms"
+          f"{' | ' + origens if origens else ''}")
+
+
+def comparar(anterior: dict, atual: dict, tolerancia: float) -> bool:
+    """Mostra a variação do p95 e do débito por cenário; True se algum piorou além da tolerância"""
+    print(f"\nComparação com {anterior.get('commit')} ({anterior.get('data')}), tolerância {tolerancia:.0%}")
+    if anterior.get("configuracao") != atual["configuracao"]:
+        print("⚠️  Configurações diferentes: a comparação pode não ser justa")
+    piorou = False
+    for nome, depois in atual["cenarios"].items():
+        antes = anterior.get("cenarios", {}).get(nome)
+        if not antes:
+            continue
+        p95_antes, p95_depois = antes["latencia_ms"]["p95"], depois["latencia_ms"]["p95"]
+        debito_antes, debito_depois = antes["pedidos_por_segundo"] or 0, depois["pedidos_por_segundo"] or 0
+        variacao_p95 = (p95_depois - p95_antes) / p95_antes if p95_antes else 0.0
+        variacao_debito = (debito_depois - debito_antes) / debito_antes if debito_antes else 0.0
+        regressao = variacao_p95 > tolerancia or variacao_debito < -tolerancia or depois["erros"] > antes["erros"]
+        piorou |= regressao
+        print(f"{'❌' if regressao else '✅'} {nome:<20} p95 {p95_antes:8.1f} -> {p95_depois:8.1f}ms ({variacao_p95:+.0%})"
+              f" | {debito_antes:8.1f} -> {debito_depois:8.1f} pedidos/s ({variacao_debito:+.0%})"
+              f" | erros {antes['erros']} -> {depois['erros']}")
+    return piorou
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Teste de carga da API com substitutos locais")
+    parser.add_argument("--pedidos", type=int, default=200, help="pedidos por cenário")
+    parser.add_argument("--concorrencia", type=int, default=20, help="pedidos em simultâneo")
+    parser.add_argument("--usuarios", type=int, default=16, help="logins simultâneos em login_rajada")
+    parser.add_argument("--vagas", type=int, default=5000, help="vagas já analisadas no banco")
+    parser.add_argument("--latencia-llm", type=float, default=0.8, help="latência média do Gemini falso (s)")
+    parser.add_argument("--jitter-llm", type=float, default=0.4, help="variação máxima da latência do Gemini (s)")
+    parser.add_argument("--latencia-pagina", type=float, default=0.05, help="latência do servidor de páginas (s)")
+    parser.add_argument("--mongodb", help="URL de um MongoDB descartável em vez do banco em memória")
+    parser.add_argument("--cenarios", help=f"lista separada por vírgulas ({','.join(CENARIOS)})")
+    parser.add_argument("--saida", help="ficheiro do resultado (por omissão em benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="resultado anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora relativa aceite no p95 e no débito")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = argumentos()
+    resultado = asyncio.run(executar(args))
+
+    saida = args.saida or os.path.join(
+        PASTA_RESULTADOS, f"carga-{resultado['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            sys.exit(1 if comparar(json.load(f), resultado, args.tolerancia) else 0)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Cassetes do modelo: gravar análises contra o Gemini falso, reproduzi-las
+sem rede e medir o formato com milhares de respostas.
+
+- gravar: N análises (analisar_oportunidade_llm) e um stream passam pelo
+  Gemini falso de cliente_llm_falhas.py e ficam na cassete
+- reproduzir: o Gemini falso passa a responder só com erros; as mesmas
+  análises dão exatamente o mesmo resultado sem nenhum pedido ao servidor;
+  prompts novos dão a análise de recurso sem abrir o disjuntor
+- formato: cassete com M respostas do tamanho das do modelo (tamanho no
+  disco, tempo de abertura, de consulta e de gravação)
+
+Uso:
+    python benchmarks/cassetes_llm.py [N] [M]
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cliente_llm_falhas import Falhas, iniciar_servidor
+
+PASTA = tempfile.mkdtemp(prefix="cassetes_llm_")
+CAMINHO = os.path.join(PASTA, "analises.jsonl.gz")
+
+# main lê a configuração ao ser importado: gravar contra o Gemini falso
+ENDPOINT = iniciar_servidor()
+os.environ.setdefault("GOOGLE_API_KEY", "chave-do-gemini-falso")
+os.environ.setdefault("LOG_NIVEL", "WARNING")
+os.environ["GEMINI_API_ENDPOINT"] = ENDPOINT
+os.environ["LLM_CASSETE_MODO"] = "gravar"
+os.environ["LLM_CASSETE"] = CAMINHO
+os.environ["LLM_PEDIDOS_POR_MINUTO"] = "60000"
+
+import main
+from cassetes_llm import REPRODUZIR, Cassete, ModeloComCassete
+
+
+def conteudos(n: int) -> list:
+    return [f"Vaga {i}: assistente administrativo em Maputo, {random.Random(i).randint(8, 40)} mil MT, "
+            f"candidaturas até {i % 28 + 1} de março pelo email rh{i}@empresa.co.mz" for i in range(n)]
+
+
+async def analisar_todos(textos: list) -> tuple:
+    inicio = time.perf_counter()
+    resultados = [await main.analisar_oportunidade_llm(texto) for texto in textos]
+    return [(r.model_dump(), dados) for r, dados in resultados], time.perf_counter() - inicio
+
+
+async def stream(prompt: str) -> str:
+    return "".join([pedaco async for pedaco in main.cliente_llm.gerar_stream(prompt)])
+
+
+async def gravar_e_reproduzir(n: int) -> None:
+    textos = conteudos(n)
+    print(f"== Gravar {n} análises e um stream (Gemini falso com {Falhas.latencia * 1000:.0f}ms)")
+    Falhas.repor()
+    gravadas, tempo_gravar = await analisar_todos(textos)
+    texto_stream = await stream("prompt do stream")
+    main.cassete_llm.fechar()
+    print(f"{Falhas.pedidos} pedidos ao Gemini em {tempo_gravar:.2f}s; cassete com {len(main.cassete_llm)} respostas, "
+          f"{os.path.getsize(CAMINHO)} bytes")
+    assert len(main.cassete_llm) == n + 1 and not any(r["fallback"] for r, _ in gravadas)
+
+    print("\n== Reproduzir com o Gemini em baixo")
+    Falhas.repor(em_baixo=True)
+    cassete = Cassete(CAMINHO)
+    main.cliente_llm.model = ModeloComCassete(None, cassete, REPRODUZIR, nome_modelo=main.model.nome_modelo)
+    reproduzidas, tempo_reproduzir = await analisar_todos(textos)
+    iguais = reproduzidas == gravadas and await stream("prompt do stream") == texto_stream
+    print(f"{Falhas.pedidos} pedidos ao Gemini em {tempo_reproduzir:.3f}s "
+          f"({tempo_gravar / tempo_reproduzir:.0f}x mais rápido); resultados iguais aos gravados: {iguais}")
+    assert Falhas.pedidos == 0 and iguais
+
+    # O erro da análise é esperado: não o mostrar
+    logging.getLogger("main").setLevel(logging.CRITICAL)
+    novos = [await main.analisar_oportunidade_llm(f"Vaga {i} que não está na cassete") for i in range(10)]
+    erro_stream = None
+    try:
+        await stream("stream que não está na cassete")
+    except Exception as e:
+        erro_stream = type(e).__name__
+    print(f"prompts novos: fallback={all(r.fallback for r, _ in novos)}, stream: {erro_stream}, "
+          f"{cassete.falhas} falhas na cassete, disjuntor {main.cliente_llm.disjuntor.resumo()['estado']}")
+    assert all(r.fallback for r, _ in novos) and erro_stream == "RespostaNaoGravada" and Falhas.pedidos == 0
+    assert main.cliente_llm.disjuntor.resumo()["estado"] == "FECHADO"
+
+
+def formato(m: int) -> None:
+    print(f"\n== Cassete com {m} respostas")
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "respostas_gemini.json"), encoding="utf-8") as f:
+        modelos = json.load(f)
+    respostas = []
+    for i in range(m):
+        resposta = json.loads(json.dumps(modelos[i % len(modelos)]))
+        resposta["dadosVaga"]["titulo"] = f"{resposta['dadosVaga']['titulo']} {i}"
+        resposta["dadosVaga"]["descricao"] = " ".join(random.Random(i).choices(resposta["dadosVaga"]["descricao"].split()
+                                                                               + ["experiência", "Maputo", "salário"], k=200))
+        respostas.append(json.dumps(resposta, ensure_ascii=False, indent=2))
+    caminho = os.path.join(PASTA, "grande.jsonl.gz")
+    chaves = [Cassete.chave("models/gemini-2.0-flash", f"prompt {i}") for i in range(m)]
+
+    cassete = Cassete(caminho)
+    inicio = time.perf_counter()
+    for chave, resposta in zip(chaves, respostas):
+        cassete.guardar(chave, resposta)
+    tempo_gravar = time.perf_counter() - inicio
+    cassete.fechar()
+    texto = sum(len(r.encode("utf-8")) for r in respostas)
+    print(f"gravar: {tempo_gravar / m * 1e6:.0f} µs por resposta; {os.path.getsize(caminho) / 1e6:.2f} MB no disco "
+          f"para {texto / 1e6:.2f} MB de texto")
+
+    inicio = time.perf_counter()
+    cassete = Cassete(caminho)
+    print(f"abrir: {(time.perf_counter() - inicio) * 1000:.0f} ms para {len(cassete)} respostas")
+    inicio = time.perf_counter()
+    for chave in chaves:
+        cassete.obter(chave)
+    print(f"consultar: {(time.perf_counter() - inicio) / m * 1e6:.2f} µs por resposta")
+    assert len(cassete) == m and cassete.obter(chaves[-1]) == respostas[-1]
+
+    # Gravação interrompida: a última linha fica a meio e o fim do gzip por escrever
+    with open(caminho, "r+b") as f:
+        f.truncate(os.path.getsize(caminho) - 200)
+    cassete = Cassete(caminho)
+    cassete.guardar(chaves[-1], respostas[-1])
+    cassete.fechar()
+    print(f"depois de cortar o fim do ficheiro e voltar a gravar: {len(Cassete(caminho))} respostas legíveis")
+    assert len(Cassete(caminho)) >= m - 2
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    m = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    asyncio.run(gravar_e_reproduzir(n))
+    formato(m)
+    print("\n✅ Cassetes verificadas")
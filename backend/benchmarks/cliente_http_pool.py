@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Compara o custo de buscar páginas com um cliente novo por pedido (um
+handshake TCP+TLS por link, como o antigo requests.get) e com o cliente
+partilhado com pool keep-alive.
+
+Um servidor HTTPS local com certificado auto-assinado simula o site de
+vagas; não é usada rede externa. No fim, vários servidores redirecionam
+para o mesmo site (como encurtadores) e verifica-se que o limite por host
+se aplica ao destino de cada salto e que os semáforos não ficam em memória.
+
+Uso:
+    python benchmarks/cliente_http_pool.py [PEDIDOS] [CONCORRENCIA]
+"""
+import asyncio
+import datetime
+import os
+import ssl
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from cliente_http import ClienteHTTP, ConfiguracaoHTTP, HEADERS
+
+PAGINA = (b"<html><head><title>Vaga</title></head><body>"
+          + b"<p>Descricao da vaga de emprego.</p>" * 200
+          + b"</body></html>")
+
+conexoes_aceites = 0
+# Destino dos /redirecionar/ e pedidos em simultâneo a /vaga/ (com atraso)
+destino = ""
+atraso = 0.0
+ativos = 0
+max_ativos = 0
+lock_ativos = threading.Lock()
+
+
+class StubVagas(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        global conexoes_aceites
+        conexoes_aceites += 1
+        super().setup()
+
+    def do_GET(self):
+        global ativos, max_ativos
+        if self.path.startswith("/redirecionar/"):
+            self.send_response(302)
+            self.send_header("Location", f"{destino}/vaga/{self.path.rsplit('/', 1)[-1]}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        with lock_ativos:
+            ativos += 1
+            max_ativos = max(max_ativos, ativos)
+        time.sleep(atraso)
+        with lock_ativos:
+            ativos -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGINA)))
+        self.end_headers()
+        self.wfile.write(PAGINA)
+
+    def log_message(self, *args):
+        pass
+
+
+def _certificado(diretorio: str) -> tuple[str, str]:
+    chave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nome = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    agora = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(nome).issuer_name(nome)
+        .public_key(chave.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(agora).not_valid_after(agora + datetime.timedelta(days=1))
+        .sign(chave, hashes.SHA256())
+    )
+    caminho_cert = os.path.join(diretorio, "cert.pem")
+    caminho_chave = os.path.join(diretorio, "key.pem")
+    with open(caminho_cert, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(caminho_chave, "wb") as f:
+        f.write(chave.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()))
+    return caminho_cert, caminho_chave
+
+
+def iniciar_servidor(diretorio: str) -> ThreadingHTTPServer:
+    caminho_cert, caminho_chave = _certificado(diretorio)
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), StubVagas)
+    contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    contexto.load_cert_chain(caminho_cert, caminho_chave)
+    servidor.socket = contexto.wrap_socket(servidor.socket, server_side=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+async def cliente_por_pedido(urls: list[str], concorrencia: int) -> None:
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def buscar(url):
+        async with semaforo:
+            async with httpx.AsyncClient(headers=HEADERS, timeout=10, verify=False) as http:
+                (await http.get(url)).raise_for_status()
+
+    await asyncio.gather(*(buscar(u) for u in urls))
+
+
+async def cliente_partilhado(urls: list[str], concorrencia: int) -> None:
+    cliente = ClienteHTTP(ConfiguracaoHTTP(conexoes_por_host=concorrencia, verify=False))
+    await cliente.iniciar()
+    try:
+        async def buscar(url):
+            (await cliente.get(url)).raise_for_status()
+
+        await asyncio.gather(*(buscar(u) for u in urls))
+    finally:
+        await cliente.fechar()
+
+
+async def medir(nome, funcao, urls, concorrencia) -> float:
+    global conexoes_aceites
+    conexoes_aceites = 0
+    inicio = time.perf_counter()
+    await funcao(urls, concorrencia)
+    total = time.perf_counter() - inicio
+    print(f"{nome:<22} {total:7.2f}s  {total / len(urls) * 1000:7.2f}ms/pedido  "
+          f"{conexoes_aceites:4d} conexões TLS")
+    return total
+
+
+async def redirecionamentos(diretorio: str, servidor: ThreadingHTTPServer, concorrencia: int) -> None:
+    global destino, atraso, max_ativos
+    origens = [iniciar_servidor(diretorio) for _ in range(8)]
+    destino, atraso, max_ativos = f"https://localhost:{servidor.server_port}", 0.05, 0
+    urls = [f"https://localhost:{origem.server_port}/redirecionar/{i}" for i in range(10) for origem in origens]
+    print(f"\n{len(urls)} links de {len(origens)} hosts redirecionados para o mesmo host")
+    cliente = ClienteHTTP(ConfiguracaoHTTP(conexoes_por_host=concorrencia, verify=False))
+    await cliente.iniciar()
+    try:
+        respostas = await asyncio.gather(*(cliente.get(url) for url in urls))
+    finally:
+        await cliente.fechar()
+    print(f"{sum(r.status_code == 200 for r in respostas)}/{len(urls)} páginas; no máximo {max_ativos} pedidos "
+          f"simultâneos ao destino (limite {concorrencia}); semáforos em memória no fim: {len(cliente._semaforos)}")
+    assert all(r.status_code == 200 for r in respostas) and max_ativos <= concorrencia and not cliente._semaforos
+    for origem in origens:
+        origem.shutdown()
+
+
+async def executar(pedidos: int, concorrencia: int) -> None:
+    with tempfile.TemporaryDirectory() as diretorio:
+        servidor = iniciar_servidor(diretorio)
+        base = f"https://localhost:{servidor.server_port}"
+        urls = [f"{base}/vaga/{i}" for i in range(pedidos)]
+
+        print(f"{pedidos} pedidos, concorrência {concorrencia}")
+        antigo = await medir("cliente por pedido", cliente_por_pedido, urls, concorrencia)
+        novo = await medir("cliente partilhado", cliente_partilhado, urls, concorrencia)
+        print(f"Ganho: {antigo / novo:.1f}x")
+        await redirecionamentos(diretorio, servidor, concorrencia)
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    pedidos = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concorrencia = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    asyncio.run(executar(pedidos, concorrencia))
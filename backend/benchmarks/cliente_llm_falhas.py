@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Testa o cliente resiliente do modelo contra um servidor Gemini falso que
+injeta falhas.
+
+O servidor local imita a API REST do Gemini (generateContent e
+streamGenerateContent) e o SDK oficial é apontado para ele com
+transport="rest", por isso os erros chegam ao cliente como na produção
+(google.api_core.exceptions.TooManyRequests, ServiceUnavailable, ...).
+
+Cenários:
+- erros 429/503 intermitentes: chamada direta vs. ClienteLLM com repetições
+- fornecedor em baixo: o disjuntor abre e os pedidos falham logo
+- latência de cauda: p95/máximo com e sem hedging
+- servidor pendurado: o prazo por pedido é respeitado
+- streaming com falha antes do primeiro pedaço
+- prompts bloqueados e pedidos inválidos (400): sem repetições e sem abrir
+  o disjuntor
+- /analyze com o modelo em baixo: a análise de recurso é marcada e não é gravada
+
+Uso:
+    python benchmarks/cliente_llm_falhas.py [PEDIDOS]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+from cliente_llm import ClienteLLM, CircuitoAberto, ErroLLM, PrazoExcedido
+
+RESPOSTA = json.dumps({
+    "dadosVaga": {"titulo": "Vaga de teste", "empresa": "Empresa Teste"},
+    "analiseRisco": {"nivelRisco": "BAIXO", "pontuacao": 10, "alertas": [], "recomendacoes": [],
+                     "detalhes": {"tituloSuspeito": 0}},
+})
+
+
+class Falhas:
+    """Configuração das falhas injetadas, alterada entre cenários"""
+    taxa_erro = 0.0          # fração de pedidos com 429 ou 503
+    em_baixo = False         # todos os pedidos com 503
+    falhar_proximos = 0      # os próximos N pedidos com 429 (o SDK já repete os 503 sozinho)
+    bloqueado = False        # prompt bloqueado por segurança: sem candidatos
+    invalido = False         # todos os pedidos com 400
+    latencia = 0.02
+    taxa_lenta = 0.0         # fração de pedidos com latencia_lenta
+    latencia_lenta = 0.0
+    pedidos = 0
+
+    @classmethod
+    def repor(cls, **valores) -> None:
+        cls.taxa_erro, cls.em_baixo, cls.latencia, cls.taxa_lenta, cls.latencia_lenta = 0.0, False, 0.02, 0.0, 0.0
+        cls.falhar_proximos = 0
+        cls.bloqueado = cls.invalido = False
+        cls.pedidos = 0
+        for nome, valor in valores.items():
+            setattr(cls, nome, valor)
+
+
+class GeminiFalso(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _json(self, estado: int, corpo) -> None:
+        dados = json.dumps(corpo).encode()
+        self.send_response(estado)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        Falhas.pedidos += 1
+        lenta = random.random() < Falhas.taxa_lenta
+        time.sleep(Falhas.latencia_lenta if lenta else Falhas.latencia)
+        if Falhas.falhar_proximos > 0:
+            Falhas.falhar_proximos -= 1
+            return self._json(429, {"error": {"code": 429, "message": "falha injetada", "status": "RESOURCE_EXHAUSTED"}})
+        if Falhas.em_baixo or random.random() < Falhas.taxa_erro:
+            codigo, estado = random.choice([(429, "RESOURCE_EXHAUSTED"), (503, "UNAVAILABLE")])
+            return self._json(codigo, {"error": {"code": codigo, "message": "falha injetada", "status": estado}})
+        if Falhas.invalido:
+            return self._json(400, {"error": {"code": 400, "message": "pedido inválido", "status": "INVALID_ARGUMENT"}})
+        if Falhas.bloqueado:
+            bloqueio = {"promptFeedback": {"blockReason": "SAFETY"}}
+            return self._json(200, [bloqueio] if ":streamGenerateContent" in self.path else bloqueio)
+
+        def pedaco(texto):
+            return {"candidates": [{"content": {"parts": [{"text": texto}], "role": "model"},
+                                    "finishReason": "STOP", "index": 0}]}
+        if ":streamGenerateContent" in self.path:
+            meio = len(RESPOSTA) // 2
+            return self._json(200, [pedaco(RESPOSTA[:meio]), pedaco(RESPOSTA[meio:])])
+        self._json(200, pedaco(RESPOSTA))
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor() -> str:
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), GeminiFalso)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+def novo_cliente(model, **opcoes) -> ClienteLLM:
+    padrao = dict(pedidos_por_minuto=60000, backoff_base_segundos=0.05, backoff_max_segundos=0.5, prazo_segundos=10)
+    return ClienteLLM(model, **{**padrao, **opcoes})
+
+
+async def em_paralelo(funcao, n: int, concorrencia: int = 10) -> list:
+    limite = asyncio.Semaphore(concorrencia)
+
+    async def um(i):
+        async with limite:
+            inicio = time.perf_counter()
+            try:
+                await funcao()
+                return True, time.perf_counter() - inicio, None
+            except Exception as e:
+                return False, time.perf_counter() - inicio, type(e).__name__
+    return await asyncio.gather(*[um(i) for i in range(n)])
+
+
+def resumo(resultados: list) -> str:
+    tempos = sorted(t for _, t, _ in resultados)
+    ok = sum(1 for sucesso, _, _ in resultados if sucesso)
+    p95 = tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)]
+    return f"{ok}/{len(resultados)} ok, p50 {tempos[len(tempos) // 2]:.2f}s, p95 {p95:.2f}s, máx {tempos[-1]:.2f}s"
+
+
+async def cenario_erros_intermitentes(model, n: int) -> None:
+    print("\n== 30% de respostas 429/503")
+    Falhas.repor(taxa_erro=0.3)
+    direto = await em_paralelo(lambda: asyncio.to_thread(model.generate_content, "prompt"), n)
+    print(f"chamada direta:   {resumo(direto)} ({Falhas.pedidos} pedidos ao servidor)")
+    Falhas.repor(taxa_erro=0.3)
+    cliente = novo_cliente(model, max_tentativas=4, limiar_falhas_disjuntor=1000)
+    resiliente = await em_paralelo(lambda: cliente.gerar("prompt"), n)
+    print(f"ClienteLLM:       {resumo(resiliente)} ({Falhas.pedidos} pedidos ao servidor, "
+          f"{cliente.repeticoes} repetições)")
+    assert sum(ok for ok, _, _ in resiliente) > sum(ok for ok, _, _ in direto)
+
+
+async def cenario_em_baixo(model, n: int) -> None:
+    print("\n== Fornecedor em baixo (todos 503)")
+    Falhas.repor(em_baixo=True, latencia=0.2)
+    cliente = novo_cliente(model, max_tentativas=2, limiar_falhas_disjuntor=5, tempo_aberto_segundos=1)
+    resultados = await em_paralelo(lambda: cliente.gerar("prompt"), n, concorrencia=5)
+    rejeitados = sum(1 for _, _, erro in resultados if erro == CircuitoAberto.__name__)
+    print(f"{resumo(resultados)}; {Falhas.pedidos} pedidos chegaram ao servidor, "
+          f"{rejeitados} rejeitados pelo disjuntor sem esperar")
+    print(f"disjuntor: {cliente.disjuntor.resumo()}")
+    assert cliente.disjuntor.aberturas >= 1 and Falhas.pedidos < n * 2
+
+    # Depois do intervalo, um pedido de teste bem-sucedido fecha o disjuntor
+    Falhas.repor()
+    await asyncio.sleep(1.1)
+    await cliente.gerar("prompt")
+    print(f"após recuperação: {cliente.disjuntor.resumo()['estado']}")
+    assert cliente.disjuntor.estado == "FECHADO"
+
+
+async def cenario_latencia_cauda(model, n: int) -> None:
+    # Poucos pedidos em simultâneo: o pool de threads do asyncio não deve ser o gargalo
+    print("\n== 10% de respostas lentas (1.5s), 2 pedidos em simultâneo")
+    for hedging in (False, True):
+        Falhas.repor(latencia=0.05)
+        cliente = novo_cliente(model, hedging=hedging, hedging_min_amostras=20)
+        # Aquecer o histograma para o p95 usado no atraso do hedging
+        await em_paralelo(lambda: cliente.gerar("prompt"), 30, concorrencia=2)
+        Falhas.repor(latencia=0.05, taxa_lenta=0.1, latencia_lenta=1.5)
+        resultados = await em_paralelo(lambda: cliente.gerar("prompt"), n, concorrencia=2)
+        print(f"hedging={str(hedging):<5}: {resumo(resultados)} "
+              f"(hedges {cliente.hedges}, vencedores {cliente.hedges_vencedores})")
+
+
+async def cenario_prazo(model) -> None:
+    print("\n== Servidor pendurado (5s) com prazo de 1s")
+    Falhas.repor(latencia=5)
+    cliente = novo_cliente(model, prazo_segundos=1)
+    inicio = time.perf_counter()
+    try:
+        await cliente.gerar("prompt")
+    except PrazoExcedido as e:
+        print(f"PrazoExcedido após {time.perf_counter() - inicio:.2f}s: {e}")
+    assert time.perf_counter() - inicio < 1.5
+
+
+async def cenario_stream(model) -> None:
+    print("\n== Streaming com 429 antes do primeiro pedaço")
+    Falhas.repor(falhar_proximos=2)
+    cliente = novo_cliente(model, max_tentativas=3)
+    pedacos = [p async for p in cliente.gerar_stream("prompt")]
+    print(f"{len(pedacos)} pedaços após {cliente.repeticoes} repetição(ões); texto completo: {''.join(pedacos) == RESPOSTA}")
+    assert "".join(pedacos) == RESPOSTA
+
+
+async def cenario_sem_resposta_util(model, n: int) -> None:
+    print("\n== Prompts bloqueados e pedidos inválidos (400)")
+    cliente = novo_cliente(model, max_tentativas=3, limiar_falhas_disjuntor=5)
+    for nome, falha in (("bloqueado", "bloqueado"), ("inválido", "invalido")):
+        Falhas.repor(**{falha: True})
+        resultados = await em_paralelo(lambda: cliente.gerar("prompt"), n)
+        erros = {erro for _, _, erro in resultados}
+
+        async def stream():
+            return [p async for p in cliente.gerar_stream("prompt")]
+        resultados_stream = await em_paralelo(stream, n)
+        erros |= {erro for _, _, erro in resultados_stream}
+        print(f"{nome}: {2 * n} pedidos, {Falhas.pedidos} ao servidor, erros {sorted(erros)}, "
+              f"disjuntor {cliente.disjuntor.resumo()['estado']}")
+        assert erros == {ErroLLM.__name__} and Falhas.pedidos == 2 * n
+        assert cliente.disjuntor.estado == "FECHADO" and cliente.disjuntor.aberturas == 0
+
+
+async def cenario_analise_de_recurso(endpoint: str) -> None:
+    print("\n== /analyze com o modelo em baixo")
+    os.environ.setdefault("GOOGLE_API_KEY", "chave-do-gemini-falso")
+    os.environ["GEMINI_API_ENDPOINT"] = endpoint
+    import httpx
+    import main
+    from concorrencia_analyze import _ColecaoVazia
+
+    gravadas = []
+
+    async def salvar(vaga_data: dict) -> str:
+        gravadas.append(vaga_data)
+        return "id"
+    main.salvar_vaga_no_banco = salvar
+    main.analise_cache.collection = _ColecaoVazia()
+    main.cliente_llm = novo_cliente(main.model, max_tentativas=2)
+
+    Falhas.repor(em_baixo=True)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://teste", timeout=30) as http:
+        corpo = {"tipoEntrada": "TEXTO", "textoPublicacao": "Vaga de motorista em Maputo, salário a combinar"}
+        resposta = (await http.post("/analyze", json=corpo)).json()
+        print(f"modelo em baixo: fallback={resposta['analise']['fallback']}, vagas gravadas: {len(gravadas)}")
+        assert resposta["analise"]["fallback"] and not gravadas
+
+        Falhas.repor()
+        resposta = (await http.post("/analyze", json=corpo)).json()
+        print(f"modelo de volta: fallback={resposta['analise']['fallback']}, vagas gravadas: {len(gravadas)}")
+        assert not resposta["analise"]["fallback"] and len(gravadas) == 1
+
+
+async def executar(n: int) -> None:
+    endpoint = iniciar_servidor()
+    genai.configure(api_key="chave-do-gemini-falso", transport="rest", client_options={"api_endpoint": endpoint})
+    model = genai.GenerativeModel("gemini-2.0-flash")
+    print(f"Gemini falso em {endpoint}, {n} pedidos por cenário")
+
+    await cenario_erros_intermitentes(model, n)
+    await cenario_em_baixo(model, n)
+    await cenario_latencia_cauda(model, n)
+    await cenario_prazo(model)
+    await cenario_stream(model)
+    await cenario_sem_resposta_util(model, n)
+    await cenario_analise_de_recurso(endpoint)
+    print("\n✅ Cliente resiliente verificado contra o Gemini falso")
+
+
+if __name__ == "__main__":
+    asyncio.run(executar(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Verifica que chamadas paralelas a /analyze se sobrepõem em vez de serem
+executadas uma após a outra.
+
+O modelo Gemini é substituído por um modelo falso que demora LATENCIA_LLM
+segundos (bloqueando, como o cliente real) e conta as chamadas em curso, e
+a gravação no MongoDB é desativada, para que o script corra sem rede nem
+banco.
+
+O cliente síncrono do modelo corre no pool de threads por omissão do
+asyncio (min(32, CPUs + 4) threads): é esse o limite de análises em
+simultâneo por processo, e acima dele as análises seguem em ondas. O
+GET /test é medido com as análises comprovadamente em curso no modelo.
+
+Uso:
+    python benchmarks/concorrencia_analyze.py [N]
+"""
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from cliente_llm import ClienteLLM
+
+LATENCIA_LLM = 0.5
+
+RESPOSTA_FALSA = """{
+    "dadosVaga": {"titulo": "Vaga de teste", "empresa": "Empresa Teste"},
+    "analiseRisco": {
+        "nivelRisco": "BAIXO",
+        "pontuacao": 10,
+        "alertas": [],
+        "recomendacoes": [],
+        "detalhes": {"tituloSuspeito": 0}
+    }
+}"""
+
+
+class _RespostaFalsa:
+    text = RESPOSTA_FALSA
+
+
+class ModeloFalso:
+    def __init__(self):
+        self.em_curso = 0
+        self.max_em_curso = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.em_curso += 1
+            self.max_em_curso = max(self.max_em_curso, self.em_curso)
+        try:
+            time.sleep(LATENCIA_LLM)
+        finally:
+            with self._lock:
+                self.em_curso -= 1
+        return _RespostaFalsa()
+
+
+async def _salvar_sem_banco(vaga_data: dict) -> str:
+    return None
+
+
+class _ColecaoVazia:
+    """Substitui a coleção do cache de análises: sem banco, só a camada em memória"""
+
+    async def find_one(self, *args, **kwargs):
+        return None
+
+    async def replace_one(self, *args, **kwargs):
+        return None
+
+
+async def executar(n: int) -> None:
+    modelo = ModeloFalso()
+    # Threads do pool por omissão do asyncio, onde corre o cliente síncrono do modelo
+    limite_threads = min(32, (os.cpu_count() or 1) + 4)
+    esperado = min(n, limite_threads)
+    # Quota folgada: aqui mede-se a sobreposição, não o balde de tokens
+    main.cliente_llm = ClienteLLM(modelo, pedidos_por_minuto=60000)
+    main.salvar_vaga_no_banco = _salvar_sem_banco
+    main.analise_cache.collection = _ColecaoVazia()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://teste") as http:
+        # Textos diferentes: pedidos idênticos seriam coalescidos numa única análise
+        corpos = [{"tipoEntrada": "TEXTO", "textoPublicacao": f"Vaga de emprego número {i} para teste de concorrência"}
+                  for i in range(n)]
+
+        inicio = time.perf_counter()
+        analises = [asyncio.create_task(http.post("/analyze", json=corpo)) for corpo in corpos]
+
+        # Esperar que as análises cheguem ao modelo antes de medir o event loop
+        while modelo.em_curso < esperado and time.perf_counter() - inicio < LATENCIA_LLM:
+            await asyncio.sleep(0.001)
+        em_curso_antes = modelo.em_curso
+        inicio_ping = time.perf_counter()
+        ping = await http.get("/test")
+        latencia_ping = time.perf_counter() - inicio_ping
+        em_curso_depois = modelo.em_curso
+
+        respostas = await asyncio.gather(*analises)
+        total = time.perf_counter() - inicio
+
+    assert all(r.status_code == 200 for r in respostas), [r.status_code for r in respostas]
+    assert ping.status_code == 200
+
+    sequencial = n * LATENCIA_LLM
+    ondas = math.ceil(n / limite_threads)
+    print(f"{n} análises paralelas: {total:.2f}s (sequencial seria >= {sequencial:.2f}s; com {limite_threads} "
+          f"threads no pool, {ondas} onda(s) de {LATENCIA_LLM}s)")
+    print(f"no máximo {modelo.max_em_curso} chamadas ao modelo em simultâneo (esperado {esperado})")
+    print(f"GET /test com {em_curso_antes} análises no modelo: {latencia_ping * 1000:.1f}ms")
+
+    assert modelo.max_em_curso >= esperado, "As análises não se sobrepuseram"
+    assert em_curso_antes >= esperado and em_curso_depois > 0, "GET /test não foi medido durante as análises"
+    assert latencia_ping < LATENCIA_LLM, "O event loop ficou bloqueado"
+    print("✅ As chamadas a /analyze sobrepõem-se e o event loop continua livre")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    asyncio.run(executar(n))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Classificação de domínios confiáveis: árvore de sufixos vs. lista exata com
+buscas por substring (a implementação anterior de get_url_trust_info).
+
+Mede o tempo por URL de cada abordagem sobre uma mistura de domínios
+confiáveis, subdomínios, imitações e domínios desconhecidos, e lista os
+URLs em que as duas discordam. Também verifica a recarga a quente: altera
+uma cópia do ficheiro de dados e confirma que a classificação muda sem
+criar um novo classificador.
+
+Uso:
+    python benchmarks/dominios_confiaveis.py [REPETICOES]
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dominios_confiaveis import FICHEIRO_DOMINIOS, ClassificadorDominios
+from indices_vagas import dominio_da_url
+
+with open(FICHEIRO_DOMINIOS, encoding="utf-8") as f:
+    DADOS = json.load(f)
+LISTA_EXATA = {d for categoria in DADOS["categorias"].values() for d in categoria["dominios"]}
+
+# Buscas por substring da versão anterior, pela mesma ordem
+SUBSTRINGS_ANTERIORES = [
+    ("JOB_PORTAL", ['linkedin', 'indeed', 'glassdoor', 'monster', 'reed', 'totaljobs', 'ziprecruiter',
+                    'careerbuilder', 'simplyhired', 'emprego', 'jobartis', 'jobs', 'vagas', 'trabalho']),
+    ("GOVERNMENT_ORGANIZATION", ['unodc', 'un.org', 'gov.', 'edu.', 'worldbank', 'imf', 'who.int', 'unicef', 'undp']),
+    ("TECH_COMPANY", ['microsoft', 'google', 'apple', 'amazon', 'facebook', 'meta', 'netflix', 'spotify', 'uber',
+                      'airbnb', 'tesla', 'spacex', 'ibm', 'oracle', 'salesforce', 'adobe', 'intel', 'nvidia',
+                      'cisco', 'vmware', 'redhat']),
+    ("LOCAL_COMPANY", ['mcel', 'vodacom', 'movitel', 'bci', 'bancounico', 'bancobci', 'bancobm', 'coca-cola',
+                       'pepsi', 'nestle', 'unilever', 'procter', 'gamble', 'shell', 'total', 'exxonmobil', 'sasol']),
+    ("NEWS_SITE", ['bbc', 'cnn', 'reuters', 'ap.org', 'bloomberg', 'wsj', 'nytimes', 'washingtonpost',
+                   'theguardian', 'independent', 'dw', 'france24', 'aljazeera', 'rt', 'sputniknews',
+                   'noticias.sapo', 'opais', 'jornalnoticias', 'verdade']),
+    ("NGO", ['amnesty', 'hrw', 'transparency', 'oxfam', 'msf', 'doctorswithoutborders', 'redcross', 'unicef',
+             'unhcr', 'wfp', 'fao', 'ilo']),
+]
+
+URLS_EXEMPLO = [
+    "https://jobs.linkedin.com/view/123", "https://mz.indeed.com/viewjob?jk=1", "https://www.linkedin.com/jobs",
+    "https://mitess.gov.mz/concursos", "https://www.gov.mz", "https://careers.microsoft.com/job/1",
+    "https://emprego.co.mz/vaga/1", "https://www.dw.com/pt-002/noticia", "https://portal.gov.br/vagas",
+    "https://fakelinkedin.com/vaga", "https://linkedin.com.vagas-rapidas.net/", "https://vagas-rapidas.blogspot.com/",
+    "https://empregos-suspeitos-fake.com/vaga/1", "https://ganhos-rapidos-online.net/", "https://art-jobs.co.mz/",
+    "https://smartwork.co.mz/oferta", "https://ilovejobs.biz/apply", "https://noticias.sapo.mz/economia",
+]
+
+
+def classificar_anterior(url: str):
+    """get_url_trust_info antes da árvore: duas chamadas a urlparse, lista exata e seis buscas por substring"""
+    parsed = urlparse(url if url.startswith(('http://', 'https://')) else 'https://' + url)
+    domain = parsed.netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    if domain not in LISTA_EXATA:
+        return None
+    parsed = urlparse(url if url.startswith(('http://', 'https://')) else 'https://' + url)
+    domain = parsed.netloc.lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    for categoria, substrings in SUBSTRINGS_ANTERIORES:
+        if any(x in domain for x in substrings):
+            return categoria
+    return "TRUSTED_DOMAIN"
+
+
+def classificar_arvore(classificador: ClassificadorDominios, url: str):
+    dominio = dominio_da_url(url)
+    return classificador.classificar(dominio)["categoria"] if dominio else None
+
+
+def medir(funcao, urls, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for url in urls:
+            funcao(url)
+    return (time.perf_counter() - inicio) / (repeticoes * len(urls)) * 1e6
+
+
+def verificar_recarga() -> None:
+    with tempfile.TemporaryDirectory() as pasta:
+        ficheiro = os.path.join(pasta, "dominios.json")
+        shutil.copy(FICHEIRO_DOMINIOS, ficheiro)
+        classificador = ClassificadorDominios(ficheiro, intervalo_recarga=0)
+        antes = classificador.classificar("vagas.exemplo.co.mz")["categoria"]
+        dados = {**DADOS, "versao": DADOS["versao"] + 1}
+        dados["categorias"]["JOB_PORTAL"]["dominios"].append("exemplo.co.mz")
+        with open(ficheiro, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+        # Garantir que a data de modificação muda mesmo em sistemas de ficheiros com resolução de 1s
+        os.utime(ficheiro, (time.time() + 2, time.time() + 2))
+        depois = classificador.classificar("vagas.exemplo.co.mz")
+        print(f"\nRecarga a quente: antes {antes}, depois {depois['categoria']} (versão {depois['versao']})")
+        assert antes is None and depois["categoria"] == "JOB_PORTAL"
+
+        with open(ficheiro, "w", encoding="utf-8") as f:
+            f.write("{ inválido")
+        os.utime(ficheiro, (time.time() + 4, time.time() + 4))
+        assert classificador.classificar("vagas.exemplo.co.mz")["categoria"] == "JOB_PORTAL"
+        print("Ficheiro inválido: a árvore anterior continua em uso")
+
+
+def executar(repeticoes: int) -> None:
+    classificador = ClassificadorDominios()
+    confiaveis = sorted(LISTA_EXATA)
+    random.seed(7)
+    urls = (URLS_EXEMPLO
+            + [f"https://{d}/vaga" for d in confiaveis]
+            + [f"https://carreiras.{d}/vaga" for d in random.sample(confiaveis, 30)]
+            + [f"https://vagas-{i}.{random.choice(['com', 'co.mz', 'net', 'org'])}/x" for i in range(100)])
+
+    anterior = medir(classificar_anterior, urls, repeticoes)
+    arvore = medir(lambda url: classificar_arvore(classificador, url), urls, repeticoes)
+    print(f"{len(urls)} URLs x {repeticoes} repetições")
+    print(f"anterior (lista exata + substrings): {anterior:.2f} µs/URL")
+    print(f"árvore de sufixos:                   {arvore:.2f} µs/URL")
+
+    print("\nURLs classificados de forma diferente:")
+    for url in urls:
+        antes, depois = classificar_anterior(url), classificar_arvore(classificador, url)
+        if antes != depois:
+            print(f"  {url:<50} {str(antes):<25} -> {depois}")
+    verificar_recarga()
+
+
+if __name__ == "__main__":
+    executar(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compara a extração antiga (BeautifulSoup html.parser + decompose + get_text
+sobre a página inteira) com o extrator por eventos com limite de bytes.
+
+Usa as páginas guardadas em benchmarks/paginas/ e uma SPA sintética de
+vários MB para simular páginas enormes/hostis. Mede o tempo mediano e o pico
+de memória (tracemalloc) de cada caminho.
+
+Uso:
+    python benchmarks/extracao_html.py [REPETICOES]
+"""
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from extrator_html import decodificar, extrair_pagina
+
+DIRETORIO_PAGINAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "paginas")
+MAX_BYTES = 2 * 1024 * 1024
+
+
+def caminho_antigo(corpo: bytes) -> tuple[str, str]:
+    soup = BeautifulSoup(corpo, "html.parser")
+    title = soup.title.string if soup.title else "No title found"
+    if soup.body:
+        for tag in soup.body(["script", "style", "img", "input", "noscript", "iframe"]):
+            tag.decompose()
+        text = soup.body.get_text(separator="\n", strip=True)
+    else:
+        text = ""
+    return title, text
+
+
+def caminho_novo(corpo: bytes) -> tuple[str, str]:
+    # O cliente HTTP para de ler em MAX_BYTES; aqui simula-se o mesmo corte
+    return extrair_pagina(decodificar(corpo[:MAX_BYTES]))
+
+
+def spa_sintetica(megabytes: int = 8) -> bytes:
+    estado = json.dumps([{"id": i, "html": "<div class='card'>" + "x" * 200 + "</div>"} for i in range(2000)])
+    scripts = "".join(f"<script>window.__estado_{i}={estado};</script>" for i in range(megabytes * 1024 * 1024 // len(estado) + 1))
+    return (
+        "<html><head><title>Vaga - Portal SPA</title></head><body>"
+        "<main><h1>Operador de Armazém</h1><p>Empresa de logística contrata operador em Matola.</p></main>"
+        f"{scripts}<div id='root'></div></body></html>"
+    ).encode("utf-8")
+
+
+def medir(funcao, corpo: bytes, repeticoes: int) -> tuple[float, float, str]:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        _, texto = funcao(corpo)
+        tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    funcao(corpo)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tempos) * 1000, pico / (1024 * 1024), texto
+
+
+def executar(repeticoes: int) -> None:
+    corpus = {os.path.basename(c): open(c, "rb").read() for c in sorted(glob.glob(os.path.join(DIRETORIO_PAGINAS, "*.html")))}
+    corpus["spa_sintetica_8mb"] = spa_sintetica()
+
+    print(f"{'página':<30} {'KB':>7} | {'antigo ms':>9} {'MB':>6} | {'novo ms':>8} {'MB':>6} | ganho")
+    for nome, corpo in corpus.items():
+        ms_antigo, mb_antigo, _ = medir(caminho_antigo, corpo, repeticoes)
+        ms_novo, mb_novo, texto = medir(caminho_novo, corpo, repeticoes)
+        print(f"{nome:<30} {len(corpo) / 1024:7.0f} | {ms_antigo:9.1f} {mb_antigo:6.1f} | "
+              f"{ms_novo:8.1f} {mb_novo:6.1f} | {ms_antigo / ms_novo:4.1f}x")
+        primeira_linha = texto.split("\n", 1)[0]
+        print(f"    início do texto: {primeira_linha[:80]}")
+
+
+if __name__ == "__main__":
+    executar(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Rajada de logins no início de um turno: bcrypt no event loop (versão
+anterior de /auth/login) vs. pool de threads limitado (senhas.py).
+
+N utilizadores fazem login ao mesmo tempo enquanto outro cliente chama
+GET /test a cada 10 ms e mede o atraso de cada resposta. Com o bcrypt no
+event loop, cada verificação (100–300 ms) parava todos os outros pedidos;
+com o pool, GET /test continua a responder em milissegundos. Com uma só
+CPU o tempo total é o mesmo nos dois casos (o bcrypt ocupa-a de qualquer
+forma); o que muda é o resto da API continuar a responder. Também
+verifica que um hash com outro custo é atualizado no login (rehash) sem
+atrasar a resposta.
+
+As coleções usuarios e instituicoes são substituídas por dicionários em
+memória, para que o script corra sem banco.
+
+Uso:
+    python benchmarks/login_rajada.py [N]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "chave-do-benchmark-de-login")
+
+import httpx
+from bson import ObjectId
+
+import main
+from senhas import VerificadorSenhas, contexto_senhas
+
+SENHA = "senha-do-turno"
+INSTITUICAO = {"_id": ObjectId(), "nome": "Instituição de teste", "codigoAcesso": "TESTE01", "ativo": True}
+
+
+class _CursorMemoria:
+    def __init__(self, documentos):
+        self._documentos = iter(documentos)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documentos)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _ColecaoUsuarios:
+    """aggregate() do login (utilizador com a instituição) e update_one() sobre um dicionário"""
+
+    name = "usuarios"
+
+    def __init__(self, usuarios):
+        self.usuarios = {u["email"]: u for u in usuarios}
+        self.atualizacoes = 0
+
+    def aggregate(self, pipeline):
+        usuario = self.usuarios.get(pipeline[0]["$match"]["email"])
+        return _CursorMemoria([{**usuario, "instituicao": [INSTITUICAO]}] if usuario else [])
+
+    async def update_one(self, filtro, atualizacao):
+        await asyncio.sleep(0.001)
+        self.atualizacoes += 1
+        for usuario in self.usuarios.values():
+            if usuario["_id"] == filtro["_id"]:
+                usuario.update(atualizacao["$set"])
+
+
+class _VerificadorNoLoop(VerificadorSenhas):
+    """Como antes: bcrypt chamado diretamente no event loop"""
+
+    async def verificar(self, senha, hash_senha):
+        self.verificacoes += 1
+        return self.contexto.verify_and_update(senha, hash_senha)
+
+
+async def rajada(verificador: VerificadorSenhas, n: int) -> dict:
+    hash_senha = verificador.contexto.hash(SENHA)
+    usuarios = _ColecaoUsuarios([
+        {"_id": ObjectId(), "nome": f"Utilizador {i}", "email": f"u{i}@teste.mz", "senha": hash_senha,
+         "instituicaoId": INSTITUICAO["_id"], "perfil": "AUTORIDADE", "ativo": True}
+        for i in range(n)
+    ])
+    main.usuarios_collection = usuarios
+    main.verificador_senhas = verificador
+
+    latencias_ping = []
+    parar = asyncio.Event()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://teste",
+                                 timeout=120) as http:
+        async def ping():
+            # Atraso de cada GET /test em relação ao previsto: inclui o tempo em que o event loop esteve parado
+            while not parar.is_set():
+                inicio = time.perf_counter()
+                await asyncio.sleep(0.01)
+                await http.get("/test")
+                latencias_ping.append(time.perf_counter() - inicio - 0.01)
+
+        async def login(i: int) -> float:
+            inicio = time.perf_counter()
+            resposta = await http.post("/auth/login", json={"email": f"u{i}@teste.mz", "senha": SENHA,
+                                                            "instituicaoId": "teste01"})
+            assert resposta.status_code == 200, resposta.text
+            return time.perf_counter() - inicio
+
+        tarefa_ping = asyncio.create_task(ping())
+        await asyncio.sleep(0.05)
+        inicio = time.perf_counter()
+        tempos = await asyncio.gather(*[login(i) for i in range(n)])
+        total = time.perf_counter() - inicio
+        parar.set()
+        await tarefa_ping
+    await asyncio.gather(*main.tarefas_login)
+    return {
+        "total": total,
+        "login_p50": statistics.median(tempos),
+        "login_max": max(tempos),
+        "ping_p50": statistics.median(latencias_ping),
+        "ping_max": max(latencias_ping),
+        "ultimo_login": usuarios.atualizacoes,
+    }
+
+
+def mostrar(nome: str, r: dict) -> None:
+    print(f"{nome:<22} total {r['total']:6.2f}s | login p50 {r['login_p50'] * 1000:7.0f}ms max {r['login_max'] * 1000:7.0f}ms"
+          f" | GET /test p50 {r['ping_p50'] * 1000:6.1f}ms max {r['ping_max'] * 1000:7.1f}ms"
+          f" | ultimoLogin {r['ultimo_login']}")
+
+
+async def verificar_rehash() -> None:
+    verificador = VerificadorSenhas(rounds=10)
+    hash_antigo = contexto_senhas(4).hash(SENHA)
+    valida, novo_hash = await verificador.verificar(SENHA, hash_antigo)
+    print(f"\nRehash: hash com 4 rounds -> válida={valida}, novo hash com {novo_hash.split('$')[2]} rounds")
+    assert valida and novo_hash.startswith("$2b$10$")
+    assert await verificador.verificar(SENHA, novo_hash) == (True, None)
+    verificador.fechar()
+
+
+async def executar(n: int) -> None:
+    rounds = int(os.getenv("BCRYPT_ROUNDS", 12))
+    print(f"{n} logins simultâneos, bcrypt com {rounds} rounds, {os.cpu_count()} CPUs")
+    no_loop = await rajada(_VerificadorNoLoop(rounds=rounds), n)
+    mostrar("bcrypt no event loop", no_loop)
+    for threads in (1, 2, 4):
+        verificador = VerificadorSenhas(rounds=rounds, max_threads=threads)
+        mostrar(f"pool de {threads} thread(s)", await rajada(verificador, n))
+        verificador.fechar()
+    await verificar_rehash()
+
+
+if __name__ == "__main__":
+    asyncio.run(executar(int(sys.argv[1]) if len(sys.argv) > 1 else 16))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Compara o conteúdo enviado ao LLM antes e depois da redução por relevância.
+
+- antes: texto da página inteira (BeautifulSoup get_text) cortado em 8000
+  caracteres
+- depois: extrator por eventos (sem boilerplate) + reduzir_conteudo com o
+  orçamento de tokens
+
+Usa as páginas guardadas em benchmarks/paginas/, uma página de portal
+sintética com menus, cookies e dezenas de "vagas relacionadas" e a SPA
+sintética do benchmark de extração. Para cada página mede os tokens
+estimados enviados, os tokens poupados e o tempo de preparação do conteúdo.
+
+Com --gemini (e GOOGLE_API_KEY definida) conta também os tokens reais com
+count_tokens e mede a latência da análise no modelo para as duas versões.
+
+Uso:
+    python benchmarks/reducao_conteudo.py [ORCAMENTO_TOKENS] [REPETICOES] [--gemini]
+"""
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extracao_html import DIRETORIO_PAGINAS, caminho_antigo, caminho_novo, spa_sintetica
+from reducao_conteudo import estimar_tokens, reduzir_conteudo
+
+LIMITE_ANTIGO = 8000
+
+
+def portal_sintetico(relacionadas: int = 60) -> bytes:
+    menu = "".join(f"<li><a href='/c/{i}'>Categoria {i}</a></li>" for i in range(40))
+    cartoes = "".join(
+        f"<div class='card'><a href='/vaga/{i}'>Vaga relacionada {i}</a><span>Maputo</span>"
+        f"<span>Publicada há {i % 7 + 1} dias</span></div>"
+        for i in range(relacionadas)
+    )
+    return (
+        "<html><head><title>Motorista de Pesados - Portal de Empregos</title></head><body>"
+        f"<div class='topo'><ul>{menu}</ul><a>Entrar</a><a>Registar</a></div>"
+        "<div class='conteudo'><h1>Motorista de Pesados</h1>"
+        "<p>Empresa de transportes contrata motorista de pesados para rota Maputo-Joanesburgo.</p>"
+        "<p>Requisitos: carta de condução profissional, 3 anos de experiência.</p>"
+        "<p>Salário: 35.000 MT. Candidaturas para recrutamento@transportes.co.mz até 30/11.</p></div>"
+        f"<div class='lista'><h2>Vagas relacionadas</h2>{cartoes}</div>"
+        "<div class='aviso'>Este site utiliza cookies para melhorar a sua experiência. Aceitar</div>"
+        "<div class='fim'>© 2024 Portal de Empregos. Todos os direitos reservados. Política de privacidade</div>"
+        "</body></html>"
+    ).encode("utf-8")
+
+
+def conteudo_antigo(corpo: bytes) -> str:
+    titulo, texto = caminho_antigo(corpo)
+    return f"Título: {titulo}\n\nConteúdo: {texto}"[:LIMITE_ANTIGO]
+
+
+def conteudo_novo(corpo: bytes, orcamento: int) -> tuple[str, dict]:
+    titulo, texto = caminho_novo(corpo)
+    return reduzir_conteudo(f"Título: {titulo}\n\nConteúdo: {texto}", orcamento, pagina=True)
+
+
+def mediana_ms(funcao, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+def medir_gemini(conteudos: list[tuple[str, str, str]]) -> None:
+    import google.generativeai as genai
+    from main import SYSTEM_PROMPT_ANALISE, model
+
+    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    print(f"\n{'página':<28} {'tokens antes':>13} {'tokens depois':>14} {'LLM antes (s)':>14} {'LLM depois (s)':>15}")
+    for nome, antes, depois in conteudos:
+        tokens, tempos = [], []
+        for texto in (antes, depois):
+            prompt = SYSTEM_PROMPT_ANALISE + "\n\nConteúdo para análise:\n" + texto
+            tokens.append(model.count_tokens(prompt).total_tokens)
+            inicio = time.perf_counter()
+            model.generate_content(prompt)
+            tempos.append(time.perf_counter() - inicio)
+        print(f"{nome:<28} {tokens[0]:13} {tokens[1]:14} {tempos[0]:14.2f} {tempos[1]:15.2f}")
+
+
+def executar(orcamento: int, repeticoes: int, gemini: bool) -> None:
+    paginas = [(os.path.basename(c), open(c, "rb").read()) for c in sorted(glob.glob(os.path.join(DIRETORIO_PAGINAS, "*.html")))]
+    paginas.append(("portal_sintetico.html", portal_sintetico()))
+    paginas.append(("spa_sintetica.html", spa_sintetica(2)))
+
+    print(f"Orçamento: {orcamento} tokens, {repeticoes} repetições (tokens estimados a ~4 caracteres)\n")
+    print(f"{'página':<28} {'tokens antes':>13} {'tokens depois':>14} {'poupados':>9} "
+          f"{'boilerpl.':>9} {'duplic.':>8} {'ms antes':>9} {'ms depois':>10}")
+    total_antes = total_depois = 0
+    conteudos = []
+    for nome, corpo in paginas:
+        antes = conteudo_antigo(corpo)
+        depois, estatisticas = conteudo_novo(corpo, orcamento)
+        ms_antes = mediana_ms(lambda: conteudo_antigo(corpo), repeticoes)
+        ms_depois = mediana_ms(lambda: conteudo_novo(corpo, orcamento), repeticoes)
+        tokens_antes = estimar_tokens(antes)
+        total_antes += tokens_antes
+        total_depois += estatisticas["tokensEnviados"]
+        conteudos.append((nome, antes, depois))
+        print(f"{nome:<28} {tokens_antes:13} {estatisticas['tokensEnviados']:14} "
+              f"{tokens_antes - estatisticas['tokensEnviados']:9} {estatisticas['linhasBoilerplate']:9} "
+              f"{estatisticas['linhasDuplicadas']:8} {ms_antes:9.2f} {ms_depois:10.2f}")
+
+    print(f"\nTotal: {total_antes} -> {total_depois} tokens "
+          f"({100 * (total_antes - total_depois) / max(total_antes, 1):.0f}% poupados)")
+
+    if gemini:
+        if not os.getenv("GOOGLE_API_KEY"):
+            print("\n--gemini requer GOOGLE_API_KEY")
+        else:
+            medir_gemini(conteudos)
+
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if not a.startswith("--")]
+    executar(int(argumentos[0]) if argumentos else 2000,
+             int(argumentos[1]) if len(argumentos) > 1 else 20,
+             "--gemini" in sys.argv)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Débito da triagem por regras sobre o corpus de vagas guardado.
+
+Lê a exportação da coleção `vagas` (humai_verify.vagas.json na raiz do
+repositório, ou outro ficheiro passado como argumento), reconstrói o texto
+de cada vaga e mede:
+
+- tempo por documento e documentos/segundo da triagem completa
+- o mesmo só para o léxico: regex em trie vs. busca ingénua frase a frase
+- quantas análises o LLM teria dispensado e a concordância com o nível de
+  risco que o LLM atribuiu
+
+Uso:
+    python benchmarks/triagem_regras.py [FICHEIRO_JSON] [REPETICOES]
+"""
+import json
+import os
+import statistics
+import sys
+import time
+import unicodedata
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from triagem_regras import LEGITIMIDADE, LEXICO, TriagemRegras, normalizar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CORPUS_PADRAO = os.path.join(RAIZ, "humai_verify.vagas.json")
+CAMPOS_TEXTO = [("Título", "titulo"), ("Empresa", "empresa"), ("Descrição", "descricao"),
+                ("Requisitos", "requisitos"), ("Remuneração", "remuneracao"), ("Contatos", "contatos")]
+
+
+def texto_da_vaga(vaga: dict) -> str:
+    # Vagas de link não guardam a página: usar os campos extraídos
+    if vaga.get("texto_original"):
+        return vaga["texto_original"]
+    return "\n".join(f"{rotulo}: {vaga[campo]}" for rotulo, campo in CAMPOS_TEXTO if vaga.get(campo))
+
+
+def busca_ingenua(frases: list[str]):
+    def analisar(texto: str) -> int:
+        normalizado = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)).lower()
+        return sum(1 for frase in frases if frase in normalizado)
+    return analisar
+
+
+def medir(funcao, textos: list[str], repeticoes: int) -> tuple[float, float]:
+    por_documento = []
+    inicio_total = time.perf_counter()
+    for _ in range(repeticoes):
+        for texto in textos:
+            inicio = time.perf_counter()
+            funcao(texto)
+            por_documento.append(time.perf_counter() - inicio)
+    total = time.perf_counter() - inicio_total
+    return statistics.median(por_documento) * 1e6, len(textos) * repeticoes / total
+
+
+def executar(caminho: str, repeticoes: int) -> None:
+    with open(caminho, encoding="utf-8") as f:
+        vagas = json.load(f)
+    textos = [texto_da_vaga(v) for v in vagas]
+    urls = [v.get("url_vaga") for v in vagas]
+    kb = sum(len(t.encode("utf-8")) for t in textos) / 1024
+    print(f"Corpus: {len(vagas)} vagas, {kb:.0f} KB de texto, {repeticoes} repetições\n")
+
+    triagem = TriagemRegras()
+    frases = [f for grupos in LEXICO.values() for lista in grupos.values() for f in lista] + list(LEGITIMIDADE)
+
+    mediana_trie, debito_trie = medir(triagem.analisar, textos, repeticoes)
+    mediana_lexico, debito_lexico = medir(lambda t: sum(1 for _ in triagem._regex.finditer(normalizar(t))), textos, repeticoes)
+    mediana_ingenua, debito_ingenuo = medir(busca_ingenua(frases), textos, repeticoes)
+    print(f"{'método':<28} {'µs/doc (mediana)':>17} {'docs/s':>10}")
+    print(f"{'triagem completa':<28} {mediana_trie:17.1f} {debito_trie:10.0f}")
+    print(f"{'só léxico, regex em trie':<28} {mediana_lexico:17.1f} {debito_lexico:10.0f}")
+    print(f"{'só léxico, frase a frase':<28} {mediana_ingenua:17.1f} {debito_ingenuo:10.0f}")
+
+    decisoes = Counter()
+    concordancia = Counter()
+    print(f"\n{'LLM':<8} {'pont.':>5} | {'regras':<8} {'pont.':>5} {'decisão':<9} critérios")
+    for vaga, texto, url in zip(vagas, textos, urls):
+        resultado = triagem.analisar(texto, url)
+        decisoes[resultado["decisao"]] += 1
+        concordancia[resultado["nivelRisco"] == vaga.get("nivel_risco")] += 1
+        print(f"{vaga.get('nivel_risco', '-'):<8} {vaga.get('pontuacao_risco', 0):5} | {resultado['nivelRisco']:<8} "
+              f"{resultado['pontuacao']:5} {str(resultado['decisao'] or '-'):<9} {', '.join(resultado['criterios'])}")
+
+    dispensadas = decisoes["CRITICO"] + decisoes["BENIGNO"]
+    print(f"\nLLM dispensado em {dispensadas}/{len(vagas)} vagas "
+          f"(CRITICO: {decisoes['CRITICO']}, BENIGNO: {decisoes['BENIGNO']})")
+    print(f"Mesmo nível de risco que o LLM: {concordancia[True]}/{len(vagas)}")
+
+
+if __name__ == "__main__":
+    executar(sys.argv[1] if len(sys.argv) > 1 else CORPUS_PADRAO,
+             int(sys.argv[2]) if len(sys.argv) > 2 else 200)
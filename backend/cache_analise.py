@@ -0,0 +1,116 @@
+"""
+Cache de análises endereçado por conteúdo.
+
+A chave é o hash SHA-256 do conteúdo normalizado (completo, sem cortes) mais
+a versão do prompt, de modo que publicações idênticas reutilizam a mesma
+análise e qualquer mudança no prompt invalida as entradas antigas. Há uma LRU em memória à frente de uma
+coleção MongoDB com índice TTL.
+"""
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar_conteudo(conteudo: str) -> str:
+    """Normaliza o conteúdo inteiro: um golpe no fim de um texto longo também muda a chave"""
+    conteudo = unicodedata.normalize("NFKC", conteudo).casefold()
+    return _ESPACOS.sub(" ", conteudo).strip()
+
+
+def chave_analise(conteudo: str, versao_prompt: str) -> str:
+    """Calcula a chave do cache para um conteúdo e versão de prompt"""
+    normalizado = normalizar_conteudo(conteudo)
+    return hashlib.sha256(f"{versao_prompt}\x00{normalizado}".encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """LRU simples em memória com expiração por entrada"""
+
+    def __init__(self, max_itens: int, ttl_segundos: float):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, chave: str) -> Optional[Any]:
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        expira_em, valor = item
+        if expira_em < time.monotonic():
+            del self._itens[chave]
+            return None
+        self._itens.move_to_end(chave)
+        return valor
+
+    def set(self, chave: str, valor: Any) -> None:
+        self._itens[chave] = (time.monotonic() + self.ttl_segundos, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+
+    def clear(self) -> None:
+        self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+
+class AnaliseCache:
+    """Cache de duas camadas (LRU em memória + MongoDB com TTL) para resultados do LLM"""
+
+    def __init__(self, collection, versao_prompt: str, ttl_segundos: int, max_itens_memoria: int = 1024):
+        self.collection = collection
+        self.versao_prompt = versao_prompt
+        self.ttl_segundos = ttl_segundos
+        self.memoria = LRUCache(max_itens_memoria, ttl_segundos)
+
+    def chave(self, conteudo: str) -> str:
+        return chave_analise(conteudo, self.versao_prompt)
+
+    async def criar_indices(self) -> None:
+        await self.collection.create_index("criado_em", expireAfterSeconds=self.ttl_segundos)
+
+    async def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        """Retorna {'resultado': ..., 'dados_vaga': ...} ou None"""
+        entrada = self.memoria.get(chave)
+        if entrada is not None:
+            return entrada
+
+        try:
+            doc = await self.collection.find_one({"_id": chave})
+        except Exception as e:
+            log.error("Erro ao consultar cache de análises", extra={"erro": str(e)})
+            return None
+        if not doc:
+            return None
+
+        entrada = {"resultado": doc["resultado"], "dados_vaga": doc.get("dados_vaga", {})}
+        self.memoria.set(chave, entrada)
+        return entrada
+
+    async def guardar(self, chave: str, resultado: Dict[str, Any], dados_vaga: Dict[str, Any]) -> None:
+        entrada = {"resultado": resultado, "dados_vaga": dados_vaga}
+        self.memoria.set(chave, entrada)
+        try:
+            await self.collection.replace_one(
+                {"_id": chave},
+                {
+                    "_id": chave,
+                    "versao_prompt": self.versao_prompt,
+                    "resultado": resultado,
+                    "dados_vaga": dados_vaga,
+                    "criado_em": datetime.utcnow(),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            log.error("Erro ao guardar no cache de análises", extra={"erro": str(e)})
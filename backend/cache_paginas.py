@@ -0,0 +1,209 @@
+"""
+Cache de páginas web com limite de memória, expiração e revalidação.
+
+- LRU limitada pelo total de bytes guardados, com TTL por entrada
+- Guarda ETag/Last-Modified para re-pedidos condicionais (304 Not Modified)
+- Cache negativo de falhas com TTL curto, para não martelar URLs em erro
+- Backend partilhado opcional (coleção MongoDB) para vários workers uvicorn
+- Contadores de hits, misses, revalidações e evicções
+
+O núcleo é síncrono e thread-safe para poder ser usado tanto pelo backend
+assíncrono como pelos scripts síncronos em llm/.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+def _tamanho(valor: Any) -> int:
+    """Estimativa do espaço ocupado pelos dados de uma página"""
+    if isinstance(valor, str):
+        return len(valor.encode("utf-8"))
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, dict):
+        return sum(_tamanho(k) + _tamanho(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set)):
+        return sum(_tamanho(v) for v in valor)
+    return 8
+
+
+class PageCache:
+    """LRU de páginas limitada por bytes, com TTL e cache negativo"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_segundos: float = 3600,
+                 ttl_negativo_segundos: float = 60):
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self.ttl_negativo_segundos = ttl_negativo_segundos
+        self._entradas: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.hits_negativos = 0
+        self.revalidacoes = 0
+        self.evictions = 0
+
+    def obter(self, url: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Retorna (entrada, fresca). Entradas expiradas continuam disponíveis
+        para revalidação condicional; falhas expiradas são descartadas.
+        """
+        with self._lock:
+            entrada = self._entradas.get(url)
+            if entrada is None:
+                self.misses += 1
+                return None, False
+
+            fresca = entrada["expira_em"] > time.time()
+            if entrada["erro"] is not None:
+                if fresca:
+                    self.hits_negativos += 1
+                    self._entradas.move_to_end(url)
+                    return entrada, True
+                self._remover(url)
+                self.misses += 1
+                return None, False
+
+            self._entradas.move_to_end(url)
+            if fresca:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entrada, fresca
+
+    def guardar(self, url: str, dados: Dict[str, Any], etag: Optional[str] = None,
+                last_modified: Optional[str] = None) -> Dict[str, Any]:
+        entrada = {
+            "dados": dados,
+            "etag": etag,
+            "last_modified": last_modified,
+            "erro": None,
+            "expira_em": time.time() + self.ttl_segundos,
+        }
+        self.restaurar(url, entrada)
+        return entrada
+
+    def guardar_falha(self, url: str, erro: str) -> Dict[str, Any]:
+        entrada = {
+            "dados": None,
+            "etag": None,
+            "last_modified": None,
+            "erro": erro,
+            "expira_em": time.time() + self.ttl_negativo_segundos,
+        }
+        self.restaurar(url, entrada)
+        return entrada
+
+    def renovar(self, url: str) -> Optional[Dict[str, Any]]:
+        """Estende o TTL de uma entrada após resposta 304 Not Modified"""
+        with self._lock:
+            entrada = self._entradas.get(url)
+            if entrada is None:
+                return None
+            entrada["expira_em"] = time.time() + self.ttl_segundos
+            self._entradas.move_to_end(url)
+            self.revalidacoes += 1
+            return entrada
+
+    def restaurar(self, url: str, entrada: Dict[str, Any]) -> None:
+        """Insere uma entrada já construída (por exemplo vinda do backend partilhado)"""
+        tamanho = _tamanho(entrada["dados"]) + _tamanho(entrada["erro"] or "") + len(url)
+        if tamanho > self.max_bytes:
+            return
+        entrada["tamanho"] = tamanho
+        with self._lock:
+            if url in self._entradas:
+                self._remover(url)
+            self._entradas[url] = entrada
+            self._bytes += tamanho
+            while self._bytes > self.max_bytes:
+                url_antiga, _ = next(iter(self._entradas.items()))
+                self._remover(url_antiga)
+                self.evictions += 1
+
+    def _remover(self, url: str) -> None:
+        entrada = self._entradas.pop(url)
+        self._bytes -= entrada["tamanho"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "entradas": len(self._entradas),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hits_negativos": self.hits_negativos,
+            "revalidacoes": self.revalidacoes,
+            "evictions": self.evictions,
+        }
+
+
+class CachePaginasMongo:
+    """Backend partilhado entre workers: uma coleção MongoDB com índice TTL"""
+
+    def __init__(self, collection, retencao_segundos: int = 7 * 24 * 3600):
+        self.collection = collection
+        self.retencao_segundos = retencao_segundos
+
+    async def criar_indices(self) -> None:
+        # O TTL do MongoDB só apaga entradas antigas; a frescura é decidida por 'expira_em',
+        # e entradas expiradas continuam úteis para revalidação condicional
+        await self.collection.create_index("atualizado_em", expireAfterSeconds=self.retencao_segundos)
+
+    async def obter(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            doc = await self.collection.find_one({"_id": url})
+        except Exception as e:
+            log.error("Erro ao consultar cache partilhado de páginas", extra={"erro": str(e)})
+            return None
+        if not doc:
+            return None
+        return {
+            "dados": doc.get("dados"),
+            "etag": doc.get("etag"),
+            "last_modified": doc.get("last_modified"),
+            "erro": doc.get("erro"),
+            "expira_em": doc["expira_em"],
+        }
+
+    async def guardar(self, url: str, entrada: Dict[str, Any]) -> None:
+        try:
+            await self.collection.replace_one(
+                {"_id": url},
+                {
+                    "_id": url,
+                    "dados": entrada["dados"],
+                    "etag": entrada["etag"],
+                    "last_modified": entrada["last_modified"],
+                    "erro": entrada["erro"],
+                    "expira_em": entrada["expira_em"],
+                    "atualizado_em": datetime.utcnow(),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            log.error("Erro ao guardar no cache partilhado de páginas", extra={"erro": str(e)})
+
+
+def cabecalhos_condicionais(entrada: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Cabeçalhos If-None-Match/If-Modified-Since para revalidar uma entrada expirada"""
+    cabecalhos = {}
+    if entrada and entrada["erro"] is None:
+        if entrada.get("etag"):
+            cabecalhos["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabecalhos["If-Modified-Since"] = entrada["last_modified"]
+    return cabecalhos
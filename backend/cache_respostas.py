@@ -0,0 +1,142 @@
+"""
+Cache de respostas JSON do servidor, com ETag e compressão.
+
+Usado por GET /dashboard, que o painel de dados pede a cada carregamento:
+
+- a resposta fica em memória durante alguns segundos e é descartada assim
+  que uma nova análise é gravada (`invalidar()`)
+- pedidos simultâneos com a cache vazia partilham um único cálculo
+- o corpo é serializado e comprimido (gzip e, se o pacote `brotli` estiver
+  instalado, br) uma única vez por entrada
+- um pedido com `If-None-Match` igual ao ETag atual recebe 304 sem corpo
+"""
+import gzip
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from coalescencia import Coalescedor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Abaixo disto a compressão não compensa o custo
+TAMANHO_MINIMO_COMPRESSAO = 500
+
+
+class EntradaResposta:
+    """Corpo JSON já serializado, com ETag e versões comprimidas calculadas a pedido"""
+
+    def __init__(self, dados: Any, expira: float):
+        self.corpo = json.dumps(jsonable_encoder(dados), ensure_ascii=False, separators=(",", ":")).encode()
+        # ETag fraco: o mesmo conteúdo é servido em várias codificações
+        self.etag = f'W/"{hashlib.sha256(self.corpo).hexdigest()[:32]}"'
+        self.expira = expira
+        self._comprimidos: Dict[str, bytes] = {}
+
+    def codificado(self, codificacao: str) -> bytes:
+        if codificacao not in self._comprimidos:
+            if codificacao == "br":
+                self._comprimidos[codificacao] = brotli.compress(self.corpo, quality=5)
+            else:
+                self._comprimidos[codificacao] = gzip.compress(self.corpo, compresslevel=6)
+        return self._comprimidos[codificacao]
+
+
+def _etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparação fraca (RFC 9110): ignora o prefixo W/
+    valores = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+    return etag.removeprefix("W/") in valores
+
+
+def escolher_codificacao(accept_encoding: str) -> Optional[str]:
+    """br se o cliente o aceitar e o pacote estiver disponível, senão gzip, senão None"""
+    aceites = {}
+    for parte in accept_encoding.lower().split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        qualidade = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                qualidade = float(parametros.strip()[2:])
+            except ValueError:
+                qualidade = 0.0
+        aceites[nome.strip()] = qualidade
+    if brotli is not None and aceites.get("br", 0) > 0:
+        return "br"
+    if aceites.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CacheRespostas:
+    """Respostas por chave, válidas até expirar o TTL ou até invalidar()"""
+
+    def __init__(self, ttl_segundos: float = 10):
+        self.ttl_segundos = ttl_segundos
+        self._entradas: Dict[str, EntradaResposta] = {}
+        self._coalescedor = Coalescedor()
+        # Incrementada a cada invalidação: um cálculo iniciado antes não é guardado
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.nao_modificadas = 0
+        self.invalidacoes = 0
+
+    def invalidar(self) -> None:
+        self._entradas.clear()
+        self._geracao += 1
+        self.invalidacoes += 1
+
+    async def obter(self, chave: str, calcular: Callable[[], Awaitable[Any]]) -> EntradaResposta:
+        entrada = self._entradas.get(chave)
+        if entrada and entrada.expira > time.monotonic():
+            self.acertos += 1
+            return entrada
+        self.falhas += 1
+
+        async def calcular_entrada() -> EntradaResposta:
+            geracao = self._geracao
+            nova = EntradaResposta(await calcular(), time.monotonic() + self.ttl_segundos)
+            if geracao == self._geracao:
+                self._entradas[chave] = nova
+            return nova
+        # A geração entra na chave: depois de invalidar() não se reaproveita um cálculo em curso
+        entrada, _ = await self._coalescedor.executar(f"{self._geracao}:{chave}", calcular_entrada)
+        return entrada
+
+    def resposta(self, entrada: EntradaResposta, request: Request) -> Response:
+        cabecalhos = {
+            "ETag": entrada.etag,
+            # O browser guarda a resposta mas revalida sempre com If-None-Match
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_corresponde(request.headers.get("if-none-match"), entrada.etag):
+            self.nao_modificadas += 1
+            return Response(status_code=304, headers=cabecalhos)
+        corpo = entrada.corpo
+        codificacao = escolher_codificacao(request.headers.get("accept-encoding", ""))
+        if codificacao and len(corpo) >= TAMANHO_MINIMO_COMPRESSAO:
+            corpo = entrada.codificado(codificacao)
+            cabecalhos["Content-Encoding"] = codificacao
+        return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "entradas": len(self._entradas),
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "nao_modificadas": self.nao_modificadas,
+            "invalidacoes": self.invalidacoes,
+            "brotli": brotli is not None,
+        }
@@ -0,0 +1,214 @@
+"""
+Gravação e reprodução das respostas do modelo (cassetes), para correr a
+análise e os scripts de llm/ sem rede e de forma determinística.
+
+`ModeloComCassete` tem o mesmo `generate_content(prompt, stream=...)` do
+SDK e envolve o modelo em três modos:
+
+- direto: o modelo sem alterações
+- gravar: chama o modelo e guarda o texto de cada resposta completa
+- reproduzir: responde só a partir da cassete, sem rede; um prompt que
+  não foi gravado dá RespostaNaoGravada
+
+A chave de cada resposta é o SHA-256 do nome do modelo e do prompt, pelo
+que qualquer alteração ao prompt ou ao conteúdo enviado é outra entrada.
+Os prompts não são guardados: o ficheiro é JSON Lines comprimido com gzip,
+uma linha por resposta, acrescentado a cada gravação, e é lido para um
+dicionário ao abrir (milhares de respostas cabem em poucos MB).
+
+O núcleo é síncrono e thread-safe, como o cache de páginas, para servir o
+ClienteLLM (que chama o modelo numa thread) e os scripts síncronos de llm/.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from typing import Any, Dict, Iterator, Optional
+
+from cliente_llm import ErroLLM
+
+log = logging.getLogger(__name__)
+
+DIRETO = "direto"
+GRAVAR = "gravar"
+REPRODUZIR = "reproduzir"
+MODOS = (DIRETO, GRAVAR, REPRODUZIR)
+
+# Tamanho dos pedaços de uma resposta reproduzida em streaming
+TAMANHO_PEDACO = 256
+
+
+class RespostaNaoGravada(ErroLLM):
+    """O prompt não está na cassete (modo reproduzir); o ClienteLLM não repete nem conta no disjuntor"""
+
+
+class RespostaGravada:
+    """Resposta reproduzida, com o atributo `text` das respostas do SDK"""
+
+    usage_metadata = None
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Cassete:
+    """Texto das respostas por chave do prompt, num ficheiro JSON Lines com gzip"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._respostas: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._escrita = None
+        self.acertos = 0
+        self.falhas = 0
+        self.gravadas = 0
+        if os.path.exists(caminho):
+            self._carregar()
+
+    def _carregar(self) -> None:
+        linhas = 0
+        completo = True
+        try:
+            with gzip.open(self.caminho, "rt", encoding="utf-8") as f:
+                for linha in f:
+                    linhas += 1
+                    try:
+                        entrada = json.loads(linha)
+                    except json.JSONDecodeError:
+                        completo = False
+                        continue
+                    self._respostas[entrada["chave"]] = entrada["resposta"]
+        except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+            # Processo interrompido a meio de uma gravação: o fim do ficheiro ficou por escrever
+            log.warning("Cassete incompleta", extra={"caminho": self.caminho, "erro": str(e)})
+            completo = False
+        if not completo or linhas > len(self._respostas):
+            # Reescrever sem as entradas repetidas nem o fim estragado, antes de acrescentar mais
+            self.compactar()
+        log.info("Cassete carregada", extra={"caminho": self.caminho, "respostas": len(self._respostas)})
+
+    @staticmethod
+    def chave(modelo: str, prompt: str) -> str:
+        return hashlib.sha256(f"{modelo}\n{prompt}".encode("utf-8")).hexdigest()[:32]
+
+    def obter(self, chave: str) -> Optional[str]:
+        texto = self._respostas.get(chave)
+        if texto is None:
+            self.falhas += 1
+        else:
+            self.acertos += 1
+        return texto
+
+    def guardar(self, chave: str, texto: str) -> None:
+        linha = json.dumps({"chave": chave, "resposta": texto}, ensure_ascii=False)
+        with self._lock:
+            if self._respostas.get(chave) == texto:
+                return
+            if self._escrita is None:
+                pasta = os.path.dirname(os.path.abspath(self.caminho))
+                os.makedirs(pasta, exist_ok=True)
+                self._escrita = gzip.open(self.caminho, "at", encoding="utf-8")
+            self._escrita.write(linha + "\n")
+            # Cada resposta fica no disco mesmo que o processo termine sem fechar a cassete
+            self._escrita.flush()
+            self._respostas[chave] = texto
+            self.gravadas += 1
+
+    def compactar(self) -> None:
+        """Reescreve o ficheiro com uma linha por chave"""
+        with self._lock:
+            self._fechar_escrita()
+            temporario = f"{self.caminho}.tmp"
+            with gzip.open(temporario, "wt", encoding="utf-8") as f:
+                for chave, texto in self._respostas.items():
+                    f.write(json.dumps({"chave": chave, "resposta": texto}, ensure_ascii=False) + "\n")
+            os.replace(temporario, self.caminho)
+
+    def _fechar_escrita(self) -> None:
+        if self._escrita is not None:
+            self._escrita.close()
+            self._escrita = None
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._fechar_escrita()
+
+    def __len__(self) -> int:
+        return len(self._respostas)
+
+    def __contains__(self, chave: str) -> bool:
+        return chave in self._respostas
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "caminho": self.caminho,
+            "respostas": len(self._respostas),
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "gravadas": self.gravadas,
+            "bytes": os.path.getsize(self.caminho) if os.path.exists(self.caminho) else 0,
+        }
+
+
+def _texto(resposta: Any) -> str:
+    try:
+        return resposta.text or ""
+    except ValueError:
+        # Resposta ou pedaço sem texto (bloqueado por segurança, só metadados)
+        return ""
+
+
+class ModeloComCassete:
+    """generate_content do modelo, com as respostas gravadas na cassete ou reproduzidas dela"""
+
+    def __init__(self, modelo: Any, cassete: Cassete, modo: str, nome_modelo: Optional[str] = None):
+        if modo not in (GRAVAR, REPRODUZIR):
+            raise ValueError(f"Modo de cassete inválido: {modo}")
+        self.modelo = modelo
+        self.cassete = cassete
+        self.modo = modo
+        self.nome_modelo = nome_modelo or getattr(modelo, "model_name", "")
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs):
+        chave = Cassete.chave(self.nome_modelo, prompt)
+        if self.modo == REPRODUZIR:
+            texto = self.cassete.obter(chave)
+            if texto is None:
+                raise RespostaNaoGravada(f"Sem resposta gravada para o prompt {chave} em {self.cassete.caminho}")
+            if stream:
+                return iter([RespostaGravada(texto[i:i + TAMANHO_PEDACO])
+                             for i in range(0, len(texto), TAMANHO_PEDACO)])
+            return RespostaGravada(texto)
+
+        resposta = self.modelo.generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._gravar_stream(chave, resposta)
+        texto = _texto(resposta)
+        if texto:
+            self.cassete.guardar(chave, texto)
+        return resposta
+
+    def _gravar_stream(self, chave: str, resposta) -> Iterator[Any]:
+        partes = []
+        for pedaco in resposta:
+            partes.append(_texto(pedaco))
+            yield pedaco
+        # Só chega aqui com o stream completo: uma resposta interrompida não é gravada
+        if any(partes):
+            self.cassete.guardar(chave, "".join(partes))
+
+
+def com_cassete(modelo: Any, modo: str = DIRETO, caminho: Optional[str] = None) -> Any:
+    """O modelo tal como está (direto) ou envolvido numa cassete aberta em `caminho`"""
+    if modo not in MODOS:
+        raise ValueError(f"LLM_CASSETE_MODO inválido: {modo} (use {', '.join(MODOS)})")
+    if modo == DIRETO:
+        return modelo
+    if not caminho:
+        raise ValueError(f"LLM_CASSETE_MODO={modo} precisa do caminho da cassete (LLM_CASSETE)")
+    if modo == REPRODUZIR and not os.path.exists(caminho):
+        raise ValueError(f"Cassete inexistente: {caminho}")
+    return ModeloComCassete(modelo, Cassete(caminho), modo)
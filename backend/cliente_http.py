@@ -0,0 +1,228 @@
+"""
+Cliente HTTP partilhado para buscar páginas de vagas.
+
+Um único pool de conexões keep-alive (com HTTP/2 opcional) evita um novo
+handshake TCP+TLS por link, e semáforos por host limitam quantos pedidos
+simultâneos fazemos a cada site. Os redirecionamentos são seguidos aqui e
+não pelo httpx, um salto de cada vez, para que cada salto respeite o
+semáforo do host a que se dirige (um encurtador não leva todos os pedidos
+ao mesmo site sem limite). O semáforo de um host só existe enquanto há
+pedidos a esse host. Há uma versão assíncrona, gerida pelo lifespan da
+API, e uma síncrona para os scripts em llm/.
+"""
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+from extrator_html import ConteudoNaoSuportado, tipo_aceitavel
+
+log = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
+}
+
+
+def _http2_disponivel() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ConfiguracaoHTTP:
+    """Parâmetros do pool, lidos do ambiente por omissão"""
+
+    def __init__(self, max_conexoes: Optional[int] = None, conexoes_por_host: Optional[int] = None,
+                 timeout_total: Optional[float] = None, timeout_conexao: Optional[float] = None,
+                 max_redirects: Optional[int] = None, http2: Optional[bool] = None, verify: bool = True):
+        self.max_conexoes = max_conexoes or int(os.getenv('HTTP_MAX_CONEXOES', 100))
+        self.conexoes_por_host = conexoes_por_host or int(os.getenv('HTTP_CONEXOES_POR_HOST', 4))
+        self.timeout_total = timeout_total or float(os.getenv('HTTP_TIMEOUT_TOTAL', 15))
+        self.timeout_conexao = timeout_conexao or float(os.getenv('HTTP_TIMEOUT_CONEXAO', 5))
+        self.max_redirects = max_redirects if max_redirects is not None else int(os.getenv('HTTP_MAX_REDIRECTS', 5))
+        if http2 is None:
+            http2 = os.getenv('HTTP2', '').lower() in ('1', 'true', 'sim')
+        if http2 and not _http2_disponivel():
+            log.warning("HTTP/2 pedido mas o pacote 'h2' não está instalado; usando HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.verify = verify
+
+    def argumentos_cliente(self) -> Dict:
+        return {
+            "headers": HEADERS,
+            "http2": self.http2,
+            "verify": self.verify,
+            # Os redirecionamentos são seguidos pelos clientes abaixo, salto a salto
+            "follow_redirects": False,
+            "timeout": httpx.Timeout(self.timeout_total, connect=self.timeout_conexao),
+            "limits": httpx.Limits(
+                max_connections=self.max_conexoes,
+                max_keepalive_connections=self.max_conexoes,
+                keepalive_expiry=30,
+            ),
+        }
+
+
+def _host(url: httpx.URL) -> str:
+    return url.netloc.decode("ascii").lower()
+
+
+def _demasiados_redirecionamentos(pedido: httpx.Request, maximo: int) -> httpx.TooManyRedirects:
+    return httpx.TooManyRedirects(f"Mais de {maximo} redirecionamentos até {pedido.url}", request=pedido)
+
+
+class _SemaforoHost:
+    """Semáforo de um host e número de pedidos que o usam (a decorrer ou à espera)"""
+
+    def __init__(self, semaforo):
+        self.semaforo = semaforo
+        self.utilizadores = 0
+
+
+class ClienteHTTP:
+    """Cliente assíncrono com pool keep-alive e limite de concorrência por host"""
+
+    def __init__(self, configuracao: Optional[ConfiguracaoHTTP] = None):
+        self.configuracao = configuracao or ConfiguracaoHTTP()
+        self._cliente: Optional[httpx.AsyncClient] = None
+        self._semaforos: Dict[str, _SemaforoHost] = {}
+
+    async def iniciar(self) -> None:
+        if self._cliente is None:
+            self._cliente = httpx.AsyncClient(**self.configuracao.argumentos_cliente())
+
+    async def fechar(self) -> None:
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+    @asynccontextmanager
+    async def _limite_host(self, host: str) -> AsyncIterator[None]:
+        """Ocupa uma vaga do semáforo do host; o último pedido a sair descarta o semáforo"""
+        entrada = self._semaforos.get(host)
+        if entrada is None:
+            entrada = self._semaforos[host] = _SemaforoHost(asyncio.Semaphore(self.configuracao.conexoes_por_host))
+        entrada.utilizadores += 1
+        try:
+            async with entrada.semaforo:
+                yield
+        finally:
+            entrada.utilizadores -= 1
+            if entrada.utilizadores == 0:
+                del self._semaforos[host]
+
+    @asynccontextmanager
+    async def _pedido(self, url: str, headers: Optional[Dict[str, str]]) -> AsyncIterator[httpx.Response]:
+        """
+        GET em streaming que segue os redirecionamentos; cada salto ocupa o semáforo do seu
+        host, e o da resposta final fica ocupado até o corpo ser lido
+        """
+        pedido = self._cliente.build_request("GET", url, headers=headers)
+        for _ in range(self.configuracao.max_redirects + 1):
+            async with self._limite_host(_host(pedido.url)):
+                response = await self._cliente.send(pedido, stream=True)
+                try:
+                    if response.next_request is None:
+                        yield response
+                        return
+                    pedido = response.next_request
+                finally:
+                    await response.aclose()
+        raise _demasiados_redirecionamentos(pedido, self.configuracao.max_redirects)
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GET com prazo total (inclui redirecionamentos e espera pelo semáforo do host)"""
+        if self._cliente is None:
+            await self.iniciar()
+
+        async def _executar():
+            async with self._pedido(url, headers) as response:
+                await response.aread()
+                return response
+
+        try:
+            return await asyncio.wait_for(_executar(), timeout=self.configuracao.timeout_total)
+        except asyncio.TimeoutError:
+            raise httpx.TimeoutException(f"Tempo total de {self.configuracao.timeout_total}s excedido para {url}")
+
+    async def buscar_pagina(self, url: str, headers: Optional[Dict[str, str]] = None,
+                            max_bytes: int = 2 * 1024 * 1024) -> Tuple[httpx.Response, bytes, bool]:
+        """
+        GET em streaming: rejeita conteúdo que não seja HTML antes de ler o corpo
+        e para de ler ao atingir max_bytes. Retorna (resposta, corpo, truncado).
+        """
+        if self._cliente is None:
+            await self.iniciar()
+
+        async def _executar():
+            async with self._pedido(url, headers) as response:
+                if not response.is_success:
+                    return response, b"", False
+                content_type = response.headers.get("content-type")
+                if not tipo_aceitavel(content_type):
+                    raise ConteudoNaoSuportado(f"Tipo de conteúdo não suportado: {content_type}")
+
+                partes = []
+                lidos = 0
+                truncado = False
+                async for parte in response.aiter_bytes():
+                    partes.append(parte)
+                    lidos += len(parte)
+                    if lidos >= max_bytes:
+                        truncado = True
+                        break
+                return response, b"".join(partes)[:max_bytes], truncado
+
+        try:
+            return await asyncio.wait_for(_executar(), timeout=self.configuracao.timeout_total)
+        except asyncio.TimeoutError:
+            raise httpx.TimeoutException(f"Tempo total de {self.configuracao.timeout_total}s excedido para {url}")
+
+
+class ClienteHTTPSincrono:
+    """Versão síncrona (thread-safe) para scripts e notebooks"""
+
+    def __init__(self, configuracao: Optional[ConfiguracaoHTTP] = None):
+        self.configuracao = configuracao or ConfiguracaoHTTP()
+        self._cliente = httpx.Client(**self.configuracao.argumentos_cliente())
+        self._semaforos: Dict[str, _SemaforoHost] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _limite_host(self, host: str) -> Iterator[None]:
+        with self._lock:
+            entrada = self._semaforos.get(host)
+            if entrada is None:
+                semaforo = threading.BoundedSemaphore(self.configuracao.conexoes_por_host)
+                entrada = self._semaforos[host] = _SemaforoHost(semaforo)
+            entrada.utilizadores += 1
+        try:
+            with entrada.semaforo:
+                yield
+        finally:
+            with self._lock:
+                entrada.utilizadores -= 1
+                if entrada.utilizadores == 0:
+                    del self._semaforos[host]
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """GET que segue os redirecionamentos, cada salto com o semáforo do seu host"""
+        pedido = self._cliente.build_request("GET", url, headers=headers)
+        for _ in range(self.configuracao.max_redirects + 1):
+            with self._limite_host(_host(pedido.url)):
+                response = self._cliente.send(pedido)
+            if response.next_request is None:
+                return response
+            pedido = response.next_request
+        raise _demasiados_redirecionamentos(pedido, self.configuracao.max_redirects)
+
+    def fechar(self) -> None:
+        self._cliente.close()
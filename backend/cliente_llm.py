@@ -0,0 +1,427 @@
+"""
+Cliente resiliente para o modelo Gemini.
+
+Envolve o `GenerativeModel` (cliente síncrono, executado em threads) com:
+
+- balde de tokens do lado do cliente, por pedidos e por tokens por minuto,
+  ajustado à quota da API, para não provocar erros 429
+- repetições limitadas de erros transitórios (429, 5xx, timeouts) com
+  backoff exponencial e jitter completo
+- prazo por pedido: esperas na quota, tentativas e pausas contam todas para
+  o mesmo prazo
+- disjuntor (circuit breaker): depois de N falhas transitórias seguidas
+  falha logo durante um intervalo, e depois deixa passar um pedido de
+  teste; respostas bloqueadas ou vazias e erros 4xx não contam, porque o
+  modelo está disponível e repetir não adianta
+- pedidos de cobertura (hedging) opcionais: se a resposta demorar mais do
+  que o p95 observado, lança um segundo pedido e usa o primeiro que chegar
+- histogramas de latência, contadores de erros por tipo e de tokens
+  enviados e recebidos
+
+As chamadas síncronas não podem ser interrompidas: quando o prazo expira o
+resultado deixa de ser aguardado, mas a thread termina a chamada em curso.
+"""
+import asyncio
+import bisect
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+# Códigos HTTP que justificam repetir o pedido
+CODIGOS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+FECHADO = "FECHADO"
+ABERTO = "ABERTO"
+MEIO_ABERTO = "MEIO_ABERTO"
+
+
+class ErroLLM(Exception):
+    """Falha do modelo depois de esgotadas as tentativas"""
+
+
+class CircuitoAberto(ErroLLM):
+    """O disjuntor está aberto: o modelo falhou repetidamente há pouco tempo"""
+
+
+class PrazoExcedido(ErroLLM):
+    """O prazo do pedido terminou antes de haver resposta"""
+
+
+def erro_transitorio(e: BaseException) -> bool:
+    if isinstance(e, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # google.api_core.exceptions.* expõem o código HTTP em .code
+    codigo = getattr(e, "code", None)
+    return isinstance(codigo, int) and codigo in CODIGOS_TRANSITORIOS
+
+
+class BaldeTokens:
+    """Balde de tokens: `capacidade` de rajada, reposto a `por_minuto` tokens por minuto"""
+
+    def __init__(self, por_minuto: float, capacidade: Optional[float] = None):
+        self.por_segundo = por_minuto / 60
+        self.capacidade = capacidade if capacidade is not None else max(por_minuto / 6, 1)
+        self._tokens = self.capacidade
+        self._atualizado = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.por_segundo)
+        self._atualizado = agora
+
+    def tentar_adquirir(self, quantidade: float = 1) -> bool:
+        self._repor()
+        if self._tokens >= quantidade:
+            self._tokens -= quantidade
+            return True
+        return False
+
+    async def adquirir(self, quantidade: float = 1, prazo: Optional[float] = None) -> float:
+        """Espera pelos tokens (por ordem de chegada); retorna o tempo de espera"""
+        # Um pedido maior do que a capacidade nunca caberia no balde
+        quantidade = min(quantidade, self.capacidade)
+        inicio = time.monotonic()
+        async with self._lock:
+            while True:
+                self._repor()
+                if self._tokens >= quantidade:
+                    self._tokens -= quantidade
+                    return time.monotonic() - inicio
+                espera = (quantidade - self._tokens) / self.por_segundo
+                if prazo is not None and time.monotonic() + espera > prazo:
+                    raise PrazoExcedido("Quota do modelo esgotada até ao fim do prazo")
+                await asyncio.sleep(espera)
+
+    def estado(self) -> Dict[str, Any]:
+        self._repor()
+        return {"disponiveis": round(self._tokens, 1), "capacidade": self.capacidade,
+                "por_minuto": round(self.por_segundo * 60, 1)}
+
+
+class Disjuntor:
+    """Circuit breaker com estados FECHADO, ABERTO e MEIO_ABERTO"""
+
+    def __init__(self, limiar_falhas: int = 5, tempo_aberto_segundos: float = 30):
+        self.limiar_falhas = limiar_falhas
+        self.tempo_aberto_segundos = tempo_aberto_segundos
+        self.estado = FECHADO
+        self._falhas_seguidas = 0
+        self._aberto_em = 0.0
+        self._teste_em_curso = False
+        self._teste_desde = 0.0
+        self.aberturas = 0
+        self.rejeitados = 0
+
+    def permitir(self) -> bool:
+        if self.estado == ABERTO and time.monotonic() - self._aberto_em >= self.tempo_aberto_segundos:
+            self.estado = MEIO_ABERTO
+            self._teste_em_curso = False
+        if self.estado == FECHADO:
+            return True
+        # Deixar passar um único pedido de teste (ou outro, se o anterior nunca terminou)
+        if self.estado == MEIO_ABERTO and (not self._teste_em_curso
+                                           or time.monotonic() - self._teste_desde >= self.tempo_aberto_segundos):
+            self._teste_em_curso = True
+            self._teste_desde = time.monotonic()
+            return True
+        self.rejeitados += 1
+        return False
+
+    def sucesso(self) -> None:
+        self.estado = FECHADO
+        self._falhas_seguidas = 0
+        self._teste_em_curso = False
+
+    def falha(self) -> None:
+        self._falhas_seguidas += 1
+        if self.estado == MEIO_ABERTO or self._falhas_seguidas >= self.limiar_falhas:
+            if self.estado != ABERTO:
+                self.aberturas += 1
+            self.estado = ABERTO
+            self._aberto_em = time.monotonic()
+            self._teste_em_curso = False
+
+    def resumo(self) -> Dict[str, Any]:
+        return {"estado": self.estado, "falhas_seguidas": self._falhas_seguidas,
+                "aberturas": self.aberturas, "rejeitados": self.rejeitados}
+
+
+class Histograma:
+    """Histograma cumulativo por limites (em segundos) e janela recente para percentis"""
+
+    LIMITES = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+    def __init__(self, limites: Tuple[float, ...] = LIMITES, janela: int = 500):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self._recentes: Deque[float] = deque(maxlen=janela)
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+        self._recentes.append(valor)
+
+    def percentil(self, p: float) -> Optional[float]:
+        if not self._recentes:
+            return None
+        ordenados = sorted(self._recentes)
+        return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+    def __len__(self) -> int:
+        return len(self._recentes)
+
+    def resumo(self) -> Dict[str, Any]:
+        acumulado = 0
+        baldes = {}
+        for limite, contagem in zip([*map(str, self.limites), "+Inf"], self.contagens):
+            acumulado += contagem
+            baldes[limite] = acumulado
+        p50, p95 = self.percentil(0.5), self.percentil(0.95)
+        return {
+            "total": self.total,
+            "soma": round(self.soma, 3),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "baldes": baldes,
+        }
+
+
+class ClienteLLM:
+    """Chamadas ao modelo com quota, repetições, prazo, disjuntor e hedging"""
+
+    def __init__(self, model, pedidos_por_minuto: float = 15, tokens_por_minuto: float = 1_000_000,
+                 max_tentativas: int = 3, backoff_base_segundos: float = 0.5, backoff_max_segundos: float = 8,
+                 prazo_segundos: float = 60, hedging: bool = False, hedging_min_amostras: int = 20,
+                 limiar_falhas_disjuntor: int = 5, tempo_aberto_segundos: float = 30):
+        self.model = model
+        self.balde_pedidos = BaldeTokens(pedidos_por_minuto)
+        self.balde_tokens = BaldeTokens(tokens_por_minuto)
+        self.max_tentativas = max_tentativas
+        self.backoff_base_segundos = backoff_base_segundos
+        self.backoff_max_segundos = backoff_max_segundos
+        self.prazo_segundos = prazo_segundos
+        self.hedging = hedging
+        self.hedging_min_amostras = hedging_min_amostras
+        self.disjuntor = Disjuntor(limiar_falhas_disjuntor, tempo_aberto_segundos)
+
+        self.latencia = Histograma()
+        self.espera_quota = Histograma()
+        self.erros: Counter = Counter()
+        self.pedidos = 0
+        self.tentativas = 0
+        self.repeticoes = 0
+        self.hedges = 0
+        self.hedges_vencedores = 0
+        self.tokens_prompt = 0
+        self.tokens_resposta = 0
+
+    # Contabilidade comum às chamadas simples e em streaming
+
+    async def _preparar_tentativa(self, prompt: str, prazo: float) -> None:
+        if not self.disjuntor.permitir():
+            self.erros["CircuitoAberto"] += 1
+            raise CircuitoAberto("Modelo indisponível (disjuntor aberto)")
+        espera = await self.balde_pedidos.adquirir(1, prazo)
+        # ~4 caracteres por token, o suficiente para respeitar a quota de tokens por minuto
+        espera += await self.balde_tokens.adquirir(len(prompt) / 4, prazo)
+        self.espera_quota.observar(espera)
+        self.tentativas += 1
+
+    async def _pausa_antes_de_repetir(self, e: Exception, tentativa: int, prazo: float) -> None:
+        """Regista a falha e espera o backoff; relança se não houver nova tentativa"""
+        self.erros[type(e).__name__] += 1
+        if not erro_transitorio(e):
+            # O modelo respondeu (pedido inválido, prompt bloqueado): não é indisponibilidade
+            self.disjuntor.sucesso()
+            raise ErroLLM(str(e)) from e
+        self.disjuntor.falha()
+        if tentativa + 1 >= self.max_tentativas:
+            raise ErroLLM(str(e)) from e
+        # Jitter completo: evita que os clientes repitam todos ao mesmo tempo
+        pausa = random.uniform(0, min(self.backoff_max_segundos, self.backoff_base_segundos * 2 ** tentativa))
+        if time.monotonic() + pausa >= prazo:
+            raise PrazoExcedido(f"Prazo esgotado depois de {tentativa + 1} tentativas: {e}") from e
+        self.repeticoes += 1
+        await asyncio.sleep(pausa)
+
+    def _contar_tokens(self, prompt: str, caracteres_resposta: int, uso: Any = None) -> None:
+        """Tokens do usage_metadata da resposta, quando a API o devolve; senão ~4 caracteres por token"""
+        self.tokens_prompt += getattr(uso, "prompt_token_count", 0) or round(len(prompt) / 4)
+        self.tokens_resposta += getattr(uso, "candidates_token_count", 0) or round(caracteres_resposta / 4)
+
+    # Chamada simples
+
+    def _chamar(self, prompt: str) -> str:
+        inicio = time.monotonic()
+        response = self.model.generate_content(prompt)
+        try:
+            texto = response.text if response else ""
+        except ValueError as e:
+            # O SDK levanta ValueError em .text quando a resposta foi bloqueada ou não tem partes
+            raise ErroLLM(f"Resposta sem texto do modelo: {e}") from e
+        if not texto:
+            raise ErroLLM("Resposta vazia do modelo")
+        self.latencia.observar(time.monotonic() - inicio)
+        self._contar_tokens(prompt, len(texto), getattr(response, "usage_metadata", None))
+        return texto
+
+    async def _chamar_com_hedging(self, prompt: str) -> str:
+        principal = asyncio.ensure_future(asyncio.to_thread(self._chamar, prompt))
+        atraso = self.latencia.percentil(0.95)
+        if not self.hedging or atraso is None or len(self.latencia) < self.hedging_min_amostras:
+            return await principal
+
+        concluidas, _ = await asyncio.wait({principal}, timeout=atraso)
+        # O pedido de cobertura só é feito se houver quota livre de imediato
+        if concluidas or not self.balde_pedidos.tentar_adquirir():
+            return await principal
+        self.hedges += 1
+        cobertura = asyncio.ensure_future(asyncio.to_thread(self._chamar, prompt))
+        pendentes = {principal, cobertura}
+        erro: Optional[BaseException] = None
+        try:
+            while pendentes:
+                concluidas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in concluidas:
+                    if tarefa.exception() is None:
+                        if tarefa is cobertura:
+                            self.hedges_vencedores += 1
+                        return tarefa.result()
+                    erro = tarefa.exception()
+            raise erro
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+
+    async def gerar(self, prompt: str) -> str:
+        """Texto completo gerado pelo modelo; levanta ErroLLM se não for possível obtê-lo"""
+        self.pedidos += 1
+        prazo = time.monotonic() + self.prazo_segundos
+        for tentativa in range(self.max_tentativas):
+            await self._preparar_tentativa(prompt, prazo)
+            try:
+                texto = await asyncio.wait_for(self._chamar_com_hedging(prompt), prazo - time.monotonic())
+            except asyncio.TimeoutError:
+                self.erros["PrazoExcedido"] += 1
+                self.disjuntor.falha()
+                raise PrazoExcedido(f"Sem resposta do modelo em {self.prazo_segundos}s")
+            except ErroLLM as e:
+                # Resposta vazia (por exemplo bloqueada por segurança): repetir não adianta
+                self.erros[type(e).__name__] += 1
+                self.disjuntor.sucesso()
+                raise
+            except Exception as e:
+                await self._pausa_antes_de_repetir(e, tentativa, prazo)
+                continue
+            self.disjuntor.sucesso()
+            return texto
+        raise ErroLLM("Tentativas esgotadas")
+
+    # Streaming
+
+    def _produzir_stream(self, prompt: str, entregar, cancelado: threading.Event, fim) -> None:
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                if cancelado.is_set():
+                    break
+                try:
+                    texto = chunk.text
+                except ValueError:
+                    # Pedaço sem texto (apenas metadados, por exemplo de segurança)
+                    continue
+                if texto:
+                    entregar(texto)
+            entregar(fim)
+        except ValueError as e:
+            # Stream sem candidatos ou interrompido por segurança: como uma resposta vazia
+            entregar(ErroLLM(f"Resposta sem texto do modelo: {e}"))
+        except Exception as e:
+            entregar(e)
+
+    async def gerar_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Entrega cada pedaço de texto assim que chega. O cliente síncrono corre numa thread e passa
+        os pedaços ao event loop por uma fila. Só há nova tentativa se a falha ocorrer antes do
+        primeiro pedaço; depois disso o erro é propagado.
+        """
+        self.pedidos += 1
+        prazo = time.monotonic() + self.prazo_segundos
+        loop = asyncio.get_running_loop()
+        for tentativa in range(self.max_tentativas):
+            await self._preparar_tentativa(prompt, prazo)
+            fila: asyncio.Queue = asyncio.Queue()
+            cancelado = threading.Event()
+            fim = object()
+
+            def entregar(item, fila=fila) -> None:
+                try:
+                    loop.call_soon_threadsafe(fila.put_nowait, item)
+                except RuntimeError:
+                    # Event loop já encerrado
+                    pass
+
+            inicio = time.monotonic()
+            loop.run_in_executor(None, self._produzir_stream, prompt, entregar, cancelado, fim)
+            recebeu = False
+            caracteres = 0
+            try:
+                while True:
+                    try:
+                        item = await asyncio.wait_for(fila.get(), prazo - time.monotonic())
+                    except asyncio.TimeoutError:
+                        self.erros["PrazoExcedido"] += 1
+                        self.disjuntor.falha()
+                        raise PrazoExcedido(f"Sem resposta do modelo em {self.prazo_segundos}s")
+                    if item is fim:
+                        if not recebeu:
+                            self.erros["ErroLLM"] += 1
+                            self.disjuntor.sucesso()
+                            raise ErroLLM("Resposta vazia do modelo")
+                        self.latencia.observar(time.monotonic() - inicio)
+                        self._contar_tokens(prompt, caracteres)
+                        self.disjuntor.sucesso()
+                        return
+                    if isinstance(item, Exception):
+                        if recebeu:
+                            self.erros[type(item).__name__] += 1
+                            if erro_transitorio(item):
+                                self.disjuntor.falha()
+                            if isinstance(item, ErroLLM):
+                                raise item
+                            raise ErroLLM(str(item)) from item
+                        if isinstance(item, ErroLLM):
+                            # Falha definitiva (resposta bloqueada, prompt que não está na cassete): repetir não adianta
+                            self.erros[type(item).__name__] += 1
+                            self.disjuntor.sucesso()
+                            raise item
+                        await self._pausa_antes_de_repetir(item, tentativa, prazo)
+                        break
+                    recebeu = True
+                    caracteres += len(item)
+                    yield item
+            finally:
+                # Cliente desligou-se ou houve erro: a thread deixa de consumir o stream
+                cancelado.set()
+        raise ErroLLM("Tentativas esgotadas")
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "pedidos": self.pedidos,
+            "tentativas": self.tentativas,
+            "repeticoes": self.repeticoes,
+            "hedges": self.hedges,
+            "hedges_vencedores": self.hedges_vencedores,
+            "tokens_prompt": self.tokens_prompt,
+            "tokens_resposta": self.tokens_resposta,
+            "erros": dict(self.erros),
+            "disjuntor": self.disjuntor.resumo(),
+            "quota": {"pedidos": self.balde_pedidos.estado(), "tokens": self.balde_tokens.estado()},
+            "latencia_segundos": self.latencia.resumo(),
+            "espera_quota_segundos": self.espera_quota.resumo(),
+        }
@@ -0,0 +1,80 @@
+"""
+Coalescência de pedidos idênticos em curso ("single flight").
+
+Quando um link de golpe se torna viral, muitos utilizadores submetem o mesmo
+URL em segundos. Pedidos com a mesma chave que chegam enquanto o primeiro
+ainda está a ser processado não iniciam novo download nem nova chamada ao
+LLM: aguardam a tarefa já em curso e recebem o mesmo resultado (ou o mesmo
+erro). A chave de um link é o URL canónico, para que variações triviais
+(maiúsculas no host, fragmento, parâmetros de tracking, barra final)
+coincidam.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Parâmetros que não mudam a página (campanhas, cliques de redes sociais)
+PARAMETROS_TRACKING = {"fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src", "si"}
+_PORTAS_PADRAO = {"http": 80, "https": 443}
+
+
+def url_canonica(url: str) -> str:
+    """Forma canónica de um URL para identificar pedidos do mesmo link"""
+    try:
+        partes = urlsplit(url.strip())
+        porta = partes.port
+    except ValueError:
+        return url.strip()
+    if not partes.scheme or not partes.netloc:
+        return url.strip()
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or "").rstrip(".")
+    if porta and porta != _PORTAS_PADRAO.get(esquema):
+        host = f"{host}:{porta}"
+    caminho = partes.path.rstrip("/") or "/"
+    parametros = sorted(
+        (nome, valor) for nome, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not nome.lower().startswith("utm_") and nome.lower() not in PARAMETROS_TRACKING
+    )
+    # O fragmento nunca chega ao servidor
+    return urlunsplit((esquema, host, caminho, urlencode(parametros), ""))
+
+
+class Coalescedor:
+    """Partilha uma única tarefa entre chamadas concorrentes com a mesma chave"""
+
+    def __init__(self):
+        self._em_curso: Dict[str, asyncio.Task] = {}
+        self.executadas = 0
+        self.coalescidas = 0
+
+    async def executar(self, chave: str, funcao: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Executa funcao() ou junta-se à execução em curso para a mesma chave.
+        Retorna (resultado, coalescida).
+        """
+        tarefa = self._em_curso.get(chave)
+        coalescida = tarefa is not None
+        if coalescida:
+            self.coalescidas += 1
+        else:
+            self.executadas += 1
+            tarefa = asyncio.create_task(funcao())
+            self._em_curso[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._terminar(chave, t))
+        # shield: se o cliente que iniciou a tarefa desligar, os restantes continuam a receber o resultado
+        return await asyncio.shield(tarefa), coalescida
+
+    def _terminar(self, chave: str, tarefa: asyncio.Task) -> None:
+        if self._em_curso.get(chave) is tarefa:
+            del self._em_curso[chave]
+        # Marcar a exceção como lida mesmo que todos os clientes tenham desistido
+        if not tarefa.cancelled():
+            tarefa.exception()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "em_curso": len(self._em_curso),
+            "executadas": self.executadas,
+            "coalescidas": self.coalescidas,
+        }
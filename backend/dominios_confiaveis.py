@@ -0,0 +1,179 @@
+"""
+Classificação de domínios confiáveis com uma árvore de sufixos.
+
+Os domínios vêm de dados/dominios_confiaveis.json (versionado) e são
+guardados numa árvore indexada pelas etiquetas do domínio invertidas
+("jobs.linkedin.com" -> com -> linkedin -> jobs). Classificar um host é
+descer a árvore uma etiqueta de cada vez, pelo que custa O(etiquetas) e
+devolve o tipo do domínio na mesma passagem:
+
+- um domínio confiável cobre os seus subdomínios ("mz.indeed.com")
+- a comparação é por etiquetas inteiras: "fakelinkedin.com" ou "rt.com.xyz"
+  não coincidem com "linkedin.com" nem com "rt.com"
+- a árvore conhece os sufixos públicos ("co.mz", "blogspot.com"...): a
+  confiança não atravessa um sufixo público mais profundo do que o domínio
+  confiável, e só sufixos de registo restrito ("gov.mz") podem ser
+  confiáveis por inteiro
+
+O ficheiro é relido sem reiniciar a API quando a data de modificação muda
+(verificada no máximo a cada `intervalo_recarga` segundos).
+
+A mesma árvore dá o domínio registável de um host ("vagas.exemplo.co.mz"
+-> "exemplo.co.mz"), usado para agrupar a reputação dos domínios. Com um
+sufixo fora da lista, o domínio registável é uma aproximação (as duas
+últimas etiquetas: "careers.safaricom.co.ke" -> "co.ke"), e
+`sufixo_conhecido` é False.
+"""
+import ipaddress
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+# Segundos níveis habituais dos ccTLDs ("co.ke", "com.ng"): debaixo de um TLD sem os seus
+# segundos níveis na lista, um destes é provavelmente um sufixo público e não um domínio
+ETIQUETAS_SEGUNDO_NIVEL = {"co", "com", "org", "net", "ac", "edu", "gov", "ed", "adv", "or", "ne", "go", "gob", "mil", "nic"}
+
+FICHEIRO_DOMINIOS = os.getenv(
+    "DOMINIOS_CONFIAVEIS_FICHEIRO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "dominios_confiaveis.json"),
+)
+
+
+class _No:
+    __slots__ = ("filhos", "categoria", "sufixo_publico")
+
+    def __init__(self):
+        self.filhos: Dict[str, "_No"] = {}
+        self.categoria: Optional[str] = None
+        self.sufixo_publico = False
+
+
+class ArvoreDominios:
+    """Árvore de etiquetas invertidas com os domínios confiáveis e os sufixos públicos"""
+
+    def __init__(self, dados: Dict[str, Any]):
+        self.versao = dados.get("versao", 0)
+        self.motivos: Dict[str, str] = {}
+        self.total_dominios = 0
+        self._raiz = _No()
+        for sufixo in dados.get("sufixos_publicos", []):
+            self._no(sufixo).sufixo_publico = True
+        restritos = set(dados.get("sufixos_restritos", []))
+        for categoria, definicao in dados.get("categorias", {}).items():
+            self.motivos[categoria] = definicao.get("motivo", "Domínio confiável conhecido")
+            for dominio in definicao.get("dominios", []):
+                no = self._no(dominio)
+                if no.sufixo_publico and dominio not in restritos:
+                    log.warning("Domínio confiável ignorado: é um sufixo público de registo livre", extra={"dominio": dominio})
+                    continue
+                if no.categoria is None:
+                    self.total_dominios += 1
+                no.categoria = categoria
+
+    def _no(self, dominio: str) -> _No:
+        no = self._raiz
+        for etiqueta in reversed(dominio.strip().lower().rstrip(".").split(".")):
+            no = no.filhos.setdefault(etiqueta, _No())
+        return no
+
+    def classificar(self, host: str) -> Dict[str, Any]:
+        """
+        Retorna {categoria, dominio_confiavel, dominio_registavel, sufixo_conhecido};
+        categoria e dominio_confiavel são None se o host não for confiável.
+        """
+        etiquetas = host.lower().rstrip(".").split(".")
+        no = self._raiz
+        profundidade_confiavel = 0
+        profundidade_sufixo = 0
+        categoria = None
+        for profundidade, etiqueta in enumerate(reversed(etiquetas), start=1):
+            no = no.filhos.get(etiqueta)
+            if no is None:
+                break
+            if no.sufixo_publico:
+                profundidade_sufixo = profundidade
+            if no.categoria is not None:
+                profundidade_confiavel, categoria = profundidade, no.categoria
+        # Um sufixo público abaixo do domínio confiável pertence a outro titular
+        if categoria is not None and profundidade_sufixo > profundidade_confiavel:
+            categoria = None
+        # Etiquetas sem sufixo conhecido: considerar a última como sufixo
+        profundidade_registavel = max(profundidade_sufixo, 1) + 1
+        sufixo_conhecido = profundidade_sufixo > 0 and not (
+            profundidade_sufixo == 1 and len(etiquetas) >= 2 and etiquetas[-2] in ETIQUETAS_SEGUNDO_NIVEL)
+        return {
+            "categoria": categoria,
+            "dominio_confiavel": ".".join(etiquetas[-profundidade_confiavel:]) if categoria else None,
+            "dominio_registavel": ".".join(etiquetas[-profundidade_registavel:]),
+            "sufixo_conhecido": sufixo_conhecido,
+        }
+
+
+class ClassificadorDominios:
+    """Árvore de domínios confiáveis carregada de um ficheiro e recarregada quando este muda"""
+
+    def __init__(self, ficheiro: str = FICHEIRO_DOMINIOS, intervalo_recarga: float = 30):
+        self.ficheiro = ficheiro
+        self.intervalo_recarga = intervalo_recarga
+        self.arvore = ArvoreDominios({})
+        self.recargas = 0
+        self._mtime: Optional[float] = None
+        self._ultima_verificacao = 0.0
+        self.recarregar()
+
+    def recarregar(self) -> bool:
+        """Lê o ficheiro se mudou desde a última leitura; um ficheiro inválido mantém a árvore atual"""
+        self._ultima_verificacao = time.monotonic()
+        try:
+            mtime = os.path.getmtime(self.ficheiro)
+            if mtime == self._mtime:
+                return False
+            with open(self.ficheiro, encoding="utf-8") as f:
+                arvore = ArvoreDominios(json.load(f))
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            log.error("Erro ao carregar domínios confiáveis", extra={"ficheiro": self.ficheiro, "erro": str(e)})
+            return False
+        # Troca atómica: pedidos em curso continuam com a árvore anterior
+        self.arvore = arvore
+        self._mtime = mtime
+        self.recargas += 1
+        log.info("Domínios confiáveis carregados", extra={"versao": arvore.versao, "dominios": arvore.total_dominios})
+        return True
+
+    def classificar(self, host: str) -> Dict[str, Any]:
+        if time.monotonic() - self._ultima_verificacao >= self.intervalo_recarga:
+            self.recarregar()
+        arvore = self.arvore
+        classificacao = arvore.classificar(host)
+        classificacao["motivo"] = arvore.motivos.get(classificacao["categoria"])
+        classificacao["versao"] = arvore.versao
+        return classificacao
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "versao": self.arvore.versao,
+            "dominios": self.arvore.total_dominios,
+            "recargas": self.recargas,
+            "ficheiro": self.ficheiro,
+        }
+
+
+# Instância partilhada pela API e pelas estatísticas (main.py ajusta o intervalo de recarga)
+classificador = ClassificadorDominios()
+
+
+def dominio_registavel(host: Optional[str]) -> Optional[str]:
+    """Domínio registável do host segundo os sufixos públicos; None para endereços IP e hosts locais"""
+    if not host or "." not in host:
+        return None
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return None
+    except ValueError:
+        pass
+    return classificador.classificar(host)["dominio_registavel"]
+
@@ -0,0 +1,130 @@
+"""
+Canonicalização de nomes de empresas.
+
+O modelo escreve a mesma empresa de muitas formas ("GlobalTech Solutions",
+"Globaltech Solutions Lda", "GLOBALTECH SOLUTIONS, S.A.") e usa frases
+variadas quando não a identifica ("Não especificada", "Empresa anónima",
+"Agência de Recrutamento (Nome não especificado)"). Para agrupar vagas por
+empresa, cada nome é reduzido a uma chave estável:
+
+1. sem acentos, minúsculas, pontuação trocada por espaços
+2. sem sufixos societários no fim (Lda, S.A., Ltd, Inc, ...); os que também
+   são palavras comuns (Co, SA, Spa, EP, EI) só saem depois de pontuação
+   ("Trading, Co", "Hotel - SpA"), para não cortar "Beleza Spa"
+3. placeholders de empresa desconhecida dão None
+4. a tabela de aliases (dados/empresas_aliases.json) junta variantes
+   conhecidas, siglas incluídas, na chave do nome principal
+
+A tabela tem uma versão: ao alterá-la, incrementa-se `versao` e a migração
+da coleção vagas recalcula as chaves gravadas (ver indices_vagas.py).
+"""
+import json
+import logging
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+FICHEIRO_ALIASES = os.getenv(
+    "EMPRESAS_ALIASES_FICHEIRO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "empresas_aliases.json"),
+)
+
+# Sufixos societários, já normalizados ("S.A." -> "s a"); retirados do fim do nome
+SUFIXOS_LEGAIS: List[Tuple[str, ...]] = [tuple(sufixo.split()) for sufixo in [
+    "lda", "ltda", "limitada", "ltd", "limited", "unipessoal", "unipessoal lda", "s a", "sa", "s a r l", "sarl",
+    "e i", "ei", "e p", "ep", "srl", "sas", "spa", "inc", "incorporated", "corp", "corporation", "co", "llc",
+    "llp", "plc", "gmbh", "bv", "nv", "pty", "pty ltd",
+]]
+# Sufixos com mais palavras primeiro ("pty ltd" antes de "ltd")
+SUFIXOS_LEGAIS.sort(key=len, reverse=True)
+# Sufixos de uma palavra que também terminam nomes ("Beleza Spa", "Trading Co"): só retirados
+# quando separados do nome por pontuação (", SA", "- Spa")
+SUFIXOS_AMBIGUOS = {("co",), ("sa",), ("spa",), ("ep",), ("ei",)}
+
+# Nomes que o modelo escreve quando a empresa não é identificada (já normalizados)
+_EMPRESA_DESCONHECIDA = re.compile(
+    r"^(?:n a|n d|nd|nenhuma?|desconhecid[oa]|confidencial|anonim[oa]|sem nome|particular|diversas|varias|"
+    r"(?:empresa|agencia|cliente|entidade|recrutador)(?: de recrutamento)? "
+    r"(?:anonim[oa]|confidencial|privad[oa]|particular|desconhecid[oa])|"
+    r".*\bnao (?:especificad[oa]|informad[oa]|identificad[oa]|mencionad[oa]|divulgad[oa]|disponivel|aplicavel)\b.*)$"
+)
+_PALAVRA = re.compile(r"[^\W_]+")
+
+
+def _sem_acentos(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+def normalizar_nome(nome: Optional[str]) -> Optional[str]:
+    """Sem acentos, minúsculas, pontuação e sufixos societários; None para placeholders"""
+    if not nome:
+        return None
+    texto = _sem_acentos(nome).casefold()
+    palavras: List[str] = []
+    # Texto entre cada palavra e a anterior, para saber se um sufixo ambíguo vem depois de pontuação
+    separadores: List[str] = []
+    fim = 0
+    for palavra in _PALAVRA.finditer(texto):
+        separadores.append(texto[fim:palavra.start()])
+        palavras.append(palavra.group())
+        fim = palavra.end()
+    if not palavras or _EMPRESA_DESCONHECIDA.match(" ".join(palavras)):
+        return None
+    retirou = True
+    while retirou:
+        retirou = False
+        for sufixo in SUFIXOS_LEGAIS:
+            # Nunca retirar o nome inteiro ("SA" sozinho continua a ser um nome)
+            if len(palavras) > len(sufixo) and tuple(palavras[-len(sufixo):]) == sufixo:
+                if sufixo in SUFIXOS_AMBIGUOS and not separadores[-len(sufixo)].strip():
+                    continue
+                palavras, separadores = palavras[:-len(sufixo)], separadores[:-len(sufixo)]
+                retirou = True
+                break
+    return " ".join(palavras)
+
+
+class CanonicalizadorEmpresas:
+    """Chave estável de uma empresa a partir do nome, com a tabela de aliases"""
+
+    def __init__(self, aliases: Dict[str, Any]):
+        self.versao = aliases.get("versao", 0)
+        self._chaves: Dict[str, str] = {}
+        self._nomes: Dict[str, str] = {}
+        for empresa in aliases.get("empresas", []):
+            chave = normalizar_nome(empresa["nome"])
+            if not chave:
+                continue
+            self._nomes[chave] = empresa["nome"]
+            for variante in empresa.get("variantes", []):
+                forma = normalizar_nome(variante)
+                if forma and forma != chave:
+                    self._chaves[forma] = chave
+                    self._chaves.setdefault(forma.replace(" ", ""), chave)
+            # Nomes escritos sem espaços ("Global Tech" e "GlobalTech") coincidem
+            self._chaves.setdefault(chave.replace(" ", ""), chave)
+
+    @classmethod
+    def carregar(cls, ficheiro: str = FICHEIRO_ALIASES) -> "CanonicalizadorEmpresas":
+        try:
+            with open(ficheiro, encoding="utf-8") as f:
+                return cls(json.load(f))
+        except (OSError, ValueError) as e:
+            log.warning("Tabela de aliases de empresas indisponível", extra={"ficheiro": ficheiro, "erro": str(e)})
+            return cls({})
+
+    def chave(self, nome: Optional[str]) -> Optional[str]:
+        forma = normalizar_nome(nome)
+        if not forma:
+            return None
+        return self._chaves.get(forma) or self._chaves.get(forma.replace(" ", "")) or forma
+
+    def nome_exibicao(self, chave: str) -> Optional[str]:
+        """Nome principal da tabela de aliases, se a empresa lá estiver"""
+        return self._nomes.get(chave)
+
+
+canonicalizador = CanonicalizadorEmpresas.carregar()
@@ -0,0 +1,337 @@
+"""
+Estatísticas materializadas da coleção `vagas` para o painel de dados.
+
+Cada vaga gravada incrementa atomicamente ($inc com upsert) um pequeno
+conjunto de contadores na coleção `vagas_estatisticas`:
+
+- `global`: total de vagas, vagas de alto risco e total por nível
+- `empresa:<empresa_chave>`: vagas e vagas de alto risco da empresa, com o
+  nome principal da tabela de aliases (ou o da primeira vaga)
+- `dominio:<dominio>`: o mesmo por domínio (análises por texto contam em
+  "Análise por texto")
+- `dia:<AAAA-MM-DD>`: o mesmo por dia de análise, com total por nível
+- `reputacao:<dominio registável>`: vagas, vagas de alto risco, soma das
+  pontuações e datas da primeira e da última análise ($min/$max) dos links
+  de cada domínio registável, lidas pela reputação dos domínios
+  (reputacao_dominios.py); as vagas decididas pela própria reputação não
+  contam, para o domínio não se confirmar a si mesmo, nem as que reutilizam
+  o veredicto de uma vaga quase idêntica (`vaga_original`), para um golpe
+  repetido com pequenas edições não pesar várias vezes
+
+/vagas/stats, /vagas/top-empresas-risco e /vagas/top-dominios-risco leem
+estes documentos em vez de contar ou agrupar a coleção inteira.
+
+`reconstruir()` recalcula tudo a partir das vagas gravadas e substitui a
+coleção de uma só vez; `verificar()` compara os contadores com a agregação
+sobre as vagas. Vários workers podem pedir a reconstrução ao arrancar: um
+bloqueio com prazo (documento em `<coleção>_bloqueio`, obtido com
+find_one_and_update) garante que só um processo reconstrói de cada vez, e
+cada reconstrução escreve numa coleção temporária com nome próprio. Ambos
+podem ser executados diretamente:
+
+    python estatisticas_vagas.py reconstruir
+    python estatisticas_vagas.py verificar
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from dominios_confiaveis import classificador as classificador_dominios, dominio_registavel
+from empresas_canonicas import canonicalizador
+from indices_vagas import (DOMINIOS_IGNORADOS, NIVEIS_RISCO_ALTO, ROTULO_ANALISE_TEXTO, TOP_N, VERSAO_DERIVADOS,
+                           campos_derivados, pipeline_top_dominios, pipeline_top_empresas)
+
+log = logging.getLogger(__name__)
+
+ID_GLOBAL = "global"
+PREFIXO_REPUTACAO = "reputacao:"
+NIVEIS_RISCO = ("BAIXO", "MEDIO", "ALTO", "CRITICO")
+ID_BLOQUEIO = "reconstrucao"
+# Prazo do bloqueio: se o processo morrer a meio, outro pode reconstruir depois disto
+VALIDADE_BLOQUEIO_SEGUNDOS = 600
+
+# Rankings: os documentos de um tipo ordenados por vagas de alto risco
+INDICES_ESTATISTICAS = [
+    ([("tipo", 1), ("alto_risco", -1), ("chave", 1)], "tipo_alto_risco_chave"),
+]
+
+
+def incrementos(vaga: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Para cada documento de estatísticas afetado pela vaga: {_id: {"$inc": ..., "$setOnInsert": ...}}"""
+    derivados = campos_derivados(vaga)
+    nivel = vaga.get("nivel_risco")
+    alto_risco = 1 if derivados["risco_alto"] else 0
+    contagem = {"total_vagas": 1, "alto_risco": alto_risco}
+    por_nivel = {f"por_nivel.{nivel}": 1} if nivel else {}
+
+    atualizacoes = {ID_GLOBAL: {"$inc": {**contagem, **por_nivel}}}
+    chave_empresa = derivados["empresa_chave"]
+    if chave_empresa:
+        nome = canonicalizador.nome_exibicao(chave_empresa) or vaga.get("empresa")
+        atualizacoes[f"empresa:{chave_empresa}"] = {
+            "$inc": contagem,
+            "$setOnInsert": {"tipo": "empresa", "chave": chave_empresa, "empresa": nome},
+        }
+    dominio = derivados["dominio"] or ROTULO_ANALISE_TEXTO
+    atualizacoes[f"dominio:{dominio}"] = {
+        "$inc": contagem,
+        "$setOnInsert": {"tipo": "dominio", "chave": dominio},
+    }
+    data_analise = vaga.get("data_analise")
+    if data_analise:
+        dia = data_analise.date().isoformat()
+        atualizacoes[f"dia:{dia}"] = {
+            "$inc": {**contagem, **por_nivel},
+            "$setOnInsert": {"tipo": "dia", "chave": dia},
+        }
+    registavel = dominio_registavel(derivados["dominio"])
+    if (registavel and registavel not in DOMINIOS_IGNORADOS
+            and not vaga.get("atalho_reputacao") and not vaga.get("vaga_original")):
+        pontuacao = vaga.get("pontuacao_risco")
+        reputacao: Dict[str, Any] = {
+            "$inc": {**contagem, "soma_pontuacao": pontuacao or 0, "com_pontuacao": 0 if pontuacao is None else 1},
+            "$setOnInsert": {"tipo": "reputacao", "chave": registavel},
+        }
+        if data_analise:
+            reputacao["$min"] = {"primeira_analise": data_analise}
+            reputacao["$max"] = {"ultima_analise": data_analise}
+        atualizacoes[f"{PREFIXO_REPUTACAO}{registavel}"] = reputacao
+    return atualizacoes
+
+
+def _somar(atualizacoes: Dict[str, Dict[str, Any]], vaga: Dict[str, Any]) -> None:
+    """Junta os incrementos de uma vaga aos já acumulados (uma atualização por documento num lote)"""
+    for id_doc, atualizacao in incrementos(vaga).items():
+        acumulada = atualizacoes.setdefault(id_doc, {"$inc": defaultdict(int)})
+        for campo, valor in atualizacao["$inc"].items():
+            acumulada["$inc"][campo] += valor
+        if "$setOnInsert" in atualizacao:
+            acumulada.setdefault("$setOnInsert", atualizacao["$setOnInsert"])
+        for operador, escolher in (("$min", min), ("$max", max)):
+            for campo, valor in atualizacao.get(operador, {}).items():
+                atuais = acumulada.setdefault(operador, {})
+                atuais[campo] = escolher(atuais[campo], valor) if campo in atuais else valor
+
+
+async def registrar(collection, vagas: List[Dict[str, Any]]) -> None:
+    """Incrementa os contadores com as vagas acabadas de gravar"""
+    from pymongo import UpdateOne
+
+    atualizacoes: Dict[str, Dict[str, Any]] = {}
+    for vaga in vagas:
+        _somar(atualizacoes, vaga)
+    if not atualizacoes:
+        return
+    await collection.bulk_write(
+        [UpdateOne({"_id": id_doc}, {operador: dict(valores) for operador, valores in atualizacao.items()}, upsert=True)
+         for id_doc, atualizacao in atualizacoes.items()],
+        ordered=False,
+    )
+
+
+async def obter_resumo(collection) -> Dict[str, int]:
+    doc = await collection.find_one({"_id": ID_GLOBAL}) or {}
+    return {"total_vagas": doc.get("total_vagas", 0), "alto_risco": doc.get("alto_risco", 0)}
+
+
+async def obter_top_empresas(collection, limite: int = TOP_N) -> List[Dict[str, Any]]:
+    cursor = (collection.find({"tipo": "empresa", "alto_risco": {"$gt": 0}}, {"_id": 0, "empresa": 1, "alto_risco": 1})
+              .sort([("alto_risco", -1), ("chave", 1)]).limit(limite))
+    return [{"empresa": doc["empresa"], "total_vagas_alto_risco": doc["alto_risco"]} async for doc in cursor]
+
+
+async def obter_top_dominios(collection, limite: int = TOP_N) -> List[Dict[str, Any]]:
+    filtro = {"tipo": "dominio", "alto_risco": {"$gt": 0}, "chave": {"$nin": DOMINIOS_IGNORADOS}}
+    cursor = (collection.find(filtro, {"_id": 0, "chave": 1, "alto_risco": 1})
+              .sort([("alto_risco", -1), ("chave", 1)]).limit(limite))
+    return [{"dominio": doc["chave"], "total_vagas_alto_risco": doc["alto_risco"]} async for doc in cursor]
+
+
+async def criar_indices(collection) -> None:
+    for chaves, nome in INDICES_ESTATISTICAS:
+        await collection.create_index(chaves, name=nome)
+
+
+@asynccontextmanager
+async def _bloqueio_reconstrucao(collection) -> AsyncIterator[bool]:
+    """True se este processo ficou com o bloqueio da reconstrução; libertado à saída"""
+    from pymongo.errors import DuplicateKeyError
+
+    bloqueios = collection.database[f"{collection.name}_bloqueio"]
+    dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    agora = datetime.utcnow()
+    try:
+        # Só encontra o documento se o bloqueio anterior expirou; se estiver ativo, o upsert
+        # tenta inserir o mesmo _id e falha
+        await bloqueios.find_one_and_update(
+            {"_id": ID_BLOQUEIO, "expira_em": {"$lt": agora}},
+            {"$set": {"dono": dono, "expira_em": agora + timedelta(seconds=VALIDADE_BLOQUEIO_SEGUNDOS)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        await bloqueios.delete_one({"_id": ID_BLOQUEIO, "dono": dono})
+
+
+async def _atualizadas(collection) -> bool:
+    """Se as estatísticas existem e foram calculadas com as versões atuais das chaves"""
+    global_doc = await collection.find_one({"_id": ID_GLOBAL}, {"versao_derivados": 1, "versao_dominios": 1})
+    return bool(global_doc and global_doc.get("versao_derivados") == VERSAO_DERIVADOS
+                and global_doc.get("versao_dominios") == classificador_dominios.arvore.versao)
+
+
+async def reconstruir(vagas_collection, collection, tamanho_lote: int = 1000,
+                      so_se_desatualizadas: bool = False) -> Optional[int]:
+    """
+    Recalcula todas as estatísticas a partir das vagas gravadas; retorna o número de vagas, ou
+    None se outro processo estiver a reconstruir (ou, com so_se_desatualizadas, se já não for
+    preciso quando o bloqueio é obtido).
+
+    Os documentos são escritos numa coleção temporária que substitui a atual
+    com um único rename, para que os endpoints nunca vejam contadores a meio.
+    Vagas gravadas durante a reconstrução podem ficar de fora; corre-se de
+    novo ou aceita-se a diferença até à próxima reconstrução.
+    """
+    async with _bloqueio_reconstrucao(collection) as obtido:
+        if not obtido:
+            log.info("Estatísticas das vagas já em reconstrução noutro processo")
+            return None
+        # Outro worker pode ter terminado a reconstrução entre a verificação e o bloqueio
+        if so_se_desatualizadas and await _atualizadas(collection):
+            return None
+        return await _reconstruir(vagas_collection, collection, tamanho_lote)
+
+
+async def _reconstruir(vagas_collection, collection, tamanho_lote: int) -> int:
+    from pymongo import InsertOne
+
+    atualizacoes: Dict[str, Dict[str, Any]] = {}
+    total = 0
+    projecao = {"url_vaga": 1, "empresa": 1, "nivel_risco": 1, "pontuacao_risco": 1, "data_analise": 1,
+                "atalho_reputacao": 1, "vaga_original": 1}
+    async for vaga in vagas_collection.find({}, projecao, batch_size=tamanho_lote):
+        _somar(atualizacoes, vaga)
+        total += 1
+    # O documento global existe mesmo sem vagas, para garantir() não reconstruir a cada arranque,
+    # e guarda a versão das chaves de empresa e domínio e dos sufixos públicos usados
+    atualizacoes.setdefault(ID_GLOBAL, {"$inc": {"total_vagas": 0, "alto_risco": 0}})
+    atualizacoes[ID_GLOBAL]["$setOnInsert"] = {"versao_derivados": VERSAO_DERIVADOS,
+                                               "versao_dominios": classificador_dominios.arvore.versao}
+
+    temporaria = collection.database[f"{collection.name}_reconstrucao_{uuid.uuid4().hex[:12]}"]
+    documentos = [{"_id": id_doc, **atualizacao.get("$setOnInsert", {}), **atualizacao.get("$min", {}),
+                   **atualizacao.get("$max", {}), **_expandir(atualizacao["$inc"])}
+                  for id_doc, atualizacao in atualizacoes.items()]
+    try:
+        for inicio in range(0, len(documentos), tamanho_lote):
+            await temporaria.bulk_write([InsertOne(doc) for doc in documentos[inicio:inicio + tamanho_lote]],
+                                        ordered=False)
+        await criar_indices(temporaria)
+        await temporaria.rename(collection.name, dropTarget=True)
+    except BaseException:
+        await temporaria.drop()
+        raise
+    log.info("Estatísticas das vagas reconstruídas", extra={"vagas": total, "documentos": len(documentos)})
+    return total
+
+
+def _expandir(contadores: Dict[str, int]) -> Dict[str, Any]:
+    """{"por_nivel.ALTO": 2} -> {"por_nivel": {"ALTO": 2}}"""
+    documento: Dict[str, Any] = {}
+    for campo, valor in contadores.items():
+        if "." in campo:
+            pai, filho = campo.split(".", 1)
+            documento.setdefault(pai, {})[filho] = valor
+        else:
+            documento[campo] = valor
+    return documento
+
+
+async def verificar(vagas_collection, collection) -> List[str]:
+    """Compara os contadores materializados com a agregação sobre as vagas; retorna as diferenças"""
+    diferencas = []
+
+    def comparar(nome: str, materializado: Any, agregado: Any) -> None:
+        if materializado != agregado:
+            diferencas.append(f"{nome}: materializado {materializado} != agregação {agregado}")
+
+    resumo = await obter_resumo(collection)
+    comparar("total_vagas", resumo["total_vagas"], await vagas_collection.count_documents({}))
+    comparar("alto_risco", resumo["alto_risco"],
+             await vagas_collection.count_documents({"nivel_risco": {"$in": list(NIVEIS_RISCO_ALTO)}}))
+    global_doc = await collection.find_one({"_id": ID_GLOBAL}) or {}
+    for nivel in NIVEIS_RISCO:
+        comparar(f"por_nivel.{nivel}", global_doc.get("por_nivel", {}).get(nivel, 0),
+                 await vagas_collection.count_documents({"nivel_risco": nivel}))
+
+    # Rankings: as contagens têm de coincidir (empates podem trocar a ordem dos nomes)
+    empresas = await obter_top_empresas(collection)
+    empresas_agregadas = await vagas_collection.aggregate(pipeline_top_empresas()).to_list(None)
+    comparar("top empresas", [e["total_vagas_alto_risco"] for e in empresas],
+             [e["total_vagas_alto_risco"] for e in empresas_agregadas])
+    dominios = await obter_top_dominios(collection)
+    dominios_agregados = await vagas_collection.aggregate(pipeline_top_dominios()).to_list(None)
+    comparar("top domínios", {d["dominio"]: d["total_vagas_alto_risco"] for d in dominios},
+             {d["dominio"]: d["total_vagas_alto_risco"] for d in dominios_agregados})
+
+    # Reputação: contagens por host (índice risco_alto_dominio) somadas por domínio registável
+    reputacao_agregada: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    pipeline = [
+        {"$match": {"dominio": {"$ne": None}, "atalho_reputacao": {"$ne": True}, "vaga_original": None}},
+        {"$group": {"_id": {"dominio": "$dominio", "risco_alto": "$risco_alto"}, "vagas": {"$sum": 1}}},
+    ]
+    async for grupo in vagas_collection.aggregate(pipeline):
+        registavel = dominio_registavel(grupo["_id"]["dominio"])
+        if registavel and registavel not in DOMINIOS_IGNORADOS:
+            reputacao_agregada[registavel][0] += grupo["vagas"]
+            reputacao_agregada[registavel][1] += grupo["vagas"] if grupo["_id"]["risco_alto"] else 0
+    reputacao = {doc["chave"]: [doc["total_vagas"], doc["alto_risco"]]
+                 async for doc in collection.find({"tipo": "reputacao"}, {"chave": 1, "total_vagas": 1, "alto_risco": 1})}
+    comparar("reputação dos domínios", reputacao, dict(reputacao_agregada))
+    return diferencas
+
+
+async def garantir(vagas_collection, collection) -> Optional[int]:
+    """No arranque: cria os índices e reconstrói as estatísticas se não existirem ou forem de outra versão"""
+    await criar_indices(collection)
+    if await _atualizadas(collection):
+        return None
+    return await reconstruir(vagas_collection, collection, so_se_desatualizadas=True)
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from logs_estruturados import configurar_logs
+
+    async def principal(comando: str) -> int:
+        load_dotenv()
+        configurar_logs(formato="texto")
+        db = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017")).humai_verify
+        if comando == "reconstruir" and await reconstruir(db.vagas, db.vagas_estatisticas) is None:
+            print("Reconstrução em curso noutro processo; a verificar as estatísticas atuais")
+        diferencas = await verificar(db.vagas, db.vagas_estatisticas)
+        for diferenca in diferencas:
+            print(f"❌ {diferenca}")
+        if not diferencas:
+            print("✅ Estatísticas materializadas iguais à agregação sobre as vagas")
+        return 1 if diferencas else 0
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else "verificar"
+    if comando not in ("reconstruir", "verificar"):
+        sys.exit("Uso: python estatisticas_vagas.py [reconstruir|verificar]")
+    sys.exit(asyncio.run(principal(comando)))
@@ -0,0 +1,262 @@
+"""
+Extração de texto de páginas de vagas sem construir a árvore DOM.
+
+Um tokenizador por eventos (html.parser.HTMLParser) percorre o HTML uma só
+vez, ignora script/style/iframe/svg e separa o texto em três partes, por
+ordem de relevância para a análise:
+
+1. dados estruturados JSON-LD do tipo JobPosting
+2. texto dentro de <main>/<article>
+3. restante texto do <body>
+
+Navegação, rodapés, barras laterais, avisos de cookies, botões de partilha e
+listas de vagas relacionadas (por tag ou por class/id) são descartados, e os
+blocos do documento ficam separados por uma linha em branco.
+"""
+import html
+import json
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+TIPOS_HTML = ("text/html", "application/xhtml+xml", "text/plain")
+
+_IGNORAR = {"script", "style", "noscript", "iframe", "svg", "template", "object"}
+_PRINCIPAL = {"main", "article"}
+_BOILERPLATE = {"nav", "footer", "aside", "form"}
+# Prefixos de class/id que marcam elementos de boilerplate
+_BOILERPLATE_CLASSES = (
+    "nav", "menu", "footer", "rodape", "sidebar", "breadcrumb", "cookie", "consent", "gdpr", "newsletter",
+    "share", "partilh", "social", "related", "relacionad", "similar", "banner", "publicidade", "advert",
+)
+_BLOCOS = {
+    "p", "div", "section", "article", "main", "header", "footer", "nav", "aside", "ul", "ol", "dl", "table",
+    "form", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+_TITULOS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_VAZIAS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_SEPARADOR_CLASSES = re.compile(r"[\s_-]+")
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+_TAGS = re.compile(r"<[^>]+>")
+_TAGS_BLOCO = re.compile(r"</?(?:p|div|br|li|ul|ol|h[1-6]|tr|table|section)\b[^>]*>", re.IGNORECASE)
+_ESPACOS = re.compile(r"[ \t\r\f\v]+")
+
+
+class ConteudoNaoSuportado(Exception):
+    """A URL não devolveu HTML (PDF, imagem, binário...)"""
+
+
+def tipo_aceitavel(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return True
+    return content_type.split(";")[0].strip().lower() in TIPOS_HTML
+
+
+def decodificar(corpo: bytes, charset: Optional[str] = None) -> str:
+    """Decodifica o HTML usando o charset do cabeçalho, da <meta> ou UTF-8"""
+    if not charset:
+        encontrado = _META_CHARSET.search(corpo[:4096])
+        charset = encontrado.group(1).decode("ascii") if encontrado else "utf-8"
+    try:
+        return corpo.decode(charset, errors="replace")
+    except LookupError:
+        return corpo.decode("utf-8", errors="replace")
+
+
+class ExtratorHTML(HTMLParser):
+    """Tokenizador que recolhe título, JSON-LD e texto visível numa única passagem"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.titulo: List[str] = []
+        self.principal: List[str] = []
+        self.resto: List[str] = []
+        self.json_ld: List[str] = []
+        self._ignorar = 0
+        self._profundidade_principal = 0
+        self._no_titulo = False
+        self._no_head = False
+        self._json_ld_atual: Optional[List[str]] = None
+        # Elemento de boilerplate aberto: [tag, profundidade de tags iguais aninhadas]
+        self._boilerplate: Optional[List] = None
+        self._depois_de_titulo = False
+
+    def _e_boilerplate(self, tag: str, atributos: Dict[str, Optional[str]]) -> bool:
+        if tag in _BOILERPLATE:
+            return True
+        if tag == "header" and not self._profundidade_principal:
+            return True
+        nomes = f"{atributos.get('class') or ''} {atributos.get('id') or ''}".lower()
+        return any(nome.startswith(_BOILERPLATE_CLASSES) for nome in _SEPARADOR_CLASSES.split(nomes) if nome)
+
+    def _quebrar_bloco(self) -> None:
+        # Um título fica no mesmo bloco que o conteúdo que o segue
+        if self._depois_de_titulo:
+            return
+        destino = self.principal if self._profundidade_principal else self.resto
+        if destino and destino[-1]:
+            destino.append("")
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in _VAZIAS:
+            return
+        if self._boilerplate is not None:
+            if tag == self._boilerplate[0]:
+                self._boilerplate[1] += 1
+            return
+        atributos = dict(attrs)
+        if tag == "script":
+            tipo = atributos.get("type") or ""
+            if tipo.lower() == "application/ld+json":
+                self._json_ld_atual = []
+        if not self._no_head and tag not in _IGNORAR and self._e_boilerplate(tag, atributos):
+            self._boilerplate = [tag, 1]
+            return
+        if tag in _BLOCOS and not self._ignorar:
+            self._quebrar_bloco()
+        if tag in _IGNORAR:
+            self._ignorar += 1
+        elif tag in _PRINCIPAL:
+            self._profundidade_principal += 1
+        elif tag == "title":
+            self._no_titulo = True
+        elif tag == "head":
+            self._no_head = True
+        elif tag == "body":
+            self._no_head = False
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._boilerplate is not None:
+            if tag == self._boilerplate[0]:
+                self._boilerplate[1] -= 1
+                if not self._boilerplate[1]:
+                    self._boilerplate = None
+            return
+        if tag in _TITULOS:
+            self._depois_de_titulo = True
+        elif tag in _BLOCOS and not self._ignorar:
+            self._quebrar_bloco()
+        if tag in _IGNORAR:
+            if self._ignorar:
+                self._ignorar -= 1
+            if tag == "script" and self._json_ld_atual is not None:
+                self.json_ld.append("".join(self._json_ld_atual))
+                self._json_ld_atual = None
+        elif tag in _PRINCIPAL:
+            if self._profundidade_principal:
+                self._profundidade_principal -= 1
+        elif tag == "title":
+            self._no_titulo = False
+        elif tag == "head":
+            self._no_head = False
+
+    def handle_data(self, data: str) -> None:
+        if self._json_ld_atual is not None:
+            self._json_ld_atual.append(data)
+            return
+        if self._no_titulo:
+            self.titulo.append(data)
+            return
+        if self._ignorar or self._no_head or self._boilerplate is not None:
+            return
+        texto = data.strip()
+        if not texto:
+            return
+        if self._profundidade_principal:
+            self.principal.append(texto)
+        else:
+            self.resto.append(texto)
+        self._depois_de_titulo = False
+
+
+def _texto_html(valor: str) -> str:
+    # Descrições JSON-LD trazem HTML, às vezes já escapado (&lt;p&gt;)
+    valor = _TAGS.sub("", _TAGS_BLOCO.sub("\n", html.unescape(valor)))
+    linhas = (_ESPACOS.sub(" ", linha).strip() for linha in html.unescape(valor).split("\n"))
+    return "\n".join(linha for linha in linhas if linha)
+
+
+def _nome(valor: Any) -> Optional[str]:
+    if isinstance(valor, dict):
+        return valor.get("name")
+    if isinstance(valor, list):
+        nomes = [_nome(v) for v in valor]
+        return ", ".join(n for n in nomes if n) or None
+    return str(valor) if valor else None
+
+
+def _localizacao(valor: Any) -> Optional[str]:
+    if isinstance(valor, list):
+        locais = [_localizacao(v) for v in valor]
+        return "; ".join(l for l in locais if l) or None
+    if isinstance(valor, dict):
+        endereco = valor.get("address", valor)
+        if isinstance(endereco, dict):
+            partes = [endereco.get(c) for c in ("streetAddress", "addressLocality", "addressRegion", "addressCountry")]
+            return ", ".join(_nome(p) for p in partes if p) or None
+        return _nome(endereco)
+    return str(valor) if valor else None
+
+
+def _salario(valor: Any) -> Optional[str]:
+    if not isinstance(valor, dict):
+        return str(valor) if valor else None
+    moeda = valor.get("currency", "")
+    quantia = valor.get("value", {})
+    if isinstance(quantia, dict):
+        minimo, maximo = quantia.get("minValue"), quantia.get("maxValue")
+        valor_unico = quantia.get("value")
+        unidade = quantia.get("unitText", "")
+        faixa = f"{minimo} - {maximo}" if minimo and maximo else (valor_unico or minimo or maximo)
+        return " ".join(str(p) for p in (faixa, moeda, unidade) if p) or None
+    return f"{quantia} {moeda}".strip() or None
+
+
+def _job_postings(dados: Any) -> List[Dict[str, Any]]:
+    if isinstance(dados, list):
+        return [p for item in dados for p in _job_postings(item)]
+    if not isinstance(dados, dict):
+        return []
+    if "@graph" in dados:
+        return _job_postings(dados["@graph"])
+    tipo = dados.get("@type")
+    tipos = tipo if isinstance(tipo, list) else [tipo]
+    return [dados] if "JobPosting" in tipos else []
+
+
+def texto_job_posting(blocos_json_ld: List[str]) -> str:
+    """Converte anúncios JSON-LD JobPosting em texto legível"""
+    linhas = []
+    for bloco in blocos_json_ld:
+        try:
+            dados = json.loads(bloco)
+        except (ValueError, TypeError):
+            continue
+        for vaga in _job_postings(dados):
+            campos = [
+                ("Título", vaga.get("title")),
+                ("Empresa", _nome(vaga.get("hiringOrganization"))),
+                ("Localização", _localizacao(vaga.get("jobLocation"))),
+                ("Tipo de contrato", _nome(vaga.get("employmentType"))),
+                ("Salário", _salario(vaga.get("baseSalary"))),
+                ("Data de publicação", vaga.get("datePosted")),
+                ("Válido até", vaga.get("validThrough")),
+                ("Descrição", _texto_html(vaga["description"]) if isinstance(vaga.get("description"), str) else None),
+            ]
+            linhas.extend(f"{rotulo}: {valor}" for rotulo, valor in campos if valor)
+    return "\n".join(linhas)
+
+
+def extrair_pagina(documento: str) -> Tuple[str, str]:
+    """Retorna (título, texto) com o conteúdo da vaga em primeiro lugar"""
+    extrator = ExtratorHTML()
+    extrator.feed(documento)
+    extrator.close()
+
+    titulo = " ".join("".join(extrator.titulo).split()) or "No title found"
+    partes = [
+        texto_job_posting(extrator.json_ld),
+        "\n".join(extrator.principal).strip(),
+        "\n".join(extrator.resto).strip(),
+    ]
+    return titulo, "\n\n".join(p for p in partes if p)
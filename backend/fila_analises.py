@@ -0,0 +1,249 @@
+"""
+Fila de análises assíncronas com pool de workers.
+
+Submeter uma análise devolve logo um ID de job; um pool de workers asyncio
+executa a análise em segundo plano. O estado de cada job fica no MongoDB,
+por isso sobrevive a reinícios: no arranque, jobs pendentes (ou em execução
+há mais tempo do que o limite, isto é, interrompidos) voltam para a fila, e
+a mesma recuperação repete-se a cada timeout_job_segundos para retomar jobs
+abandonados por outro processo que morreu enquanto este continuava ativo.
+A reivindicação de um job é atómica (find_one_and_update), o que permite
+vários processos uvicorn partilharem a mesma coleção sem executar o mesmo
+job duas vezes.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+log = logging.getLogger(__name__)
+
+PENDENTE = "PENDENTE"
+EM_EXECUCAO = "EM_EXECUCAO"
+CONCLUIDO = "CONCLUIDO"
+ERRO = "ERRO"
+ESTADOS_FINAIS = (CONCLUIDO, ERRO)
+
+Executor = Callable[[Dict[str, Any], Callable[[str], Awaitable[None]]], Awaitable[Dict[str, Any]]]
+
+
+class ErroJob(Exception):
+    """Erro esperado de um job (entrada inválida, etc.), guardado sem traceback"""
+
+
+class _Amostras:
+    """Janela das últimas durações para médias e percentis"""
+
+    def __init__(self, tamanho: int = 1000):
+        self._valores: Deque[float] = deque(maxlen=tamanho)
+        self.total = 0
+
+    def adicionar(self, valor: float) -> None:
+        self._valores.append(valor)
+        self.total += 1
+
+    def resumo(self) -> Dict[str, Any]:
+        if not self._valores:
+            return {"total": self.total, "media": None, "p95": None, "max": None}
+        ordenados = sorted(self._valores)
+        return {
+            "total": self.total,
+            "media": round(sum(ordenados) / len(ordenados), 3),
+            "p95": round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))], 3),
+            "max": round(ordenados[-1], 3),
+        }
+
+
+class FilaAnalises:
+    """Fila persistida no MongoDB com um pool de workers asyncio"""
+
+    def __init__(self, collection, executor: Executor, num_workers: int = 4,
+                 timeout_job_segundos: int = 300, retencao_segundos: int = 7 * 24 * 3600):
+        self.collection = collection
+        self.executor = executor
+        self.num_workers = num_workers
+        self.timeout_job_segundos = timeout_job_segundos
+        self.retencao_segundos = retencao_segundos
+        self._fila: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._recuperacao: Optional[asyncio.Task] = None
+        # IDs já na fila local, para a recuperação periódica não os duplicar
+        self._enfileirados: Set[str] = set()
+        # job -> um evento por cliente à espera de mudanças (só existe enquanto alguém espera)
+        self._esperas: Dict[str, Set[asyncio.Event]] = {}
+        self._em_execucao = 0
+        self.tempo_espera = _Amostras()
+        self.tempo_execucao = _Amostras()
+        self.concluidos = 0
+        self.erros = 0
+
+    async def iniciar(self) -> None:
+        try:
+            await self.collection.create_index("concluido_em", expireAfterSeconds=self.retencao_segundos)
+            await self.collection.create_index([("status", 1), ("criado_em", 1)])
+            await self._recuperar_jobs()
+        except Exception as e:
+            log.error("Erro ao preparar fila de análises", extra={"erro": str(e)})
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+        self._recuperacao = asyncio.create_task(self._manter_recuperacao())
+
+    async def parar(self) -> None:
+        tarefas = self._workers + ([self._recuperacao] if self._recuperacao else [])
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        self._workers = []
+        self._recuperacao = None
+
+    def _enfileirar(self, job_id: str) -> None:
+        self._enfileirados.add(job_id)
+        self._fila.put_nowait(job_id)
+
+    async def _recuperar_jobs(self, so_abandonados: bool = False) -> None:
+        """
+        Volta a enfileirar jobs pendentes e jobs interrompidos por um reinício. Com
+        so_abandonados, os pendentes só contam se tiverem mais do que timeout_job_segundos,
+        para não disputar jobs acabados de submeter que estão na fila de outro processo.
+        """
+        limite = datetime.utcnow() - timedelta(seconds=self.timeout_job_segundos)
+        pendentes = {"status": PENDENTE, "criado_em": {"$lt": limite}} if so_abandonados else {"status": PENDENTE}
+        filtro = {"$or": [
+            pendentes,
+            {"status": EM_EXECUCAO, "iniciado_em": {"$lt": limite}},
+        ]}
+        recuperados = 0
+        async for job in self.collection.find(filtro, {"_id": 1}).sort("criado_em", 1):
+            if job["_id"] in self._enfileirados:
+                continue
+            self._enfileirar(job["_id"])
+            recuperados += 1
+        if recuperados:
+            log.info("Fila de análises: jobs recuperados", extra={"recuperados": recuperados})
+
+    async def _manter_recuperacao(self) -> None:
+        """Tarefa de fundo: recupera periodicamente jobs abandonados (falhas não a interrompem)"""
+        while True:
+            await asyncio.sleep(self.timeout_job_segundos)
+            try:
+                await self._recuperar_jobs(so_abandonados=True)
+            except Exception as e:
+                log.error("Erro ao recuperar jobs da fila de análises", extra={"erro": str(e)})
+
+    async def submeter(self, pedido: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        await self.collection.insert_one({
+            "_id": job_id,
+            "status": PENDENTE,
+            "etapa": None,
+            "pedido": pedido,
+            "resultado": None,
+            "erro": None,
+            "tentativas": 0,
+            "criado_em": datetime.utcnow(),
+            "iniciado_em": None,
+            "concluido_em": None,
+        })
+        self._enfileirar(job_id)
+        return job_id
+
+    async def obter(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def aguardar_mudanca(self, job_id: str, timeout: float) -> None:
+        """
+        Espera por uma mudança de estado feita por este processo (ou até ao timeout). Cada
+        cliente tem o seu evento, e a entrada do job sai com o último cliente, mesmo que o
+        job seja executado noutro processo ou já tenha terminado.
+        """
+        evento = asyncio.Event()
+        esperas = self._esperas.setdefault(job_id, set())
+        esperas.add(evento)
+        try:
+            await asyncio.wait_for(evento.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            esperas.discard(evento)
+            if not esperas and self._esperas.get(job_id) is esperas:
+                del self._esperas[job_id]
+
+    def _notificar(self, job_id: str) -> None:
+        for evento in self._esperas.get(job_id, ()):
+            evento.set()
+
+    async def _atualizar(self, job_id: str, campos: Dict[str, Any]) -> None:
+        await self.collection.update_one({"_id": job_id}, {"$set": campos})
+        self._notificar(job_id)
+
+    async def _reivindicar(self, job_id: str) -> Optional[Dict[str, Any]]:
+        agora = datetime.utcnow()
+        limite = agora - timedelta(seconds=self.timeout_job_segundos)
+        return await self.collection.find_one_and_update(
+            {"_id": job_id, "$or": [
+                {"status": PENDENTE},
+                {"status": EM_EXECUCAO, "iniciado_em": {"$lt": limite}},
+            ]},
+            {"$set": {"status": EM_EXECUCAO, "iniciado_em": agora, "etapa": None}, "$inc": {"tentativas": 1}},
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._fila.get()
+            self._enfileirados.discard(job_id)
+            try:
+                job = await self._reivindicar(job_id)
+                if job is None:
+                    # Já executado (ou em execução) noutro worker/processo
+                    continue
+                self._notificar(job_id)
+                await self._executar(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception("Erro no worker da fila de análises", extra={"erro": str(e)})
+            finally:
+                self._fila.task_done()
+
+    async def _executar(self, job: Dict[str, Any]) -> None:
+        job_id = job["_id"]
+        inicio = time.monotonic()
+        self.tempo_espera.adicionar((datetime.utcnow() - job["criado_em"]).total_seconds())
+        self._em_execucao += 1
+
+        async def reportar(etapa: str) -> None:
+            await self._atualizar(job_id, {"etapa": etapa})
+
+        try:
+            resultado = await asyncio.wait_for(self.executor(job["pedido"], reportar), timeout=self.timeout_job_segundos)
+            await self._atualizar(job_id, {
+                "status": CONCLUIDO, "resultado": resultado, "concluido_em": datetime.utcnow()
+            })
+            self.concluidos += 1
+        except asyncio.CancelledError:
+            # Encerramento da API: o job volta a ser recuperado no próximo arranque
+            await self.collection.update_one({"_id": job_id}, {"$set": {"status": PENDENTE}})
+            raise
+        except Exception as e:
+            erro = str(e) if isinstance(e, ErroJob) else f"Erro interno: {str(e)}"
+            if isinstance(e, asyncio.TimeoutError):
+                erro = f"Tempo limite de {self.timeout_job_segundos}s excedido"
+            await self._atualizar(job_id, {"status": ERRO, "erro": erro, "concluido_em": datetime.utcnow()})
+            self.erros += 1
+        finally:
+            self._em_execucao -= 1
+            self.tempo_execucao.adicionar(time.monotonic() - inicio)
+
+    def metricas(self) -> Dict[str, Any]:
+        return {
+            "profundidade_fila": self._fila.qsize(),
+            "em_execucao": self._em_execucao,
+            "clientes_a_espera": sum(len(esperas) for esperas in self._esperas.values()),
+            "workers": self.num_workers,
+            "concluidos": self.concluidos,
+            "erros": self.erros,
+            "tempo_espera_segundos": self.tempo_espera.resumo(),
+            "tempo_execucao_segundos": self.tempo_execucao.resumo(),
+        }
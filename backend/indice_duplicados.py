@@ -0,0 +1,139 @@
+"""
+Índice de quase-duplicados (MinHash + LSH) para publicações repostadas.
+
+Golpes são repostados com pequenas alterações (outro telefone, outro nome de
+empresa, emojis). O texto é normalizado (acentos, caixa, números e símbolos),
+dividido em trigramas de palavras e resumido numa assinatura MinHash de
+"uma permutação" com densificação, que custa uma única passagem pelos
+shingles. As primeiras posições da assinatura são agrupadas em bandas (LSH)
+para encontrar candidatos em tempo constante; a similaridade de Jaccard é
+depois estimada com a assinatura completa.
+"""
+import hashlib
+import re
+import unicodedata
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+NUM_PERMUTACOES = 64
+NUM_BANDAS = 8
+LINHAS_POR_BANDA = 4
+TAMANHO_SHINGLE = 3
+
+_MAX_VALOR = 0xFFFFFFFF
+_BITS_BIN = NUM_PERMUTACOES.bit_length() - 1
+_PALAVRAS = re.compile(r"[a-z]+|\d+")
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Normaliza o texto: sem acentos, minúsculas, números reduzidos a '0' e sem símbolos/emojis"""
+    texto = unicodedata.normalize("NFKD", texto.casefold())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return ["0" if t.isdigit() else t for t in _PALAVRAS.findall(texto)]
+
+
+def _hash_shingle(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def assinatura_minhash(texto: str) -> Optional[bytes]:
+    """Calcula a assinatura MinHash do texto (None se não houver palavras)"""
+    tokens = tokenizar(texto)
+    if not tokens:
+        return None
+
+    if len(tokens) < TAMANHO_SHINGLE:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + TAMANHO_SHINGLE]) for i in range(len(tokens) - TAMANHO_SHINGLE + 1)}
+
+    # One permutation hashing: cada hash vai para um bin e guarda-se o mínimo por bin
+    bins = [_MAX_VALOR + 1] * NUM_PERMUTACOES
+    mascara = NUM_PERMUTACOES - 1
+    for shingle in shingles:
+        h = _hash_shingle(shingle)
+        i = h & mascara
+        v = (h >> _BITS_BIN) & _MAX_VALOR
+        if v < bins[i]:
+            bins[i] = v
+
+    # Densificação por rotação: bins vazios copiam o próximo bin preenchido
+    vazio = _MAX_VALOR + 1
+    assinatura = array("I", [0] * NUM_PERMUTACOES)
+    for i in range(NUM_PERMUTACOES):
+        distancia = 0
+        j = i
+        while bins[j] == vazio:
+            j = (j + 1) & mascara
+            distancia += 1
+        assinatura[i] = (bins[j] + distancia * 0x9E3779B1) & _MAX_VALOR
+    return assinatura.tobytes()
+
+
+def similaridade(a: bytes, b: bytes) -> float:
+    """Estimativa da similaridade de Jaccard entre duas assinaturas"""
+    va = array("I")
+    va.frombytes(a)
+    vb = array("I")
+    vb.frombytes(b)
+    iguais = sum(1 for x, y in zip(va, vb) if x == y)
+    return iguais / NUM_PERMUTACOES
+
+
+def _chaves_bandas(assinatura: bytes) -> List[int]:
+    tamanho = LINHAS_POR_BANDA * 4
+    return [hash(assinatura[i * tamanho:(i + 1) * tamanho]) for i in range(NUM_BANDAS)]
+
+
+class IndiceDuplicados:
+    """Índice LSH em memória, atualizado incrementalmente a cada análise gravada"""
+
+    def __init__(self, limiar: float = 0.8):
+        self.limiar = limiar
+        self._assinaturas: List[bytes] = []
+        self._ids: List[str] = []
+        self._posicoes: Dict[str, int] = {}
+        self._bandas: List[Dict[int, object]] = [{} for _ in range(NUM_BANDAS)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, vaga_id: str) -> bool:
+        return vaga_id in self._posicoes
+
+    def adicionar(self, vaga_id: str, assinatura: bytes) -> None:
+        if vaga_id in self._posicoes:
+            return
+        posicao = len(self._ids)
+        self._ids.append(vaga_id)
+        self._assinaturas.append(assinatura)
+        self._posicoes[vaga_id] = posicao
+
+        # Baldes com um único elemento guardam o inteiro diretamente para poupar memória
+        for banda, chave in zip(self._bandas, _chaves_bandas(assinatura)):
+            atual = banda.get(chave)
+            if atual is None:
+                banda[chave] = posicao
+            elif isinstance(atual, list):
+                atual.append(posicao)
+            else:
+                banda[chave] = [atual, posicao]
+
+    def consultar(self, assinatura: bytes) -> Optional[Tuple[str, float]]:
+        """Retorna (id, similaridade) da análise mais parecida acima do limiar, se houver"""
+        candidatos = set()
+        for banda, chave in zip(self._bandas, _chaves_bandas(assinatura)):
+            atual = banda.get(chave)
+            if atual is None:
+                continue
+            if isinstance(atual, list):
+                candidatos.update(atual)
+            else:
+                candidatos.add(atual)
+
+        melhor = None
+        for posicao in candidatos:
+            sim = similaridade(assinatura, self._assinaturas[posicao])
+            if sim >= self.limiar and (melhor is None or sim > melhor[1]):
+                melhor = (self._ids[posicao], sim)
+        return melhor
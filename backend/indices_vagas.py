@@ -0,0 +1,147 @@
+"""
+Índices e campos derivados da coleção `vagas`.
+
+Cada vaga gravada recebe campos calculados no momento da escrita, para
+que a listagem, as estatísticas e os rankings corram sobre índices em vez
+de percorrer a coleção inteira:
+
+- `dominio`: host do URL da vaga (minúsculas, sem porta nem "www."), ou
+  None nas análises por texto
+- `empresa_chave`: chave canónica da empresa (ver empresas_canonicas.py),
+  ou None quando a empresa não foi identificada
+- `risco_alto`: nível de risco ALTO ou CRITICO
+- `versao_derivados`: versão das regras que calcularam os campos acima
+
+`migrar()` cria os índices e recalcula em lotes os documentos gravados com
+outra versão (ou sem campos derivados); corre no arranque da API e também
+pode ser executado diretamente:
+
+    python indices_vagas.py
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from empresas_canonicas import canonicalizador
+
+log = logging.getLogger(__name__)
+
+NIVEIS_RISCO_ALTO = ("ALTO", "CRITICO")
+ROTULO_ANALISE_TEXTO = "Análise por texto"
+DOMINIOS_IGNORADOS = ["localhost", "127.0.0.1"]
+TOP_N = 4
+# Muda quando muda o cálculo dos campos derivados ou a tabela de aliases de empresas
+VERSAO_DERIVADOS = f"3.{canonicalizador.versao}"
+
+# (chaves, nome): nomes fixos para que criar os índices de novo não falhe nem os duplique
+INDICES_VAGAS: List[Tuple[List[Tuple[str, int]], str]] = [
+    # Listagem por data (ordem estável com _id para paginação por cursor)
+    ([("data_analise", -1), ("_id", -1)], "data_analise_id"),
+    # Listagem filtrada por nível de risco e contagens por nível
+    ([("nivel_risco", 1), ("data_analise", -1), ("_id", -1)], "nivel_risco_data_analise_id"),
+    # Ranking de empresas: inclui o nome original para o $group não ler os documentos
+    ([("risco_alto", 1), ("empresa_chave", 1), ("empresa", 1)], "risco_alto_empresa_chave"),
+    # Ranking de domínios
+    ([("risco_alto", 1), ("dominio", 1)], "risco_alto_dominio"),
+]
+# Índices de versões anteriores, removidos na migração
+INDICES_OBSOLETOS = ["risco_alto_empresa"]
+
+
+def dominio_da_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    try:
+        host = urlsplit(url.strip() if "://" in url else f"http://{url.strip()}").hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+def campos_derivados(vaga: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "dominio": dominio_da_url(vaga.get("url_vaga")),
+        "empresa_chave": canonicalizador.chave(vaga.get("empresa")),
+        "risco_alto": vaga.get("nivel_risco") in NIVEIS_RISCO_ALTO,
+        "versao_derivados": VERSAO_DERIVADOS,
+    }
+
+
+def pipeline_top_empresas(limite: int = TOP_N) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"risco_alto": True, "empresa_chave": {"$ne": None}}},
+        {"$project": {"_id": 0, "empresa_chave": 1, "empresa": 1}},
+        {"$group": {"_id": "$empresa_chave", "total_vagas_alto_risco": {"$sum": 1}, "empresa": {"$first": "$empresa"}}},
+        {"$sort": {"total_vagas_alto_risco": -1, "_id": 1}},
+        {"$limit": limite},
+        {"$project": {"_id": 0, "empresa": 1, "total_vagas_alto_risco": 1}},
+    ]
+
+
+def pipeline_top_dominios(limite: int = TOP_N) -> List[Dict[str, Any]]:
+    return [
+        {"$match": {"risco_alto": True, "dominio": {"$nin": DOMINIOS_IGNORADOS}}},
+        {"$project": {"_id": 0, "dominio": 1}},
+        {"$group": {"_id": {"$ifNull": ["$dominio", ROTULO_ANALISE_TEXTO]}, "total_vagas_alto_risco": {"$sum": 1}}},
+        {"$sort": {"total_vagas_alto_risco": -1, "_id": 1}},
+        {"$limit": limite},
+        {"$project": {"_id": 0, "dominio": "$_id", "total_vagas_alto_risco": 1}},
+    ]
+
+
+async def criar_indices(collection) -> None:
+    existentes = await collection.index_information()
+    for nome in INDICES_OBSOLETOS:
+        if nome in existentes:
+            await collection.drop_index(nome)
+    for chaves, nome in INDICES_VAGAS:
+        await collection.create_index(chaves, name=nome)
+
+
+async def preencher_campos_derivados(collection, tamanho_lote: int = 500) -> int:
+    """Calcula os campos derivados das vagas gravadas sem eles ou com outra versão; retorna quantas foram atualizadas"""
+    from pymongo import UpdateOne
+
+    projecao = {"url_vaga": 1, "empresa": 1, "nivel_risco": 1}
+    atualizadas = 0
+    ultimo_id = None
+    while True:
+        # Percorrer por _id permite retomar a migração e não depende de um cursor longo
+        filtro: Dict[str, Any] = {"versao_derivados": {"$ne": VERSAO_DERIVADOS}}
+        if ultimo_id is not None:
+            filtro["_id"] = {"$gt": ultimo_id}
+        lote = await collection.find(filtro, projecao).sort("_id", 1).limit(tamanho_lote).to_list(tamanho_lote)
+        if not lote:
+            return atualizadas
+        await collection.bulk_write(
+            # empresa_norm: campo da versão 1, substituído por empresa_chave
+            [UpdateOne({"_id": vaga["_id"]}, {"$set": campos_derivados(vaga), "$unset": {"empresa_norm": ""}})
+             for vaga in lote],
+            ordered=False,
+        )
+        atualizadas += len(lote)
+        ultimo_id = lote[-1]["_id"]
+
+
+async def migrar(collection, tamanho_lote: int = 500) -> None:
+    await criar_indices(collection)
+    atualizadas = await preencher_campos_derivados(collection, tamanho_lote)
+    log.info("Índices da coleção vagas criados; campos derivados preenchidos", extra={"vagas_atualizadas": atualizadas})
+
+
+if __name__ == "__main__":
+    import os
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from logs_estruturados import configurar_logs
+
+    load_dotenv()
+    configurar_logs(formato="texto")
+    cliente = AsyncIOMotorClient(os.getenv("MONGODB_URL", "mongodb://localhost:27017"))
+    asyncio.run(migrar(cliente.humai_verify.vagas))
@@ -4,14 +4,16 @@ Script para inserir usuário e instituição da PGR no banco de dados
 import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
-from passlib.context import CryptContext
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 
+from senhas import contexto_senhas
+
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# O mesmo custo do bcrypt que a API (senão a senha é reescrita no primeiro login)
+pwd_context = contexto_senhas(int(os.getenv('BCRYPT_ROUNDS', 12)))
 mongodb_url = os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
 
 async def insert_user():
@@ -0,0 +1,117 @@
+"""
+Parser JSON incremental para respostas do LLM recebidas em streaming.
+
+Recebe o texto aos pedaços e, assim que um valor escalar (string, número,
+booleano ou null) fica completo, emite o par (caminho, valor), em que o
+caminho é a tupla de chaves/índices desde a raiz, por exemplo
+("analiseRisco", "alertas", 0). Texto antes do primeiro "{" (como um
+bloco ```json) é ignorado, tal como tudo depois do objeto raiz fechar.
+"""
+import json
+from typing import Any, List, Tuple, Union
+
+Caminho = Tuple[Union[str, int], ...]
+
+_ESPACOS = " \t\n\r"
+_FIM_LITERAL = ",}] \t\n\r"
+
+
+class _Nivel:
+    __slots__ = ("objeto", "posicao", "esperando_chave")
+
+    def __init__(self, objeto: bool):
+        self.objeto = objeto
+        self.posicao: Union[str, int, None] = None if objeto else 0
+        self.esperando_chave = objeto
+
+
+class ParserJSONIncremental:
+    def __init__(self):
+        self._pilha: List[_Nivel] = []
+        self._iniciado = False
+        self.terminado = False
+        self._token = None  # None, "string" ou "literal"
+        self._buffer: List[str] = []
+        self._escape = False
+        self._string_e_chave = False
+
+    def alimentar(self, texto: str) -> List[Tuple[Caminho, Any]]:
+        """Processa mais um pedaço de texto e retorna os valores completados"""
+        eventos: List[Tuple[Caminho, Any]] = []
+        for c in texto:
+            if self.terminado:
+                break
+            self._caractere(c, eventos)
+        return eventos
+
+    def _caminho(self) -> Caminho:
+        return tuple(nivel.posicao for nivel in self._pilha)
+
+    def _caractere(self, c: str, eventos: List[Tuple[Caminho, Any]]) -> None:
+        if not self._iniciado:
+            if c == "{":
+                self._iniciado = True
+                self._pilha.append(_Nivel(objeto=True))
+            return
+
+        if self._token == "string":
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._fechar_string(eventos)
+                return
+            self._buffer.append(c)
+            return
+
+        if self._token == "literal":
+            if c not in _FIM_LITERAL:
+                self._buffer.append(c)
+                return
+            self._fechar_literal(eventos)
+
+        if c in _ESPACOS:
+            return
+        topo = self._pilha[-1]
+        if c == '"':
+            self._token = "string"
+            self._string_e_chave = topo.objeto and topo.esperando_chave
+            self._buffer = []
+        elif c in "{[":
+            self._pilha.append(_Nivel(objeto=(c == "{")))
+        elif c in "}]":
+            self._pilha.pop()
+            if not self._pilha:
+                self.terminado = True
+        elif c == ":":
+            topo.esperando_chave = False
+        elif c == ",":
+            if topo.objeto:
+                topo.esperando_chave = True
+            else:
+                topo.posicao += 1
+        else:
+            self._token = "literal"
+            self._buffer = [c]
+
+    def _fechar_string(self, eventos: List[Tuple[Caminho, Any]]) -> None:
+        self._token = None
+        try:
+            valor = json.loads('"' + "".join(self._buffer) + '"')
+        except ValueError:
+            valor = "".join(self._buffer)
+        if self._string_e_chave:
+            self._pilha[-1].posicao = valor
+        else:
+            eventos.append((self._caminho(), valor))
+
+    def _fechar_literal(self, eventos: List[Tuple[Caminho, Any]]) -> None:
+        self._token = None
+        bruto = "".join(self._buffer)
+        try:
+            valor = json.loads(bruto)
+        except ValueError:
+            # Modelos às vezes escrevem intervalos ou valores inválidos; emitir como texto
+            valor = bruto
+        eventos.append((self._caminho(), valor))
@@ -0,0 +1,70 @@
+"""
+Logs estruturados: um objeto JSON por linha, com o id do pedido.
+
+Os módulos usam `logging.getLogger(__name__)` e passam os valores em
+`extra={...}`, que aparecem como campos do JSON em vez de ficarem no meio
+do texto:
+
+    log.info("Análise LLM concluída", extra={"nivel_risco": "ALTO"})
+
+    {"ts": "...", "nivel": "INFO", "logger": "main", "id_pedido": "3f2a...",
+     "mensagem": "Análise LLM concluída", "nivel_risco": "ALTO"}
+
+O id do pedido é definido pelo middleware da API (cabeçalho X-Request-ID
+recebido ou um novo) e acompanha as tarefas criadas durante o pedido, pelo
+que os logs da análise, do LLM e da gravação de um pedido partilham o mesmo
+id. `formato="texto"` dá linhas legíveis para os scripts de linha de
+comandos.
+"""
+import json
+import logging
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+id_pedido: ContextVar[Optional[str]] = ContextVar("id_pedido", default=None)
+
+# Atributos de qualquer LogRecord; os restantes vieram de extra={...}
+_ATRIBUTOS_REGISTO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "id_pedido"}
+
+
+class FiltroIdPedido(logging.Filter):
+    """Acrescenta o id do pedido em curso a cada registo"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.id_pedido = id_pedido.get()
+        return True
+
+
+class FormatadorJSON(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+        }
+        if getattr(record, "id_pedido", None):
+            dados["id_pedido"] = record.id_pedido
+        dados["mensagem"] = record.getMessage()
+        for campo, valor in record.__dict__.items():
+            if campo not in _ATRIBUTOS_REGISTO:
+                dados[campo] = valor
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, default=str, ensure_ascii=False)
+
+
+def configurar_logs(nivel: str = "INFO", formato: str = "json") -> None:
+    """Substitui os handlers do logger raiz por um só, no stdout"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(FiltroIdPedido())
+    if formato == "json":
+        handler.setFormatter(FormatadorJSON())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    raiz = logging.getLogger()
+    raiz.handlers = [handler]
+    raiz.setLevel(nivel.upper())
+    # O httpx regista cada pedido em INFO: uma linha por página baixada seria só ruído
+    logging.getLogger("httpx").setLevel(max(raiz.level, logging.WARNING))
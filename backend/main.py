@@ -1,29 +1,67 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
 from typing import Optional, Dict, Any
 import os
 import json
 import re
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import google.generativeai as genai
-import requests
-from bs4 import BeautifulSoup
 from motor.motor_asyncio import AsyncIOMotorClient
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 
+from autenticacao import CacheAutenticacao, ErroAutenticacao
+from cache_analise import AnaliseCache
+from indice_duplicados import IndiceDuplicados, assinatura_minhash
+from cache_paginas import PageCache, CachePaginasMongo, cabecalhos_condicionais
+from cache_respostas import CacheRespostas
+from cassetes_llm import REPRODUZIR, com_cassete
+from cliente_http import ClienteHTTP
+from cliente_llm import ClienteLLM
+from coalescencia import Coalescedor, url_canonica
+from dominios_confiaveis import classificador as classificador_dominios
+from extrator_html import decodificar, extrair_pagina
+from fila_analises import FilaAnalises, ErroJob, ESTADOS_FINAIS
+from estatisticas_vagas import (garantir as garantir_estatisticas, obter_resumo, obter_top_dominios, obter_top_empresas,
+                                registrar as registrar_estatisticas)
+from indices_vagas import campos_derivados, dominio_da_url, migrar as migrar_vagas
+from json_incremental import ParserJSONIncremental
+from logs_estruturados import configurar_logs, id_pedido
+from metricas import LIMITES_TAMANHO, etapa, iniciar_etapas, registo as registo_metricas
+from paginacao_vagas import CacheTotais, CursorInvalido, pagina_vagas
+from reducao_conteudo import reduzir_conteudo
+from reputacao_dominios import ReputacaoDominios
+from senhas import SobrecargaSenhas, VerificadorSenhas
+from triagem_regras import TriagemRegras, CRITERIOS
+
 # Configuração inicial
 load_dotenv()
+# Logs em JSON (LOG_FORMATO=texto para linhas legíveis em desenvolvimento)
+configurar_logs(os.getenv('LOG_NIVEL', 'INFO'), os.getenv('LOG_FORMATO', 'json'))
+log = logging.getLogger(__name__)
 api_key = os.getenv('GOOGLE_API_KEY')
 mongodb_url = os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
+# Cassete do modelo (cassetes_llm.py): gravar guarda as respostas em LLM_CASSETE, reproduzir responde só a partir dela
+llm_cassete_modo = os.getenv('LLM_CASSETE_MODO', 'direto')
 
-if not api_key or len(api_key) < 10:
+# A reproduzir uma cassete não há chamadas ao Gemini, nem chave a verificar
+if llm_cassete_modo != REPRODUZIR and (not api_key or len(api_key) < 10):
     raise ValueError("API key inválida. Verifique o arquivo .env")
 
-genai.configure(api_key=api_key)
+# GEMINI_API_ENDPOINT aponta o cliente para outro servidor (por exemplo o Gemini falso de benchmarks/)
+gemini_endpoint = os.getenv('GEMINI_API_ENDPOINT')
+if gemini_endpoint:
+    genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": gemini_endpoint})
+else:
+    genai.configure(api_key=api_key)
 
 # Configurações de segurança para evitar loops infinitos
 generation_config = {
@@ -53,7 +91,34 @@ safety_settings = [
     }
 ]
 
-model = genai.GenerativeModel('gemini-2.0-flash')
+model = com_cassete(genai.GenerativeModel('gemini-2.0-flash'), llm_cassete_modo, os.getenv('LLM_CASSETE'))
+cassete_llm = getattr(model, 'cassete', None)
+
+# Todas as chamadas ao modelo passam pelo cliente resiliente (quota, repetições, prazo, disjuntor)
+cliente_llm = ClienteLLM(
+    model,
+    # Sem quota por omissão ao reproduzir uma cassete: reprocessar o histórico não espera pelo Gemini
+    pedidos_por_minuto=float(os.getenv('LLM_PEDIDOS_POR_MINUTO', 1e9 if llm_cassete_modo == REPRODUZIR else 15)),
+    tokens_por_minuto=float(os.getenv('LLM_TOKENS_POR_MINUTO', 1e12 if llm_cassete_modo == REPRODUZIR else 1000000)),
+    max_tentativas=int(os.getenv('LLM_MAX_TENTATIVAS', 3)),
+    prazo_segundos=float(os.getenv('LLM_PRAZO_SEGUNDOS', 60)),
+    hedging=os.getenv('LLM_HEDGING', 'false').lower() == 'true',
+    limiar_falhas_disjuntor=int(os.getenv('LLM_DISJUNTOR_FALHAS', 5)),
+    tempo_aberto_segundos=float(os.getenv('LLM_DISJUNTOR_ABERTO_SEGUNDOS', 30))
+)
+
+# Versão do prompt de análise: alterar sempre que o prompt (ou o conteúdo que o acompanha) mudar
+# para invalidar o cache; "2": chaves do texto completo, em vez dos primeiros 8000 caracteres
+PROMPT_VERSION = "2"
+
+# Orçamento de tokens do conteúdo enviado ao modelo (ver reducao_conteudo.py)
+CONTEUDO_ORCAMENTO_TOKENS = int(os.getenv('CONTEUDO_ORCAMENTO_TOKENS', 2000))
+
+# Análise em lote: tamanho máximo e concorrência por etapa
+BATCH_MAX_ITENS = int(os.getenv('BATCH_MAX_ITENS', 500))
+BATCH_CONCORRENCIA_FETCH = int(os.getenv('BATCH_CONCORRENCIA_FETCH', 8))
+BATCH_CONCORRENCIA_LLM = int(os.getenv('BATCH_CONCORRENCIA_LLM', 4))
+BATCH_TAMANHO_GRAVACAO = 50
 
 # Configuração do MongoDB
 client = AsyncIOMotorClient(mongodb_url)
@@ -61,16 +126,123 @@ db = client.humai_verify
 vagas_collection = db.vagas
 usuarios_collection = db.usuarios
 instituicoes_collection = db.instituicoes
+analises_cache_collection = db.analises_cache
+vagas_minhash_collection = db.vagas_minhash
+paginas_cache_collection = db.paginas_cache
+jobs_collection = db.analises_jobs
+vagas_estatisticas_collection = db.vagas_estatisticas
+
+# Cache de análises por conteúdo (LRU em memória + MongoDB com TTL)
+analise_cache = AnaliseCache(
+    analises_cache_collection,
+    versao_prompt=PROMPT_VERSION,
+    ttl_segundos=int(os.getenv('ANALISE_CACHE_TTL_SEGUNDOS', 7 * 24 * 3600)),
+    max_itens_memoria=int(os.getenv('ANALISE_CACHE_MAX_ITENS', 1024))
+)
+
+# Índice de quase-duplicados sobre as vagas já analisadas
+indice_duplicados = IndiceDuplicados(limiar=float(os.getenv('LIMIAR_SIMILARIDADE', 0.7)))
+
+# Pedidos /analyze idênticos em curso partilham o mesmo download, chamada ao LLM e gravação
+coalescedor_analises = Coalescedor()
+
+# Totais da listagem /vagas (aproximados, recontados no máximo uma vez por TTL)
+totais_vagas = CacheTotais(ttl_segundos=float(os.getenv('VAGAS_TOTAIS_TTL_SEGUNDOS', 60)))
+
+# Respostas de GET /dashboard, descartadas quando uma nova vaga é gravada
+cache_dashboard = CacheRespostas(ttl_segundos=float(os.getenv('DASHBOARD_CACHE_TTL_SEGUNDOS', 10)))
+
+# Reputação dos domínios a partir das vagas analisadas (documentos reputacao:* de vagas_estatisticas)
+reputacao_dominios = ReputacaoDominios(
+    vagas_estatisticas_collection,
+    minimo_analises=int(os.getenv('REPUTACAO_MINIMO_ANALISES', 5)),
+    limiar_mau=float(os.getenv('REPUTACAO_LIMIAR_MAU', 0.8)),
+    limiar_bom=float(os.getenv('REPUTACAO_LIMIAR_BOM', 0.1)),
+    validade_dias=float(os.getenv('REPUTACAO_VALIDADE_DIAS', 30)),
+    intervalo_recarga=float(os.getenv('REPUTACAO_RECARGA_SEGUNDOS', 300)),
+    atalho_ativo=os.getenv('REPUTACAO_ATALHO', 'true').lower() in ('1', 'true', 'sim')
+)
+
+# Triagem por regras antes do LLM: decisões CRITICO/BENIGNO evidentes dispensam o modelo
+motor_triagem = TriagemRegras(
+    limiar_critico=int(os.getenv('TRIAGEM_LIMIAR_CRITICO', 90)),
+    min_criterios_critico=int(os.getenv('TRIAGEM_MIN_CRITERIOS_CRITICO', 4)),
+    limiar_benigno=int(os.getenv('TRIAGEM_LIMIAR_BENIGNO', 0)),
+    min_sinais_legitimos=int(os.getenv('TRIAGEM_MIN_SINAIS_LEGITIMOS', 4))
+)
+
+# Métricas de GET /metrics; a duração das etapas da análise é medida com etapa() (metricas.py)
+analises_por_origem = registo_metricas.contador(
+    "humai_analises_total", "Análises por origem do resultado: cache, semelhante, triagem, reputacao, llm ou recurso",
+    ("origem",))
+bytes_paginas = registo_metricas.histograma("humai_pagina_bytes", "Bytes baixados por página", LIMITES_TAMANHO)
+caracteres_conteudo = registo_metricas.histograma(
+    "humai_conteudo_caracteres", "Caracteres do conteúdo obtido e do enviado ao modelo", LIMITES_TAMANHO, ("fase",))
+pedidos_http = registo_metricas.contador(
+    "humai_pedidos_http_total", "Pedidos HTTP por rota e código de estado", ("metodo", "rota", "estado"))
+duracao_pedidos = registo_metricas.histograma(
+    "humai_pedido_duracao_segundos", "Duração dos pedidos HTTP (nos streams, até ao último evento)",
+    rotulos=("metodo", "rota"))
 
 # Configuração de segurança
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 horas
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt num pool de threads limitado; hashes com outro custo são atualizados no login
+verificador_senhas = VerificadorSenhas(
+    rounds=int(os.getenv('BCRYPT_ROUNDS', 12)),
+    max_threads=int(os.getenv('SENHAS_MAX_THREADS', 2)),
+    max_pendentes=int(os.getenv('SENHAS_MAX_PENDENTES', 64))
+)
+# Atualizações de ultimoLogin em curso (referências para as tarefas não serem recolhidas)
+tarefas_login: set[asyncio.Task] = set()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-app = FastAPI(title="HumAI Verify Opportunity API", version="1.0.0")
+# Tokens verificados, utilizadores e instituições em memória (inexistentes e inativos incluídos)
+cache_autenticacao = CacheAutenticacao(
+    usuarios_collection,
+    instituicoes_collection,
+    SECRET_KEY,
+    ALGORITHM,
+    ttl_segundos=float(os.getenv('AUTH_CACHE_TTL_SEGUNDOS', 60)),
+    ttl_negativo_segundos=float(os.getenv('AUTH_CACHE_TTL_NEGATIVO_SEGUNDOS', 10))
+)
+# A análise é pública por omissão; os dados das vagas exigem sempre autenticação
+ANALISE_REQUER_AUTENTICACAO = os.getenv('ANALISE_REQUER_AUTENTICACAO', 'false').lower() in ('1', 'true', 'sim')
+# Perfis que podem desativar utilizadores da própria instituição
+PERFIS_GESTAO_UTILIZADORES = {p.strip() for p in os.getenv('PERFIS_GESTAO_UTILIZADORES', 'ADMIN').split(',') if p.strip()}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await cliente_http.iniciar()
+    
+    # Criar índices necessários (não impede o arranque se o MongoDB estiver indisponível)
+    try:
+        await analise_cache.criar_indices()
+        # Login: o utilizador é procurado pelo email
+        await usuarios_collection.create_index("email", name="email")
+        if cache_paginas_compartilhado:
+            await cache_paginas_compartilhado.criar_indices()
+    except Exception as e:
+        log.error("Erro ao criar índices", extra={"erro": str(e)})
+    
+    # Carregar o índice de quase-duplicados e migrar a coleção vagas em segundo plano para não atrasar o arranque
+    carregamento_indice = asyncio.create_task(carregar_indice_duplicados())
+    migracao_vagas = asyncio.create_task(migrar_colecao_vagas())
+    recarga_reputacao = asyncio.create_task(reputacao_dominios.manter_atualizada())
+    await fila_analises.iniciar()
+    yield
+    await fila_analises.parar()
+    carregamento_indice.cancel()
+    migracao_vagas.cancel()
+    recarga_reputacao.cancel()
+    await cliente_http.fechar()
+    verificador_senhas.fechar()
+    if cassete_llm:
+        cassete_llm.fechar()
+
+app = FastAPI(title="HumAI Verify Opportunity API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware - deve ser adicionado ANTES de definir rotas
 app.add_middleware(
@@ -82,96 +254,89 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
-# Headers para requisições web
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
-}
-
-# Cache simples
-_cache = {}
-
-# URLs confiáveis conhecidas
-TRUSTED_DOMAINS = {
-    # Sites de empregos confiáveis
-    'linkedin.com', 'linkedin.co.mz',
-    'indeed.com', 'indeed.co.mz',
-    'glassdoor.com', 'glassdoor.co.mz',
-    'reed.co.uk', 'reed.co.mz',
-    'emprego.co.mz', 'emprego.co.za',
-    'jobartis.co.mz', 'jobartis.co.za',
-    'jobs.co.mz', 'jobs.co.za',
-    'vagas.co.mz', 'vagas.co.za',
-    
-    # Sites de empresas conhecidas
-    'unodc.org', 'un.org',
-    'microsoft.com', 'google.com', 'apple.com',
-    'amazon.com', 'facebook.com', 'meta.com',
-    'netflix.com', 'spotify.com', 'uber.com',
-    'airbnb.com', 'tesla.com', 'spacex.com',
-    'ibm.com', 'oracle.com', 'salesforce.com',
-    'adobe.com', 'intel.com', 'nvidia.com',
-    'cisco.com', 'vmware.com', 'redhat.com',
-    
-    # Sites governamentais
-    'gov.mz', 'gov.za', 'gov.br', 'gov.uk',
-    'un.org', 'worldbank.org', 'imf.org',
-    'who.int', 'unicef.org', 'undp.org',
-    
-    # Sites educacionais
-    'harvard.edu', 'mit.edu', 'stanford.edu',
-    'cambridge.ac.uk', 'oxford.ac.uk',
-    'up.ac.za', 'uct.ac.za', 'wits.ac.za',
-    'uem.mz', 'up.ac.mz', 'isctem.ac.mz',
+class MiddlewareObservabilidade:
+    """
+    Id do pedido (X-Request-ID recebido ou um novo, devolvido na resposta), métricas HTTP e uma
+    linha de log por pedido com a duração de cada etapa. É ASGI puro, sem tarefa extra por pedido;
+    nas respostas em stream a linha é escrita depois do último evento.
+    """
     
-    # Sites de notícias confiáveis
-    'bbc.com', 'cnn.com', 'reuters.com',
-    'dw.com', 'france24.com', 'aljazeera.com',
-    'rt.com', 'sputniknews.com',
-    'noticias.sapo.mz', 'opais.co.mz',
-    'jornalnoticias.co.mz', 'verdade.co.mz',
+    def __init__(self, app):
+        self.app = app
+        self._rotas: Dict[Any, str] = {}
     
-    # Sites de ONGs confiáveis
-    'amnesty.org', 'hrw.org', 'transparency.org',
-    'oxfam.org', 'msf.org', 'doctorswithoutborders.org',
-    'redcross.org', 'unicef.org', 'unhcr.org',
-    'wfp.org', 'fao.org', 'ilo.org',
+    def _rota(self, scope) -> str:
+        # O router guarda o endpoint no scope; o caminho com parâmetros evita uma série por vaga ou job
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "desconhecida"
+        if endpoint not in self._rotas:
+            self._rotas.update({getattr(r, "endpoint", None): r.path for r in app.routes})
+        return self._rotas.get(endpoint, "desconhecida")
     
-    # Sites de empresas moçambicanas conhecidas
-    'mcel.co.mz', 'vodacom.co.mz', 'movitel.co.mz',
-    'bci.co.mz', 'bancounico.co.mz', 'bancobci.co.mz',
-    'bancobm.co.mz', 'bancobm.co.mz', 'bancobm.co.mz',
-    'coca-cola.co.mz', 'pepsi.co.mz', 'nestle.co.mz',
-    'unilever.co.mz', 'procter.co.mz', 'gamble.co.mz',
-    'shell.co.mz', 'total.co.mz', 'exxonmobil.co.mz',
-    'sasol.co.mz', 'sasol.co.za', 'sasol.com',
-    'sasol.com', 'sasol.co.za', 'sasol.co.mz',
-}
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        recebido = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        pedido = recebido if re.fullmatch(r"[\w.-]{1,64}", recebido) else uuid.uuid4().hex[:16]
+        token = id_pedido.set(pedido)
+        etapas = iniciar_etapas()
+        estado = 500
+        inicio = time.perf_counter()
+        
+        async def enviar(mensagem):
+            nonlocal estado
+            if mensagem["type"] == "http.response.start":
+                estado = mensagem["status"]
+                mensagem["headers"] = [*mensagem.get("headers", []), (b"x-request-id", pedido.encode("latin-1"))]
+            await send(mensagem)
+        
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            rota = self._rota(scope)
+            pedidos_http.inc(metodo=scope["method"], rota=rota, estado=estado)
+            duracao_pedidos.observar(duracao, metodo=scope["method"], rota=rota)
+            campos = {"metodo": scope["method"], "caminho": scope["path"], "estado": estado,
+                      "duracao_ms": round(duracao * 1000, 1)}
+            if etapas:
+                campos["etapas_ms"] = {nome: round(segundos * 1000, 1) for nome, segundos in etapas.items()}
+            log.info("Pedido concluído", extra=campos)
+            id_pedido.reset(token)
+
+# Por último: fica por fora do CORS e mede o pedido inteiro
+app.add_middleware(MiddlewareObservabilidade)
+
+# Cliente HTTP partilhado (pool keep-alive, limite por host, timeouts e redirecionamentos)
+cliente_http = ClienteHTTP()
+
+# Máximo de bytes lidos de uma página (o resto é descartado sem ser baixado)
+PAGINA_MAX_BYTES = int(os.getenv('PAGINA_MAX_BYTES', 2 * 1024 * 1024))
+
+# Cache de páginas: LRU limitada em bytes, com TTL, revalidação condicional e cache negativo
+cache_paginas = PageCache(
+    max_bytes=int(os.getenv('CACHE_PAGINAS_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl_segundos=float(os.getenv('CACHE_PAGINAS_TTL_SEGUNDOS', 3600)),
+    ttl_negativo_segundos=float(os.getenv('CACHE_PAGINAS_TTL_NEGATIVO_SEGUNDOS', 60))
+)
+
+# Backend partilhado opcional para que vários workers usem o mesmo cache
+cache_paginas_compartilhado = (
+    CachePaginasMongo(paginas_cache_collection)
+    if os.getenv('CACHE_PAGINAS_COMPARTILHADO', '').lower() in ('1', 'true', 'sim')
+    else None
+)
+
+# Domínios confiáveis conhecidos (dados/dominios_confiaveis.json, relido quando muda)
+classificador_dominios.intervalo_recarga = float(os.getenv('DOMINIOS_CONFIAVEIS_RECARGA_SEGUNDOS', 30))
 
 def is_trusted_url(url: str) -> bool:
     """
     Verifica se uma URL é de uma fonte confiável conhecida.
     """
-    if not url:
-        return False
-    
-    try:
-        # Extrair domínio da URL
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        from urllib.parse import urlparse
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        
-        # Remover www. se presente
-        if domain.startswith('www.'):
-            domain = domain[4:]
-        
-        # Verificar se o domínio está na lista de confiáveis
-        return domain in TRUSTED_DOMAINS
-    
-    except Exception:
-        return False
+    return get_url_trust_info(url)['is_trusted']
 
 def get_url_trust_info(url: str) -> Dict[str, Any]:
     """
@@ -185,59 +350,35 @@ def get_url_trust_info(url: str) -> Dict[str, Any]:
             'domain_type': 'UNKNOWN'
         }
     
-    is_trusted = is_trusted_url(url)
+    # Domínio (sem www. nem porta) e tipo numa só passagem pela árvore de sufixos
+    domain = dominio_da_url(url)
+    classificacao = classificador_dominios.classificar(domain) if domain else None
+    # Histórico das análises do domínio registável (em memória, sem consulta ao banco)
+    reputacao = reputacao_dominios.obter(domain)
     
-    if is_trusted:
-        try:
-            from urllib.parse import urlparse
-            parsed = urlparse(url if url.startswith(('http://', 'https://')) else 'https://' + url)
-            domain = parsed.netloc.lower()
-            if domain.startswith('www.'):
-                domain = domain[4:]
-            
-            # Determinar tipo de domínio
-            if any(x in domain for x in ['linkedin', 'indeed', 'glassdoor', 'monster', 'reed', 'totaljobs', 'ziprecruiter', 'careerbuilder', 'simplyhired', 'emprego', 'jobartis', 'jobs', 'vagas', 'trabalho']):
-                domain_type = 'JOB_PORTAL'
-                trust_reason = 'Portal de empregos conhecido (mas mantenha cautela - mesmo portais confiáveis podem ter anúncios falsos)'
-            elif any(x in domain for x in ['unodc', 'un.org', 'gov.', 'edu.', 'worldbank', 'imf', 'who.int', 'unicef', 'undp']):
-                domain_type = 'GOVERNMENT_ORGANIZATION'
-                trust_reason = 'Organização governamental ou internacional confiável'
-            elif any(x in domain for x in ['microsoft', 'google', 'apple', 'amazon', 'facebook', 'meta', 'netflix', 'spotify', 'uber', 'airbnb', 'tesla', 'spacex', 'ibm', 'oracle', 'salesforce', 'adobe', 'intel', 'nvidia', 'cisco', 'vmware', 'redhat']):
-                domain_type = 'TECH_COMPANY'
-                trust_reason = 'Empresa de tecnologia conhecida'
-            elif any(x in domain for x in ['mcel', 'vodacom', 'movitel', 'bci', 'bancounico', 'bancobci', 'bancobm', 'coca-cola', 'pepsi', 'nestle', 'unilever', 'procter', 'gamble', 'shell', 'total', 'exxonmobil', 'sasol']):
-                domain_type = 'LOCAL_COMPANY'
-                trust_reason = 'Empresa local conhecida'
-            elif any(x in domain for x in ['bbc', 'cnn', 'reuters', 'ap.org', 'bloomberg', 'wsj', 'nytimes', 'washingtonpost', 'theguardian', 'independent', 'dw', 'france24', 'aljazeera', 'rt', 'sputniknews', 'noticias.sapo', 'opais', 'jornalnoticias', 'verdade']):
-                domain_type = 'NEWS_SITE'
-                trust_reason = 'Site de notícias confiável'
-            elif any(x in domain for x in ['amnesty', 'hrw', 'transparency', 'oxfam', 'msf', 'doctorswithoutborders', 'redcross', 'unicef', 'unhcr', 'wfp', 'fao', 'ilo']):
-                domain_type = 'NGO'
-                trust_reason = 'ONG confiável'
-            else:
-                domain_type = 'TRUSTED_DOMAIN'
-                trust_reason = 'Domínio confiável conhecido'
-            
-            return {
-                'is_trusted': True,
-                'trust_level': 'HIGH',
-                'trust_reason': trust_reason,
-                'domain_type': domain_type,
-                'domain': domain
-            }
-        except Exception:
-            return {
-                'is_trusted': True,
-                'trust_level': 'HIGH',
-                'trust_reason': 'URL confiável identificada',
-                'domain_type': 'TRUSTED_DOMAIN'
-            }
+    if classificacao and classificacao['categoria']:
+        return {
+            'is_trusted': True,
+            'trust_level': 'HIGH',
+            'trust_reason': classificacao['motivo'],
+            'domain_type': classificacao['categoria'],
+            'domain': domain,
+            'reputation': reputacao
+        }
     else:
+        trust_reason = 'URL não reconhecida como confiável'
+        if reputacao and reputacao['veredicto'] == 'MAU':
+            trust_reason = (f"Domínio com histórico de golpes: {reputacao['alto_risco']} de {reputacao['analises']} "
+                            f"análises com risco ALTO ou CRITICO")
+        elif reputacao and reputacao['veredicto'] == 'BOM':
+            trust_reason = (f"URL não reconhecida como confiável, mas sem histórico de golpes "
+                            f"({reputacao['analises']} análises anteriores)")
         return {
             'is_trusted': False,
             'trust_level': 'LOW',
-            'trust_reason': 'URL não reconhecida como confiável',
-            'domain_type': 'UNKNOWN'
+            'trust_reason': trust_reason,
+            'domain_type': 'UNKNOWN',
+            'reputation': reputacao
         }
 
 # Modelos de Autenticação
@@ -260,12 +401,6 @@ class LoginResponse(BaseModel):
     token: str
 
 # Funções de autenticação
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -276,44 +411,72 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def utilizador_atual(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """Dependência dos endpoints protegidos: utilizador do token Bearer, resolvido pela cache de autenticação"""
+    try:
+        return await cache_autenticacao.autenticar(token)
+    except ErroAutenticacao as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+# Dependências dos endpoints de análise (/analyze, /analyze/stream, /analyze/batch e /jobs)
+DEPENDENCIAS_ANALISE = [Depends(utilizador_atual)] if ANALISE_REQUER_AUTENTICACAO else []
+
 async def get_user_by_email(email: str):
-    user = await usuarios_collection.find_one({"email": email})
-    return user
+    """Utilizador e a sua instituição numa só ida ao banco ($lookup); instituicaoId pode estar gravado como texto"""
+    pipeline = [
+        {"$match": {"email": email}},
+        {"$limit": 1},
+        {"$addFields": {"instituicaoOid": {"$convert": {"input": "$instituicaoId", "to": "objectId", "onError": None}}}},
+        {"$lookup": {"from": instituicoes_collection.name, "localField": "instituicaoOid", "foreignField": "_id",
+                     "as": "instituicao"}},
+    ]
+    async for user in usuarios_collection.aggregate(pipeline):
+        user.pop("instituicaoOid", None)
+        instituicoes = user.pop("instituicao")
+        return user, instituicoes[0] if instituicoes else None
+    return None, None
+
+async def registrar_login(user_id: Any, novo_hash: Optional[str]) -> None:
+    """ultimoLogin (e a senha com o novo custo do bcrypt, se mudou), sem atrasar a resposta do login"""
+    campos = {"ultimoLogin": datetime.utcnow()}
+    if novo_hash:
+        campos["senha"] = novo_hash
+    try:
+        await usuarios_collection.update_one({"_id": user_id}, {"$set": campos})
+        if novo_hash:
+            log.info("Senha atualizada para o custo atual do bcrypt",
+                     extra={"usuario_id": str(user_id), "rounds": verificador_senhas.rounds})
+    except Exception as e:
+        log.error("Erro ao registar o login", extra={"usuario_id": str(user_id), "erro": str(e)})
 
 async def authenticate_user(email: str, senha: str, codigo_instituicao: str):
-    from bson import ObjectId
-    user = await get_user_by_email(email)
-    if not user:
-        return False
-    
-    if not verify_password(senha, user.get("senha", "")):
-        return False
-    
-    # Verificar código da instituição
-    instituicao_id = user.get("instituicaoId")
-    if isinstance(instituicao_id, str):
-        instituicao_id = ObjectId(instituicao_id)
-    
-    instituicao = await instituicoes_collection.find_one({"_id": instituicao_id})
-    if not instituicao:
-        return False
-    
-    codigo_instituicao_upper = codigo_instituicao.upper()
-    codigo_db = instituicao.get("codigoAcesso", "").upper()
-    
-    if codigo_instituicao_upper != codigo_db:
-        return False
-    
-    if not user.get("ativo", False):
-        return False
+    """(utilizador, instituição) se as credenciais forem válidas, senão None"""
+    user, instituicao = await get_user_by_email(email)
+    # As verificações baratas primeiro, mas o bcrypt corre sempre: o tempo de resposta não revela o que falhou
+    valido = bool(
+        user and instituicao
+        and codigo_instituicao.upper() == instituicao.get("codigoAcesso", "").upper()
+        and user.get("ativo", False)
+    )
+    senha_valida, novo_hash = await verificador_senhas.verificar(senha, user.get("senha") if valido else None)
+    if not senha_valida:
+        return None
     
-    return user
+    tarefa = asyncio.create_task(registrar_login(user["_id"], novo_hash))
+    tarefas_login.add(tarefa)
+    tarefa.add_done_callback(tarefas_login.discard)
+    return user, instituicao
 
 class AnalysisRequest(BaseModel):
     tipoEntrada: str
     linkOportunidade: Optional[str] = None
     textoPublicacao: Optional[str] = None
 
+class AnalysisBatchRequest(BaseModel):
+    itens: list[AnalysisRequest]
+    concorrenciaFetch: Optional[int] = None
+    concorrenciaLLM: Optional[int] = None
+
 class RecomendacaoItem(BaseModel):
     titulo: str
     explicacao: str
@@ -324,6 +487,8 @@ class VagaCompleta(BaseModel):
     url_vaga: Optional[str] = None
     texto_original: Optional[str] = None
     tipo_entrada: str
+    # Texto enviado ao modelo, quando difere do original (indexado nos quase-duplicados)
+    conteudo_analisado: Optional[str] = None
     
     # Dados extraídos da vaga
     titulo: Optional[str] = None
@@ -345,6 +510,15 @@ class VagaCompleta(BaseModel):
     recomendacoes: list[str]
     recomendacoes_detalhadas: Optional[list[RecomendacaoItem]] = None
     detalhes_risco: Dict[str, int]
+    # Decidida pela reputação do domínio (não conta para a reputação)
+    atalho_reputacao: bool = False
+    # Veredicto reutilizado desta vaga quase idêntica (também não conta para a reputação)
+    vaga_original: Optional[str] = None
+    
+    # Campos derivados para consultas por índice (ver indices_vagas.py)
+    dominio: Optional[str] = None
+    empresa_chave: Optional[str] = None
+    risco_alto: bool = False
     
     # Metadados
     data_analise: datetime
@@ -359,45 +533,85 @@ class AnalysisResult(BaseModel):
     detalhes: Dict[str, int]
     textosSuspeitos: Optional[Dict[str, Optional[str]]] = None
     explicacoesDetalhes: Optional[Dict[str, Optional[str]]] = None
+    # Análise de recurso (modelo indisponível ou resposta inválida): não é gravada nem guardada em cache
+    fallback: bool = False
+    # Decidida pela reputação do domínio, sem análise do conteúdo: gravada, mas não conta para a reputação
+    atalhoReputacao: bool = False
+
+# Títulos das recomendações acrescentadas com base na confiabilidade da URL
+TITULO_RECOMENDACAO_PORTAL = "Portal de empregos conhecido - mas mantenha cautela"
+TITULO_RECOMENDACAO_CONFIAVEL = "URL de fonte confiável identificada"
+TITULOS_RECOMENDACAO_CONFIANCA = {TITULO_RECOMENDACAO_PORTAL, TITULO_RECOMENDACAO_CONFIAVEL}
 
 class Website:
     """Classe para extração de conteúdo web"""
     
-    def __init__(self, url: str):
+    def __init__(self, url: str, title: str, text: str):
         self.url = url
-        
-        # Usar cache se disponível
-        if url in _cache:
-            cached = _cache[url]
-            self.title = cached['title']
-            self.text = cached['text']
-            return
+        self.title = title
+        self.text = text
+    
+    @classmethod
+    def _de_entrada(cls, url: str, entrada: Dict[str, Any]) -> "Website":
+        if entrada["erro"] is not None:
+            return cls(url, "Erro ao carregar", f"Erro ao acessar URL: {entrada['erro']}")
+        return cls(url, entrada["dados"]["title"], entrada["dados"]["text"])
+    
+    @classmethod
+    async def carregar(cls, url: str) -> "Website":
+        """Baixa a página sem bloquear o event loop e extrai o conteúdo numa thread"""
+        # Usar cache se disponível (primeiro em memória, depois o partilhado)
+        entrada, fresca = cache_paginas.obter(url)
+        if entrada is None and cache_paginas_compartilhado:
+            entrada = await cache_paginas_compartilhado.obter(url)
+            if entrada is not None:
+                cache_paginas.restaurar(url, entrada)
+                fresca = entrada["expira_em"] > time.time()
+        if entrada is not None and fresca:
+            return cls._de_entrada(url, entrada)
         
         try:
-            response = requests.get(url, headers=HEADERS, timeout=10)
-            response.raise_for_status()
+            with etapa("obtencao"):
+                response, corpo, truncado = await cliente_http.buscar_pagina(
+                    url, headers=cabecalhos_condicionais(entrada), max_bytes=PAGINA_MAX_BYTES
+                )
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # Página não mudou desde a última visita: reutilizar o conteúdo guardado
+            if response.status_code == 304 and entrada is not None:
+                entrada = cache_paginas.renovar(url) or entrada
+                if cache_paginas_compartilhado:
+                    await cache_paginas_compartilhado.guardar(url, entrada)
+                return cls._de_entrada(url, entrada)
             
-            # Extrair título
-            self.title = soup.title.string if soup.title else "No title found"
+            response.raise_for_status()
+            bytes_paginas.observar(len(corpo))
             
-            # Extrair texto limpo
-            if soup.body:
-                for tag in soup.body(["script", "style", "img", "input", "noscript", "iframe"]):
-                    tag.decompose()
-                self.text = soup.body.get_text(separator="\n", strip=True)
-            else:
-                self.text = ""
+            if truncado:
+                log.warning("Página truncada", extra={"url": url, "max_bytes": PAGINA_MAX_BYTES})
             
-            # Guardar no cache
-            _cache[url] = {
-                'title': self.title,
-                'text': self.text
-            }
+            # A extração é CPU-bound: executar fora do event loop
+            with etapa("extracao"):
+                title, text = await asyncio.to_thread(cls._extrair_conteudo, corpo, response.charset_encoding)
+            
+            # Guardar no cache com os validadores para revalidação condicional
+            entrada = cache_paginas.guardar(
+                url,
+                {'title': title, 'text': text},
+                etag=response.headers.get('etag'),
+                last_modified=response.headers.get('last-modified')
+            )
         except Exception as e:
-            self.title = "Erro ao carregar"
-            self.text = f"Erro ao acessar URL: {str(e)}"
+            # Cache negativo: falhas ficam guardadas por pouco tempo
+            entrada = cache_paginas.guardar_falha(url, str(e))
+        
+        if cache_paginas_compartilhado:
+            await cache_paginas_compartilhado.guardar(url, entrada)
+        return cls._de_entrada(url, entrada)
+    
+    @staticmethod
+    def _extrair_conteudo(html: bytes, charset: Optional[str] = None) -> tuple[str, str]:
+        # Tokenizador por eventos: sem árvore DOM, com o conteúdo da vaga (JSON-LD, main/article) primeiro
+        return extrair_pagina(decodificar(html, charset))
 
 def extract_json(text: str) -> Optional[Dict]:
     """Extrai JSON de forma robusta do texto da resposta"""
@@ -416,7 +630,7 @@ def extract_json(text: str) -> Optional[Dict]:
         
         return json.loads(json_str)
     except (ValueError, json.JSONDecodeError) as e:
-        print(f"Erro ao extrair JSON: {e}")
+        log.error("Erro ao extrair JSON", extra={"erro": str(e)})
         return None
 
 def get_recomendacoes_genericas() -> list[RecomendacaoItem]:
@@ -444,10 +658,8 @@ def get_recomendacoes_genericas() -> list[RecomendacaoItem]:
         )
     ]
 
-def analisar_oportunidade_llm(conteudo: str) -> tuple[AnalysisResult, dict]:
-    """Analisa oportunidade usando LLM"""
-    
-    system_prompt = """Você é um especialista em análise de riscos de tráfico humano e golpes em oportunidades de emprego.
+# Prompt de sistema da análise (ao alterá-lo, incrementar PROMPT_VERSION)
+SYSTEM_PROMPT_ANALISE = """Você é um especialista em análise de riscos de tráfico humano e golpes em oportunidades de emprego.
 
 Analise o conteúdo fornecido e:
 1. Extraia TODOS os dados da vaga de emprego
@@ -532,117 +744,75 @@ Retorne APENAS um JSON com a seguinte estrutura:
     }
 }"""
 
-    try:
-        # Limitar o tamanho do conteúdo para evitar problemas
-        conteudo_limitado = conteudo[:8000] if len(conteudo) > 8000 else conteudo
-        
-        prompt_completo = system_prompt + "\n\nConteúdo para análise:\n" + conteudo_limitado
-        
-        # Gerar conteúdo com o modelo
-        response = model.generate_content(prompt_completo)
+def montar_prompt_analise(conteudo: str) -> str:
+    # O conteúdo já chega reduzido ao orçamento de tokens por reduzir_conteudo
+    return SYSTEM_PROMPT_ANALISE + "\n\nConteúdo para análise:\n" + conteudo
+
+def interpretar_resposta_llm(texto: str) -> tuple[AnalysisResult, dict]:
+    """Converte o texto completo gerado pelo modelo no resultado da análise"""
+    result = extract_json(texto)
+    
+    if not result:
+        raise Exception("Não foi possível extrair JSON da resposta do modelo")
+    
+    if result and 'analiseRisco' in result:
+        analise = result['analiseRisco']
+        dados_vaga = result.get('dadosVaga', {})
         
-        if not response or not response.text:
-            raise Exception("Resposta vazia do modelo")
+        nivel_risco = analise.get('nivelRisco', 'MEDIO')
         
-        print(f"Resposta do modelo recebida (tamanho: {len(response.text)})")
-        print(f"Primeiros 200 caracteres: {response.text[:200]}")
-            
-        result = extract_json(response.text)
-        
-        if not result:
-            raise Exception("Não foi possível extrair JSON da resposta do modelo")
+        # Processar recomendações detalhadas
+        recomendacoes_detalhadas = [
+            RecomendacaoItem(
+                titulo=rec.get('titulo', ''),
+                explicacao=rec.get('explicacao', ''),
+                paragrafoProblematico=rec.get('paragrafoProblematico')
+            ) for rec in analise.get('recomendacoesDetalhadas', [])
+        ]
         
-        if result and 'analiseRisco' in result:
-            analise = result['analiseRisco']
-            dados_vaga = result.get('dadosVaga', {})
-            
-            nivel_risco = analise.get('nivelRisco', 'MEDIO')
-            
-            # Processar recomendações detalhadas
-            recomendacoes_detalhadas = [
-                RecomendacaoItem(
-                    titulo=rec.get('titulo', ''),
-                    explicacao=rec.get('explicacao', ''),
-                    paragrafoProblematico=rec.get('paragrafoProblematico')
-                ) for rec in analise.get('recomendacoesDetalhadas', [])
-            ]
-            
-            # Se não houver recomendações específicas e o nível de risco for BAIXO ou MÉDIO,
-            # adicionar recomendações genéricas de segurança
-            if not recomendacoes_detalhadas and nivel_risco in ['BAIXO', 'MEDIO']:
-                recomendacoes_detalhadas = get_recomendacoes_genericas()
-                # Também atualizar recomendações simples
-                recomendacoes_simples = analise.get('recomendacoes', [])
-                if not recomendacoes_simples:
-                    recomendacoes_simples = [rec.titulo for rec in recomendacoes_detalhadas]
-            else:
-                recomendacoes_simples = analise.get('recomendacoes', [])
-            
-            return AnalysisResult(
-                nivelRisco=nivel_risco,
-                pontuacao=analise.get('pontuacao', 50),
-                alertas=analise.get('alertas', []),
-                recomendacoes=recomendacoes_simples,
-                recomendacoesDetalhadas=recomendacoes_detalhadas,
-                detalhes=analise.get('detalhes', {
-                    "tituloSuspeito": 0,
-                    "empresaSuspeita": 0,
-                    "descricaoVaga": 0,
-                    "requisitosVagos": 0,
-                    "salarioIrreal": 0,
-                    "contatoSuspeito": 0,
-                    "plataformaSuspeita": 0,
-                    "urlSuspeita": 0
-                }),
-                textosSuspeitos={k: v for k, v in analise.get('textosSuspeitos', {}).items() if v is not None},
-                explicacoesDetalhes={k: v for k, v in analise.get('explicacoesDetalhes', {}).items() 
-                                     if v is not None and analise.get('detalhes', {}).get(k, 0) >= 31}
-            ), dados_vaga
+        # Se não houver recomendações específicas e o nível de risco for BAIXO ou MÉDIO,
+        # adicionar recomendações genéricas de segurança
+        if not recomendacoes_detalhadas and nivel_risco in ['BAIXO', 'MEDIO']:
+            recomendacoes_detalhadas = get_recomendacoes_genericas()
+            # Também atualizar recomendações simples
+            recomendacoes_simples = analise.get('recomendacoes', [])
+            if not recomendacoes_simples:
+                recomendacoes_simples = [rec.titulo for rec in recomendacoes_detalhadas]
         else:
-            # Fallback se não conseguir extrair JSON - incluir recomendações genéricas
-            recomendacoes_fallback = get_recomendacoes_genericas()
-            return AnalysisResult(
-                nivelRisco="MEDIO",
-                pontuacao=50,
-                alertas=["Erro na análise automática"],
-                recomendacoes=[rec.titulo for rec in recomendacoes_fallback] + ["Verifique manualmente a oportunidade"],
-                recomendacoesDetalhadas=recomendacoes_fallback + [
-                    RecomendacaoItem(
-                        titulo="Verifique manualmente a oportunidade",
-                        explicacao="Não foi possível realizar a análise automática completa. Por favor, revise cuidadosamente a oportunidade antes de tomar qualquer decisão.",
-                        paragrafoProblematico=None
-                    )
-                ],
-                detalhes={
-                    "tituloSuspeito": 0,
-                    "empresaSuspeita": 0,
-                    "descricaoVaga": 0,
-                    "requisitosVagos": 0,
-                    "salarioIrreal": 0,
-                    "contatoSuspeito": 0,
-                    "plataformaSuspeita": 0,
-                    "urlSuspeita": 0
-                },
-                textosSuspeitos={},
-                explicacoesDetalhes={}
-            ), {}
-    except Exception as e:
-        print(f"Erro na análise LLM: {e}")
-        print(f"Tipo do erro: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
+            recomendacoes_simples = analise.get('recomendacoes', [])
         
-        # Incluir recomendações genéricas mesmo em caso de erro
-        recomendacoes_erro = get_recomendacoes_genericas()
+        return AnalysisResult(
+            nivelRisco=nivel_risco,
+            pontuacao=analise.get('pontuacao', 50),
+            alertas=analise.get('alertas', []),
+            recomendacoes=recomendacoes_simples,
+            recomendacoesDetalhadas=recomendacoes_detalhadas,
+            detalhes=analise.get('detalhes', {
+                "tituloSuspeito": 0,
+                "empresaSuspeita": 0,
+                "descricaoVaga": 0,
+                "requisitosVagos": 0,
+                "salarioIrreal": 0,
+                "contatoSuspeito": 0,
+                "plataformaSuspeita": 0,
+                "urlSuspeita": 0
+            }),
+            textosSuspeitos={k: v for k, v in analise.get('textosSuspeitos', {}).items() if v is not None},
+            explicacoesDetalhes={k: v for k, v in analise.get('explicacoesDetalhes', {}).items() 
+                                 if v is not None and analise.get('detalhes', {}).get(k, 0) >= 31}
+        ), dados_vaga
+    else:
+        # Fallback se não conseguir extrair JSON - incluir recomendações genéricas
+        recomendacoes_fallback = get_recomendacoes_genericas()
         return AnalysisResult(
             nivelRisco="MEDIO",
             pontuacao=50,
-            alertas=[f"Erro na análise: {str(e)}"],
-            recomendacoes=[rec.titulo for rec in recomendacoes_erro] + ["Verifique manualmente a oportunidade"],
-            recomendacoesDetalhadas=recomendacoes_erro + [
+            alertas=["Erro na análise automática"],
+            recomendacoes=[rec.titulo for rec in recomendacoes_fallback] + ["Verifique manualmente a oportunidade"],
+            recomendacoesDetalhadas=recomendacoes_fallback + [
                 RecomendacaoItem(
                     titulo="Verifique manualmente a oportunidade",
-                    explicacao=f"Ocorreu um erro durante a análise automática ({str(e)}). Por favor, revise cuidadosamente a oportunidade antes de tomar qualquer decisão e considere consultar autoridades competentes se identificar sinais suspeitos.",
+                    explicacao="Não foi possível realizar a análise automática completa. Por favor, revise cuidadosamente a oportunidade antes de tomar qualquer decisão.",
                     paragrafoProblematico=None
                 )
             ],
@@ -657,17 +827,339 @@ Retorne APENAS um JSON com a seguinte estrutura:
                 "urlSuspeita": 0
             },
             textosSuspeitos={},
-            explicacoesDetalhes={}
+            explicacoesDetalhes={},
+            fallback=True
         ), {}
 
+def analise_de_erro(e: Exception) -> tuple[AnalysisResult, dict]:
+    """Resultado de recurso quando a chamada ao modelo falha"""
+    # Incluir recomendações genéricas mesmo em caso de erro
+    recomendacoes_erro = get_recomendacoes_genericas()
+    return AnalysisResult(
+        nivelRisco="MEDIO",
+        pontuacao=50,
+        alertas=[f"Erro na análise: {str(e)}"],
+        recomendacoes=[rec.titulo for rec in recomendacoes_erro] + ["Verifique manualmente a oportunidade"],
+        recomendacoesDetalhadas=recomendacoes_erro + [
+            RecomendacaoItem(
+                titulo="Verifique manualmente a oportunidade",
+                explicacao=f"Ocorreu um erro durante a análise automática ({str(e)}). Por favor, revise cuidadosamente a oportunidade antes de tomar qualquer decisão e considere consultar autoridades competentes se identificar sinais suspeitos.",
+                paragrafoProblematico=None
+            )
+        ],
+        detalhes={
+            "tituloSuspeito": 0,
+            "empresaSuspeita": 0,
+            "descricaoVaga": 0,
+            "requisitosVagos": 0,
+            "salarioIrreal": 0,
+            "contatoSuspeito": 0,
+            "plataformaSuspeita": 0,
+            "urlSuspeita": 0
+        },
+        textosSuspeitos={},
+        explicacoesDetalhes={},
+        fallback=True
+    ), {}
+
+async def analisar_oportunidade_llm(conteudo: str) -> tuple[AnalysisResult, dict]:
+    """Analisa oportunidade usando LLM"""
+    try:
+        prompt_completo = montar_prompt_analise(conteudo)
+        
+        # Gerar conteúdo com o modelo (quota, repetições e prazo no cliente resiliente)
+        with etapa("llm"):
+            texto = await cliente_llm.gerar(prompt_completo)
+        
+        log.info("Resposta do modelo recebida", extra={"tamanho": len(texto)})
+        log.debug("Início da resposta do modelo", extra={"inicio": texto[:200]})
+        
+        with etapa("interpretacao"):
+            return interpretar_resposta_llm(texto)
+    except Exception as e:
+        log.exception("Erro na análise LLM", extra={"erro": str(e), "tipo_erro": type(e).__name__})
+        return analise_de_erro(e)
+
+def evento_parcial(caminho: tuple, valor: Any) -> Optional[tuple[str, dict]]:
+    """Converte um valor do JSON parcial do modelo num evento para o cliente"""
+    if len(caminho) == 2 and caminho[0] == "dadosVaga":
+        return "dadosVaga", {"campo": caminho[1], "valor": valor}
+    if caminho == ("analiseRisco", "nivelRisco"):
+        return "nivelRisco", {"nivelRisco": valor}
+    if caminho == ("analiseRisco", "pontuacao"):
+        return "pontuacao", {"pontuacao": valor}
+    if len(caminho) == 3 and caminho[:2] == ("analiseRisco", "alertas"):
+        return "alerta", {"indice": caminho[2], "texto": valor}
+    return None
+
+def eventos_de_resultado(resultado: AnalysisResult, dados_vaga: dict) -> list[tuple[str, dict]]:
+    """Eventos parciais equivalentes para uma análise reutilizada (cache ou quase-duplicado)"""
+    valores = [(("dadosVaga", campo), valor) for campo, valor in dados_vaga.items()]
+    valores.append((("analiseRisco", "nivelRisco"), resultado.nivelRisco))
+    valores.append((("analiseRisco", "pontuacao"), resultado.pontuacao))
+    valores.extend((("analiseRisco", "alertas", i), alerta) for i, alerta in enumerate(resultado.alertas))
+    eventos = [evento_parcial(caminho, valor) for caminho, valor in valores]
+    return [evento for evento in eventos if evento]
+
+def evento_sse(nome: str, dados: Any) -> str:
+    return f"event: {nome}\ndata: {json.dumps(dados, default=str, ensure_ascii=False)}\n\n"
+
+def resultado_da_triagem(triagem: dict) -> AnalysisResult:
+    """Resultado completo a partir da triagem por regras, quando esta dispensa o LLM"""
+    primeiro_trecho: Dict[str, str] = {}
+    for trecho in triagem["trechos"]:
+        primeiro_trecho.setdefault(trecho["criterio"], trecho["texto"])
+    
+    alertas = []
+    recomendacoes_detalhadas = []
+    explicacoes = {}
+    for criterio in triagem["criterios"]:
+        info = CRITERIOS[criterio]
+        trecho = primeiro_trecho.get(criterio)
+        alertas.append(f'{info["alerta"]}: "{trecho}"' if trecho else info["alerta"])
+        recomendacoes_detalhadas.append(RecomendacaoItem(
+            titulo=info["alerta"],
+            explicacao=info["explicacao"],
+            paragrafoProblematico=trecho
+        ))
+        if triagem["detalhes"][info["campo"]] >= 31:
+            explicacoes.setdefault(info["campo"], info["explicacao"])
+    
+    if triagem["decisao"] == "BENIGNO":
+        nivel_risco = "BAIXO"
+        recomendacoes_detalhadas = get_recomendacoes_genericas()
+    else:
+        nivel_risco = "CRITICO"
+    
+    return AnalysisResult(
+        nivelRisco=nivel_risco,
+        pontuacao=triagem["pontuacao"],
+        alertas=alertas,
+        recomendacoes=[rec.titulo for rec in recomendacoes_detalhadas],
+        recomendacoesDetalhadas=recomendacoes_detalhadas,
+        detalhes=dict(triagem["detalhes"]),
+        textosSuspeitos=dict(triagem["textosSuspeitos"]),
+        explicacoesDetalhes=explicacoes
+    )
+
+def resultado_da_reputacao(reputacao: dict) -> AnalysisResult:
+    """Resultado a partir do histórico do domínio, quando este dispensa a análise do conteúdo"""
+    percentagem = round(reputacao["proporcao_alto_risco"] * 100)
+    alerta = (f"O domínio {reputacao['dominio']} já foi analisado {reputacao['analises']} vezes e "
+              f"{percentagem}% das vagas foram classificadas com risco ALTO ou CRITICO")
+    recomendacoes_detalhadas = [
+        RecomendacaoItem(
+            titulo="Domínio com histórico de golpes",
+            explicacao=f"{alerta}. Não envie dados pessoais nem pagamentos a partir deste site e confirme a vaga "
+                       f"diretamente com a empresa por um canal oficial.",
+            paragrafoProblematico=None
+        )
+    ] + get_recomendacoes_genericas()
+    pontuacao = round(reputacao["pontuacao_media"] or 0)
+    return AnalysisResult(
+        nivelRisco="CRITICO" if pontuacao >= 80 else "ALTO",
+        pontuacao=pontuacao,
+        alertas=[alerta],
+        recomendacoes=[rec.titulo for rec in recomendacoes_detalhadas],
+        recomendacoesDetalhadas=recomendacoes_detalhadas,
+        detalhes={
+            "tituloSuspeito": 0,
+            "empresaSuspeita": 0,
+            "descricaoVaga": 0,
+            "requisitosVagos": 0,
+            "salarioIrreal": 0,
+            "contatoSuspeito": 0,
+            "plataformaSuspeita": 0,
+            "urlSuspeita": 100
+        },
+        textosSuspeitos={},
+        explicacoesDetalhes={"urlSuspeita": alerta},
+        atalhoReputacao=True
+    )
+
+def texto_para_indice(vaga: dict) -> Optional[str]:
+    """
+    Texto usado no índice de quase-duplicados (apenas vagas com dados extraídos pelo LLM): o
+    conteúdo reduzido enviado ao modelo, o mesmo com que buscar_analise_semelhante consulta
+    """
+    if not any(vaga.get(campo) for campo in ("titulo", "empresa", "descricao")):
+        return None
+    # A descrição só resta nas vagas gravadas antes de conteudo_analisado existir
+    return vaga.get("conteudo_analisado") or vaga.get("texto_original") or vaga.get("descricao")
+
+async def registrar_no_indice_duplicados(vaga_id: str, vaga: dict) -> None:
+    """Adiciona uma vaga ao índice em memória e persiste a sua assinatura"""
+    texto = texto_para_indice(vaga)
+    if not texto:
+        return
+    assinatura = assinatura_minhash(texto)
+    if not assinatura:
+        return
+    indice_duplicados.adicionar(vaga_id, assinatura)
+    try:
+        await vagas_minhash_collection.replace_one(
+            {"_id": vaga_id},
+            {"_id": vaga_id, "assinatura": assinatura},
+            upsert=True
+        )
+    except Exception as e:
+        log.error("Erro ao guardar assinatura MinHash", extra={"erro": str(e)})
+
+async def migrar_colecao_vagas() -> None:
+    """Índices da coleção vagas, campos derivados nas vagas antigas e estatísticas materializadas"""
+    try:
+        await migrar_vagas(vagas_collection)
+        if await garantir_estatisticas(vagas_collection, vagas_estatisticas_collection) is not None:
+            # Estatísticas reconstruídas: não esperar pela próxima recarga periódica da reputação
+            await reputacao_dominios.carregar()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.error("Erro na migração da coleção vagas", extra={"erro": str(e)})
+
+async def carregar_indice_duplicados(tamanho_lote: int = 1000) -> None:
+    """Carrega as assinaturas gravadas e calcula as das vagas que ainda não as têm"""
+    try:
+        async for doc in vagas_minhash_collection.find({}):
+            indice_duplicados.adicionar(doc["_id"], bytes(doc["assinatura"]))
+        
+        pendentes = []
+        projecao = {"titulo": 1, "empresa": 1, "descricao": 1, "texto_original": 1, "conteudo_analisado": 1}
+        async for vaga in vagas_collection.find({}, projecao):
+            vaga_id = str(vaga["_id"])
+            if vaga_id in indice_duplicados:
+                continue
+            texto = texto_para_indice(vaga)
+            if texto:
+                pendentes.append((vaga_id, texto))
+            if len(pendentes) >= tamanho_lote:
+                await _indexar_lote(pendentes)
+                pendentes = []
+        if pendentes:
+            await _indexar_lote(pendentes)
+        log.info("Índice de quase-duplicados carregado", extra={"vagas": len(indice_duplicados)})
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.error("Erro ao carregar índice de quase-duplicados", extra={"erro": str(e)})
+
+async def _indexar_lote(pendentes: list[tuple[str, str]]) -> None:
+    assinaturas = await asyncio.to_thread(lambda: [assinatura_minhash(texto) for _, texto in pendentes])
+    documentos = []
+    for (vaga_id, _), assinatura in zip(pendentes, assinaturas):
+        if assinatura:
+            indice_duplicados.adicionar(vaga_id, assinatura)
+            documentos.append({"_id": vaga_id, "assinatura": assinatura})
+    if documentos:
+        from pymongo.errors import BulkWriteError
+        try:
+            await vagas_minhash_collection.insert_many(documentos, ordered=False)
+        except BulkWriteError:
+            # Assinaturas gravadas em paralelo por salvar_vaga_no_banco
+            pass
+
+def analise_de_vaga_gravada(vaga: dict) -> tuple[AnalysisResult, dict]:
+    """Reconstrói o resultado e os dados da vaga a partir de um documento gravado"""
+    recomendacoes_detalhadas = [
+        RecomendacaoItem(**rec) for rec in vaga.get("recomendacoes_detalhadas") or []
+        if rec.get("titulo") not in TITULOS_RECOMENDACAO_CONFIANCA
+    ]
+    resultado = AnalysisResult(
+        nivelRisco=vaga.get("nivel_risco", "MEDIO"),
+        pontuacao=vaga.get("pontuacao_risco", 50),
+        alertas=vaga.get("alertas", []),
+        recomendacoes=vaga.get("recomendacoes", []),
+        recomendacoesDetalhadas=recomendacoes_detalhadas,
+        detalhes=vaga.get("detalhes_risco", {})
+    )
+    dados_vaga = {
+        "titulo": vaga.get("titulo"),
+        "empresa": vaga.get("empresa"),
+        "descricao": vaga.get("descricao"),
+        "requisitos": vaga.get("requisitos"),
+        "remuneracao": vaga.get("remuneracao"),
+        "localizacao": vaga.get("localizacao"),
+        "tipoOportunidade": vaga.get("tipo_oportunidade"),
+        "beneficios": vaga.get("beneficios"),
+        "contatos": vaga.get("contatos"),
+        "plataforma": vaga.get("plataforma")
+    }
+    return resultado, dados_vaga
+
+async def buscar_analise_semelhante(reduzido: str) -> Optional[tuple[AnalysisResult, dict, dict]]:
+    """
+    Procura uma análise anterior de conteúdo quase idêntico (pelo conteúdo reduzido, como no índice).
+    Só o veredicto é reutilizado: os dados da vaga (empresa, contatos...) foram extraídos de outro
+    texto e não são atribuídos a este.
+    """
+    assinatura = assinatura_minhash(reduzido)
+    if not assinatura:
+        return None
+    encontrada = indice_duplicados.consultar(assinatura)
+    if not encontrada:
+        return None
+    
+    from bson import ObjectId
+    vaga_id, sim = encontrada
+    try:
+        vaga = await vagas_collection.find_one({"_id": ObjectId(vaga_id)})
+    except Exception as e:
+        log.error("Erro ao obter vaga semelhante", extra={"erro": str(e)})
+        return None
+    if not vaga:
+        return None
+    
+    resultado, _ = analise_de_vaga_gravada(vaga)
+    return resultado, {}, {"vagaId": vaga_id, "similaridade": round(sim, 3)}
+
+async def gravar_analise(request: AnalysisRequest, resultado: AnalysisResult, dados_vaga: dict,
+                         url_trust_info: Optional[Dict[str, Any]], reduzido: str, info: dict) -> Optional[str]:
+    """Grava a vaga analisada; análises de recurso não são gravadas como se fossem reais"""
+    if resultado.fallback:
+        log.info("Análise de recurso: a vaga não é gravada")
+        return None
+    vaga_id = await salvar_vaga_no_banco(montar_vaga(request, resultado, dados_vaga, url_trust_info, reduzido, info))
+    if vaga_id:
+        log.info("Vaga salva no banco", extra={"vaga_id": vaga_id})
+    return vaga_id
+
+async def atualizar_estatisticas(documentos: list[dict]) -> None:
+    """Incrementa as estatísticas do painel; uma falha não impede a gravação da vaga"""
+    try:
+        await registrar_estatisticas(vagas_estatisticas_collection, documentos)
+        reputacao_dominios.registrar(documentos)
+    except Exception as e:
+        log.error("Erro ao atualizar estatísticas das vagas (corrigir com 'python estatisticas_vagas.py reconstruir')", extra={"erro": str(e)})
+    # Depois dos contadores, para a cache não guardar valores antigos; a listagem mudou mesmo que falhem
+    cache_dashboard.invalidar()
+
+async def salvar_vagas_no_banco(vagas_data: list[dict]) -> list[str]:
+    """Salva várias vagas com um único insert_many e retorna os IDs"""
+    try:
+        documentos = [VagaCompleta(**{**vaga_data, **campos_derivados(vaga_data)}).dict() for vaga_data in vagas_data]
+        with etapa("gravacao"):
+            result = await vagas_collection.insert_many(documentos, ordered=False)
+            vaga_ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+            await atualizar_estatisticas(documentos)
+            for vaga_id, vaga_data in zip(vaga_ids, vagas_data):
+                await registrar_no_indice_duplicados(vaga_id, vaga_data)
+        return vaga_ids
+    except Exception as e:
+        log.error("Erro ao salvar lote no banco", extra={"erro": str(e)})
+        return []
+
 async def salvar_vaga_no_banco(vaga_data: dict) -> str:
     """Salva a vaga no MongoDB e retorna o ID"""
     try:
-        vaga_doc = VagaCompleta(**vaga_data)
-        result = await vagas_collection.insert_one(vaga_doc.dict())
-        return str(result.inserted_id)
+        documento = VagaCompleta(**{**vaga_data, **campos_derivados(vaga_data)}).dict()
+        with etapa("gravacao"):
+            result = await vagas_collection.insert_one(documento)
+            vaga_id = str(result.inserted_id)
+            await atualizar_estatisticas([documento])
+            await registrar_no_indice_duplicados(vaga_id, vaga_data)
+        return vaga_id
     except Exception as e:
-        print(f"Erro ao salvar no banco: {e}")
+        log.error("Erro ao salvar no banco", extra={"erro": str(e)})
         return None
 
 @app.get("/")
@@ -678,39 +1170,27 @@ async def root():
 async def login(request: LoginRequest):
     """Endpoint de autenticação"""
     try:
-        user = await authenticate_user(
+        autenticado = await authenticate_user(
             request.email, 
             request.senha, 
             request.instituicaoId
         )
         
-        if not user:
+        if not autenticado:
             raise HTTPException(
                 status_code=401,
                 detail="Credenciais inválidas. Verifique seu email, senha e código da instituição."
             )
         
-        # Buscar informações da instituição
-        from bson import ObjectId
-        instituicao_id = user.get("instituicaoId")
-        if isinstance(instituicao_id, str):
-            instituicao_id = ObjectId(instituicao_id)
-        
-        instituicao = await instituicoes_collection.find_one({"_id": instituicao_id})
-        instituicao_nome = instituicao.get("nome", "Instituição") if instituicao else "Instituição"
-        
-        # Atualizar último login
-        user_id_obj = user["_id"]
-        if isinstance(user_id_obj, str):
-            user_id_obj = ObjectId(user_id_obj)
-        
-        await usuarios_collection.update_one(
-            {"_id": user_id_obj},
-            {"$set": {"ultimoLogin": datetime.utcnow()}}
-        )
+        # A instituição veio com o utilizador; ultimoLogin é atualizado em segundo plano
+        user, instituicao = autenticado
+        instituicao_id = instituicao["_id"]
+        instituicao_nome = instituicao.get("nome", "Instituição")
         
         # Criar token
         user_id_str = str(user["_id"]) if not isinstance(user["_id"], str) else user["_id"]
+        # Um utilizador reativado pode ainda estar na cache negativa
+        cache_autenticacao.invalidar_utilizador(user_id_str)
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             data={"sub": user_id_str, "email": user["email"]},
@@ -731,319 +1211,665 @@ async def login(request: LoginRequest):
         )
     except HTTPException:
         raise
+    except SobrecargaSenhas as e:
+        log.warning("Login recusado por sobrecarga", extra={"erro": str(e)})
+        raise HTTPException(status_code=503, detail="Demasiados logins em simultâneo. Tente novamente.",
+                            headers={"Retry-After": "1"})
     except Exception as e:
-        print(f"Erro no login: {e}")
+        log.error("Erro no login", extra={"erro": str(e)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
+@app.get("/auth/me", response_model=UserResponse)
+async def utilizador_autenticado(utilizador: Dict[str, Any] = Depends(utilizador_atual)):
+    """Utilizador do token, para o frontend validar a sessão guardada"""
+    return UserResponse(**utilizador, ativo=True)
+
+@app.post("/usuarios/{usuario_id}/desativar")
+async def desativar_usuario(usuario_id: str, utilizador: Dict[str, Any] = Depends(utilizador_atual)):
+    """Desativa um utilizador da mesma instituição; os seus tokens deixam de ser aceites de imediato"""
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    if utilizador["perfil"] not in PERFIS_GESTAO_UTILIZADORES:
+        raise HTTPException(status_code=403, detail="Sem permissão para gerir utilizadores")
+    try:
+        usuario_oid = ObjectId(usuario_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Utilizador não encontrado")
+    try:
+        resultado = await usuarios_collection.update_one(
+            {"_id": usuario_oid, "instituicaoId": {"$in": [ObjectId(utilizador["instituicaoId"]), utilizador["instituicaoId"]]}},
+            {"$set": {"ativo": False}}
+        )
+    except Exception as e:
+        log.error("Erro ao desativar utilizador", extra={"erro": str(e)})
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+    if not resultado.matched_count:
+        raise HTTPException(status_code=404, detail="Utilizador não encontrado")
+    # Neste worker já no próximo pedido; nos restantes ao fim de AUTH_CACHE_TTL_SEGUNDOS
+    cache_autenticacao.invalidar_utilizador(usuario_id)
+    return {"id": usuario_id, "ativo": False}
+
+@app.get("/auth/cache")
+async def estatisticas_autenticacao():
+    """Acertos e consultas da cache de autenticação e ocupação do pool do bcrypt"""
+    return {**cache_autenticacao.estatisticas(), "senhas": verificador_senhas.estatisticas()}
+
 @app.get("/test")
 async def test():
     return {"status": "ok", "message": "API funcionando"}
 
-@app.post("/analyze")
-async def analyze_opportunity(request: AnalysisRequest):
-    """Analisa uma oportunidade de emprego"""
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    """Métricas no formato de texto do Prometheus: etapas da análise, pedidos HTTP, caches, LLM e fila"""
+    return PlainTextResponse(registo_metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+@app.get("/llm/metricas")
+async def metricas_llm():
+    """Latência, erros por tipo, repetições, hedging, quota e estado do disjuntor do cliente do modelo"""
+    if cassete_llm:
+        return {**cliente_llm.estatisticas(), "cassete": {"modo": llm_cassete_modo, **cassete_llm.estatisticas()}}
+    return cliente_llm.estatisticas()
+
+@app.get("/analyze/coalescencia")
+async def estatisticas_coalescencia():
+    """Pedidos /analyze em curso, executados e coalescidos com um pedido idêntico"""
+    return coalescedor_analises.estatisticas()
+
+@app.get("/cache/paginas")
+async def estatisticas_cache_paginas():
+    """Contadores do cache de páginas (hits, misses, revalidações, evicções)"""
+    return cache_paginas.estatisticas()
+
+async def obter_conteudo(request: AnalysisRequest) -> str:
+    """Etapa de obtenção: baixa o link ou usa o texto fornecido"""
+    conteudo = ""
     
-    try:
-        conteudo = ""
-        
-        if request.tipoEntrada == "LINK" and request.linkOportunidade:
-            # Extrair conteúdo do link
-            try:
-                website = Website(request.linkOportunidade)
-                conteudo = f"Título: {website.title}\n\nConteúdo: {website.text}"
-            except Exception as e:
-                print(f"Erro ao extrair conteúdo do link: {e}")
-                conteudo = f"Link fornecido: {request.linkOportunidade}\nErro ao extrair conteúdo completo."
-        elif request.tipoEntrada == "TEXTO" and request.textoPublicacao:
-            # Usar texto fornecido
-            conteudo = request.textoPublicacao
-        else:
-            raise HTTPException(status_code=400, detail="Tipo de entrada ou conteúdo inválido")
-        
-        if not conteudo or len(conteudo.strip()) < 10:
-            raise HTTPException(status_code=400, detail="Conteúdo muito curto ou vazio")
-        
-        # Analisar com LLM
-        print(f"Iniciando análise LLM para tipo: {request.tipoEntrada}")
-        print(f"Tamanho do conteúdo: {len(conteudo)}")
-        resultado, dados_vaga = analisar_oportunidade_llm(conteudo)
-        print(f"Análise LLM concluída. Nível de risco: {resultado.nivelRisco}")
-        
-        # Verificar confiabilidade da URL se for link
-        url_trust_info = None
-        if request.tipoEntrada == "LINK" and request.linkOportunidade:
-            url_trust_info = get_url_trust_info(request.linkOportunidade)
-            
-            # Se a URL for confiável, ajustar a análise
-            if url_trust_info.get('is_trusted', False):
-                domain_type = url_trust_info.get('domain_type', 'UNKNOWN')
-                
-                # Reduzir pontuação de URL suspeita apenas para organizações governamentais e empresas conhecidas
-                if domain_type in ['GOVERNMENT_ORGANIZATION', 'TECH_COMPANY', 'LOCAL_COMPANY', 'NEWS_SITE', 'NGO']:
-                    if 'urlSuspeita' in resultado.detalhes:
-                        resultado.detalhes['urlSuspeita'] = 0
-                
-                # Adicionar recomendação apropriada baseada no tipo de domínio
-                if not resultado.recomendacoesDetalhadas:
-                    resultado.recomendacoesDetalhadas = []
-                
-                if domain_type == 'JOB_PORTAL':
-                    # Para portais de empregos, adicionar recomendação de cautela
-                    resultado.recomendacoesDetalhadas.insert(0, RecomendacaoItem(
-                        titulo="Portal de empregos conhecido - mas mantenha cautela",
-                        explicacao=f"A oportunidade foi encontrada em {url_trust_info.get('trust_reason', 'um portal de empregos conhecido')}. Mesmo portais confiáveis podem ter anúncios falsos ou golpes. Sempre verifique a legitimidade da empresa e do anúncio antes de prosseguir.",
-                        paragrafoProblematico=None
-                    ))
-                else:
-                    # Para outras fontes confiáveis, adicionar recomendação positiva
-                    resultado.recomendacoesDetalhadas.insert(0, RecomendacaoItem(
-                        titulo="URL de fonte confiável identificada",
-                        explicacao=f"A oportunidade foi encontrada em {url_trust_info.get('trust_reason', 'uma fonte confiável')}. Isso é um indicador positivo de legitimidade, mas ainda assim mantenha as precauções de segurança.",
-                        paragrafoProblematico=None
-                    ))
+    if request.tipoEntrada == "LINK" and request.linkOportunidade:
+        # Extrair conteúdo do link
+        try:
+            website = await Website.carregar(request.linkOportunidade)
+            conteudo = f"Título: {website.title}\n\nConteúdo: {website.text}"
+        except Exception as e:
+            log.error("Erro ao extrair conteúdo do link", extra={"erro": str(e)})
+            conteudo = f"Link fornecido: {request.linkOportunidade}\nErro ao extrair conteúdo completo."
+    elif request.tipoEntrada == "TEXTO" and request.textoPublicacao:
+        # Usar texto fornecido
+        conteudo = request.textoPublicacao
+    else:
+        raise HTTPException(status_code=400, detail="Tipo de entrada ou conteúdo inválido")
+    
+    if not conteudo or len(conteudo.strip()) < 10:
+        raise HTTPException(status_code=400, detail="Conteúdo muito curto ou vazio")
+    
+    return conteudo
+
+async def buscar_analise_existente(reduzido: str, chave_cache: str) -> Optional[tuple[AnalysisResult, dict, bool, Optional[dict]]]:
+    """Análise já feita para o mesmo conteúdo (cache) ou para uma publicação quase idêntica"""
+    with etapa("cache"):
+        # Reutilizar análise de conteúdo idêntico, se existir
+        em_cache = await analise_cache.obter(chave_cache)
+        if em_cache is not None:
+            resultado = AnalysisResult(**em_cache["resultado"])
+            log.info("Análise obtida do cache", extra={"nivel_risco": resultado.nivelRisco})
+            analises_por_origem.inc(origem="cache")
+            return resultado, em_cache["dados_vaga"], True, None
         
-        # Preparar dados para salvar no banco
-        vaga_data = {
-            "url_vaga": request.linkOportunidade if request.tipoEntrada == "LINK" else None,
-            "texto_original": request.textoPublicacao if request.tipoEntrada == "TEXTO" else None,
-            "tipo_entrada": request.tipoEntrada,
-            "titulo": dados_vaga.get("titulo"),
-            "empresa": dados_vaga.get("empresa"),
-            "descricao": dados_vaga.get("descricao"),
-            "requisitos": dados_vaga.get("requisitos"),
-            "remuneracao": dados_vaga.get("remuneracao"),
-            "localizacao": dados_vaga.get("localizacao"),
-            "tipo_oportunidade": dados_vaga.get("tipoOportunidade"),
-            "beneficios": dados_vaga.get("beneficios"),
-            "contatos": dados_vaga.get("contatos"),
-            "plataforma": dados_vaga.get("plataforma"),
-            "url_trust_info": url_trust_info,
-            "nivel_risco": resultado.nivelRisco,
-            "pontuacao_risco": resultado.pontuacao,
-            "alertas": resultado.alertas,
-            "recomendacoes": resultado.recomendacoes,
-            "recomendacoes_detalhadas": [rec.model_dump() for rec in resultado.recomendacoesDetalhadas] if resultado.recomendacoesDetalhadas else [],
-            "detalhes_risco": resultado.detalhes,
-            "data_analise": datetime.now()
-        }
+        semelhante = await buscar_analise_semelhante(reduzido)
+        if semelhante:
+            # Publicação quase idêntica já analisada: reutilizar a análise anterior
+            resultado, dados_vaga, similar_to = semelhante
+            log.info("Análise reutilizada de uma vaga semelhante",
+                     extra={"vaga_id": similar_to["vagaId"], "similaridade": similar_to["similaridade"]})
+            analises_por_origem.inc(origem="semelhante")
+            # Sem cache: um novo pedido igual volta a ser marcado como quase-duplicado da vaga original
+            return resultado, dados_vaga, False, similar_to
+    return None
+
+def reduzir_para_llm(conteudo: str, tipo_entrada: str) -> tuple[str, dict]:
+    """
+    Mantém os blocos mais relevantes dentro do orçamento de tokens; o boilerplate e as
+    repetições só são removidos do texto das páginas (LINK), nunca de um texto colado
+    """
+    with etapa("reducao"):
+        reduzido, reducao = reduzir_conteudo(conteudo, CONTEUDO_ORCAMENTO_TOKENS, pagina=tipo_entrada == "LINK")
+    caracteres_conteudo.observar(len(conteudo), fase="obtido")
+    caracteres_conteudo.observar(len(reduzido), fase="enviado")
+    log.info("Conteúdo reduzido", extra={"tokens_originais": reducao["tokensOriginais"],
+                                         "tokens_enviados": reducao["tokensEnviados"],
+                                         "tokens_poupados": reducao["tokensPoupados"]})
+    return reduzido, reducao
+
+def triar_conteudo(conteudo: str, url: Optional[str] = None) -> dict:
+    """Triagem por regras sobre o mesmo texto que o LLM recebe"""
+    with etapa("triagem"):
+        triagem = motor_triagem.analisar(conteudo, url)
+    log.info("Triagem por regras", extra={"pontuacao": triagem["pontuacao"], "decisao": triagem["decisao"]})
+    return triagem
+
+async def analisar_conteudo(conteudo: str, tipo_entrada: str,
+                            limite_llm: Optional[asyncio.Semaphore] = None,
+                            url: Optional[str] = None) -> tuple[AnalysisResult, dict, dict, str]:
+    """
+    Etapa de análise: redução do conteúdo, cache, quase-duplicados, triagem por regras e, por fim, o LLM.
+    Retorna (resultado, dados_vaga, info, reduzido), em que info traz cacheHit, similarTo, triagem e
+    reducao e reduzido é o texto enviado ao modelo (gravado com a vaga para o índice de quase-duplicados).
+    """
+    reduzido, reducao = reduzir_para_llm(conteudo, tipo_entrada)
+    triagem = triar_conteudo(reduzido, url)
+    info = {"cacheHit": False, "similarTo": None, "triagem": triagem, "reducao": reducao}
+    # A chave usa o texto reduzido: é ele que determina a resposta do modelo
+    chave_cache = analise_cache.chave(reduzido)
+    existente = await buscar_analise_existente(reduzido, chave_cache)
+    if existente:
+        resultado, dados_vaga, info["cacheHit"], info["similarTo"] = existente
+        return resultado, dados_vaga, info, reduzido
+    
+    if triagem["decisao"]:
+        # Caso evidente: as regras bastam e o LLM não é chamado (sem extração dos dados da vaga)
+        analises_por_origem.inc(origem="triagem")
+        return resultado_da_triagem(triagem), {}, info, reduzido
+    
+    reputacao = reputacao_dominios.atalho(dominio_da_url(url))
+    if reputacao:
+        # Domínio com histórico de golpes: a reputação basta e o LLM também não é chamado
+        info["reputacao"] = reputacao
+        analises_por_origem.inc(origem="reputacao")
+        return resultado_da_reputacao(reputacao), {}, info, reduzido
+    
+    # Analisar com LLM
+    log.info("Iniciando análise LLM", extra={"tipo_entrada": tipo_entrada, "tamanho_conteudo": len(reduzido)})
+    async with limite_llm or nullcontext():
+        resultado, dados_vaga = await analisar_oportunidade_llm(reduzido)
+    analises_por_origem.inc(origem="recurso" if resultado.fallback else "llm")
+    log.info("Análise LLM concluída", extra={"nivel_risco": resultado.nivelRisco, "recurso": resultado.fallback})
+    
+    # Guardar apenas análises completas, nunca as de recurso
+    if not resultado.fallback:
+        await analise_cache.guardar(chave_cache, resultado.model_dump(), dados_vaga)
+    return resultado, dados_vaga, info, reduzido
+
+def montar_resposta(resultado: AnalysisResult, dados_vaga: dict, conteudo: str,
+                    url_trust_info: Optional[Dict[str, Any]], info: dict) -> dict:
+    """Corpo de resposta comum a /analyze, ao stream, aos lotes e aos jobs"""
+    return {
+        "analise": resultado.model_dump(),
+        "dadosVaga": dados_vaga,
+        "textoOriginal": conteudo,
+        "urlTrustInfo": url_trust_info,
+        **info
+    }
+
+def aplicar_confianca_url(request: AnalysisRequest, resultado: AnalysisResult) -> Optional[Dict[str, Any]]:
+    """Verifica a confiabilidade da URL (se for link) e ajusta a análise"""
+    if not (request.tipoEntrada == "LINK" and request.linkOportunidade):
+        return None
+    
+    url_trust_info = get_url_trust_info(request.linkOportunidade)
+    
+    # Se a URL for confiável, ajustar a análise
+    if url_trust_info.get('is_trusted', False):
+        domain_type = url_trust_info.get('domain_type', 'UNKNOWN')
         
-        # Salvar no MongoDB
-        vaga_id = await salvar_vaga_no_banco(vaga_data)
-        if vaga_id:
-            print(f"Vaga salva no banco com ID: {vaga_id}")
+        # Reduzir pontuação de URL suspeita apenas para organizações governamentais e empresas conhecidas
+        if domain_type in ['GOVERNMENT_ORGANIZATION', 'TECH_COMPANY', 'LOCAL_COMPANY', 'NEWS_SITE', 'NGO']:
+            if 'urlSuspeita' in resultado.detalhes:
+                resultado.detalhes['urlSuspeita'] = 0
         
-        # Criar resposta com dados da vaga
-        response_data = {
-            "analise": resultado.model_dump(),
-            "dadosVaga": dados_vaga,
-            "textoOriginal": conteudo,
-            "urlTrustInfo": url_trust_info
-        }
+        # Adicionar recomendação apropriada baseada no tipo de domínio
+        if not resultado.recomendacoesDetalhadas:
+            resultado.recomendacoesDetalhadas = []
         
-        return response_data
+        if domain_type == 'JOB_PORTAL':
+            # Para portais de empregos, adicionar recomendação de cautela
+            resultado.recomendacoesDetalhadas.insert(0, RecomendacaoItem(
+                titulo=TITULO_RECOMENDACAO_PORTAL,
+                explicacao=f"A oportunidade foi encontrada em {url_trust_info.get('trust_reason', 'um portal de empregos conhecido')}. Mesmo portais confiáveis podem ter anúncios falsos ou golpes. Sempre verifique a legitimidade da empresa e do anúncio antes de prosseguir.",
+                paragrafoProblematico=None
+            ))
+        else:
+            # Para outras fontes confiáveis, adicionar recomendação positiva
+            resultado.recomendacoesDetalhadas.insert(0, RecomendacaoItem(
+                titulo=TITULO_RECOMENDACAO_CONFIAVEL,
+                explicacao=f"A oportunidade foi encontrada em {url_trust_info.get('trust_reason', 'uma fonte confiável')}. Isso é um indicador positivo de legitimidade, mas ainda assim mantenha as precauções de segurança.",
+                paragrafoProblematico=None
+            ))
+    
+    return url_trust_info
+
+def montar_vaga(request: AnalysisRequest, resultado: AnalysisResult, dados_vaga: dict,
+                url_trust_info: Optional[Dict[str, Any]], reduzido: str, info: dict) -> dict:
+    """Prepara os dados da vaga para salvar no banco (info vem de analisar_conteudo)"""
+    texto_original = request.textoPublicacao if request.tipoEntrada == "TEXTO" else None
+    return {
+        "url_vaga": request.linkOportunidade if request.tipoEntrada == "LINK" else None,
+        "texto_original": texto_original,
+        "tipo_entrada": request.tipoEntrada,
+        # Um texto colado que coube no orçamento não é guardado duas vezes
+        "conteudo_analisado": reduzido if reduzido != texto_original else None,
+        "titulo": dados_vaga.get("titulo"),
+        "empresa": dados_vaga.get("empresa"),
+        "descricao": dados_vaga.get("descricao"),
+        "requisitos": dados_vaga.get("requisitos"),
+        "remuneracao": dados_vaga.get("remuneracao"),
+        "localizacao": dados_vaga.get("localizacao"),
+        "tipo_oportunidade": dados_vaga.get("tipoOportunidade"),
+        "beneficios": dados_vaga.get("beneficios"),
+        "contatos": dados_vaga.get("contatos"),
+        "plataforma": dados_vaga.get("plataforma"),
+        "url_trust_info": url_trust_info,
+        "nivel_risco": resultado.nivelRisco,
+        "pontuacao_risco": resultado.pontuacao,
+        "alertas": resultado.alertas,
+        "recomendacoes": resultado.recomendacoes,
+        "recomendacoes_detalhadas": [rec.model_dump() for rec in resultado.recomendacoesDetalhadas] if resultado.recomendacoesDetalhadas else [],
+        "detalhes_risco": resultado.detalhes,
+        "atalho_reputacao": resultado.atalhoReputacao,
+        "vaga_original": (info.get("similarTo") or {}).get("vagaId"),
+        "data_analise": datetime.now()
+    }
+
+def chave_pedido(item: AnalysisRequest) -> str:
+    """Identifica pedidos idênticos: URL canónico para links, hash do conteúdo para textos"""
+    if item.tipoEntrada == "LINK" and item.linkOportunidade:
+        return f"LINK:{url_canonica(item.linkOportunidade)}"
+    if item.tipoEntrada == "TEXTO" and item.textoPublicacao:
+        return f"TEXTO:{analise_cache.chave(item.textoPublicacao)}"
+    return f"{item.tipoEntrada}:{item.linkOportunidade}:{item.textoPublicacao}"
+
+async def analisar_e_gravar(request: AnalysisRequest) -> dict:
+    """Obtenção, análise e gravação de um pedido /analyze"""
+    conteudo = await obter_conteudo(request)
+    resultado, dados_vaga, info, reduzido = await analisar_conteudo(
+        conteudo, request.tipoEntrada, url=request.linkOportunidade)
+    url_trust_info = aplicar_confianca_url(request, resultado)
+    
+    # Salvar no MongoDB
+    await gravar_analise(request, resultado, dados_vaga, url_trust_info, reduzido, info)
+    
+    # Criar resposta com dados da vaga
+    return montar_resposta(resultado, dados_vaga, conteudo, url_trust_info, info)
+
+@app.post("/analyze", dependencies=DEPENDENCIAS_ANALISE)
+async def analyze_opportunity(request: AnalysisRequest):
+    """Analisa uma oportunidade de emprego"""
+    
+    try:
+        # Pedidos idênticos em curso partilham a mesma análise e a mesma vaga gravada
+        resposta, coalescida = await coalescedor_analises.executar(
+            chave_pedido(request), lambda: analisar_e_gravar(request))
+        if coalescida:
+            log.info("Pedido /analyze coalescido com análise em curso", extra={"tipo_entrada": request.tipoEntrada})
+        return {**resposta, "coalescida": coalescida}
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erro no endpoint /analyze: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Erro no endpoint /analyze", extra={"erro": str(e)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@app.get("/vagas")
-async def listar_vagas(limit: int = 10, skip: int = 0, nivel_risco: Optional[str] = None):
-    """Lista vagas analisadas"""
-    try:
-        # Construir filtro
-        filtro = {}
-        if nivel_risco and nivel_risco != "TODOS":
-            filtro["nivel_risco"] = nivel_risco
-        
-        # Se há filtro, retornar todas as vagas filtradas sem paginação
-        if filtro:
-            cursor = vagas_collection.find(filtro).sort("data_analise", -1)
-            vagas = []
-            async for vaga in cursor:
-                vaga["_id"] = str(vaga["_id"])
-                vagas.append(vaga)
+@app.post("/analyze/stream", dependencies=DEPENDENCIAS_ANALISE)
+async def analyze_opportunity_stream(request: AnalysisRequest):
+    """
+    Variante de /analyze via Server-Sent Events: campos da vaga, nível de risco, pontuação e
+    alertas são enviados assim que o modelo os gera. O evento final "resultado" traz a mesma
+    resposta de /analyze, já gravada no banco.
+    """
+    conteudo = await obter_conteudo(request)
+    
+    async def gerar():
+        try:
+            reduzido, reducao = reduzir_para_llm(conteudo, request.tipoEntrada)
+            yield evento_sse("inicio", {"tamanhoConteudo": len(conteudo), "reducao": reducao})
+            triagem = triar_conteudo(reduzido, request.linkOportunidade)
+            yield evento_sse("triagem", triagem)
+            info = {"cacheHit": False, "similarTo": None, "triagem": triagem, "reducao": reducao}
             
-            total = len(vagas)
+            chave_cache = analise_cache.chave(reduzido)
+            existente = await buscar_analise_existente(reduzido, chave_cache)
+            reputacao = (None if existente or triagem["decisao"]
+                         else reputacao_dominios.atalho(dominio_da_url(request.linkOportunidade)))
+            if existente or triagem["decisao"] or reputacao:
+                if existente:
+                    resultado, dados_vaga, info["cacheHit"], info["similarTo"] = existente
+                elif triagem["decisao"]:
+                    analises_por_origem.inc(origem="triagem")
+                    resultado, dados_vaga = resultado_da_triagem(triagem), {}
+                else:
+                    info["reputacao"] = reputacao
+                    analises_por_origem.inc(origem="reputacao")
+                    resultado, dados_vaga = resultado_da_reputacao(reputacao), {}
+                for nome, dados in eventos_de_resultado(resultado, dados_vaga):
+                    yield evento_sse(nome, dados)
+            else:
+                log.info("Iniciando análise LLM em streaming",
+                         extra={"tipo_entrada": request.tipoEntrada, "tamanho_conteudo": len(reduzido)})
+                parser = ParserJSONIncremental()
+                partes = []
+                try:
+                    # Inclui o envio dos eventos parciais ao cliente, intercalado com a geração
+                    with etapa("llm"):
+                        async for texto in cliente_llm.gerar_stream(montar_prompt_analise(reduzido)):
+                            partes.append(texto)
+                            for caminho, valor in parser.alimentar(texto):
+                                evento = evento_parcial(caminho, valor)
+                                if evento:
+                                    yield evento_sse(*evento)
+                    
+                    resposta = "".join(partes)
+                    if not resposta:
+                        raise Exception("Resposta vazia do modelo")
+                    log.info("Resposta do modelo recebida", extra={"tamanho": len(resposta)})
+                    with etapa("interpretacao"):
+                        resultado, dados_vaga = interpretar_resposta_llm(resposta)
+                except Exception as e:
+                    log.error("Erro na análise LLM", extra={"erro": str(e), "tipo_erro": type(e).__name__})
+                    resultado, dados_vaga = analise_de_erro(e)
+                analises_por_origem.inc(origem="recurso" if resultado.fallback else "llm")
+                log.info("Análise LLM concluída", extra={"nivel_risco": resultado.nivelRisco, "recurso": resultado.fallback})
+                
+                if not resultado.fallback:
+                    await analise_cache.guardar(chave_cache, resultado.model_dump(), dados_vaga)
             
-            return {
-                "vagas": vagas,
-                "total": total,
-                "limit": total,
-                "skip": 0
-            }
-        else:
-            # Sem filtro, usar paginação normal
-            cursor = vagas_collection.find().skip(skip).limit(limit).sort("data_analise", -1)
-            vagas = []
-            async for vaga in cursor:
-                vaga["_id"] = str(vaga["_id"])
-                vagas.append(vaga)
+            url_trust_info = aplicar_confianca_url(request, resultado)
+            await gravar_analise(request, resultado, dados_vaga, url_trust_info, reduzido, info)
             
-            total = await vagas_collection.count_documents({})
+            yield evento_sse("resultado", montar_resposta(resultado, dados_vaga, conteudo, url_trust_info, info))
+        except Exception as e:
+            log.exception("Erro no endpoint /analyze/stream", extra={"erro": str(e)})
+            yield evento_sse("erro", {"detail": f"Erro interno: {str(e)}"})
+    
+    # X-Accel-Buffering desativa o buffer do nginx, que atrasaria os eventos
+    return StreamingResponse(gerar(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/analyze/batch", dependencies=DEPENDENCIAS_ANALISE)
+async def analyze_batch(request: AnalysisBatchRequest):
+    """
+    Analisa vários itens de uma vez, devolvendo cada resultado em NDJSON assim que fica pronto.
+    Entradas idênticas são analisadas uma única vez e as vagas são gravadas com insert_many.
+    """
+    if not request.itens:
+        raise HTTPException(status_code=400, detail="Lote vazio")
+    if len(request.itens) > BATCH_MAX_ITENS:
+        raise HTTPException(status_code=400, detail=f"Lote com mais de {BATCH_MAX_ITENS} itens")
+    
+    limite_fetch = asyncio.Semaphore(request.concorrenciaFetch or BATCH_CONCORRENCIA_FETCH)
+    limite_llm = asyncio.Semaphore(request.concorrenciaLLM or BATCH_CONCORRENCIA_LLM)
+    
+    # Agrupar índices de itens idênticos
+    grupos: Dict[str, list[int]] = {}
+    for indice, item in enumerate(request.itens):
+        grupos.setdefault(chave_pedido(item), []).append(indice)
+    
+    async def processar(indices: list[int]) -> tuple[list[int], dict, Optional[dict]]:
+        item = request.itens[indices[0]]
+        try:
+            async with limite_fetch:
+                conteudo = await obter_conteudo(item)
+            resultado, dados_vaga, info, reduzido = await analisar_conteudo(
+                conteudo, item.tipoEntrada, limite_llm, url=item.linkOportunidade)
+            url_trust_info = aplicar_confianca_url(item, resultado)
+            resposta = {"status": "ok", **montar_resposta(resultado, dados_vaga, conteudo, url_trust_info, info)}
+            vaga_data = None if resultado.fallback else montar_vaga(item, resultado, dados_vaga, url_trust_info, reduzido, info)
+            return indices, resposta, vaga_data
+        except HTTPException as e:
+            return indices, {"status": "erro", "erro": e.detail}, None
+        except Exception as e:
+            log.error("Erro ao analisar item do lote", extra={"erro": str(e)})
+            return indices, {"status": "erro", "erro": f"Erro interno: {str(e)}"}, None
+    
+    async def gerar():
+        tarefas = [asyncio.create_task(processar(indices)) for indices in grupos.values()]
+        pendentes_gravacao = []
+        try:
+            for concluida in asyncio.as_completed(tarefas):
+                indices, resposta, vaga_data = await concluida
+                if vaga_data:
+                    pendentes_gravacao.append(vaga_data)
+                for indice in indices:
+                    yield json.dumps({"indice": indice, **resposta}, default=str, ensure_ascii=False) + "\n"
+                
+                if len(pendentes_gravacao) >= BATCH_TAMANHO_GRAVACAO:
+                    await salvar_vagas_no_banco(pendentes_gravacao)
+                    pendentes_gravacao = []
+            if pendentes_gravacao:
+                await salvar_vagas_no_banco(pendentes_gravacao)
+        finally:
+            # Cliente desligou-se a meio: não deixar análises órfãs a correr
+            for tarefa in tarefas:
+                tarefa.cancel()
+    
+    return StreamingResponse(gerar(), media_type="application/x-ndjson")
+
+async def executar_job_analise(pedido: Dict[str, Any], reportar) -> Dict[str, Any]:
+    """Executa uma análise submetida à fila (mesmas etapas de /analyze)"""
+    request = AnalysisRequest(**pedido)
+    try:
+        await reportar("obtendo_conteudo")
+        conteudo = await obter_conteudo(request)
+    except HTTPException as e:
+        raise ErroJob(e.detail)
+    
+    await reportar("analisando")
+    resultado, dados_vaga, info, reduzido = await analisar_conteudo(
+        conteudo, request.tipoEntrada, url=request.linkOportunidade)
+    url_trust_info = aplicar_confianca_url(request, resultado)
+    
+    await reportar("gravando")
+    vaga_id = await gravar_analise(request, resultado, dados_vaga, url_trust_info, reduzido, info)
+    
+    return {"vagaId": vaga_id, **montar_resposta(resultado, dados_vaga, conteudo, url_trust_info, info)}
+
+# Fila de análises assíncronas (estado persistido no MongoDB)
+fila_analises = FilaAnalises(
+    jobs_collection,
+    executar_job_analise,
+    num_workers=int(os.getenv('FILA_NUM_WORKERS', 4)),
+    timeout_job_segundos=int(os.getenv('FILA_TIMEOUT_JOB_SEGUNDOS', 300))
+)
+
+# Contadores que os componentes já mantêm, lidos a cada recolha de GET /metrics
+registo_metricas.estatisticas("humai_llm", lambda: cliente_llm.estatisticas())
+if cassete_llm:
+    registo_metricas.estatisticas("humai_cassete_llm", lambda: cassete_llm.estatisticas())
+registo_metricas.estatisticas("humai_cache_paginas", lambda: cache_paginas.estatisticas())
+registo_metricas.estatisticas("humai_coalescencia", lambda: coalescedor_analises.estatisticas())
+registo_metricas.estatisticas("humai_cache_dashboard", lambda: cache_dashboard.estatisticas())
+registo_metricas.estatisticas("humai_autenticacao", lambda: cache_autenticacao.estatisticas())
+registo_metricas.estatisticas("humai_senhas", lambda: verificador_senhas.estatisticas())
+registo_metricas.estatisticas("humai_reputacao", lambda: reputacao_dominios.estatisticas())
+registo_metricas.estatisticas("humai_fila", lambda: fila_analises.metricas())
+
+def job_publico(job: dict) -> dict:
+    """Representação de um job para a API"""
+    def data_iso(valor):
+        return valor.isoformat() if isinstance(valor, datetime) else valor
+    
+    return {
+        "jobId": job["_id"],
+        "status": job["status"],
+        "etapa": job.get("etapa"),
+        "resultado": job.get("resultado"),
+        "erro": job.get("erro"),
+        "criadoEm": data_iso(job.get("criado_em")),
+        "iniciadoEm": data_iso(job.get("iniciado_em")),
+        "concluidoEm": data_iso(job.get("concluido_em"))
+    }
+
+@app.post("/jobs", status_code=202, dependencies=DEPENDENCIAS_ANALISE)
+async def submeter_job(request: AnalysisRequest):
+    """Submete uma análise para execução em segundo plano e retorna o ID do job"""
+    try:
+        job_id = await fila_analises.submeter(request.model_dump())
+        return {"jobId": job_id, "status": "PENDENTE"}
+    except Exception as e:
+        log.error("Erro ao submeter job", extra={"erro": str(e)})
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+@app.get("/jobs/metricas")
+async def metricas_jobs():
+    """Profundidade da fila e tempos de espera/execução dos jobs"""
+    return fila_analises.metricas()
+
+@app.get("/jobs/{job_id}", dependencies=DEPENDENCIAS_ANALISE)
+async def obter_job(job_id: str):
+    """Obtém o estado (e o resultado, se concluído) de um job"""
+    job = await fila_analises.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job_publico(job)
+
+@app.get("/jobs/{job_id}/eventos", dependencies=DEPENDENCIAS_ANALISE)
+async def eventos_job(job_id: str):
+    """Acompanha o progresso de um job via Server-Sent Events"""
+    job = await fila_analises.obter(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    
+    async def gerar():
+        ultimo_estado = None
+        atual = job
+        while True:
+            estado = (atual["status"], atual.get("etapa"))
+            if estado != ultimo_estado:
+                ultimo_estado = estado
+                yield evento_sse(atual['status'].lower(), job_publico(atual))
+            if atual["status"] in ESTADOS_FINAIS:
+                return
             
-            return {
-                "vagas": vagas,
-                "total": total,
-                "limit": limit,
-                "skip": skip
-            }
+            # Mudanças feitas por este processo acordam a espera; as de outros processos são vistas por polling
+            await fila_analises.aguardar_mudanca(job_id, timeout=1.0)
+            atual = await fila_analises.obter(job_id) or atual
+    
+    return StreamingResponse(gerar(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/vagas", dependencies=[Depends(utilizador_atual)])
+async def listar_vagas(limit: int = Query(10, ge=1, le=100), cursor: Optional[str] = None,
+                       nivel_risco: Optional[str] = None):
+    """Lista vagas analisadas, da mais recente para a mais antiga, paginadas por cursor"""
+    return await pagina_listagem(limit, cursor, nivel_risco)
+
+async def pagina_listagem(limit: int, cursor: Optional[str], nivel_risco: Optional[str]) -> dict:
+    """Uma página da listagem de vagas com o total aproximado"""
+    # Construir filtro
+    filtro = {}
+    if nivel_risco and nivel_risco != "TODOS":
+        filtro["nivel_risco"] = nivel_risco
+    
+    try:
+        vagas, proximo_cursor = await pagina_vagas(vagas_collection, filtro, limit, cursor)
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Erro ao listar vagas: {e}")
+        log.error("Erro ao listar vagas", extra={"erro": str(e)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+    
+    try:
+        # Total aproximado: metadados da coleção ou contagem sobre o índice, guardada por VAGAS_TOTAIS_TTL_SEGUNDOS
+        if filtro:
+            total = await totais_vagas.obter(
+                filtro["nivel_risco"], lambda: vagas_collection.count_documents(filtro)
+            )
+        else:
+            total = await totais_vagas.obter("TODOS", vagas_collection.estimated_document_count)
+    except Exception as e:
+        log.error("Erro ao contar vagas", extra={"erro": str(e)})
+        total = None
+    
+    return {
+        "vagas": vagas,
+        "total": total,
+        "limit": limit,
+        "proximo_cursor": proximo_cursor
+    }
 
-@app.get("/vagas/stats")
+@app.get("/vagas/stats", dependencies=[Depends(utilizador_atual)])
 async def obter_estatisticas():
     """Obtém estatísticas gerais das vagas"""
     try:
-        # Contar total de vagas
-        total_vagas = await vagas_collection.count_documents({})
-        
-        # Contar alto risco (ALTO + CRITICO)
-        alto_risco = await vagas_collection.count_documents({
-            "nivel_risco": {"$in": ["ALTO", "CRITICO"]}
-        })
-        
-        return {
-            "total_vagas": total_vagas,
-            "alto_risco": alto_risco
-        }
+        # Contadores mantidos a cada gravação (total e alto risco: ALTO + CRITICO)
+        return await obter_resumo(vagas_estatisticas_collection)
     except Exception as e:
-        print(f"Erro ao obter estatísticas: {e}")
+        log.error("Erro ao obter estatísticas", extra={"erro": str(e)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@app.get("/vagas/top-empresas-risco")
+@app.get("/vagas/top-empresas-risco", dependencies=[Depends(utilizador_atual)])
 async def obter_top_empresas_risco():
     """Obtém as 4 empresas com mais vagas de alto risco"""
     try:
-        # Pipeline de agregação para contar vagas de alto risco por empresa
-        pipeline = [
-            {
-                "$match": {
-                    "nivel_risco": {"$in": ["ALTO", "CRITICO"]},
-                    "empresa": {
-                        "$exists": True, 
-                        "$ne": None, 
-                        "$ne": "",
-                        "$nin": ["Empresa anónima", "Agência de recrutamento (não especificada)", "Agência de Recrutamento (Nome não especificado)", "Não especificada", "N/A", "n/a", "Não informado"]
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$empresa",
-                    "total_vagas_alto_risco": {"$sum": 1},
-                    "empresa": {"$first": "$empresa"}
-                }
-            },
-            {
-                "$sort": {"total_vagas_alto_risco": -1}
-            },
-            {
-                "$limit": 4
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "empresa": 1,
-                    "total_vagas_alto_risco": 1
-                }
-            }
-        ]
-        
-        empresas = []
-        async for empresa in vagas_collection.aggregate(pipeline):
-            empresas.append(empresa)
+        # Contadores por empresa mantidos a cada gravação
+        empresas = await obter_top_empresas(vagas_estatisticas_collection)
         
         return {"empresas": empresas}
     except Exception as e:
-        print(f"Erro ao obter top empresas de risco: {e}")
+        log.error("Erro ao obter top empresas de risco", extra={"erro": str(e)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
-@app.get("/vagas/top-dominios-risco")
+@app.get("/vagas/top-dominios-risco", dependencies=[Depends(utilizador_atual)])
 async def obter_top_dominios_risco():
     """Obtém os 4 domínios com mais vagas de alto risco"""
     try:
-        # Pipeline de agregação para contar vagas de alto risco por domínio
-        pipeline = [
-            {
-                "$match": {
-                    "nivel_risco": {"$in": ["ALTO", "CRITICO"]}
-                }
-            },
-            {
-                "$addFields": {
-                    "dominio": {
-                        "$cond": {
-                            "if": {
-                                "$and": [
-                                    {"$ne": ["$url_vaga", None]},
-                                    {"$ne": ["$url_vaga", ""]},
-                                    {"$ne": [{"$type": "$url_vaga"}, "missing"]}
-                                ]
-                            },
-                            "then": {
-                                "$arrayElemAt": [
-                                    {"$split": [{"$arrayElemAt": [{"$split": ["$url_vaga", "://"]}, 1]}, "/"]},
-                                    0
-                                ]
-                            },
-                            "else": {
-                                "$cond": {
-                                    "if": {"$ne": ["$tipo_entrada", None]},
-                                    "then": "Análise por texto",
-                                    "else": "Fonte não especificada"
-                                }
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "$match": {
-                    "dominio": {
-                        "$exists": True, 
-                        "$ne": None, 
-                        "$ne": "",
-                        "$nin": ["localhost", "127.0.0.1", None]
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$dominio",
-                    "total_vagas_alto_risco": {"$sum": 1},
-                    "dominio": {"$first": "$dominio"}
-                }
-            },
-            {
-                "$sort": {"total_vagas_alto_risco": -1}
-            },
-            {
-                "$limit": 4
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "dominio": 1,
-                    "total_vagas_alto_risco": 1
-                }
-            }
-        ]
-        
-        dominios = []
-        async for dominio in vagas_collection.aggregate(pipeline):
-            dominios.append(dominio)
+        # Contadores por domínio mantidos a cada gravação
+        dominios = await obter_top_dominios(vagas_estatisticas_collection)
         
         return {"dominios": dominios}
     except Exception as e:
-        print(f"Erro ao obter top domínios de risco: {e}")
+        log.error("Erro ao obter top domínios de risco", extra={"erro": str(e)})
+        raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+
+@app.get("/dashboard", dependencies=[Depends(utilizador_atual)])
+async def obter_dashboard(request: Request, limit: int = Query(10, ge=1, le=100), nivel_risco: Optional[str] = None):
+    """
+    Dados do painel num só pedido: primeira página de vagas, estatísticas e rankings.
+    A resposta fica em cache até DASHBOARD_CACHE_TTL_SEGUNDOS ou até à próxima vaga gravada,
+    com ETag (304 para If-None-Match igual) e compressão gzip/br.
+    """
+    async def calcular() -> dict:
+        vagas, estatisticas, empresas, dominios = await asyncio.gather(
+            pagina_listagem(limit, None, nivel_risco),
+            obter_resumo(vagas_estatisticas_collection),
+            obter_top_empresas(vagas_estatisticas_collection),
+            obter_top_dominios(vagas_estatisticas_collection),
+        )
+        return {"vagas": vagas, "estatisticas": estatisticas, "empresas": empresas, "dominios": dominios}
+    
+    try:
+        entrada = await cache_dashboard.obter(f"{nivel_risco or 'TODOS'}:{limit}", calcular)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error("Erro ao obter dados do painel", extra={"erro": str(e)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
+    return cache_dashboard.resposta(entrada, request)
+
+@app.get("/dashboard/cache")
+async def obter_metricas_cache_dashboard():
+    """Acertos, falhas, respostas 304 e invalidações da cache do painel"""
+    return cache_dashboard.estatisticas()
+
+@app.get("/dominios")
+async def estatisticas_dominios():
+    """Domínios confiáveis carregados e reputação dos domínios em memória"""
+    return {"confiaveis": classificador_dominios.estatisticas(), "reputacao": reputacao_dominios.estatisticas()}
+
+@app.get("/dominios/{dominio}", dependencies=[Depends(utilizador_atual)])
+async def obter_dominio(dominio: str):
+    """Classificação e reputação de um domínio, para investigação (subdomínios contam no domínio registável)"""
+    host = dominio_da_url(dominio)
+    reputacao = reputacao_dominios.obter(host)
+    if not reputacao:
+        raise HTTPException(status_code=400, detail="Domínio inválido")
+    classificacao = classificador_dominios.classificar(host)
+    return {
+        "dominio": host,
+        "confiavel": classificacao["categoria"] is not None,
+        "categoria": classificacao["categoria"],
+        "motivo": classificacao["motivo"],
+        "reputacao": reputacao,
+        "atalho": reputacao["veredicto"] == "MAU" and reputacao_dominios.atalho_permitido(host)
+    }
 
-@app.get("/vagas/{vaga_id}")
+@app.get("/vagas/{vaga_id}", dependencies=[Depends(utilizador_atual)])
 async def obter_vaga(vaga_id: str):
     """Obtém uma vaga específica por ID"""
     try:
@@ -1055,7 +1881,7 @@ async def obter_vaga(vaga_id: str):
         vaga["_id"] = str(vaga["_id"])
         return vaga
     except Exception as e:
-        print(f"Erro ao obter vaga: {e}")
+        log.error("Erro ao obter vaga", extra={"erro": str(e)})
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
 if __name__ == "__main__":
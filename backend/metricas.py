@@ -0,0 +1,209 @@
+"""
+Métricas da API no formato de texto do Prometheus (GET /metrics) e tempos
+por etapa de cada análise.
+
+- `Contador` e `Histograma` com rótulos, atualizados no caminho do pedido
+  (uma soma num dicionário; sem locks, tudo corre no event loop)
+- `etapa("llm")` mede um bloco: observa o histograma
+  humai_etapa_duracao_segundos{etapa=...} e soma a duração às etapas do
+  pedido em curso, que o middleware escreve no log do pedido
+- `Registo.estatisticas(prefixo, funcao)` exporta no momento da recolha os
+  contadores que os componentes já mantêm (caches, cliente do LLM, fila),
+  sem custo nenhum entre recolhas
+
+Sem dependências: o formato de exposição é texto simples e a API só
+precisa de uma pequena parte do prometheus_client.
+"""
+import bisect
+import math
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Durações (segundos): de uma consulta à cache a uma chamada lenta ao modelo
+LIMITES_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Tamanhos (bytes, caracteres ou tokens)
+LIMITES_TAMANHO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Etapas do pedido em curso (nome -> segundos), iniciadas pelo middleware
+_etapas_pedido: ContextVar[Optional[Dict[str, float]]] = ContextVar("etapas_pedido", default=None)
+
+
+def _nome_valido(nome: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", nome)
+
+
+def _rotulos(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: Any) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Valor que só cresce, por combinação de rótulos"""
+
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **rotulos: str) -> None:
+        chave = tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+        self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos: str) -> float:
+        return self._valores.get(tuple(str(rotulos.get(nome, "")) for nome in self.rotulos), 0)
+
+    def linhas(self) -> Iterator[str]:
+        for chave, valor in self._valores.items():
+            yield f"{self.nome}{_rotulos(self.rotulos, chave)} {_numero(valor)}"
+
+
+class Histograma:
+    """Contagens cumulativas por limite, soma e total, por combinação de rótulos"""
+
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, limites: Tuple[float, ...] = LIMITES_SEGUNDOS,
+                 rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.limites = tuple(limites)
+        self.rotulos = rotulos
+        # rótulos -> [contagens por balde (não cumulativas), soma, total]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observar(self, valor: float, **rotulos: str) -> None:
+        chave = tuple(str(rotulos.get(nome, "")) for nome in self.rotulos)
+        serie = self._series.get(chave)
+        if serie is None:
+            serie = self._series[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+        serie[0][bisect.bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+        serie[2] += 1
+
+    def total(self, **rotulos: str) -> int:
+        serie = self._series.get(tuple(str(rotulos.get(nome, "")) for nome in self.rotulos))
+        return serie[2] if serie else 0
+
+    def soma(self, **rotulos: str) -> float:
+        serie = self._series.get(tuple(str(rotulos.get(nome, "")) for nome in self.rotulos))
+        return serie[1] if serie else 0.0
+
+    def linhas(self) -> Iterator[str]:
+        for chave, (contagens, soma, total) in self._series.items():
+            acumulado = 0
+            for limite, contagem in zip([*self.limites, math.inf], contagens):
+                acumulado += contagem
+                le = 'le="' + _numero(limite) + '"'
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos, chave, le)} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, chave)} {_numero(soma)}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, chave)} {total}"
+
+
+class Registo:
+    """Métricas da API e funções de estatísticas lidas a cada recolha"""
+
+    def __init__(self):
+        self._metricas: Dict[str, Any] = {}
+        self._estatisticas: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def contador(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()) -> Contador:
+        return self._metricas.setdefault(nome, Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome: str, ajuda: str, limites: Tuple[float, ...] = LIMITES_SEGUNDOS,
+                   rotulos: Tuple[str, ...] = ()) -> Histograma:
+        return self._metricas.setdefault(nome, Histograma(nome, ajuda, limites, rotulos))
+
+    def estatisticas(self, prefixo: str, funcao: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Exporta o dicionário devolvido por funcao() como gauges: os números do
+        primeiro nível dão prefixo_<campo>; os de dicionários interiores dão
+        prefixo_<caminho>{chave="<campo>"} (erros por tipo, estado do disjuntor).
+        Textos, None e listas são ignorados.
+        """
+        self._estatisticas.append((prefixo, funcao))
+
+    def _linhas_estatisticas(self, prefixo: str, dados: Dict[str, Any]) -> Iterator[str]:
+        series: Dict[str, List[str]] = {}
+
+        def percorrer(nome: str, valor: Any, chave: Optional[str]) -> None:
+            if isinstance(valor, bool):
+                valor = int(valor)
+            if isinstance(valor, (int, float)):
+                rotulo = _rotulos(("chave",), (chave,)) if chave is not None else ""
+                series.setdefault(nome, []).append(f"{nome}{rotulo} {_numero(valor)}")
+            elif isinstance(valor, dict):
+                for campo, interior in valor.items():
+                    if isinstance(interior, dict):
+                        percorrer(f"{nome}_{_nome_valido(str(campo))}", interior, None)
+                    else:
+                        percorrer(nome, interior, str(campo))
+
+        for campo, valor in dados.items():
+            percorrer(f"{prefixo}_{_nome_valido(str(campo))}", valor, None)
+        for nome, linhas in series.items():
+            yield f"# TYPE {nome} gauge"
+            yield from linhas
+
+    def exportar(self) -> str:
+        """Texto no formato de exposição 0.0.4 do Prometheus"""
+        linhas = []
+        for metrica in self._metricas.values():
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.linhas())
+        for prefixo, funcao in self._estatisticas:
+            try:
+                linhas.extend(self._linhas_estatisticas(prefixo, funcao()))
+            except Exception as e:
+                # Um componente com erro não impede a recolha dos restantes
+                linhas.append(f"# {prefixo}: {_escapar(e)}")
+        return "\n".join(linhas) + "\n"
+
+
+registo = Registo()
+
+duracao_etapas = registo.histograma(
+    "humai_etapa_duracao_segundos", "Duração de cada etapa da análise", rotulos=("etapa",))
+
+
+def iniciar_etapas() -> Dict[str, float]:
+    """Começa a acumular as etapas do pedido em curso (chamado pelo middleware)"""
+    etapas: Dict[str, float] = {}
+    _etapas_pedido.set(etapas)
+    return etapas
+
+
+def etapas_do_pedido() -> Optional[Dict[str, float]]:
+    return _etapas_pedido.get()
+
+
+@contextmanager
+def etapa(nome: str) -> Iterator[None]:
+    """Mede o bloco (também com await lá dentro) como a etapa `nome` do pedido em curso"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        duracao_etapas.observar(duracao, etapa=nome)
+        etapas = _etapas_pedido.get()
+        if etapas is not None:
+            etapas[nome] = etapas.get(nome, 0.0) + duracao
@@ -0,0 +1,103 @@
+"""
+Paginação por cursor (keyset) da listagem de vagas.
+
+Em vez de skip(), que obriga o MongoDB a percorrer e descartar todas as
+vagas das páginas anteriores, cada página continua a partir da última vaga
+da página anterior: o cursor codifica o par (data_analise, _id) dessa vaga
+e a consulta seguinte pede as vagas estritamente "mais antigas" na ordem
+(data_analise desc, _id desc). Com os índices data_analise_id e
+nivel_risco_data_analise_id (ver indices_vagas.py) cada página lê apenas
+`limit + 1` entradas do índice, seja a página 1 ou a 10.000.
+
+A listagem devolve só os campos mostrados nos cartões; o detalhe completo
+(texto original, descrição, recomendações detalhadas...) vem de
+/vagas/{id}.
+"""
+import base64
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+ORDEM_LISTAGEM = [("data_analise", -1), ("_id", -1)]
+
+# Campos dos cartões da listagem (DadosOportunidadesPage)
+PROJECAO_LISTAGEM = {
+    "titulo": 1,
+    "empresa": 1,
+    "tipo_entrada": 1,
+    "url_vaga": 1,
+    "remuneracao": 1,
+    "localizacao": 1,
+    "nivel_risco": 1,
+    "pontuacao_risco": 1,
+    "recomendacoes": 1,
+    "data_analise": 1,
+}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(vaga: Dict[str, Any]) -> str:
+    """Cursor opaco com a posição (data_analise, _id) de uma vaga"""
+    chave = f"{vaga['data_analise'].isoformat()}|{vaga['_id']}"
+    return base64.urlsafe_b64encode(chave.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        chave = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        data, id_vaga = chave.split("|")
+        return datetime.fromisoformat(data), ObjectId(id_vaga)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+def filtro_pagina(filtro: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """Acrescenta ao filtro a condição "depois do cursor" na ordem da listagem"""
+    if not cursor:
+        return filtro
+    data, id_vaga = decodificar_cursor(cursor)
+    # A condição $lte fora do $or dá ao planeador um limite simples sobre o índice
+    return {
+        **filtro,
+        "data_analise": {"$lte": data},
+        "$or": [
+            {"data_analise": {"$lt": data}},
+            {"data_analise": data, "_id": {"$lt": id_vaga}},
+        ],
+    }
+
+
+async def pagina_vagas(collection, filtro: Dict[str, Any], limit: int,
+                       cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+    """Retorna (vagas, proximo_cursor); proximo_cursor é None na última página"""
+    # Pedir uma vaga a mais indica se há página seguinte sem contar documentos
+    vagas = await (collection.find(filtro_pagina(filtro, cursor), PROJECAO_LISTAGEM)
+                   .sort(ORDEM_LISTAGEM).limit(limit + 1).to_list(limit + 1))
+    proximo_cursor = codificar_cursor(vagas[limit - 1]) if len(vagas) > limit else None
+    vagas = vagas[:limit]
+    for vaga in vagas:
+        vaga["_id"] = str(vaga["_id"])
+    return vagas, proximo_cursor
+
+
+class CacheTotais:
+    """Totais da listagem guardados por alguns segundos em vez de contados a cada página"""
+
+    def __init__(self, ttl_segundos: float = 60):
+        self.ttl_segundos = ttl_segundos
+        self._totais: Dict[str, Tuple[float, int]] = {}
+
+    async def obter(self, chave: str, contar: Callable[[], Awaitable[int]]) -> int:
+        agora = time.monotonic()
+        guardado = self._totais.get(chave)
+        if guardado and guardado[0] > agora:
+            return guardado[1]
+        total = await contar()
+        self._totais[chave] = (agora + self.ttl_segundos, total)
+        return total
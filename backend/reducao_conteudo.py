@@ -0,0 +1,212 @@
+"""
+Redução do conteúdo enviado ao LLM.
+
+Um texto que já cabe no orçamento segue sem alterações. Nos restantes, em
+vez de cortar o texto às cegas num número fixo de caracteres, o texto é
+dividido em blocos (separados por linhas em branco, como os produz o
+extrator de HTML) e:
+
+1. nas páginas (entradas LINK), linhas de boilerplate (cookies, direitos
+   reservados, login, partilha...) são removidas
+2. nas páginas, linhas repetidas são removidas (as curtas também quando só
+   diferem nos números, como listas de "vagas relacionadas")
+3. cada bloco recebe uma pontuação de relevância para um anúncio de vaga
+   (vocabulário de vagas, sinais de golpe, contatos, valores, campos
+   rotulados) e os mais relevantes preenchem o orçamento de tokens,
+   mantendo a ordem original
+
+As linhas com contatos, valores ou sinais de golpe nunca são tratadas como
+boilerplate e só são removidas quando se repetem exatamente: num texto
+colado pelo utilizador, "Partilhe com 10 amigos no WhatsApp" ou um
+segundo número de telefone são precisamente o que o modelo deve ver.
+
+Os tokens são estimados em ~4 caracteres por token, a média do tokenizador
+do Gemini para texto em português.
+"""
+import math
+import re
+import time
+from typing import Any, Dict, List, Tuple
+
+from triagem_regras import LEGITIMIDADE, LEXICO, compilar_frases, normalizar
+
+CARACTERES_POR_TOKEN = 4
+
+_VOCABULARIO_VAGA = (
+    "vaga", "vagas", "emprego", "cargo", "funcao", "funcoes", "salario", "remuneracao", "requisitos",
+    "responsabilidades", "candidatura", "candidaturas", "candidatar", "experiencia", "empresa", "contrato",
+    "beneficios", "local de trabalho", "localizacao", "prazo", "recrutamento", "contratar", "contratacao",
+    "entrevista", "curriculo", "cv", "formacao", "licenciatura", "horario", "contacto", "contato", "email",
+    "telefone", "whatsapp", "concurso", "estagio", "bolsa", "job", "salary", "requirements", "apply",
+    "experience", "position", "company", "responsibilities", "qualifications", "deadline",
+)
+_FRASES_BOILERPLATE = compilar_frases((
+    "cookies", "politica de privacidade", "politica de cookies", "termos de uso", "termos e condicoes",
+    "todos os direitos reservados", "direitos de autor", "all rights reserved", "privacy policy",
+    "terms of use", "powered by", "subscreva", "subscrever", "newsletter", "siga-nos", "follow us",
+    "partilhe", "partilhar", "compartilhe", "compartilhar", "voltar ao topo", "back to top",
+))
+# Linhas que são apenas um item de menu ou botão
+_LINHA_MENU = re.compile(
+    r"(?:inicio|home|entrar|sair|login|logout|sign in|sign up|registar|registrar|cadastrar|pesquisar|"
+    r"pesquisa|search|menu|aceitar|rejeitar|accept|reject|saiba mais|ler mais|ver mais|read more|"
+    r"publicidade|anuncio|facebook|instagram|twitter|linkedin|youtube|tiktok|whatsapp|telegram|"
+    r"anterior|seguinte|proximo|next|previous|[›»|>·•-])[\s:.!]*"
+)
+_CAMPO_ROTULADO = re.compile(r"^[^\W\d][\w ]{1,30}:\s*\S")
+_CONTATO = re.compile(r"@[\w-]+\.|https?://|www\.|(?:\+\d{1,3}\s?)?\d{2,3}[\s.-]?\d{3}[\s.-]?\d{3,4}")
+_DINHEIRO = re.compile(r"(?:r\$|us\$|usd|\$|€|eur|mzn|kz)\s?\d|\d[\d.,]*\s?(?:mil\s)?(?:reais|meticais|mzn|mt|dolares|usd|euros)\b")
+_DIGITOS = re.compile(r"\d+")
+_LETRA = re.compile(r"[^\W\d_]")
+_SEPARADOR_BLOCOS = re.compile(r"\n\s*\n")
+
+_REGEX_VAGA = compilar_frases(_VOCABULARIO_VAGA + LEGITIMIDADE)
+_REGEX_SINAIS = compilar_frases(frase for grupos in LEXICO.values() for frases in grupos.values() for frase in frases)
+
+
+def estimar_tokens(texto: str) -> int:
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def _e_protegida(normalizada: str) -> bool:
+    """Linha com contatos, valores ou sinais de golpe"""
+    return bool(_CONTATO.search(normalizada) or _DINHEIRO.search(normalizada) or _REGEX_SINAIS.search(normalizada))
+
+
+def _e_boilerplate(normalizada: str, protegida: bool) -> bool:
+    if protegida or len(normalizada) > 160:
+        return False
+    return bool(_LINHA_MENU.fullmatch(normalizada) or _FRASES_BOILERPLATE.search(normalizada))
+
+
+def _chave_linha(normalizada: str, protegida: bool) -> str:
+    chave = " ".join(normalizada.split())
+    # Linhas curtas que só diferem em números ("Vaga relacionada 12") contam como repetidas
+    if not protegida and len(chave) <= 80 and _LETRA.search(chave):
+        chave = _DIGITOS.sub("0", chave)
+    return chave
+
+
+def _pontuar_bloco(linhas: List[str], normalizadas: List[str], posicao: int) -> float:
+    texto = "\n".join(normalizadas)
+    pontos = (
+        len(_REGEX_VAGA.findall(texto))
+        + 3 * len(_REGEX_SINAIS.findall(texto))
+        + 2 * len(_CONTATO.findall(texto))
+        + 2 * len(_DINHEIRO.findall(texto))
+        + 0.5 * sum(1 for linha in linhas if _CAMPO_ROTULADO.match(linha))
+    )
+    # Listas de itens curtos sem vocabulário de vaga (menus, categorias) valem pouco
+    curtas = sum(1 for linha in linhas if len(linha.split()) <= 3)
+    if len(linhas) >= 3 and curtas / len(linhas) > 0.7:
+        pontos -= 2
+    # Densidade: um bloco enorme com poucas ocorrências não deve ganhar a um bloco curto e focado
+    densidade = pontos / math.sqrt(max(estimar_tokens(texto), 1))
+    # Os primeiros blocos (JSON-LD, <main>) tendem a ser o próprio anúncio
+    return densidade + 1 / (1 + posicao)
+
+
+def reduzir_conteudo(texto: str, orcamento_tokens: int = 2000,
+                     pagina: bool = False) -> Tuple[str, Dict[str, Any]]:
+    """
+    Retorna o texto reduzido ao orçamento e as estatísticas da redução;
+    `pagina` (texto extraído de uma página) ativa a remoção de boilerplate e repetições
+    """
+    inicio = time.perf_counter()
+    tokens_originais = estimar_tokens(texto)
+    if tokens_originais <= orcamento_tokens:
+        return texto, {
+            "tokensOriginais": tokens_originais,
+            "tokensEnviados": tokens_originais,
+            "tokensPoupados": 0,
+            "linhasBoilerplate": 0,
+            "linhasDuplicadas": 0,
+            "blocos": sum(1 for bloco in _SEPARADOR_BLOCOS.split(texto) if bloco.strip()),
+            "blocosDescartados": 0,
+            "tempoMs": round((time.perf_counter() - inicio) * 1000, 2),
+        }
+    blocos: List[Tuple[List[str], List[str]]] = []
+    vistas = set()
+    linhas_boilerplate = 0
+    linhas_duplicadas = 0
+    pendente = None
+
+    for bruto in _SEPARADOR_BLOCOS.split(texto):
+        linhas, normalizadas = [], []
+        for linha in bruto.split("\n"):
+            linha = linha.strip()
+            if not linha:
+                continue
+            normalizada = normalizar(linha)
+            if pagina:
+                protegida = _e_protegida(normalizada)
+                if _e_boilerplate(normalizada, protegida):
+                    linhas_boilerplate += 1
+                    continue
+                chave = _chave_linha(normalizada, protegida)
+                if chave in vistas:
+                    linhas_duplicadas += 1
+                    continue
+                vistas.add(chave)
+            linhas.append(linha)
+            normalizadas.append(normalizada)
+        if not linhas:
+            continue
+        if pendente:
+            # Um título solto ("Requisitos:") fica agarrado ao bloco que introduz
+            linhas = pendente[0] + linhas
+            normalizadas = pendente[1] + normalizadas
+            pendente = None
+        if len(linhas) == 1 and linhas[0].endswith(":") and len(linhas[0]) <= 60:
+            pendente = (linhas, normalizadas)
+        else:
+            blocos.append((linhas, normalizadas))
+    if pendente:
+        blocos.append(pendente)
+
+    tokens_blocos = [estimar_tokens("\n".join(linhas)) + 1 for linhas, _ in blocos]
+    mantidos = set(range(len(blocos)))
+    cortado = None
+
+    if sum(tokens_blocos) > orcamento_tokens:
+        # Preencher o orçamento pelos blocos mais relevantes
+        pontuacoes = [_pontuar_bloco(linhas, normalizadas, i) for i, (linhas, normalizadas) in enumerate(blocos)]
+        mantidos = set()
+        restante = orcamento_tokens
+        for i in sorted(range(len(blocos)), key=lambda i: pontuacoes[i], reverse=True):
+            if tokens_blocos[i] <= restante:
+                mantidos.add(i)
+                restante -= tokens_blocos[i]
+            elif cortado is None and restante > 50 and pontuacoes[i] > 0:
+                # O bloco não cabe inteiro: ficar com as primeiras linhas
+                linhas = []
+                for linha in blocos[i][0]:
+                    custo = estimar_tokens(linha) + 1
+                    if custo > restante:
+                        break
+                    linhas.append(linha)
+                    restante -= custo
+                if linhas:
+                    cortado = (i, linhas)
+                    mantidos.add(i)
+
+    partes = []
+    for i, (linhas, _) in enumerate(blocos):
+        if i in mantidos:
+            partes.append("\n".join(cortado[1] if cortado and cortado[0] == i else linhas))
+    reduzido = "\n\n".join(partes)
+    if not reduzido and blocos:
+        # Orçamento menor do que qualquer bloco: enviar ao menos o início
+        reduzido = "\n".join(blocos[0][0])[:orcamento_tokens * CARACTERES_POR_TOKEN]
+
+    tokens_enviados = estimar_tokens(reduzido)
+    return reduzido, {
+        "tokensOriginais": tokens_originais,
+        "tokensEnviados": tokens_enviados,
+        "tokensPoupados": tokens_originais - tokens_enviados,
+        "linhasBoilerplate": linhas_boilerplate,
+        "linhasDuplicadas": linhas_duplicadas,
+        "blocos": len(blocos),
+        "blocosDescartados": len(blocos) - len(mantidos),
+        "tempoMs": round((time.perf_counter() - inicio) * 1000, 2),
+    }
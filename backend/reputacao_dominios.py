@@ -0,0 +1,171 @@
+"""
+Reputação dos domínios aprendida com o histórico de análises.
+
+Os contadores vêm dos documentos `reputacao:<dominio registável>` da coleção
+vagas_estatisticas (ver estatisticas_vagas.py): número de análises, quantas
+deram ALTO ou CRITICO, pontuação média e datas da primeira e da última
+análise. Todos os documentos ficam em memória (um por domínio, poucos
+milhares) para que get_url_trust_info os consulte sem ir ao banco:
+
+- são carregados no arranque e recarregados a cada `intervalo_recarga`
+  segundos, para apanhar as vagas gravadas por outros workers
+- as vagas gravadas por este processo são somadas de imediato (`registrar`)
+
+O veredicto só existe com um mínimo de análises:
+
+- MAU: a proporção de alto risco atinge `limiar_mau` e a última análise
+  completa tem menos de `validade_dias`; a análise de um link do domínio
+  pode então dispensar o LLM (`atalho`). As vagas assim decididas não
+  contam para a reputação, pelo que, sem análises completas, o veredicto
+  expira ao fim de `validade_dias` e o domínio volta a ser analisado
+- BOM: a proporção de alto risco não passa de `limiar_bom`
+- INDEFINIDO: entre os dois, ou MAU com o histórico desatualizado
+- SEM_HISTORICO: menos análises do que o mínimo
+
+O atalho não se aplica a encurtadores e serviços de mensagens (bit.ly,
+wa.me, forms.gle...: um só domínio para links de muitos autores) nem a
+hosts cujo sufixo público não está na lista de dominios_confiaveis.py (o
+domínio registável seria o próprio sufixo, "co.ke", partilhado por todos
+os sites do país). A exceção são hosts com uma só etiqueta debaixo de um
+TLD fora da lista ("ganhos-rapidos.xyz", "www.vagas.top"): aí o host é o
+próprio domínio registável. Nos restantes casos a reputação continua a ir
+para o prompt do LLM como indicação, mas a análise é sempre completa.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from dominios_confiaveis import ETIQUETAS_SEGUNDO_NIVEL, classificador as classificador_dominios, dominio_registavel
+from estatisticas_vagas import PREFIXO_REPUTACAO, incrementos
+from triagem_regras import ENCURTADORES, HOSTS_MENSAGENS
+
+# Hosts partilhados por muitos autores: a reputação do domínio não diz nada sobre um link concreto
+HOSTS_PARTILHADOS = ENCURTADORES | HOSTS_MENSAGENS
+
+log = logging.getLogger(__name__)
+
+
+class ReputacaoDominios:
+    """Contadores de reputação por domínio registável, mantidos em memória"""
+
+    def __init__(self, collection, minimo_analises: int = 5, limiar_mau: float = 0.8, limiar_bom: float = 0.1,
+                 validade_dias: float = 30, intervalo_recarga: float = 300, atalho_ativo: bool = True):
+        self.collection = collection
+        self.atalho_ativo = atalho_ativo
+        self.minimo_analises = minimo_analises
+        self.limiar_mau = limiar_mau
+        self.limiar_bom = limiar_bom
+        self.validade = timedelta(days=validade_dias)
+        self.intervalo_recarga = intervalo_recarga
+        self._dominios: Dict[str, Dict[str, Any]] = {}
+        self.carregado_em: Optional[datetime] = None
+        self.recargas = 0
+        self.atalhos = 0
+
+    async def carregar(self) -> int:
+        """Substitui os contadores em memória pelos do banco"""
+        projecao = {"_id": 0, "chave": 1, "total_vagas": 1, "alto_risco": 1, "soma_pontuacao": 1, "com_pontuacao": 1,
+                    "primeira_analise": 1, "ultima_analise": 1}
+        dominios = {doc["chave"]: doc async for doc in self.collection.find({"tipo": "reputacao"}, projecao)}
+        # Troca atómica: as consultas em curso continuam com o dicionário anterior
+        self._dominios = dominios
+        self.carregado_em = datetime.now()
+        self.recargas += 1
+        return len(dominios)
+
+    async def manter_atualizada(self) -> None:
+        """Tarefa de fundo: recarrega os contadores periodicamente (falhas não a interrompem)"""
+        while True:
+            try:
+                total = await self.carregar()
+                if self.recargas == 1:
+                    log.info("Reputação dos domínios carregada", extra={"dominios": total})
+            except Exception as e:
+                log.error("Erro ao carregar a reputação dos domínios", extra={"erro": str(e)})
+            await asyncio.sleep(self.intervalo_recarga)
+
+    def registrar(self, vagas: List[Dict[str, Any]]) -> None:
+        """Soma as vagas acabadas de gravar, com os mesmos incrementos enviados ao banco"""
+        for vaga in vagas:
+            for id_doc, atualizacao in incrementos(vaga).items():
+                if not id_doc.startswith(PREFIXO_REPUTACAO):
+                    continue
+                atual = {**self._dominios.get(id_doc[len(PREFIXO_REPUTACAO):], atualizacao["$setOnInsert"])}
+                for campo, valor in atualizacao["$inc"].items():
+                    atual[campo] = atual.get(campo, 0) + valor
+                for operador, escolher in (("$min", min), ("$max", max)):
+                    for campo, valor in atualizacao.get(operador, {}).items():
+                        atual[campo] = escolher(atual[campo], valor) if atual.get(campo) else valor
+                self._dominios[atual["chave"]] = atual
+
+    def obter(self, host: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Reputação do domínio registável do host; None se o host não tiver domínio registável"""
+        dominio = dominio_registavel(host.strip().lower().rstrip(".") if host else None)
+        if not dominio:
+            return None
+        doc = self._dominios.get(dominio, {})
+        analises = doc.get("total_vagas", 0)
+        alto_risco = doc.get("alto_risco", 0)
+        proporcao = alto_risco / analises if analises else 0.0
+        ultima_analise = doc.get("ultima_analise")
+        if analises < self.minimo_analises:
+            veredicto = "SEM_HISTORICO"
+        elif proporcao >= self.limiar_mau and ultima_analise and datetime.now() - ultima_analise <= self.validade:
+            veredicto = "MAU"
+        elif proporcao <= self.limiar_bom:
+            veredicto = "BOM"
+        else:
+            veredicto = "INDEFINIDO"
+        return {
+            "dominio": dominio,
+            "analises": analises,
+            "alto_risco": alto_risco,
+            "proporcao_alto_risco": round(proporcao, 3),
+            "pontuacao_media": round(doc["soma_pontuacao"] / doc["com_pontuacao"], 1) if doc.get("com_pontuacao") else None,
+            "primeira_analise": doc.get("primeira_analise"),
+            "ultima_analise": ultima_analise,
+            "veredicto": veredicto,
+        }
+
+    def atalho_permitido(self, host: Optional[str]) -> bool:
+        """
+        Se a reputação do host pode dispensar a análise: não para domínios confiáveis
+        (os portais também publicam golpes), hosts partilhados nem sufixos desconhecidos,
+        exceto uma só etiqueta debaixo do TLD ("ganhos-rapidos.xyz")
+        """
+        if not (self.atalho_ativo and host):
+            return False
+        host = host.strip().lower().rstrip(".")
+        classificacao = classificador_dominios.classificar(host)
+        if classificacao["categoria"]:
+            return False
+        host_sem_www = host[4:] if host.startswith("www.") else host
+        if not classificacao["sufixo_conhecido"]:
+            etiquetas = host_sem_www.split(".")
+            if len(etiquetas) != 2 or etiquetas[0] in ETIQUETAS_SEGUNDO_NIVEL:
+                return False
+        return not ({host_sem_www, classificacao["dominio_registavel"]} & HOSTS_PARTILHADOS)
+
+    def atalho(self, host: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Reputação MAU que dispensa a análise completa; None se o atalho não for permitido para o host"""
+        if not self.atalho_permitido(host):
+            return None
+        reputacao = self.obter(host)
+        if not reputacao or reputacao["veredicto"] != "MAU":
+            return None
+        self.atalhos += 1
+        return reputacao
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "dominios": len(self._dominios),
+            "recargas": self.recargas,
+            "carregado_em": self.carregado_em,
+            "atalho_ativo": self.atalho_ativo,
+            "atalhos": self.atalhos,
+            "minimo_analises": self.minimo_analises,
+            "limiar_mau": self.limiar_mau,
+            "limiar_bom": self.limiar_bom,
+            "validade_dias": self.validade.days,
+        }
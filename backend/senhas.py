@@ -0,0 +1,96 @@
+"""
+Hash e verificação de senhas fora do event loop.
+
+bcrypt gasta 100–300 ms de CPU por verificação; no event loop, uma rajada
+de logins no início de um turno parava todos os outros pedidos. Aqui as
+operações correm num pool de threads limitado (o bcrypt liberta o GIL
+enquanto calcula):
+
+- no máximo `max_threads` hashes em simultâneo, para não tirar a CPU toda
+  às análises
+- no máximo `max_pendentes` à espera; acima disso SobrecargaSenhas (503)
+  em vez de uma fila sem fim
+- `verificar` devolve também o novo hash quando o custo do bcrypt
+  (BCRYPT_ROUNDS) mudou, para a senha ser atualizada no login
+- sem hash (utilizador inexistente, código errado) verifica-se um hash
+  falso com o mesmo custo, para que o tempo de resposta não revele quais
+  emails existem
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+class SobrecargaSenhas(Exception):
+    """Demasiadas verificações de senha à espera"""
+
+
+def contexto_senhas(rounds: int = 12) -> CryptContext:
+    """CryptContext do bcrypt com o custo indicado; hashes com outro custo precisam de atualização"""
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+class VerificadorSenhas:
+    """bcrypt num pool de threads limitado, com fila de espera limitada"""
+
+    def __init__(self, rounds: int = 12, max_threads: int = 2, max_pendentes: int = 64):
+        self.contexto = contexto_senhas(rounds)
+        self.rounds = rounds
+        self.max_threads = max_threads
+        self.max_pendentes = max_pendentes
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="bcrypt")
+        self._pendentes = 0
+        self._hash_falso: Optional[str] = None
+        self.verificacoes = 0
+        self.rehashes = 0
+        self.rejeitadas = 0
+        self.tempo_total = 0.0
+
+    async def _executar(self, funcao, *args):
+        if self._pendentes >= self.max_pendentes:
+            self.rejeitadas += 1
+            raise SobrecargaSenhas(f"{self._pendentes} verificações de senha em espera")
+        self._pendentes += 1
+        inicio = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, funcao, *args)
+        finally:
+            self._pendentes -= 1
+            self.tempo_total += time.perf_counter() - inicio
+
+    async def gerar_hash(self, senha: str) -> str:
+        return await self._executar(self.contexto.hash, senha)
+
+    async def verificar(self, senha: str, hash_senha: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Retorna (valida, novo_hash); novo_hash só existe se a senha for válida e
+        o hash gravado usar outro custo. Sem hash_senha, a resposta é sempre False.
+        """
+        self.verificacoes += 1
+        if not hash_senha or not self.contexto.identify(hash_senha):
+            if self._hash_falso is None:
+                self._hash_falso = await self.gerar_hash("senha-inexistente")
+            await self._executar(self.contexto.verify, senha, self._hash_falso)
+            return False, None
+        valida, novo_hash = await self._executar(self.contexto.verify_and_update, senha, hash_senha)
+        if novo_hash:
+            self.rehashes += 1
+        return valida, novo_hash
+
+    def fechar(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "max_threads": self.max_threads,
+            "pendentes": self._pendentes,
+            "max_pendentes": self.max_pendentes,
+            "verificacoes": self.verificacoes,
+            "rehashes": self.rehashes,
+            "rejeitadas": self.rejeitadas,
+            "tempo_medio_ms": round(self.tempo_total / self.verificacoes * 1000, 1) if self.verificacoes else None,
+        }
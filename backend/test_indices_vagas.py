@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Testa os índices e os campos derivados da coleção vagas com explain().
+
+Requer um MongoDB (MONGODB_URL). Usa uma base de dados temporária: insere
+vagas sintéticas no formato antigo (sem campos derivados), corre a migração
+e verifica que:
+
+- todas as vagas ficam com dominio, empresa_chave e risco_alto na versão atual
+- nenhuma consulta da listagem, das estatísticas e dos rankings usa COLLSCAN
+- os rankings por índice dão o mesmo resultado que a contagem em Python
+- a paginação por cursor percorre todas as vagas sem repetir nem saltar
+  nenhuma, e uma página profunda lê tantas entradas do índice como a primeira
+- as estatísticas materializadas (reconstruídas e depois incrementadas)
+  coincidem com a agregação sobre as vagas, incluindo a reputação dos
+  domínios, em que as vagas decididas pela reputação e as quase-duplicadas
+  não contam
+"""
+
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from estatisticas_vagas import reconstruir, registrar, verificar
+from indices_vagas import (ROTULO_ANALISE_TEXTO, VERSAO_DERIVADOS, campos_derivados, migrar, pipeline_top_dominios,
+                           pipeline_top_empresas)
+from paginacao_vagas import ORDEM_LISTAGEM, PROJECAO_LISTAGEM, codificar_cursor, filtro_pagina, pagina_vagas
+
+load_dotenv()
+
+BASE_TESTE = "humai_verify_teste_indices"
+NUM_VAGAS = int(os.getenv("NUM_VAGAS_TESTE", 5000))
+EMPRESAS = ["GlobalTech Solutions", "globaltech  solutions", "Globaltech Solutions Lda", "GLOBALTECH SOLUTIONS, S.A.",
+            "Microsoft", "Microsoft Corporation", "TechnoServe", "Não especificada", "Empresa anónima",
+            "Agência de Recrutamento (Nome não especificado)", "CISM - Centro de Investigação em Saúde de Manhiça",
+            "CISM", None]
+URLS = [None, None, "https://www.emprego.co.mz/vaga/{i}", "https://empregos-suspeitos-fake.com/vaga/{i}",
+        "https://ganhos-rapidos-online.net/vaga/{i}", "http://localhost:3000/vaga/{i}"]
+NIVEIS = ["BAIXO", "MEDIO", "ALTO", "CRITICO"]
+
+
+def vaga_sintetica(i: int) -> dict:
+    url = random.choice(URLS)
+    return {
+        "url_vaga": url.format(i=i) if url else None,
+        "texto_original": None if url else f"Texto da vaga {i}",
+        "tipo_entrada": "LINK" if url else "TEXTO",
+        "titulo": f"Vaga {i}",
+        "empresa": random.choice(EMPRESAS),
+        "descricao": "x" * 500,
+        "nivel_risco": random.choice(NIVEIS),
+        "pontuacao_risco": random.randint(0, 100),
+        "alertas": [],
+        "recomendacoes": [],
+        "detalhes_risco": {},
+        # Várias vagas com a mesma data: o _id desempata a ordem da paginação
+        "data_analise": datetime(2025, 1, 1) + timedelta(minutes=i // 3),
+    }
+
+
+def estagios(plano) -> set:
+    """Todos os estágios (COLLSCAN, IXSCAN, FETCH...) de um plano de explain()"""
+    encontrados = set()
+    if isinstance(plano, dict):
+        if "stage" in plano:
+            encontrados.add(plano["stage"])
+        for valor in plano.values():
+            encontrados |= estagios(valor)
+    elif isinstance(plano, list):
+        for valor in plano:
+            encontrados |= estagios(valor)
+    return encontrados
+
+
+def verificar_sem_collscan(nome: str, plano: dict) -> None:
+    encontrados = estagios(plano)
+    assert "COLLSCAN" not in encontrados, f"{nome}: COLLSCAN no plano {json.dumps(plano, default=str)[:2000]}"
+    assert encontrados & {"IXSCAN", "COUNT_SCAN", "DISTINCT_SCAN"}, f"{nome}: nenhum índice usado ({encontrados})"
+    print(f"✅ {nome}: {', '.join(sorted(encontrados))}")
+
+
+async def verificar_paginacao(collection, filtro: dict, limit: int = 10) -> None:
+    """Percorre a listagem por cursor e compara com a ordem completa; compara o plano da 1.ª e da última página"""
+    nome = f"paginação {filtro or 'sem filtro'}"
+    esperado = [str(v["_id"]) async for v in collection.find(filtro, {"_id": 1}).sort(ORDEM_LISTAGEM)]
+    obtido, cursor, cursores = [], None, [None]
+    while True:
+        vagas, cursor = await pagina_vagas(collection, filtro, limit, cursor)
+        obtido.extend(v["_id"] for v in vagas)
+        assert all(set(v) <= set(PROJECAO_LISTAGEM) | {"_id"} for v in vagas), f"{nome}: campos fora da projeção"
+        if not cursor:
+            break
+        cursores.append(cursor)
+    assert obtido == esperado, f"{nome}: {len(obtido)} vagas paginadas, {len(esperado)} esperadas"
+
+    examinadas = []
+    for cursor in (cursores[min(1, len(cursores) - 1)], cursores[-1]):
+        consulta = collection.find(filtro_pagina(filtro, cursor), PROJECAO_LISTAGEM).sort(ORDEM_LISTAGEM).limit(limit + 1)
+        plano = await consulta.explain()
+        verificar_sem_collscan(f"{nome}, página {cursores.index(cursor) + 1}", plano)
+        examinadas.append(plano["executionStats"]["totalKeysExamined"])
+    # Sem skip(), as chaves examinadas dependem do tamanho da página e não da profundidade
+    assert max(examinadas) <= 2 * (limit + 1), f"{nome}: chaves examinadas {examinadas}"
+    print(f"✅ {nome}: {len(cursores)} páginas, chaves examinadas na 2.ª/última página: {examinadas}")
+
+
+async def test_indices_vagas():
+    """Migração, campos derivados e planos das consultas da coleção vagas"""
+    client = AsyncIOMotorClient(os.getenv('MONGODB_URL', 'mongodb://localhost:27017'))
+    db = client[BASE_TESTE]
+    collection = db.vagas
+    try:
+        await collection.drop()
+        vagas = [vaga_sintetica(i) for i in range(NUM_VAGAS)]
+        # Metade no formato antigo (sem campos derivados), metade com os campos da versão 1
+        antigas = [dict(v) if i % 2 else {**v, "empresa_norm": (v["empresa"] or "").lower(), "risco_alto": False}
+                   for i, v in enumerate(vagas)]
+        await collection.insert_many(antigas)
+        print(f"✅ {NUM_VAGAS} vagas inseridas sem campos derivados ou com os da versão 1")
+
+        await migrar(collection, tamanho_lote=1000)
+        sem_campos = await collection.count_documents({"versao_derivados": {"$ne": VERSAO_DERIVADOS}})
+        assert sem_campos == 0, f"{sem_campos} vagas sem campos derivados da versão atual"
+        assert not await collection.count_documents({"empresa_norm": {"$exists": True}}), "empresa_norm não removido"
+        chaves_globaltech = await collection.distinct("empresa_chave", {"empresa": {"$regex": "^globaltech", "$options": "i"}})
+        assert chaves_globaltech == ["globaltech solutions"], f"Variantes não agrupadas: {chaves_globaltech}"
+        # A migração é idempotente
+        await migrar(collection)
+        print("✅ Campos derivados preenchidos em todas as vagas")
+
+        ordem = [("data_analise", -1), ("_id", -1)]
+        verificar_sem_collscan("listagem", await collection.find({}).sort(ordem).limit(10).explain())
+        verificar_sem_collscan("listagem por nível",
+                               await collection.find({"nivel_risco": "ALTO"}).sort(ordem).limit(10).explain())
+        verificar_sem_collscan("contagem de alto risco",
+                               await db.command("explain", {"count": "vagas", "query": {"risco_alto": True}}))
+        verificar_sem_collscan("top empresas", await db.command(
+            "aggregate", "vagas", pipeline=pipeline_top_empresas(), explain=True))
+        verificar_sem_collscan("top domínios", await db.command(
+            "aggregate", "vagas", pipeline=pipeline_top_dominios(), explain=True))
+
+        # Resultados iguais à contagem direta
+        derivadas = [campos_derivados(v) for v in vagas]
+        empresas = Counter(d["empresa_chave"] for d in derivadas if d["risco_alto"] and d["empresa_chave"])
+        dominios = Counter(d["dominio"] or ROTULO_ANALISE_TEXTO for d in derivadas
+                           if d["risco_alto"] and d["dominio"] not in ("localhost", "127.0.0.1"))
+        top_empresas = await collection.aggregate(pipeline_top_empresas()).to_list(None)
+        top_dominios = await collection.aggregate(pipeline_top_dominios()).to_list(None)
+        assert sorted(e["total_vagas_alto_risco"] for e in top_empresas) == sorted(c for _, c in empresas.most_common(4))
+        assert {d["dominio"]: d["total_vagas_alto_risco"] for d in top_dominios} == dict(dominios.most_common(4))
+        print(f"✅ Rankings corretos: {top_empresas} {top_dominios}")
+
+        await verificar_paginacao(collection, {})
+        await verificar_paginacao(collection, {"nivel_risco": "ALTO"})
+
+        await reconstruir(collection, db.vagas_estatisticas)
+        novas = [{**v, **campos_derivados(v), "atalho_reputacao": i % 10 == 0,
+                  "vaga_original": "vaga-anterior" if i % 7 == 0 else None}
+                 for i, v in enumerate(map(vaga_sintetica, range(NUM_VAGAS, NUM_VAGAS + 50)))]
+        await collection.insert_many(novas)
+        await registrar(db.vagas_estatisticas, novas)
+        diferencas = await verificar(collection, db.vagas_estatisticas)
+        assert not diferencas, f"Estatísticas materializadas diferentes da agregação: {diferencas}"
+        print("✅ Estatísticas materializadas iguais à agregação")
+    finally:
+        await client.drop_database(BASE_TESTE)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(test_indices_vagas())
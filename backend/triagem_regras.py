@@ -0,0 +1,421 @@
+"""
+Triagem determinística por regras, executada antes do LLM.
+
+Os critérios do prompt de análise que se detetam por palavras-chave (título
+chamativo, contato só por WhatsApp, pedido de dinheiro antecipado, links
+encurtados...) têm léxicos em português e inglês. Todas as frases são
+compiladas numa única expressão regular com a forma de uma trie, aplicada
+ao texto sem acentos e em minúsculas: o motor de regex percorre os
+prefixos comuns uma só vez, à maneira de Aho-Corasick, em vez de testar
+frase a frase.
+
+O resultado é um mapa `detalhes` preliminar (as mesmas chaves do LLM), os
+trechos suspeitos com as suas posições no texto e, quando a evidência é
+esmagadora (CRITICO) ou claramente benigna, uma decisão que dispensa o LLM.
+"""
+import re
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+CAMPOS_DETALHES = (
+    "tituloSuspeito", "empresaSuspeita", "descricaoVaga", "requisitosVagos",
+    "salarioIrreal", "contatoSuspeito", "plataformaSuspeita", "urlSuspeita",
+)
+
+# Critérios do prompt (os critérios 2 e 8 partilham "empresa"); "trafico" cobre
+# sinais de recrutamento para exploração. "peso" é a influência na pontuação global.
+CRITERIOS: Dict[str, Dict[str, Any]] = {
+    "titulo": {
+        "campo": "tituloSuspeito", "peso": 0.5,
+        "alerta": "Título com promessas de ganhos fáceis",
+        "explicacao": "Expressões como \"ganhe muito\" ou \"dinheiro fácil\" são típicas de anúncios fraudulentos.",
+    },
+    "empresa": {
+        "campo": "empresaSuspeita", "peso": 0.4,
+        "alerta": "Empresa não identificada",
+        "explicacao": "O anúncio não identifica claramente a empresa contratante, o que impede verificar a sua existência.",
+    },
+    "promessas": {
+        "campo": "descricaoVaga", "peso": 0.6,
+        "alerta": "Promessas irrealistas na descrição",
+        "explicacao": "Ganhos garantidos ou muito altos para pouco trabalho não correspondem a ofertas de emprego reais.",
+    },
+    "requisitos": {
+        "campo": "requisitosVagos", "peso": 0.4,
+        "alerta": "Requisitos inexistentes ou muito baixos",
+        "explicacao": "Vagas que dispensam qualquer experiência ou qualificação são usadas para atrair o maior número de vítimas.",
+    },
+    "contato": {
+        "campo": "contatoSuspeito", "peso": 0.5,
+        "alerta": "Contato apenas por canais pessoais",
+        "explicacao": "O contato é feito apenas por WhatsApp, mensagem privada ou email pessoal, sem um canal oficial da empresa.",
+    },
+    "plataforma": {
+        "campo": "plataformaSuspeita", "peso": 0.3,
+        "alerta": "Divulgação em plataforma não profissional",
+        "explicacao": "Redes sociais e grupos de mensagens não verificam quem publica anúncios de emprego.",
+    },
+    "salario": {
+        "campo": "salarioIrreal", "peso": 0.5,
+        "alerta": "Remuneração irrealista",
+        "explicacao": "A remuneração prometida é desproporcional à função ou aos requisitos pedidos.",
+    },
+    "pressao": {
+        "campo": "descricaoVaga", "peso": 0.3,
+        "alerta": "Pressão para decidir rapidamente",
+        "explicacao": "Urgência artificial (\"últimas vagas\", \"não perca\") serve para impedir que o candidato verifique a oferta.",
+    },
+    "pagamento": {
+        "campo": "descricaoVaga", "peso": 0.95,
+        "alerta": "Pedido de pagamento antecipado",
+        "explicacao": "Empregadores legítimos nunca cobram taxas de inscrição, formação, kits ou vistos aos candidatos.",
+    },
+    "trafico": {
+        "campo": "descricaoVaga", "peso": 0.8,
+        "alerta": "Sinais de recrutamento para exploração",
+        "explicacao": "Viagem ou alojamento pagos, trabalho no exterior e restrições de género ou aparência são padrões de aliciamento para tráfico humano.",
+    },
+    "url": {
+        "campo": "urlSuspeita", "peso": 0.6,
+        "alerta": "Link suspeito",
+        "explicacao": "Links encurtados, domínios genéricos ou com palavras de ganhos fáceis escondem o destino real.",
+    },
+}
+
+# Léxicos: critério -> {pontos: frases}. As frases são escritas sem acentos e em
+# minúsculas; espaços aceitam também hífens e quebras de linha.
+LEXICO: Dict[str, Dict[int, Tuple[str, ...]]] = {
+    "titulo": {
+        70: ("ganhe muito", "ganhe muito dinheiro", "dinheiro facil", "dinheiro facilmente", "dinheiro rapido",
+             "ganhos rapidos", "fique rico", "enriqueca rapido", "easy money", "get rich", "make money fast",
+             "earn money fast"),
+        40: ("oportunidade unica", "renda extra", "ganhe dinheiro", "trabalho facil", "trabalhe de casa",
+             "trabalho em casa", "trabalhando de casa", "sem sair de casa", "seja seu proprio chefe",
+             "seja o seu proprio patrao", "renda passiva", "work from home", "be your own boss"),
+    },
+    "promessas": {
+        60: ("ganhos garantidos", "renda garantida", "lucro garantido", "retorno garantido", "dinheiro garantido",
+             "guaranteed income", "facil e rapido", "rapido e facil", "sem esforco", "renda ilimitada",
+             "ganhos ilimitados", "unlimited income"),
+        30: ("muito dinheiro", "poucas horas por dia", "alto rendimento", "high income"),
+    },
+    "empresa": {
+        50: ("empresa anonima", "empresa confidencial", "empresa nao especificada", "empresa nao divulgada",
+             "nao divulgamos o nome", "confidential company"),
+        30: ("agencia de recrutamento", "empresa multinacional", "parceiro internacional"),
+    },
+    "requisitos": {
+        60: ("sem experiencia", "sem experiencia necessaria", "nao e necessaria experiencia",
+             "nao precisa de experiencia", "nao exige experiencia", "nenhuma experiencia", "sem requisitos",
+             "sem qualificacao", "qualquer pessoa", "no experience", "no experience needed",
+             "no experience required", "anyone can"),
+    },
+    "contato": {
+        80: ("apenas por whatsapp", "somente por whatsapp", "so por whatsapp", "somente whatsapp", "so whatsapp",
+             "chama no whatsapp", "chamar no whatsapp", "mensagem no whatsapp", "deixe teu contacto",
+             "deixe o teu contacto", "deixe o seu contacto", "deixe seu contato", "deixe o seu contato",
+             "no pvt", "no privado", "chama no pv", "chama no privado", "mensagem privada", "inbox",
+             "whatsapp only", "only whatsapp", "dm me", "send me a dm"),
+        40: ("whatsapp", "telegram"),
+    },
+    "plataforma": {
+        40: ("facebook", "instagram", "tiktok", "kwai", "grupo de whatsapp", "grupo do whatsapp",
+             "grupo do facebook", "canal do telegram"),
+    },
+    "salario": {
+        50: ("ganhe ate", "ganhos de ate", "ganhe em dolares", "salario altissimo", "receba diariamente",
+             "pagamento diario", "earn up to"),
+        30: ("salario acima da media", "salario atrativo", "salario aliciante"),
+    },
+    "pressao": {
+        50: ("nao perca", "vagas limitadas", "ultimas vagas", "poucas vagas", "so hoje", "apenas hoje",
+             "ultima chance", "ultima oportunidade", "responda ja", "vagas esgotando", "act now",
+             "limited spots", "dont miss", "don't miss", "last chance"),
+        30: ("urgente", "imediatamente"),
+    },
+    "pagamento": {
+        90: ("taxa de inscricao", "taxa de adesao", "taxa de cadastro", "taxa de formacao", "taxa de processamento",
+             "taxa de registo", "taxa de registro", "taxa do visto", "custos do visto", "pagar o visto",
+             "pague a taxa", "pagar a taxa", "pagamento antecipado", "deposito antecipado", "valor de inscricao",
+             "custo do kit", "compra do kit", "kit de trabalho", "envie o valor", "registration fee",
+             "application fee", "processing fee", "training fee", "upfront payment", "pay a fee"),
+        40: ("m-pesa", "mpesa", "e-mola", "emola", "pix", "deposito"),
+    },
+    "trafico": {
+        60: ("trabalho no exterior", "trabalhar no exterior", "trabalho na europa", "trabalhar na europa",
+             "trabalho fora do pais", "viagem paga", "passagem paga", "passagens pagas", "bilhete de aviao pago",
+             "visto garantido", "visto de trabalho garantido", "alojamento gratuito", "entregar o passaporte",
+             "entregue o passaporte", "apenas para mulheres", "somente mulheres", "so para mulheres",
+             "vagas apenas para mulheres", "meninas bonitas", "boa aparencia", "acompanhantes",
+             "work abroad", "free flight", "free accommodation"),
+        30: ("alojamento incluido", "alojamento pago"),
+    },
+}
+
+# Frases de anúncios legítimos (contam como sinais positivos). As negações
+# ("não cobramos qualquer taxa") são mais longas do que as frases de pagamento e
+# ganham-lhes na correspondência.
+LEGITIMIDADE: Tuple[str, ...] = (
+    "envie o seu cv", "envie o cv", "envie o seu curriculum", "curriculum vitae", "carta de apresentacao",
+    "carta de motivacao", "candidaturas", "processo de candidatura", "como candidatar", "licenciatura",
+    "mestrado", "anos de experiencia", "experiencia minima", "experiencia comprovada", "habilitacoes",
+    "qualificacoes", "responsabilidades", "principais funcoes", "termos de referencia", "requisitos minimos",
+    "data limite", "prazo de candidatura", "nunca cobramos", "nao cobramos qualquer taxa",
+    "nao cobramos nenhuma taxa", "nao cobramos taxas", "nao e cobrada qualquer taxa", "sem qualquer taxa",
+    "sem taxa de inscricao", "years of experience", "bachelor", "degree", "responsibilities", "qualifications",
+    "how to apply", "cover letter", "we never charge",
+)
+
+ENCURTADORES = {
+    "bit.ly", "tinyurl.com", "goo.gl", "t.co", "ow.ly", "is.gd", "cutt.ly", "rebrand.ly", "shorturl.at",
+    "encurtador.com.br", "rb.gy", "tiny.cc", "linktr.ee", "forms.gle",
+}
+HOSTS_MENSAGENS = {"wa.me", "api.whatsapp.com", "chat.whatsapp.com", "t.me", "telegram.me"}
+TLDS_SUSPEITOS = {
+    "xyz", "top", "click", "online", "site", "icu", "buzz", "rest", "monster", "tk", "ml", "ga", "cf", "gq",
+    "work", "loan", "win", "club",
+}
+EMAILS_PESSOAIS = {"gmail.com", "hotmail.com", "yahoo.com", "yahoo.com.br", "outlook.com", "live.com", "icloud.com"}
+
+# Palavras de isca em hosts. Só contam se uma parte do host (separada por ".", "-" ou dígitos)
+# for inteiramente feita delas ("ganhos-rapidos", "easymoney"), e não em freelancer, richmond,
+# cashew ou facilities
+_PALAVRAS_DOMINIO = re.compile(
+    r"(?:ganh[a-z]*?|dinheiro|rapid[a-z]*?|facil|gratis|lucro[a-z]*?|renda|bonus|premio[a-z]*?|money|cash|easy|free"
+    r"|rich|fake|suspeit[a-z]*?)"
+)
+_PARTE_PALAVRAS_DOMINIO = re.compile(f"(?:{_PALAVRAS_DOMINIO.pattern})+")
+_SEPARADORES_HOST = re.compile(r"[.\-\d]+")
+_URL = re.compile(r"(?:https?://|www\.)[^\s<>\"')\]]+|\b(?:" + "|".join(re.escape(h) for h in sorted(ENCURTADORES | HOSTS_MENSAGENS)) + r")/[^\s<>\"')\]]*")
+_EMAIL = re.compile(r"[\w.+-]+@((?:[\w-]+\.)+[a-z]{2,})")
+_TELEFONE = re.compile(r"(?<![\w.,])(?:\+\d{1,3}[\s.-]?)?(?:\(?\d{2,3}\)?[\s.-]?)?\d{3,5}[\s.-]?\d{3,4}(?![\w.,]\d)")
+_DINHEIRO = r"(?:(?:r\$|us\$|usd|\$|€|eur|mzn|kz)\s?\d[\d.,]*(?:\s?mil)?|\d[\d.,]*(?:\s?mil)?\s?(?:reais|meticais|mzn|mt|dolares|usd|euros))"
+_MOEDA = re.compile(_DINHEIRO)
+
+# Regras que dependem de números: (critério, pontos, regex sobre o texto normalizado)
+REGRAS_REGEX: Tuple[Tuple[str, int, "re.Pattern[str]"], ...] = (
+    ("promessas", 40, re.compile(
+        r"(?:trabalh\w*|work)\s+(?:apenas\s+|so\s+|only\s+)?\d{1,2}\s*h(?:oras?|ours?)?\s+(?:por|ao|a|per)\s+(?:dia|day)")),
+    ("salario", 50, re.compile(_DINHEIRO + r"\s*(?:por|ao|a|per|/)\s*(?:dia|semana|hora|day|week|hour)\b")),
+)
+
+
+def _tabela_dobragem() -> Dict[int, str]:
+    """
+    Tabela para str.translate que remove acentos e passa a minúsculas sem
+    alterar o comprimento do texto (as posições continuam a valer no original).
+    """
+    tabela = {codigo: chr(codigo + 32) for codigo in range(ord("A"), ord("Z") + 1)}
+    for codigo in range(0x00C0, 0x0250):
+        caractere = chr(codigo)
+        base = "".join(c for c in unicodedata.normalize("NFKD", caractere) if not unicodedata.combining(c)).lower()
+        if len(base) == 1 and base != caractere:
+            tabela[codigo] = base
+    tabela.update({ord("’"): "'", ord("‘"): "'", ord(" "): " ", ord("–"): "-", ord("—"): "-"})
+    return tabela
+
+
+_DOBRAGEM = _tabela_dobragem()
+_NAO_ASCII = re.compile("[" + "".join(chr(c) for c in sorted(_DOBRAGEM) if c > 127) + "]")
+_SEPARADORES = re.compile(r"[\s\-_]+")
+
+
+def normalizar(texto: str) -> str:
+    # lower() e a substituição só dos caracteres acentuados correm em C; translate()
+    # com a tabela inteira é várias vezes mais lento em textos longos
+    minusculas = texto.lower()
+    if len(minusculas) != len(texto):
+        return texto.translate(_DOBRAGEM)
+    return _NAO_ASCII.sub(lambda c: _DOBRAGEM[ord(c.group())], minusculas)
+
+
+def _canonica(frase: str) -> str:
+    return " ".join(_SEPARADORES.split(frase))
+
+
+def _regex_trie(frases: Iterable[str]) -> str:
+    """Alternância com os prefixos comuns fatorizados (a trie das frases como regex)"""
+    trie: Dict[str, Any] = {}
+    for frase in frases:
+        no = trie
+        for caractere in frase:
+            no = no.setdefault(caractere, {})
+        no[""] = True
+
+    def gerar(no: Dict[str, Any]) -> str:
+        ramos = []
+        for caractere in sorted(c for c in no if c):
+            atomo = r"[\s\-_]+" if caractere == " " else re.escape(caractere)
+            ramos.append(atomo + gerar(no[caractere]))
+        if not ramos:
+            return ""
+        fim = "" in no
+        if len(ramos) == 1 and not fim:
+            return ramos[0]
+        padrao = "(?:" + "|".join(ramos) + ")"
+        return padrao + "?" if fim else padrao
+
+    return r"(?<!\w)" + gerar(trie) + r"(?!\w)"
+
+
+def compilar_frases(frases: Iterable[str]) -> "re.Pattern[str]":
+    """Compila frases numa regex em trie, para aplicar a texto passado por normalizar()"""
+    return re.compile(_regex_trie(_canonica(normalizar(frase)) for frase in frases))
+
+
+class TriagemRegras:
+    """Motor de regras compilado uma vez e partilhado entre pedidos"""
+
+    def __init__(self, limiar_critico: int = 90, min_criterios_critico: int = 4,
+                 limiar_benigno: int = 0, min_sinais_legitimos: int = 4):
+        self.limiar_critico = limiar_critico
+        self.min_criterios_critico = min_criterios_critico
+        self.limiar_benigno = limiar_benigno
+        self.min_sinais_legitimos = min_sinais_legitimos
+
+        # frase normalizada -> (critério ou None para legitimidade, pontos)
+        self._frases: Dict[str, Tuple[Optional[str], int]] = {}
+        for criterio, grupos in LEXICO.items():
+            for pontos, frases in grupos.items():
+                for frase in frases:
+                    self._frases[_canonica(normalizar(frase))] = (criterio, pontos)
+        for frase in LEGITIMIDADE:
+            self._frases[_canonica(normalizar(frase))] = (None, 0)
+        self._regex = compilar_frases(self._frases)
+
+    def analisar(self, texto: str, url: Optional[str] = None) -> Dict[str, Any]:
+        """Pontua o texto; as posições dos trechos referem-se ao texto recebido"""
+        inicio = time.perf_counter()
+        if not unicodedata.is_normalized("NFC", texto):
+            texto = unicodedata.normalize("NFC", texto)
+        normalizado = normalizar(texto)
+
+        pontos: Dict[str, int] = {}
+        trechos: List[Dict[str, Any]] = []
+        sinais_legitimos = 0
+        vistos = set()
+
+        def registar(criterio: str, valor: int, posicao: Optional[Tuple[int, int]], trecho: str) -> None:
+            chave = (criterio, trecho.lower())
+            if chave in vistos:
+                return
+            vistos.add(chave)
+            pontos[criterio] = min(100, pontos.get(criterio, 0) + valor)
+            trechos.append({
+                "criterio": criterio,
+                "campo": CRITERIOS[criterio]["campo"],
+                "inicio": posicao[0] if posicao else None,
+                "fim": posicao[1] if posicao else None,
+                "texto": trecho,
+            })
+
+        for encontrado in self._regex.finditer(normalizado):
+            criterio, valor = self._frases[_canonica(encontrado.group())]
+            if criterio is None:
+                sinais_legitimos += 1
+                continue
+            registar(criterio, valor, encontrado.span(), texto[encontrado.start():encontrado.end()])
+
+        for criterio, valor, regex in REGRAS_REGEX:
+            for encontrado in regex.finditer(normalizado):
+                registar(criterio, valor, encontrado.span(), texto[encontrado.start():encontrado.end()])
+
+        # Contatos: email corporativo conta a favor, email pessoal ou só telefone/WhatsApp contra
+        emails = [(e.group(1), e.span()) for e in _EMAIL.finditer(normalizado)] if "@" in normalizado else []
+        emails_corporativos = [d for d, _ in emails if d not in EMAILS_PESSOAIS]
+        sinais_legitimos += min(len(emails_corporativos), 1)
+        for dominio, posicao in emails:
+            if dominio in EMAILS_PESSOAIS:
+                registar("contato", 30, posicao, texto[posicao[0]:posicao[1]])
+        if not emails:
+            for telefone in _TELEFONE.finditer(normalizado):
+                if sum(c.isdigit() for c in telefone.group()) >= 8:
+                    registar("contato", 20, telefone.span(), texto[telefone.start():telefone.end()])
+            if "contato" in pontos:
+                pontos["contato"] = min(100, pontos["contato"] + 20)
+
+        urls = [(u.group(), u.span()) for u in _URL.finditer(normalizado)]
+        if url:
+            urls.append((normalizar(url), None))
+        for endereco, posicao in urls:
+            original = texto[posicao[0]:posicao[1]] if posicao else url
+            for criterio, valor in self._avaliar_url(endereco):
+                registar(criterio, valor, posicao, original)
+
+        # Critério 7: requisitos mínimos com remuneração anunciada
+        if pontos.get("requisitos", 0) >= 50:
+            dinheiro = _MOEDA.search(normalizado)
+            if dinheiro:
+                registar("salario", 40, dinheiro.span(), texto[dinheiro.start():dinheiro.end()])
+
+        # Critério 8: nenhuma forma de identificar a empresa
+        if not sinais_legitimos and not emails and not urls and pontos:
+            pontos["empresa"] = min(100, pontos.get("empresa", 0) + 30)
+
+        detalhes = {campo: 0 for campo in CAMPOS_DETALHES}
+        for criterio, valor in pontos.items():
+            campo = CRITERIOS[criterio]["campo"]
+            detalhes[campo] = max(detalhes[campo], valor)
+
+        restante = 1.0
+        for criterio, valor in pontos.items():
+            restante *= 1 - CRITERIOS[criterio]["peso"] * valor / 100
+        pontuacao = round(100 * (1 - restante))
+
+        textos_suspeitos: Dict[str, str] = {}
+        for trecho in trechos:
+            atual = textos_suspeitos.get(trecho["campo"])
+            textos_suspeitos[trecho["campo"]] = f"{atual}; {trecho['texto']}" if atual else trecho["texto"]
+
+        return {
+            "pontuacao": pontuacao,
+            "nivelRisco": nivel_por_pontuacao(pontuacao),
+            "detalhes": detalhes,
+            "textosSuspeitos": textos_suspeitos,
+            "trechos": trechos,
+            "criterios": sorted(pontos),
+            "sinaisLegitimos": sinais_legitimos,
+            "decisao": self._decidir(pontuacao, len(pontos), sinais_legitimos),
+            "tempoMicrossegundos": round((time.perf_counter() - inicio) * 1e6, 1),
+        }
+
+    def _decidir(self, pontuacao: int, num_criterios: int, sinais_legitimos: int) -> Optional[str]:
+        if pontuacao >= self.limiar_critico and num_criterios >= self.min_criterios_critico:
+            return "CRITICO"
+        if pontuacao <= self.limiar_benigno and sinais_legitimos >= self.min_sinais_legitimos:
+            return "BENIGNO"
+        return None
+
+    @staticmethod
+    def _avaliar_url(endereco: str) -> List[Tuple[str, int]]:
+        host = urlsplit(endereco if "://" in endereco else "http://" + endereco).hostname or ""
+        if host.startswith("www."):
+            host = host[4:]
+        achados = []
+        if host in ENCURTADORES:
+            achados.append(("url", 70))
+        if host in HOSTS_MENSAGENS:
+            achados.append(("contato", 50))
+            if host.startswith("chat.") or host.startswith("t."):
+                achados.append(("plataforma", 40))
+        if re.fullmatch(r"[\d.]+", host):
+            achados.append(("url", 60))
+        elif host.rsplit(".", 1)[-1] in TLDS_SUSPEITOS:
+            achados.append(("url", 40))
+        palavras = [palavra for parte in _SEPARADORES_HOST.split(host) if _PARTE_PALAVRAS_DOMINIO.fullmatch(parte)
+                    for palavra in _PALAVRAS_DOMINIO.findall(parte)]
+        if palavras:
+            achados.append(("url", min(80, 40 * len(palavras))))
+        return achados
+
+
+def nivel_por_pontuacao(pontuacao: int) -> str:
+    if pontuacao >= 80:
+        return "CRITICO"
+    if pontuacao >= 50:
+        return "ALTO"
+    if pontuacao >= 25:
+        return "MEDIO"
+    return "BAIXO"
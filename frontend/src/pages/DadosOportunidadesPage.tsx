@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 
 const API_URL = (import.meta as any).env.VITE_API_URL || 'http://localhost:8000';
 import { 
@@ -27,7 +27,8 @@ import {
 } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../hooks/useAuth';
-import { EstatisticasResponse, TopEmpresaRisco, TopEmpresasResponse, TopDominioRisco, TopDominiosResponse } from '../types';
+import { authService } from '../services/authService';
+import { EstatisticasResponse, TopEmpresaRisco, TopDominioRisco } from '../types';
 
 interface VagaCompleta {
   _id: string;
@@ -58,17 +59,29 @@ interface VagaCompleta {
   data_criacao: string;
 }
 
+// Campos devolvidos pela listagem; o detalhe completo vem de /vagas/{id}
+type VagaResumo = Pick<VagaCompleta,
+  '_id' | 'titulo' | 'empresa' | 'tipo_entrada' | 'url_vaga' | 'remuneracao' | 'localizacao' |
+  'nivel_risco' | 'pontuacao_risco' | 'recomendacoes' | 'data_analise'>;
+
 interface VagasResponse {
-  vagas: VagaCompleta[];
-  total: number;
+  vagas: VagaResumo[];
+  total: number | null;
   limit: number;
-  skip: number;
+  proximo_cursor: string | null;
+}
+
+interface DashboardResponse {
+  vagas: VagasResponse;
+  estatisticas: EstatisticasResponse;
+  empresas: TopEmpresaRisco[];
+  dominios: TopDominioRisco[];
 }
 
 const DadosOportunidadesPage: React.FC = () => {
   const navigate = useNavigate();
   const { user, logout } = useAuth();
-  const [vagas, setVagas] = useState<VagaCompleta[]>([]);
+  const [vagas, setVagas] = useState<VagaResumo[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [searchTerm, setSearchTerm] = useState('');
@@ -76,6 +89,10 @@ const DadosOportunidadesPage: React.FC = () => {
   const [expandedVaga, setExpandedVaga] = useState<string | null>(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [totalPages, setTotalPages] = useState(1);
+  // cursores[i] é o cursor da página i + 1 (a página 1 não tem cursor)
+  const [cursores, setCursores] = useState<(string | null)[]>([null]);
+  const [temProxima, setTemProxima] = useState(false);
+  const paginaMontada = useRef(false);
   const [estatisticas, setEstatisticas] = useState<EstatisticasResponse>({ total_vagas: 0, alto_risco: 0 });
   const [topEmpresas, setTopEmpresas] = useState<TopEmpresaRisco[]>([]);
   const [topDominios, setTopDominios] = useState<TopDominioRisco[]>([]);
@@ -83,72 +100,79 @@ const DadosOportunidadesPage: React.FC = () => {
   const [modalAnaliseRisco, setModalAnaliseRisco] = useState<VagaCompleta | null>(null);
   const itemsPerPage = 10;
 
-  const fetchEstatisticas = async () => {
-    try {
-      const response = await fetch(`${API_URL}/vagas/stats`);
-      if (response.ok) {
-        const data: EstatisticasResponse = await response.json();
-        setEstatisticas(data);
-      }
-    } catch (err) {
-      console.error('Erro ao carregar estatísticas:', err);
+  // Guarda uma página da listagem e os cursores para navegar a partir dela
+  const aplicarPaginaVagas = (data: VagasResponse, page: number, cursoresAtuais: (string | null)[]) => {
+    setVagas(data.vagas);
+    setTemProxima(data.proximo_cursor !== null);
+    const proximos = cursoresAtuais.slice(0, page);
+    if (data.proximo_cursor) {
+      proximos.push(data.proximo_cursor);
     }
+    setCursores(proximos);
+    // O total é aproximado: nunca mostrar menos páginas do que as já percorridas
+    const paginasTotal = data.total !== null ? Math.ceil(data.total / itemsPerPage) : 1;
+    setTotalPages(Math.max(paginasTotal, data.proximo_cursor ? page + 1 : page));
   };
 
-  const fetchTopEmpresas = async () => {
+  // Primeira página, estatísticas e rankings num só pedido (com cache e ETag no servidor)
+  const fetchDashboard = async () => {
     try {
-      const response = await fetch(`${API_URL}/vagas/top-empresas-risco`);
-      if (response.ok) {
-        const data: TopEmpresasResponse = await response.json();
-        setTopEmpresas(data.empresas);
+      setLoading(true);
+      const params = new URLSearchParams({ limit: String(itemsPerPage) });
+      if (filterRisco !== 'TODOS') {
+        params.set('nivel_risco', filterRisco);
       }
-    } catch (err) {
-      console.error('Erro ao carregar top empresas:', err);
-    }
-  };
-
-  const fetchTopDominios = async () => {
-    try {
-      const response = await fetch(`${API_URL}/vagas/top-dominios-risco`);
-      if (response.ok) {
-        const data: TopDominiosResponse = await response.json();
-        setTopDominios(data.dominios);
+      const response = await fetch(`${API_URL}/dashboard?${params}`, { headers: authService.authHeaders() });
+      if (response.status === 401) {
+        // Sessão expirada ou utilizador desativado: voltar ao login
+        logout();
+        return;
       }
+      
+      if (!response.ok) {
+        throw new Error('Erro ao carregar dados');
+      }
+      
+      const data: DashboardResponse = await response.json();
+      aplicarPaginaVagas(data.vagas, 1, [null]);
+      setEstatisticas(data.estatisticas);
+      setTopEmpresas(data.empresas);
+      setTopDominios(data.dominios);
+      setError(null);
     } catch (err) {
-      console.error('Erro ao carregar top domínios:', err);
+      setError('Erro ao carregar dados das oportunidades');
+      console.error('Erro:', err);
+    } finally {
+      setLoading(false);
     }
   };
 
-  const fetchVagas = async (page: number = 1) => {
+  const fetchVagas = async (page: number, cursoresAtuais: (string | null)[] = cursores) => {
     try {
       setLoading(true);
       
-      // Se há filtro ativo, buscar todas as vagas filtradas sem paginação
+      // Paginação por cursor, com ou sem filtro de risco
+      const params = new URLSearchParams({ limit: String(itemsPerPage) });
       if (filterRisco !== 'TODOS') {
-        const response = await fetch(`${API_URL}/vagas?nivel_risco=${filterRisco}`);
-        
-        if (!response.ok) {
-          throw new Error('Erro ao carregar dados');
-        }
-        
-        const data: VagasResponse = await response.json();
-        setVagas(data.vagas);
-        setTotalPages(1); // Sem paginação quando há filtro
-        setError(null);
-      } else {
-        // Sem filtro, usar paginação normal
-        const skip = (page - 1) * itemsPerPage;
-        const response = await fetch(`${API_URL}/vagas?limit=${itemsPerPage}&skip=${skip}`);
-        
-        if (!response.ok) {
-          throw new Error('Erro ao carregar dados');
-        }
-        
-        const data: VagasResponse = await response.json();
-        setVagas(data.vagas);
-        setTotalPages(Math.ceil(data.total / itemsPerPage));
-        setError(null);
+        params.set('nivel_risco', filterRisco);
+      }
+      const cursor = cursoresAtuais[page - 1];
+      if (cursor) {
+        params.set('cursor', cursor);
       }
+      const response = await fetch(`${API_URL}/vagas?${params}`, { headers: authService.authHeaders() });
+      if (response.status === 401) {
+        logout();
+        return;
+      }
+      
+      if (!response.ok) {
+        throw new Error('Erro ao carregar dados');
+      }
+      
+      const data: VagasResponse = await response.json();
+      aplicarPaginaVagas(data, page, cursoresAtuais);
+      setError(null);
     } catch (err) {
       setError('Erro ao carregar dados das oportunidades');
       console.error('Erro:', err);
@@ -158,17 +182,42 @@ const DadosOportunidadesPage: React.FC = () => {
   };
 
   useEffect(() => {
-    setCurrentPage(1); // Resetar para página 1 quando o filtro muda
-    fetchVagas(1);
-    fetchEstatisticas();
-    fetchTopEmpresas();
-    fetchTopDominios();
+    // Resetar para página 1 quando o filtro muda (o efeito da página faz o pedido)
+    if (currentPage === 1) {
+      fetchDashboard();
+    } else {
+      setCurrentPage(1);
+    }
   }, [filterRisco]);
 
   useEffect(() => {
-    fetchVagas(currentPage);
+    // No carregamento inicial o efeito do filtro já pediu /dashboard
+    if (!paginaMontada.current) {
+      paginaMontada.current = true;
+      return;
+    }
+    // A página 1 vem de /dashboard; as seguintes de /vagas com o cursor
+    if (currentPage === 1) {
+      fetchDashboard();
+    } else {
+      fetchVagas(currentPage);
+    }
   }, [currentPage]);
 
+  // Detalhe completo de uma vaga, pedido só quando se abre um dos modais
+  const fetchVagaCompleta = async (vaga: VagaResumo): Promise<VagaCompleta | null> => {
+    try {
+      const response = await fetch(`${API_URL}/vagas/${vaga._id}`, { headers: authService.authHeaders() });
+      if (!response.ok) {
+        throw new Error('Erro ao carregar vaga');
+      }
+      return await response.json();
+    } catch (err) {
+      console.error('Erro ao carregar detalhes da vaga:', err);
+      return null;
+    }
+  };
+
   const getRiskColor = (nivel: string) => {
     switch (nivel) {
       case 'BAIXO': return 'text-green-600 bg-green-100';
@@ -187,12 +236,11 @@ const DadosOportunidadesPage: React.FC = () => {
   };
 
   const filteredVagas = vagas.filter(vaga => {
-    // Apenas filtrar por busca de texto (título, empresa, descrição)
+    // Apenas filtrar por busca de texto (título, empresa)
     // O filtro de risco é feito no backend
     const matchesSearch = !searchTerm || 
       vaga.titulo?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      vaga.empresa?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      vaga.descricao?.toLowerCase().includes(searchTerm.toLowerCase());
+      vaga.empresa?.toLowerCase().includes(searchTerm.toLowerCase());
     
     return matchesSearch;
   });
@@ -211,16 +259,22 @@ const DadosOportunidadesPage: React.FC = () => {
     setExpandedVaga(expandedVaga === vagaId ? null : vagaId);
   };
 
-  const openVagaInfoModal = (vaga: VagaCompleta) => {
-    setModalVagaInfo(vaga);
+  const openVagaInfoModal = async (vaga: VagaResumo) => {
+    const completa = await fetchVagaCompleta(vaga);
+    if (completa) {
+      setModalVagaInfo(completa);
+    }
   };
 
   const closeVagaInfoModal = () => {
     setModalVagaInfo(null);
   };
 
-  const openAnaliseRiscoModal = (vaga: VagaCompleta) => {
-    setModalAnaliseRisco(vaga);
+  const openAnaliseRiscoModal = async (vaga: VagaResumo) => {
+    const completa = await fetchVagaCompleta(vaga);
+    if (completa) {
+      setModalAnaliseRisco(completa);
+    }
   };
 
   const closeAnaliseRiscoModal = () => {
@@ -717,8 +771,8 @@ const DadosOportunidadesPage: React.FC = () => {
                 </div>
                 
                 <button
-                  onClick={() => setCurrentPage(Math.min(totalPages, currentPage + 1))}
-                  disabled={currentPage === totalPages}
+                  onClick={() => setCurrentPage(currentPage + 1)}
+                  disabled={!temProxima}
                   className="px-4 py-2 text-sm font-medium text-gray-700 bg-white border border-gray-300 rounded-lg hover:bg-gray-50 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
                 >
                   Próxima
@@ -4,9 +4,10 @@ import { zodResolver } from '@hookform/resolvers/zod';
 import { z } from 'zod';
 import { useNavigate } from 'react-router-dom';
 import { ArrowLeft, Search, AlertTriangle, CheckCircle, XCircle, Loader2, Shield, AlertCircle, Briefcase, MapPin, DollarSign, FileText, Link as LinkIcon, Copy, Wand2, LogIn, LogOut, User } from 'lucide-react';
-import { OportunidadeFormData, AnaliseResultado, RespostaAnalise, DadosVaga } from '@/types';
+import { OportunidadeFormData, AnaliseResultado, AnaliseParcial, RespostaAnalise, DadosVaga } from '@/types';
 // import { config } from '@/config';
 import { useAuth } from '../hooks/useAuth';
+import { authService } from '../services/authService';
 
 const oportunidadeSchema = z.object({
   // Campos de entrada
@@ -40,6 +41,7 @@ export default function VerificarOportunidadePage() {
   // const [tipoEntrada, setTipoEntrada] = useState<'LINK' | 'TEXTO'>('LINK');
   const [mostrarTextoCompleto, setMostrarTextoCompleto] = useState(false);
   const [urlTrustInfo, setUrlTrustInfo] = useState<any>(null);
+  const [analiseParcial, setAnaliseParcial] = useState<AnaliseParcial | null>(null);
 
   const removeHtmlTags = (text: string): string => {
     if (!text) return '';
@@ -72,12 +74,32 @@ export default function VerificarOportunidadePage() {
   };
   */
 
+  // Aplica um evento do stream ao estado parcial mostrado durante a análise
+  const aplicarEvento = (parcial: AnaliseParcial, evento: string, dados: any): AnaliseParcial => {
+    switch (evento) {
+      case 'triagem': return { ...parcial, etapa: 'MODELO' };
+      case 'dadosVaga': return { ...parcial, dadosVaga: { ...parcial.dadosVaga, [dados.campo]: dados.valor } };
+      case 'nivelRisco': return { ...parcial, nivelRisco: dados.nivelRisco };
+      case 'pontuacao': return { ...parcial, pontuacao: dados.pontuacao };
+      case 'alerta': {
+        const alertas = [...parcial.alertas];
+        alertas[dados.indice] = dados.texto;
+        return { ...parcial, alertas };
+      }
+      default: return parcial;
+    }
+  };
+
   const analisarOportunidade = async (data: OportunidadeFormData): Promise<RespostaAnalise> => {
     try {
-      const response = await fetch(`${(import.meta as any).env.VITE_API_URL || 'http://localhost:8000'}/analyze`, {
+      // POST /analyze/stream: os dados da vaga, o risco e os alertas chegam (Server-Sent Events)
+      // enquanto o modelo escreve; o evento "resultado" traz a resposta completa de /analyze
+      const response = await fetch(`${(import.meta as any).env.VITE_API_URL || 'http://localhost:8000'}/analyze/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          // Opcional: a análise é pública, mas a API pode exigir autenticação (ANALISE_REQUER_AUTENTICACAO)
+          ...authService.authHeaders(),
         },
         body: JSON.stringify({
           tipoEntrada: data.tipoEntrada,
@@ -91,9 +113,43 @@ export default function VerificarOportunidadePage() {
         console.error('Erro na resposta do servidor:', response.status, errorText);
         throw new Error(`Erro na análise: ${response.status} - ${errorText}`);
       }
+      if (!response.body) {
+        throw new Error('O navegador não suporta respostas em stream');
+      }
 
-      const resposta = await response.json();
-      return resposta;
+      const leitor = response.body.getReader();
+      const decodificador = new TextDecoder();
+      let pendente = '';
+      let parcial: AnaliseParcial = { etapa: 'CONTEUDO', dadosVaga: {}, alertas: [] };
+      setAnaliseParcial(parcial);
+      for (;;) {
+        const { done, value } = await leitor.read();
+        if (done) break;
+        pendente += decodificador.decode(value, { stream: true });
+        // Cada evento termina com uma linha em branco: "event: <nome>\ndata: <json>\n\n"
+        const blocos = pendente.split('\n\n');
+        pendente = blocos.pop() || '';
+        for (const bloco of blocos) {
+          let evento = 'message';
+          let dados = '';
+          for (const linha of bloco.split('\n')) {
+            if (linha.startsWith('event:')) evento = linha.slice(6).trim();
+            else if (linha.startsWith('data:')) dados += linha.slice(5).trim();
+          }
+          if (!dados) continue;
+          const conteudo = JSON.parse(dados);
+          if (evento === 'resultado') {
+            await leitor.cancel();
+            return conteudo;
+          }
+          if (evento === 'erro') {
+            throw new Error(conteudo.detail || 'Erro interno');
+          }
+          parcial = aplicarEvento(parcial, evento, conteudo);
+          setAnaliseParcial(parcial);
+        }
+      }
+      throw new Error('A ligação terminou antes do resultado da análise');
     } catch (error) {
       console.error('Erro ao analisar oportunidade:', error);
       
@@ -124,9 +180,7 @@ export default function VerificarOportunidadePage() {
   const onSubmit = async (data: OportunidadeFormData) => {
     try {
       setIsAnalyzing(true);
-      
-      // Simular tempo de análise
-      await new Promise(resolve => setTimeout(resolve, 2000));
+      setAnaliseParcial(null);
       
       const resposta = await analisarOportunidade(data);
       setResultado(resposta.analise);
@@ -137,6 +191,7 @@ export default function VerificarOportunidadePage() {
       console.error('Erro ao analisar oportunidade:', error);
     } finally {
       setIsAnalyzing(false);
+      setAnaliseParcial(null);
     }
   };
 
@@ -828,6 +883,42 @@ DESCRIÇÃO: Procuramos pessoa dinâmica para trabalhar no nosso escritório. Tr
                     </div>
                   )}
                 </button>
+                {/* Resultados parciais enquanto a análise decorre */}
+                {isAnalyzing && analiseParcial && (
+                  <div className="mt-4 p-3 sm:p-4 bg-gray-50 rounded-lg border border-gray-200 text-left">
+                    <p className="text-xs sm:text-sm font-medium text-gray-700 flex items-center">
+                      <Loader2 className="h-3 w-3 sm:h-4 sm:w-4 mr-2 animate-spin flex-shrink-0" />
+                      {analiseParcial.etapa === 'CONTEUDO' ? 'A obter o conteúdo da oportunidade...' : 'A analisar a oportunidade...'}
+                    </p>
+                    {analiseParcial.dadosVaga.titulo && (
+                      <p className="mt-2 text-sm text-gray-900 flex items-center">
+                        <Briefcase className="h-3 w-3 sm:h-4 sm:w-4 text-gray-600 mr-2 flex-shrink-0" />
+                        <span className="break-words">{analiseParcial.dadosVaga.titulo}</span>
+                      </p>
+                    )}
+                    {analiseParcial.dadosVaga.empresa && (
+                      <p className="text-xs sm:text-sm text-gray-600 mt-1">
+                        <strong>Empresa:</strong> {analiseParcial.dadosVaga.empresa}
+                      </p>
+                    )}
+                    {analiseParcial.nivelRisco && (
+                      <p className={`inline-block mt-2 px-2 py-1 rounded border text-xs sm:text-sm font-semibold ${getRiscoColor(analiseParcial.nivelRisco)}`}>
+                        Risco {analiseParcial.nivelRisco}
+                        {analiseParcial.pontuacao !== undefined && ` · ${analiseParcial.pontuacao}/100`}
+                      </p>
+                    )}
+                    {analiseParcial.alertas.length > 0 && (
+                      <ul className="mt-2 space-y-1">
+                        {analiseParcial.alertas.filter(Boolean).map((alerta, index) => (
+                          <li key={index} className="text-xs sm:text-sm text-gray-700 flex items-start">
+                            <AlertTriangle className="h-3 w-3 sm:h-4 sm:w-4 text-orange-500 mr-2 mt-0.5 flex-shrink-0" />
+                            <span className="break-words">{alerta}</span>
+                          </li>
+                        ))}
+                      </ul>
+                    )}
+                  </div>
+                )}
                 <p className="text-xs sm:text-sm text-gray-500 text-center mt-3 sm:mt-4 px-2">
                   Esta análise é baseada em padrões conhecidos de tráfico humano e golpes. 
                   Sempre seja cauteloso e verifique informações adicionais.
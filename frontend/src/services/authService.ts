@@ -48,6 +48,12 @@ export const authService = {
     return localStorage.getItem('token');
   },
 
+  // Cabeçalho Authorization para os endpoints protegidos da API
+  authHeaders(): Record<string, string> {
+    const token = this.getToken();
+    return token ? { Authorization: `Bearer ${token}` } : {};
+  },
+
   getUser(): User | null {
     const userStr = localStorage.getItem('user');
     if (!userStr) return null;
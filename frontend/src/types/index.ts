@@ -29,6 +29,18 @@ export interface UrlTrustInfo {
   trust_reason: string;
   domain_type: 'JOB_PORTAL' | 'GOVERNMENT_ORGANIZATION' | 'TECH_COMPANY' | 'LOCAL_COMPANY' | 'NEWS_SITE' | 'NGO' | 'TRUSTED_DOMAIN' | 'UNKNOWN';
   domain?: string;
+  reputation?: ReputacaoDominio | null;
+}
+
+export interface ReputacaoDominio {
+  dominio: string;
+  analises: number;
+  alto_risco: number;
+  proporcao_alto_risco: number;
+  pontuacao_media: number | null;
+  primeira_analise: string | null;
+  ultima_analise: string | null;
+  veredicto: 'MAU' | 'BOM' | 'INDEFINIDO' | 'SEM_HISTORICO';
 }
 
 export interface AnaliseResultado {
@@ -67,6 +79,7 @@ export interface AnaliseResultado {
     plataformaSuspeita?: string;
     urlSuspeita?: string;
   };
+  atalhoReputacao?: boolean;
 }
 
 export interface RespostaAnalise {
@@ -76,6 +89,15 @@ export interface RespostaAnalise {
   urlTrustInfo?: UrlTrustInfo;
 }
 
+// Estado da análise enquanto chegam os eventos de POST /analyze/stream
+export interface AnaliseParcial {
+  etapa: 'CONTEUDO' | 'TRIAGEM' | 'MODELO';
+  dadosVaga: DadosVaga;
+  nivelRisco?: AnaliseResultado['nivelRisco'];
+  pontuacao?: number;
+  alertas: string[];
+}
+
 export interface DadosVaga {
   titulo?: string;
   empresa?: string;
@@ -1,30 +1,37 @@
 import os
 import re
+import sys
 import json
 from typing import Optional, Dict
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
-import requests
+import httpx
 from IPython.display import Markdown, display
 import google.generativeai as genai
 
+# Módulos partilhados com o backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from cache_paginas import PageCache, cabecalhos_condicionais
+from cassetes_llm import REPRODUZIR, com_cassete
+from cliente_http import ClienteHTTPSincrono
+
 # Configuração inicial
 load_dotenv(override=True)
 api_key = os.getenv('GOOGLE_API_KEY')
+# LLM_CASSETE_MODO=gravar guarda as respostas em LLM_CASSETE; reproduzir corre sem rede a partir delas
+llm_cassete_modo = os.getenv('LLM_CASSETE_MODO', 'direto')
 
-if not api_key or len(api_key) < 10:
+if llm_cassete_modo != REPRODUZIR and (not api_key or len(api_key) < 10):
     raise ValueError("API key inválida. Verifique o arquivo .env")
 
 genai.configure()
-Model = genai.GenerativeModel('gemini-2.5-flash')
+Model = com_cassete(genai.GenerativeModel('gemini-2.5-flash'), llm_cassete_modo, os.getenv('LLM_CASSETE'))
 
-# Headers otimizados
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
-}
+# Cliente HTTP partilhado (pool keep-alive e limite de pedidos simultâneos por host)
+_http = ClienteHTTPSincrono()
 
-# Cache simples para evitar requisições repetidas
-_cache = {}
+# Cache de páginas limitado em bytes, com TTL, revalidação condicional e cache negativo
+_cache = PageCache(max_bytes=32 * 1024 * 1024, ttl_segundos=3600, ttl_negativo_segundos=60)
 
 
 class Website:
@@ -34,21 +41,26 @@ class Website:
         self.url = url
         
         # Usar cache se disponível
-        if url in _cache:
-            cached = _cache[url]
-            self.title = cached['title']
-            self.text = cached['text']
-            self.links = cached['links']
+        entrada, fresca = _cache.obter(url)
+        if entrada is not None and fresca:
+            self._carregar_entrada(entrada)
             return
         
-        # Fazer requisição apenas uma vez
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
+        # Fazer requisição apenas uma vez (condicional se já houver uma versão guardada)
+        try:
+            response = _http.get(url, headers=cabecalhos_condicionais(entrada))
+            if response.status_code == 304 and entrada is not None:
+                self._carregar_entrada(_cache.renovar(url) or entrada)
+                return
+            response.raise_for_status()
+        except Exception as e:
+            _cache.guardar_falha(url, str(e))
+            raise
         
         soup = BeautifulSoup(response.content, 'html.parser')
         
         # Extrair título
-        self.title = soup.title.string if soup.title else "No title found"
+        self.title = str(soup.title.string) if soup.title and soup.title.string else "No title found"
         
         # Extrair texto limpo
         if soup.body:
@@ -66,11 +78,19 @@ class Website:
         ))
         
         # Guardar no cache
-        _cache[url] = {
-            'title': self.title,
-            'text': self.text,
-            'links': self.links
-        }
+        _cache.guardar(
+            url,
+            {'title': self.title, 'text': self.text, 'links': self.links},
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+    
+    def _carregar_entrada(self, entrada: Dict):
+        if entrada['erro'] is not None:
+            raise httpx.HTTPError(entrada['erro'])
+        self.title = entrada['dados']['title']
+        self.text = entrada['dados']['text']
+        self.links = entrada['dados']['links']
     
     def get_contents(self) -> str:
         return f"Webpage Title:\n{self.title}\nWebpage Contents:\n{self.text}\n\n"
@@ -147,8 +167,8 @@ def get_links(url: str) -> Optional[Dict]:
         f"Links encontrados:\n" + "\n".join(website.links[:100])  # Limitar para não exceder tokens
     )
     
-    chat = Model.start_chat()
-    response = chat.send_message(LINK_SYSTEM_PROMPT + "\n\n" + user_prompt)
+    # Uma só mensagem: o mesmo que uma conversa nova, e passa pela cassete
+    response = Model.generate_content(LINK_SYSTEM_PROMPT + "\n\n" + user_prompt)
     
     return extract_json(response.text)
 
@@ -186,8 +206,7 @@ def extract_job_data(site_name: str, url: str, max_chars: int = 25000) -> str:
     user_prompt = f"Site: {site_name}\n\n{content}"
     
     # Gerar extração
-    chat = Model.start_chat()
-    response = chat.send_message(EXTRACTION_SYSTEM_PROMPT + "\n\n" + user_prompt)
+    response = Model.generate_content(EXTRACTION_SYSTEM_PROMPT + "\n\n" + user_prompt)
     
     return response.text
 